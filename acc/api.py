@@ -3,12 +3,19 @@ The main accelerator decorator and load_back_end function.
 
 These two functions are the only API functions from an end-user's perspective.
 """
+import acc.backend.profiling as profiling
+import acc.backend.sourcemap as sourcemap
+import acc.backend.queues as queues
+import acc.backend.transfers as transfers
+import acc.info as info
+import acc.timings as timings
 import acc.frontend.util.errors as errors
 import acc.frontend.util.util as util
 import acc.frontend.frontend as frontend
 import acc.ir.metavars as metavars
 import acc.ir.icv as icv
 import acc.ir.intrep as intrep
+import acc.ir.passes.pipeline as pipeline
 import dill
 import functools
 import inspect
@@ -24,6 +31,10 @@ DEFAULT_DEVICE_NUM  = 0
 # The default asynchronous queue, used when not specified by async clauses
 DEFAULT_ASYNC       = 0
 
+# The special async-arguments: use the default queue (acc_async_noval) and run synchronously (acc_async_sync)
+ASYNC_NOVAL         = queues.ASYNC_NOVAL
+ASYNC_SYNC          = queues.ASYNC_SYNC
+
 # The back end
 back = None
 
@@ -45,7 +56,7 @@ def _initialize_acc():
         return wrapper
     return decorate
 
-def acc():
+def acc(async_=None):
     """
     The main accelerator decorator.
 
@@ -59,6 +70,20 @@ def acc():
             ret.append(d ** 2)
     ```
 
+    If `async_` is given, it is an async-argument (an int, or ASYNC_NOVAL for the default
+    queue), and every call to the decorated function is enqueued on that asynchronous activity
+    queue instead of blocking. The call then returns a handle, which has a `result()` method and
+    which can be awaited from a coroutine:
+
+    ```python
+    @acc(async_=1)
+    def function_to_accelerate(data, ret):
+        ...
+
+    handle = function_to_accelerate(data, ret)
+    await handle                    # or handle.result(), or wait(1), or await wait_coroutine(1)
+    ```
+
     NOTE: You cannot use global variables in the function that is decorated.
           The results are undefined if you do that, but it will likely result
           in a NameError. If you need to use a global, just pass it in to the
@@ -82,53 +107,81 @@ def acc():
             except AttributeError:
                 raise ImportError("Back end does not have a 'compile' function.")
 
+            # Time each stage of the call (see timings.py)
+            clock = timings.stopwatch(_qualified_name(func))
+
             # Grab the source code from the decorated function
             source = dill.source.getsource(func).splitlines()[1:]  # strip the decorator
             source = os.linesep.join(source)
+            clock.lap("source")
 
-            # Grab the decorated function's signature
+            # Grab the decorated function's signature, and the values this call gives its parameters
             signature = inspect.signature(func)
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = dict(bound.arguments)
+            except TypeError:
+                # The call itself will raise the error
+                arguments = None
+            clock.lap("signature")
 
             # Grab the top of the stack
             stackframe = inspect.stack()[1]
+            clock.lap("stack")
 
             # Grab the decorated function's modules
             module = sys.modules[func.__module__]
             mods_mods = util.get_modules_from_module(module)
+            clock.lap("modules")
 
             # Put together all the stuff we need in order to rewrite the function
             funcname = func.__name__
-            meta_data = metavars.MetaVars(src=source, stackframe=stackframe, signature=signature, funcs_name=funcname, funcs_module=module, funcs_mods=mods_mods)
+            meta_data = metavars.MetaVars(src=source, stackframe=stackframe, signature=signature, funcs_name=funcname, funcs_module=module, funcs_mods=mods_mods, arguments=arguments)
 
             intermediate_rep = intrep.IntermediateRepresentation(meta_data, icvs)
             dbg = errors.Debug(intermediate_rep)
-            for pragma, linenumber in frontend.parse_pragmas(intermediate_rep.src, *args, **kwargs):
+            for pragma, linenumber in frontend.parse_pragmas(intermediate_rep, *args, **kwargs):
                 dbg.lineno = linenumber
                 # Side-effect-y: this function modifies intermediate_rep each time
                 frontend.accumulate_pragma(intermediate_rep, pragma, linenumber, dbg, *args, **kwargs)
+            clock.lap("parse")
+
+            # Optimise the intermediate representation
+            pipeline.optimize(intermediate_rep)
+            clock.lap("optimize")
 
             # Pass the intermediate representation into the backend to get the new source code
             new_source = back.compile(intermediate_rep)
+            clock.lap("compile")
 
             # Dump the source code that we created into a file
             oldmodulesource = dill.source.getsource(module)
             signature_line = "def {}{}:".format(func.__name__, signature)
             signature_line_number = oldmodulesource.splitlines().index(signature_line) - 1 # deal with decorator
             last_line_number = len(source.splitlines()) + signature_line_number + 1
+            if info.enabled:
+                info.emit(intermediate_rep, _qualified_name(func), inspect.getsourcefile(module), signature_line_number + 2)
             newmodulesource = _replace_source(oldmodulesource, new_source, signature_line_number, last_line_number)
             fpath = util.compile_kernel_module(newmodulesource)
+            clock.lap("module")
 
-            # TODO: Remove this
-            print(newmodulesource)
-            with open("debug_output.py", 'wb') as f:
-                f.write(newmodulesource.encode())
-
-            # Import the new module.
-            mod = util.load_kernel_module(fpath)
+            # Import the new module, with its code pointing at this module's source (see sourcemap.py)
+            mapping = sourcemap.SourceMap(inspect.getsourcefile(module), signature_line_number + 1, len(new_source.splitlines()),
+                                          last_line_number - signature_line_number, signature_line_number + 2, intermediate_rep.line_map)
+            mod = util.load_kernel_module(fpath, code=mapping.compile_module(newmodulesource))
+            clock.lap("load")
 
             # Return the result of executing the newly written function.
             func_to_execute = getattr(mod, funcname)
-            return func_to_execute(*args, **kwargs)
+            try:
+                if async_ is None or async_ == ASYNC_SYNC:
+                    return func_to_execute(*args, **kwargs)
+                queueid = icvs.default_async if async_ == ASYNC_NOVAL else async_
+                return queues.enqueue(queueid, func_to_execute, *args, **kwargs)
+            finally:
+                clock.lap("execute")
+                clock.stop()
         return wrapper
     return decorate
 
@@ -319,7 +372,7 @@ def async_test(i: int) -> int:
     asynchronous operations initiated by this thread have completed; there is no guarantee that all matching
     asynchronous operations initiated by other threads have completed.
     """
-    pass
+    return int(queues.test(i))
 
 @_initialize_acc()
 def async_test_all() -> int:
@@ -334,7 +387,7 @@ def async_test_all() -> int:
     outstanding asynchronous operations initiated by this thread have completed; there is no guarantee that all
     asynchronous operations initiated by other threads have completed.
     """
-    pass
+    return int(queues.test_all())
 
 @_initialize_acc()
 def wait(i: int) -> None:
@@ -351,7 +404,7 @@ def wait(i: int) -> None:
     equivalent to a wait directive with a matching wait argument and no async clause, as described in
     Section 2.16.3.
     """
-    pass
+    queues.wait(i)
 
 @_initialize_acc()
 def wait_async(w: int, a: int) -> None:
@@ -365,7 +418,7 @@ def wait_async(w: int, a: int) -> None:
     acc_wait_async is functionally equivalent to a wait directive with a matching wait argument
     and a matching async argument, as described in Section 2.16.3.
     """
-    pass
+    queues.wait_async([w], a)
 
 @_initialize_acc()
 def wait_all() -> None:
@@ -379,7 +432,27 @@ def wait_all() -> None:
     acc_wait_all is functionally equivalent to a wait directive with no wait argument list and no
     async argument, as described in Section 2.16.3.
     """
-    pass
+    queues.wait_all()
+
+async def wait_coroutine(i: int) -> None:
+    """
+    Coroutine variant of `wait`, for use with asyncio.
+
+    Suspends the calling coroutine until all the asynchronous operations on queue `i` have completed,
+    without blocking the event loop (or dedicating a thread to the wait).
+    """
+    _construct_icvs()
+    await queues.wait_coroutine(i)
+
+async def wait_all_coroutine() -> None:
+    """
+    Coroutine variant of `wait_all`, for use with asyncio.
+
+    Suspends the calling coroutine until all the asynchronous operations have completed,
+    without blocking the event loop (or dedicating a thread to the wait).
+    """
+    _construct_icvs()
+    await queues.wait_all_coroutine()
 
 @_initialize_acc()
 def wait_all_async(i: int) -> None:
@@ -392,7 +465,7 @@ def wait_all_async(i: int) -> None:
     is functionally equivalent to a wait directive with no wait argument list and a matching async
     argument, as described in Section 2.16.3.
     """
-    pass
+    queues.wait_all_async(i)
 
 @_initialize_acc()
 def get_default_async() -> int:
@@ -403,7 +476,7 @@ def get_default_async() -> int:
     acc-default-async-var for the current thread, which is the asynchronous queue used when an async clause appears
     without an async-argument or with the value acc_async_noval.
     """
-    pass
+    return icvs.default_async
 
 @_initialize_acc()
 def set_default_async(i: int) -> None:
@@ -419,7 +492,7 @@ def set_default_async(i: int) -> None:
     functionally equivalent to a set default_async directive with a matching argument in int-expr, as
     described in Section 2.14.3.
     """
-    pass
+    icvs.default_async = DEFAULT_ASYNC if i == ASYNC_NOVAL else i
 
 @_initialize_acc()
 def on_device(devtype: str) -> int:
@@ -789,6 +862,86 @@ def detach():
     """
     pass
 
+@_initialize_acc()
+def prof_register(event: str, callback) -> None:
+    """
+    Description
+    -----------
+    The acc_prof_register routine registers `callback` to be called each time the runtime
+    reports `event`, which is the name of an event without its acc_ev_ prefix (e.g.,
+    "compute_construct_start" or "enqueue_upload_end"; see acc.backend.profiling.EVENTS).
+    The callback is called as `callback(info)`, where `info` is an acc.backend.profiling.EventInfo
+    that holds the decorated function's name and the line number of the region's pragma, the
+    number of gangs, the number of bytes moved, and so on, as far as they apply to the event.
+
+    Tools can also be loaded at startup with the ACC_PROFLIB environment variable, a list of
+    modules or .py files, each with an `acc_register_library(register, unregister)` function.
+
+    Restrictions
+    ------------
+    - Callbacks are called on whichever thread the event happens on (the thread of an activity queue,
+      for an async region), so they must be thread-safe.
+    """
+    profiling.register(event, callback)
+
+@_initialize_acc()
+def prof_unregister(event: str, callback) -> None:
+    """
+    Description
+    -----------
+    The acc_prof_unregister routine removes a registration of `callback` for `event` made by
+    acc_prof_register. When no callback is registered for any event, the runtime no longer
+    collects the information that events are reported with.
+    """
+    profiling.unregister(event, callback)
+
+def get_stage_timings() -> dict:
+    """
+    Returns how long each stage of the @acc decorator's pipeline (fetching the source, parsing
+    the pragmas, compiling, loading, executing...) has taken, for each decorated function, as
+    a dictionary of histograms of nanoseconds. See acc.timings for the stages and the format.
+
+    Timing the stages can be turned off with ACC_STAGE_TIMINGS=0.
+    """
+    return timings.get()
+
+def dump_stage_timings(f) -> None:
+    """
+    Writes the result of `get_stage_timings` as JSON to `f`, a file name or a file object.
+    """
+    timings.dump(f)
+
+def reset_stage_timings() -> None:
+    """
+    Forgets the timings that `get_stage_timings` returns.
+    """
+    timings.reset()
+
+def get_transfer_stats() -> dict:
+    """
+    Returns how much data the compute regions, data regions and update directives have moved
+    between the host and the device: for each region ("funcname:lineno"), and for each variable
+    in each region, the number of transfers to the device and back, the bytes moved each way,
+    and the nanoseconds the transfers took, as
+    {"regions": {region: counts}, "variables": {region: {variable: counts}}}.
+    See acc.backend.transfers for what is counted and how.
+
+    Counting can be turned off with ACC_TRANSFER_STATS=0.
+    """
+    return transfers.get()
+
+def dump_transfer_stats(f) -> None:
+    """
+    Writes the result of `get_transfer_stats` as JSON to `f`, a file name or a file object.
+    """
+    transfers.dump(f)
+
+def reset_transfer_stats() -> None:
+    """
+    Forgets the counts that `get_transfer_stats` returns.
+    """
+    transfers.reset()
+
 def _construct_icvs():
     """
     Construct the ICVs object out of the environment variables
@@ -801,6 +954,13 @@ def _construct_icvs():
         default_async = DEFAULT_ASYNC
 
         icvs = icv.ICVs(current_device_type, current_device_num, default_async)
+        profiling.load_libraries()
+
+def _qualified_name(func) -> str:
+    """
+    Returns the name that the stage timings of the decorated function `func` are kept under.
+    """
+    return "{}.{}".format(func.__module__, getattr(func, "__qualname__", func.__name__))
 
 def _replace_source(oldsrc, newsrc, startlineno, endlineno):
     """
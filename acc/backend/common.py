@@ -1,6 +1,9 @@
 """
 Common methods and data structures used by the back ends.
 """
+import acc.frontend.util.util as util
+import re
+
 class CompilerTarget:
     """
     This class represents the compiler target. The compiler target is source code
@@ -50,40 +53,153 @@ class CompilerTarget:
         """
         self.importsection = ""             # Source code for the import section
         self.kernel_code_sections = []      # One source string per kernel
-        self.decorated_function_code = ""   # Source code for the refactored function
-        self._modules = set([mod.__name__ for _alias, mod in intermediate_rep.meta_data.funcs_mods])
+        self.decorated_function_code = intermediate_rep.src   # Source code for the refactored function
+        self._modules = set([(mod.__name__, alias) for alias, mod in intermediate_rep.meta_data.funcs_mods])
+        self._replacements = []             # (first line, last line, source) to swap into the function
+        self._kernel_origins = []           # (first line, last line, pragma line) of each kernel's region
 
     def add_import(self, module: str, alias=None):
         """
         Utility function for adding an import statement.
 
         Adds `import module` to the import section of the source code, where `module`
-        is the given module. Does not add it if this module is already in the import section.
+        is the given module. Does not add it if this module is already in the import section
+        under the same name.
         """
-        if module not in self._modules:
-            if alias and alias != module:
+        alias = alias if alias else module
+        if (module, alias) not in self._modules:
+            if alias != module:
                 self.importsection += "import {} as {}\n".format(module, alias)
             else:
                 self.importsection += "import {}\n".format(module)
-            self._modules.add(module)
+            self._modules.add((module, alias))
 
-    def add_kernel(self, kernelsrc: str):
+    def add_kernel(self, kernelsrc: str, first=None, last=None, lineno=None):
         """
         Adds the given `kernelsrc` into the list of kernels to compile.
+
+        `first` and `last` are the (function-based) line numbers of the region that the
+        kernel's code was taken from, and `lineno` is the line number of the region's pragma,
+        which the kernel's `def` is mapped to (see `line_map`).
         """
         self.kernel_code_sections.append(kernelsrc)
+        self._kernel_origins.append((first, last, lineno))
+
+    def replace_lines(self, first: int, last: int, src: str):
+        """
+        Replaces lines `first` through `last` (inclusive, function-based line numbers,
+        as in IrNode.lineno) of the decorated function with `src` when the module is built.
+
+        Replacements are all made against the original line numbers, so they can
+        be added in any order, but they must not overlap.
+        """
+        self._replacements.append((first, last, src))
 
     def build(self):
         """
         Builds and returns the resultant source code.
         """
-        return "{imports}\n\n{kernels}\n{decorated_function}".format(imports=self.importsection, kernels=self._build_kernels_section(), decorated_function=self.decorated_function_code)
+        return "\n".join(line for line, _ in self._build_lines())
 
-    def _build_kernels_section(self):
+    def line_map(self) -> list:
         """
-        Builds and returns a string representation of the kernels.
+        Returns, for each line of the source code that `build` returns, the (function-based)
+        line number of the decorated function that it came from, or None if it did not come
+        from any (e.g., the imports).
+
+        A line that was copied from the decorated function (into a kernel, or into a
+        replacement) maps to the line it was copied from. A line that was generated maps to
+        the last copied line before it, or, if there is none, to the region's pragma (for
+        a kernel) or to the first line that the replacement replaced.
         """
-        s = ""
-        for kernel in self.kernel_code_sections:
-            s += kernel + "\n\n"
-        return s
+        return [lineno for _, lineno in self._build_lines()]
+
+    def _build_lines(self) -> [(str, int)]:
+        """
+        Builds the resultant source code as a list of lines, each with the line it came from.
+        """
+        lines = [(line, None) for line in self.importsection.splitlines()]
+        lines += [("", None), ("", None)]
+        for kernel, (first, last, lineno) in zip(self.kernel_code_sections, self._kernel_origins):
+            lines += _match_lines(kernel.splitlines(), self.decorated_function_code.splitlines(), first, last, lineno)
+            lines.append(("", None))
+        lines.append(("", None))
+        return lines + self._build_decorated_function()
+
+    def _build_decorated_function(self) -> [(str, int)]:
+        """
+        Builds and returns the refactored function, with all the replacements made, as a list of
+        lines, each with the line it came from.
+        """
+        original = self.decorated_function_code.splitlines()
+        lines = [(line, i) for i, line in enumerate(original)]
+        for first, last, src in sorted(self._replacements, reverse=True):
+            lines[first:last + 1] = _match_lines(src.splitlines(), original, first, last, first)
+        return lines
+
+def _match_lines(lines: [str], original: [str], first, last, default) -> [(str, int)]:
+    """
+    Pairs each of `lines` (generated from lines `first` through `last` of `original`) with the
+    line of `original` that it was copied from (the next line, in order, with the same text,
+    ignoring indentation), or with the last one matched before it, or with `default`.
+    """
+    if first is None or last is None:
+        return [(line, default) for line in lines]
+    matched = []
+    cursor = first
+    previous = default
+    for line in lines:
+        text = line.strip()
+        if text:
+            for i in range(cursor, min(last, len(original) - 1) + 1):
+                if original[i].strip() == text:
+                    previous = i
+                    cursor = i + 1
+                    break
+        matched.append((line, previous))
+    return matched
+
+def get_function_locals(intermediate_rep, exclude=range(0)) -> set:
+    """
+    Returns the names of the decorated function's parameters and local variables,
+    not counting names that are only bound on the (function-based) line numbers
+    in the range `exclude`.
+
+    The names and the lines that bind them come from the source index, which parses
+    the function once, so this takes no longer than the number of names.
+    """
+    index = intermediate_rep.index
+    names = set(index.parameters)
+    for name, lines in index.bindings.items():
+        # The lines are in order, so some are outside the range if the first or the last one is
+        if lines[0] not in exclude or lines[-1] not in exclude:
+            names.add(name)
+    return names
+
+def get_region_variables(intermediate_rep, region_src: str, first: int, last: int, exclude=()) -> [str]:
+    """
+    Returns the names of the variables that a region of the decorated function
+    uses and that live outside of it (so they must be given to the region),
+    in order of first appearance.
+
+    @param region_src:  The source code of the region.
+
+    @param first:       The region's first line number (function-based).
+
+    @param last:        The region's last line number (function-based).
+
+    @param exclude:     Names that should not be returned, even if they qualify
+                        (e.g., the loop variables of a `parallel loop`).
+    """
+    outside = get_function_locals(intermediate_rep, exclude=range(first, last + 1))
+    names = []
+    for name in util.get_variables_from_source(util.left_strip_src(region_src)):
+        if name in outside and name not in exclude and name not in names:
+            names.append(name)
+    return names
+
+def get_indentation(line: str) -> str:
+    """
+    Returns the leading whitespace of `line`.
+    """
+    return re.match(r"(\s*)", line).group(1)
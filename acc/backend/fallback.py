@@ -0,0 +1,180 @@
+"""
+Decides, each time a `parallel loop` is reached, whether to launch it on the gangs
+or to run it on the local thread instead.
+
+A region runs on the local thread when its if clause is false or its self clause
+is true (the code generated by the host back end evaluates those), and also when
+its trip count is too small for the gangs to pay off: launching a region costs a
+fixed overhead (waking the gangs, sending them the kernel and the data, and
+waiting for their replies), which a loop over a handful of items never makes up.
+
+The smallest trip count that is launched on the gangs is each region's threshold.
+It starts out as DEFAULT_INLINE_THRESHOLD (set by ACC_INLINE_THRESHOLD; 0 launches
+every region, however small), and, unless ACC_INLINE_LEARN is 0, it is learned from
+the region's own timings: the time per iteration when the loop runs on the local
+thread, and the overhead of a launch (the time a launch takes beyond its share of
+the iterations on each gang). Launching pays off once the time saved by splitting
+the iterations among the gangs is more than the overhead:
+
+    n * per_item * (1 - 1 / num_gangs) > overhead
+
+The generated code uses this module like this:
+
+```python
+_acc_items = range(n)
+with _acc_fallback.timed("f:12", _acc_items, num_gangs=None, condition=True) as _acc_run:
+    if _acc_run.offload:
+        _acc_gangs.launch(...)
+    else:
+        for i in _acc_items:
+            ...
+```
+"""
+import acc.backend.gangs as gangs
+import os
+import threading
+import time
+
+# Trip counts below this run on the local thread, until a region's timings say otherwise
+DEFAULT_INLINE_THRESHOLD = int(os.environ.get("ACC_INLINE_THRESHOLD", 256))
+
+# Learn each region's threshold from its timings
+DEFAULT_LEARN = os.environ.get("ACC_INLINE_LEARN", "1") == "1"
+
+# How much the newest timing counts for in a region's running averages
+SMOOTHING = 0.3
+
+class RegionTimings:
+    """
+    What has been learned about one region.
+
+    Items
+    -----
+
+    - per_item  : The running average of the seconds per iteration on the local thread, or None.
+    - overhead  : The running average of the seconds a launch takes beyond its share of
+                  the iterations, or None.
+    - inline    : How many times the region ran on the local thread.
+    - offloaded : How many times the region was launched on the gangs.
+    """
+    __slots__ = ("per_item", "overhead", "inline", "offloaded")
+
+    def __init__(self):
+        self.per_item = None
+        self.overhead = None
+        self.inline = 0
+        self.offloaded = 0
+
+    def threshold(self, num_gangs: int) -> float:
+        """
+        Returns the smallest trip count for which launching the region on `num_gangs`
+        gangs is expected to pay off.
+        """
+        if not DEFAULT_LEARN or DEFAULT_INLINE_THRESHOLD <= 0 or self.per_item is None or self.overhead is None:
+            return DEFAULT_INLINE_THRESHOLD
+        saved = self.per_item * (1 - 1 / max(num_gangs, 1))
+        if saved <= 0:
+            return float("inf")
+        return max(self.overhead, 0.0) / saved
+
+class Timed:
+    """
+    The context manager returned by `timed`. Its `offload` is True if the region is to be
+    launched on the gangs, and False if it is to run on the local thread. The time that the
+    block takes is recorded against the region when it exits without an exception.
+    """
+    __slots__ = ("key", "trip_count", "num_gangs", "offload", "_record", "_start")
+
+    def __init__(self, key: str, trip_count, num_gangs: int, offload: bool, record: bool):
+        self.key = key
+        self.trip_count = trip_count
+        self.num_gangs = num_gangs
+        self.offload = offload
+        self._record = record
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None and self._record:
+            record(self.key, self.trip_count, time.perf_counter() - self._start, self.offload, self.num_gangs)
+        return False
+
+# The RegionTimings of each region, by key
+_timings = {}
+_timings_lock = threading.Lock()
+
+def timed(key: str, items, num_gangs=None, condition=True, record=True) -> Timed:
+    """
+    Decides whether to launch the region `key` (the decorated function's name and the
+    line number of the region's pragma) and returns a Timed to run it in.
+
+    @param key:         The region's key, which its timings are kept under.
+
+    @param items:       The iterable of the region's loop. A region over an iterable with
+                        no length is always launched (when `condition` allows it), since
+                        its trip count cannot be known without running it.
+
+    @param num_gangs:   The value of the region's num_gangs clause, or None for the default.
+
+    @param condition:   The value of the region's if and self clauses: False if the region
+                        must run on the local thread.
+
+    @param record:      False if the time that the block takes is not the time the region
+                        takes (e.g., because it is launched asynchronously).
+    """
+    num_gangs = gangs.DEFAULT_NUM_GANGS if num_gangs is None else num_gangs
+    try:
+        trip_count = len(items)
+    except TypeError:
+        trip_count = None
+
+    if not condition:
+        offload = False
+    elif trip_count is None:
+        offload = True
+    else:
+        with _timings_lock:
+            timings = _timings.get(key)
+        threshold = DEFAULT_INLINE_THRESHOLD if timings is None else timings.threshold(num_gangs)
+        offload = trip_count >= threshold
+
+    # The first launch also starts the gangs, which says nothing about later launches
+    record = record and trip_count is not None and (not offload or gangs.is_started())
+    return Timed(key, trip_count, num_gangs, offload, record)
+
+def record(key: str, trip_count: int, seconds: float, offloaded: bool, num_gangs: int) -> None:
+    """
+    Records that the region `key` took `seconds` for `trip_count` iterations, on the gangs
+    if `offloaded` is True, and on the local thread otherwise.
+    """
+    with _timings_lock:
+        timings = _timings.setdefault(key, RegionTimings())
+        if offloaded:
+            timings.offloaded += 1
+            share = trip_count * (timings.per_item or 0.0) / max(num_gangs, 1)
+            timings.overhead = _average(timings.overhead, seconds - share)
+        else:
+            timings.inline += 1
+            if trip_count > 0:
+                timings.per_item = _average(timings.per_item, seconds / trip_count)
+
+def thresholds(num_gangs=None) -> dict:
+    """
+    Returns the current threshold of each region that has been timed, by key.
+    """
+    num_gangs = gangs.DEFAULT_NUM_GANGS if num_gangs is None else num_gangs
+    with _timings_lock:
+        return {key: timings.threshold(num_gangs) for key, timings in _timings.items()}
+
+def reset() -> None:
+    """
+    Forgets everything that has been learned.
+    """
+    with _timings_lock:
+        _timings.clear()
+
+def _average(average, value: float) -> float:
+    return value if average is None else (1 - SMOOTHING) * average + SMOOTHING * value
@@ -0,0 +1,137 @@
+"""
+Profiles of the kernels that run in the gang processes, merged on the host.
+
+Profiling the host process only shows it waiting for the gangs, since that is where
+the kernels run. When this module is enabled (ACC_PROFILE=1, or `start`), each gang
+runs each chunk of a region's iterations under cProfile and sends the profile back
+along with its results, and the host merges them all into one profile, which
+`stats` returns as a pstats.Stats, and which is written to ACC_PROFILE_FILE (in the
+format of pstats.Stats.dump_stats, so it can be loaded with pstats or snakeviz) when
+the program exits.
+
+The kernels are compiled from a module that the acc decorator generates, but with the
+lines of the source code they came from (see sourcemap.py), so the profiles the gangs
+send back already point at the user's source code. Before they are merged, each kernel
+is renamed after the decorated function and the line of its region's pragma (e.g.,
+`f:12 (acc region)`), where it is shown.
+"""
+import atexit
+import os
+import pstats
+import threading
+
+# Profile the kernels from the start
+DEFAULT_ENABLED = os.environ.get("ACC_PROFILE", "0") == "1"
+
+# The file that the merged profile is written to when the program exits, if profiling is enabled
+DEFAULT_PROFILE_FILE = os.environ.get("ACC_PROFILE_FILE", "acc.prof")
+
+# True while profiling is on
+enabled = DEFAULT_ENABLED
+
+# The merged profile, or None if no gang has sent one back yet
+_merged = None
+_merged_lock = threading.Lock()
+
+class _Profile:
+    """
+    Something that pstats.Stats can be made from: a dictionary of statistics in the
+    format of cProfile.Profile.stats.
+    """
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def start() -> None:
+    """
+    Turns profiling on.
+    """
+    global enabled
+    enabled = True
+
+def stop() -> None:
+    """
+    Turns profiling off. The profile so far is kept until `reset`.
+    """
+    global enabled
+    enabled = False
+
+def reset() -> None:
+    """
+    Forgets the profile so far.
+    """
+    global _merged
+    with _merged_lock:
+        _merged = None
+
+def add(profile: dict, kernel, region=None) -> None:
+    """
+    Merges the `profile` (the stats of a cProfile.Profile) that a gang sent back after running
+    `kernel` (the host's copy of it) for the region whose key is `region` into the merged profile.
+    """
+    global _merged
+    code = getattr(kernel, "__code__", None)
+    kernelkey = (code.co_filename, code.co_firstlineno, code.co_name) if code is not None else None
+    mapped = {}
+    for func, (cc, nc, tt, ct, callers) in profile.items():
+        key = _map(func, kernelkey, region)
+        mappedcallers = {}
+        for caller, value in callers.items():
+            callerkey = _map(caller, kernelkey, region)
+            mappedcallers[callerkey] = _add_caller(mappedcallers.get(callerkey), value)
+        if key in mapped:
+            cc0, nc0, tt0, ct0, callers0 = mapped[key]
+            for callerkey, value in mappedcallers.items():
+                callers0[callerkey] = _add_caller(callers0.get(callerkey), value)
+            mapped[key] = (cc0 + cc, nc0 + nc, tt0 + tt, ct0 + ct, callers0)
+        else:
+            mapped[key] = (cc, nc, tt, ct, mappedcallers)
+
+    with _merged_lock:
+        if _merged is None:
+            _merged = pstats.Stats(_Profile(mapped))
+        else:
+            _merged.add(_Profile(mapped))
+
+def stats():
+    """
+    Returns the merged profile as a pstats.Stats, or None if there is none yet.
+    """
+    with _merged_lock:
+        if _merged is None:
+            return None
+        return pstats.Stats(_Profile({func: (cc, nc, tt, ct, dict(callers)) for func, (cc, nc, tt, ct, callers) in _merged.stats.items()}))
+
+def dump(path: str) -> None:
+    """
+    Writes the merged profile to `path`, in the format of pstats.Stats.dump_stats.
+    Does nothing if there is no profile.
+    """
+    merged = stats()
+    if merged is not None:
+        merged.dump_stats(path)
+
+def _map(func: tuple, kernelkey, region) -> tuple:
+    """
+    Returns the (file name, line number, function name) that the profile entry `func` of
+    a kernel is shown as.
+    """
+    filename, line, _ = func
+    if func == kernelkey and region is not None:
+        return (filename, line, "{} (acc region)".format(region))
+    return func
+
+def _add_caller(value, other):
+    """
+    Adds up two entries of a callers dictionary: (cc, nc, tt, ct) tuples, or plain counts.
+    """
+    if value is None:
+        return other
+    if isinstance(value, tuple):
+        return tuple(a + b for a, b in zip(value, other))
+    return value + other
+
+if DEFAULT_ENABLED:
+    atexit.register(dump, DEFAULT_PROFILE_FILE)
@@ -0,0 +1,1027 @@
+"""
+The gang runtime for the host back end.
+
+Source code generated by the host back end calls into this module to run its
+compute regions. A gang is a long-lived Python process; all the gangs belong to
+a single GangPool that is started the first time a region is launched and is
+shared by every region (and every activity queue) in the program.
+
+Launching a region with n gangs looks like this:
+
+1. The kernel function is serialized once (with dill, since it is not importable).
+2. n tasks are handed to the pool, each one carrying the kernel, the gang's number,
+   the gang's chunk of the loop's iterations (for `parallel loop`), and copies of
+   the data the region uses. Tasks and replies are serialized by messages.py,
+   which sends large buffers over the pipes without copying them into the pickle.
+3. Each gang process runs the kernel on its task and sends back its copy of
+   every composite (non-scalar) variable.
+4. The host merges the gangs' copies back into the original variables in place.
+   Scalars are treated as firstprivate and are not copied back.
+
+NumPy arrays are the exception: they are placed in shared-memory device buffers
+(see sharedarrays.py) that the gangs read and write in place, and which the data
+clauses (copy, copyin, copyout, create) copy in and out.
+
+Large `parallel loop` regions can be pipelined, by setting ACC_PIPELINE_DEPTH to
+more than 1: the iterations are split into more chunks than there are gangs, and
+each gang may have up to PIPELINE_DEPTH chunks in flight. While a gang computes chunk k, the host is already copying chunk k+1's
+slice of the streamed arrays (those whose first dimension is the trip count, and
+which the kernel only indexes by the index of its iteration) into the device
+buffers and sending it, and copying chunk k-1's results back out.
+
+Serial regions are not sent to the gangs at all: they run on the local thread
+(see launch_serial), with the same data semantics.
+
+A sequence of regions (the kernels of a kernels construct) can be run inside a
+data region (see DataRegion), which keeps the arrays they use in their device
+buffers from the first region to the last, so they are copied in and out once.
+
+Memory-mapped arrays are never copied; the gangs map their files themselves.
+A parallel loop over memory-mapped arrays is streamed: it is split into windows
+of at most STREAM_WINDOW_BYTES each, and since each gang maps the file anew for
+each window and unmaps it afterwards, and only PIPELINE_DEPTH windows per gang
+are in flight at once, resident memory stays bounded no matter how big the
+files are.
+
+A parallel loop over an iterable with no length (a generator, say) is run in
+batches of BATCH_SIZE items, pulled from the iterable only as the gangs are
+ready for them. Replies are merged one at a time in iteration order and then
+dropped, so the region only holds the batches in flight, not the whole dataset.
+
+Everything that happens on the device (starting the gangs, launching a chunk,
+copying an array in or out...) is reported to the callbacks registered with the
+profiling interface (see profiling.py), if there are any. When tracing is on (see
+tracing.py), the host and the gangs also record a timeline of what they do, and
+when profiling is on (see gangprofile.py), the gangs profile the kernels. The data
+that each region moves to and from the device is counted by transfers.py.
+"""
+import acc.backend.gangprofile as gangprofile
+import acc.backend.messages as messages
+import acc.backend.profiling as profiling
+import acc.backend.queues as queues
+import acc.backend.sharedarrays as sharedarrays
+import acc.backend.tracing as tracing
+import acc.backend.transfers as transfers
+import cProfile
+import collections
+import collections.abc
+import concurrent.futures
+import copy
+import dill
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+import types
+
+# The number of gang processes to start, if not overridden
+DEFAULT_NUM_GANGS = os.cpu_count() or 1
+
+# The number of chunks each gang may have in flight at once. 1 turns pipelining off.
+# It is off by default: when every core already has a gang, the extra chunks and copies
+# cost more than the overlap saves (see benchmarks/pipeline.py).
+PIPELINE_DEPTH = int(os.environ.get("ACC_PIPELINE_DEPTH", 1))
+
+# The smallest trip count for which a parallel loop is pipelined
+PIPELINE_THRESHOLD = int(os.environ.get("ACC_PIPELINE_THRESHOLD", 1024))
+
+# How many chunks per gang to split a pipelined parallel loop into
+PIPELINE_CHUNKS = int(os.environ.get("ACC_PIPELINE_CHUNKS", 4))
+
+# How many items to pull at a time from a parallel loop's iterable, when it has no length
+BATCH_SIZE = int(os.environ.get("ACC_BATCH_SIZE", 256))
+
+# The most bytes of memory-mapped arrays that a single chunk of a parallel loop may touch
+STREAM_WINDOW_BYTES = int(os.environ.get("ACC_STREAM_WINDOW_BYTES", 64 * 1024 * 1024))
+
+# Things with a __dict__ that are nevertheless never copied back from the gangs
+_NOT_COMPOSITE = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, type)
+
+class GangError(Exception):
+    """
+    Raised on the host when a kernel raised an exception inside a gang.
+    The message contains the traceback from the gang process.
+    """
+    pass
+
+class GangPool:
+    """
+    A pool of gang processes.
+
+    Each gang process is connected to the host by a pipe. Each pipe is driven by
+    two host threads: one that feeds tasks from a single shared task queue to the
+    gang, and one that collects the gang's replies. That way any number of host
+    threads can launch regions concurrently, and whichever gang is free picks up
+    the next task.
+
+    Each gang may be sent up to `depth` tasks before it has replied to the first,
+    so that the transfer of one task overlaps the computation of another.
+    """
+    def __init__(self, ngangs: int, depth=1):
+        self.ngangs = ngangs
+        self.depth = max(depth, 1)
+        self._tasks = queue.Queue()
+        self._processes = []
+        self._threads = []
+
+        context = _get_context()
+        for gangid in range(ngangs):
+            host_end, gang_end = context.Pipe()
+            process = context.Process(target=_gang_main, args=(gang_end,), daemon=True)
+            process.start()
+            gang_end.close()
+
+            slots = threading.Semaphore(self.depth)
+            inflight = queue.Queue()
+            sender = threading.Thread(target=self._feed, args=(host_end, slots, inflight), daemon=True)
+            receiver = threading.Thread(target=self._collect, args=(host_end, slots, inflight), daemon=True)
+            sender.start()
+            receiver.start()
+            self._processes.append(process)
+            self._threads.extend([sender, receiver])
+
+    def submit(self, message: (bool, list)) -> concurrent.futures.Future:
+        """
+        Hands a serialized task to the next free gang and returns a future that
+        will hold the gang's reply.
+        """
+        future = concurrent.futures.Future()
+        self._tasks.put((future, message))
+        return future
+
+    def shutdown(self) -> None:
+        """
+        Stops all the gangs.
+        """
+        if profiling.enabled:
+            profiling.dispatch("device_shutdown_start", num_gangs=self.ngangs)
+        for _ in self._processes:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        for process in self._processes:
+            process.join()
+        if profiling.enabled:
+            profiling.dispatch("device_shutdown_end", num_gangs=self.ngangs)
+
+    def _feed(self, conn, slots, inflight):
+        """
+        Runs on a host thread: sends tasks to one gang, as long as it has fewer
+        than `depth` tasks in flight.
+        """
+        while True:
+            slots.acquire()
+            task = self._tasks.get()
+            if task is None:
+                inflight.put(None)
+                return
+
+            future, message = task
+            if not future.set_running_or_notify_cancel():
+                slots.release()
+                continue
+            try:
+                messages.send_frames(conn, *message)
+            except BaseException as e:
+                future.set_exception(e)
+                slots.release()
+                continue
+            inflight.put(future)
+
+    def _collect(self, conn, slots, inflight):
+        """
+        Runs on a host thread: collects one gang's replies, which come back in
+        the order the tasks were sent.
+        """
+        while True:
+            future = inflight.get()
+            if future is None:
+                conn.close()
+                return
+
+            try:
+                ok, payload = messages.recv(conn)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                if ok:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(GangError(payload))
+            slots.release()
+
+# The one and only gang pool, started lazily
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> GangPool:
+    """
+    Returns the gang pool, starting it if this is the first time it is needed.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if profiling.enabled:
+                profiling.dispatch("device_init_start", num_gangs=DEFAULT_NUM_GANGS)
+            _pool = GangPool(DEFAULT_NUM_GANGS, depth=PIPELINE_DEPTH)
+            if profiling.enabled:
+                profiling.dispatch("device_init_end", num_gangs=DEFAULT_NUM_GANGS)
+        return _pool
+
+def is_started() -> bool:
+    """
+    Returns True if the gang pool has been started.
+    """
+    with _pool_lock:
+        return _pool is not None
+
+def launch(kernel, data: tuple, items=None, num_gangs=None, async_=None, wait=None, modes=None, region=None, names=None, streams=(), sequential=False):
+    """
+    Launches a compute region. This is the function that the code generated by
+    the host back end calls in place of the region's source code.
+
+    @param kernel:      The kernel function. It is called in each gang as
+                        `kernel(gang, num_gangs, items, *data)`.
+
+    @param data:        The values of the variables that the region uses, in the
+                        same order as the kernel's parameters.
+
+    @param items:       For a `parallel loop`, the iterable that is being looped over.
+                        Each gang is given a contiguous chunk of it, in order.
+                        None for a `parallel` region.
+
+    @param num_gangs:   The value of the num_gangs clause, or None for the default.
+
+    @param async_:      The async-argument, or None if there was no async clause.
+
+    @param wait:        None if there was no wait clause, otherwise a tuple of
+                        async-arguments to wait on before the region starts (an
+                        empty tuple means all of the queues).
+
+    @param modes:       The data clause that each of the variables in `data` appeared in
+                        ("copy", "copyin", "copyout", "create", ...), or None for all "copy",
+                        which is what the variables without a data clause are treated as.
+
+    @param region:      The region's key ("funcname:lineno"), which the region's profiling
+                        events are reported under, or None.
+
+    @param names:       The names of the variables in `data`, which their transfers are
+                        counted under (see transfers.py), or None.
+
+    @param streams:     The names of the arrays in `data` that the kernel only ever indexes by
+                        the index of its iteration, so that a pipelined loop may copy each chunk
+                        just its own slice of them. The other arrays are copied in and out whole.
+
+    @return:            None if the region is synchronous, otherwise a
+                        queues.AsyncHandle for the enqueued region.
+    """
+    if async_ is None or async_ == queues.ASYNC_SYNC:
+        _run_region(kernel, data, items, num_gangs, wait, modes, region, names, streams, sequential)
+        return None
+    else:
+        return queues.enqueue(async_, _run_region, kernel, data, items, num_gangs, wait, modes, region, names, streams, sequential)
+
+def launch_serial(kernel, data: tuple, async_=None, wait=None, modes=None, region=None):
+    """
+    Runs a serial region. This is the function that the code generated by the host
+    back end calls in place of a serial region's source code.
+
+    A serial region runs as if on a single gang of a single worker, so rather than
+    sending it to a gang process, it is run right here, in the calling process (or,
+    for an async region, on its activity queue's thread), with no serializing, no
+    pool and no processes. The data clauses are still honoured:
+
+    - An array that a data region keeps resident is given to the kernel as its device
+      buffer, so the region sees (and updates) what is on the device.
+    - An array or composite variable whose data clause does not copy out (copyin,
+      create) is given to the kernel as a copy, so that the region's writes to it are
+      not seen afterwards, just as if it had run on a gang. Memory-mapped arrays are
+      mapped copy-on-write instead of being copied.
+    - Everything else is given to the kernel as it is. Scalars are passed by value,
+      so they are firstprivate, as in every compute region.
+
+    @param kernel:      The kernel function. It is called as `kernel(*data)`.
+
+    @param data:        The values of the variables that the region uses, in the
+                        same order as the kernel's parameters.
+
+    @param async_:      As for `launch`.
+
+    @param wait:        As for `launch`.
+
+    @param modes:       As for `launch`.
+
+    @param region:      As for `launch`.
+
+    @return:            None if the region is synchronous, otherwise a
+                        queues.AsyncHandle for the enqueued region.
+    """
+    if async_ is None or async_ == queues.ASYNC_SYNC:
+        _run_serial(kernel, data, wait, modes, region)
+        return None
+    else:
+        return queues.enqueue(async_, _run_serial, kernel, data, wait, modes, region)
+
+class DataRegion:
+    """
+    Keeps arrays resident in device buffers across a sequence of compute regions,
+    so that they are copied in once at the start and out once at the end, instead
+    of around every region. The code generated for a kernels construct runs its
+    kernels inside one of these:
+
+    ```python
+    with _acc_gangs.data_region((a, b), modes=("copy", "copyin")) as _acc_data:
+        _acc_gangs.launch(...)          # a and b are already on the device
+        _acc_data.update_self(a)        # host code in between sees the device's a...
+        a[0] = 0
+        _acc_data.update_device(a)      # ...and the device sees its changes
+        _acc_gangs.launch(...)
+    ```
+
+    While the region is open, the arrays are present: any compute region that is
+    launched with one of them (from any thread) uses its buffer as it is. Only
+    arrays that can be shared (see sharedarrays.is_shareable) are kept resident,
+    and an array that is already present (because of an enclosing region) is left
+    to the enclosing region. Everything else is transferred by each compute region
+    as usual.
+    """
+    def __init__(self, data: tuple, modes=None, wait=None, region=None, names=None):
+        """
+        @param data:    The values of the variables that the compute regions use.
+
+        @param modes:   The data clause that each of the variables appeared in, or None for all "copy".
+
+        @param wait:    As for `launch`: the async-arguments to wait on before the region starts.
+
+        @param region:  As for `launch`: the key that the region's profiling events are reported under.
+
+        @param names:   As for `launch`: the names of the variables, for counting their transfers.
+        """
+        modes = ("copy",) * len(data) if modes is None else modes
+        self._wait = wait
+        self._region = region
+        self._buffers = []
+        seen = set()
+        for i, (value, mode) in enumerate(zip(data, modes)):
+            if sharedarrays.is_shareable(value) and id(value) not in seen:
+                seen.add(id(value))
+                self._buffers.append((value, mode, _name(names, i)))
+
+    def __enter__(self):
+        _wait_for(self._wait, self._region)
+        if profiling.enabled:
+            profiling.dispatch("enter_data_start", self._region)
+        # Start the gangs before allocating any buffer, just as _run_region does
+        if self._buffers:
+            get_pool()
+        buffers = []
+        try:
+            with _present_lock:
+                for value, mode, name in self._buffers:
+                    if id(value) not in _present:
+                        buf = _allocate(value, mode, self._region, name)
+                        _present[id(value)] = buf
+                        buffers.append(buf)
+            for buf in buffers:
+                if buf.copies_in:
+                    _upload(buf, self._region)
+        except BaseException:
+            self._release(buffers)
+            raise
+        self._buffers = buffers
+        if profiling.enabled:
+            profiling.dispatch("enter_data_end", self._region)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if profiling.enabled:
+            profiling.dispatch("exit_data_start", self._region)
+        try:
+            if exc_type is None:
+                for buf in self._buffers:
+                    if buf.copies_out:
+                        _download(buf, self._region)
+        finally:
+            self._release(self._buffers)
+        if profiling.enabled:
+            profiling.dispatch("exit_data_end", self._region)
+        return False
+
+    def update_self(self, *values):
+        """
+        Copies the device buffers of `values` back into the arrays, for the ones this region keeps resident.
+        """
+        if profiling.enabled:
+            profiling.dispatch("update_start", self._region)
+        for buf in self._owned(values):
+            _download(buf, self._region)
+        if profiling.enabled:
+            profiling.dispatch("update_end", self._region)
+
+    def update_device(self, *values):
+        """
+        Copies `values` into their device buffers, for the ones this region keeps resident.
+        """
+        if profiling.enabled:
+            profiling.dispatch("update_start", self._region)
+        for buf in self._owned(values):
+            _upload(buf, self._region)
+        if profiling.enabled:
+            profiling.dispatch("update_end", self._region)
+
+    def _owned(self, values):
+        for value in values:
+            for buf in self._buffers:
+                if buf.original is value:
+                    yield buf
+                    break
+
+    def _release(self, buffers):
+        with _present_lock:
+            for buf in buffers:
+                if _present.get(id(buf.original)) is buf:
+                    del _present[id(buf.original)]
+        for buf in buffers:
+            _free(buf, self._region)
+
+# The device buffers of the arrays that are resident in a data region, by the id of the array
+_present = {}
+_present_lock = threading.Lock()
+
+def data_region(data: tuple, modes=None, wait=None, region=None, names=None) -> DataRegion:
+    """
+    Returns a DataRegion (a context manager) that keeps the arrays among `data` resident
+    on the device while it is open. See DataRegion.
+    """
+    return DataRegion(data, modes, wait, region, names)
+
+def partition(iterable, gang: int, num_gangs: int):
+    """
+    Returns gang number `gang`'s share of the iterations in `iterable`.
+
+    This is used in the kernels of `parallel` regions to run `loop` constructs
+    in gang-partitioned mode.
+    """
+    return _split(iterable, num_gangs)[gang]
+
+def _gang_main(conn):
+    """
+    The main loop of a gang process.
+    """
+    while True:
+        try:
+            message = messages.recv_frames(conn)
+        except (EOFError, OSError):
+            return
+
+        attached = []
+        received = tracing.clock()
+        try:
+            kernelbytes, gang, num_gangs, items, data, returns, options = messages.loads(*message)
+            kernel = dill.loads(kernelbytes)
+            data = list(data)
+            for i, value in enumerate(data):
+                if isinstance(value, (sharedarrays.SharedArrayRef, sharedarrays.MappedArrayRef)):
+                    handle, data[i] = value.attach()
+                    attached.append(handle)
+            options = {} if options is None else options
+            profiler = cProfile.Profile() if options.get("profile") else None
+            started = tracing.clock()
+            if profiler is not None:
+                profiler.runcall(kernel, gang, num_gangs, items, *data)
+            else:
+                kernel(gang, num_gangs, items, *data)
+            finished = tracing.clock()
+
+            # What the host asked to know about the task, besides its results
+            report = None
+            if options:
+                report = {"pid": os.getpid()}
+            if options.get("trace"):
+                report["spans"] = [("unpack", received, started), ("compute", started, finished)]
+            if profiler is not None:
+                profiler.create_stats()
+                report["profile"] = profiler.stats
+            reply = (True, ([data[i] for i in returns], report))
+        except BaseException:
+            reply = (False, traceback.format_exc())
+        finally:
+            data = None
+            for handle in attached:
+                handle.close()
+
+        try:
+            message = messages.dumps(reply)
+        except BaseException:
+            message = messages.dumps((False, traceback.format_exc()))
+        messages.send_frames(conn, *message)
+
+def _get_context():
+    """
+    Gangs are forked where possible, so that the user's main module is not
+    re-imported (and re-run) in each gang.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def _is_composite(value) -> bool:
+    """
+    Returns True if `value` is an array or composite variable (in OpenACC terms),
+    which are copied back from the gangs. Scalars are not.
+    """
+    if isinstance(value, (list, dict, set, bytearray)) or _is_ndarray(value):
+        return True
+    return hasattr(value, "__dict__") and not isinstance(value, _NOT_COMPOSITE)
+
+def _is_ndarray(value) -> bool:
+    return type(value).__module__ == "numpy" and type(value).__name__ in ("ndarray", "memmap")
+
+def _merge(original, versions: list):
+    """
+    Merges the gangs' copies (`versions`, in gang order) of a composite variable
+    into a single value, given the value the variable had when the region started.
+
+    - Elements that a gang changed take that gang's value.
+    - Elements that a gang appended to a list are appended in gang order, which
+      is iteration order, since each gang works on a contiguous chunk.
+    - Keys that a gang added to a dict or set are added.
+    """
+    changed = [v for v in versions if _changed(original, v)]
+    if not changed:
+        return original
+
+    if isinstance(original, list):
+        if any(len(v) < len(original) for v in changed):
+            # Something was removed; there is no sensible way to merge that
+            return changed[-1]
+        merged = list(original)
+        for i, orig in enumerate(original):
+            merged[i] = _merge(orig, [v[i] for v in changed])
+        for v in changed:
+            merged.extend(v[len(original):])
+        return merged
+    elif isinstance(original, dict):
+        merged = dict(original)
+        for v in changed:
+            for key, val in v.items():
+                if key not in original:
+                    merged[key] = val
+        for key, orig in original.items():
+            merged[key] = _merge(orig, [v[key] for v in changed if key in v])
+        return merged
+    elif isinstance(original, set):
+        merged = set(original)
+        for v in changed:
+            merged |= v
+        return merged
+    elif _is_ndarray(original):
+        merged = original.copy()
+        for v in changed:
+            mask = v != original
+            merged[mask] = v[mask]
+        return merged
+    else:
+        return changed[-1]
+
+def _changed(original, version) -> bool:
+    if version is original:
+        return False
+    if _is_ndarray(original):
+        return original.shape != version.shape or bool((original != version).any())
+    try:
+        return bool(version != original)
+    except Exception:
+        return True
+
+class _Merger:
+    """
+    Merges the gangs' copies of a composite variable into the original, one copy at a
+    time, in iteration order, with the same result as `_merge(original, versions)`.
+
+    Only what the copies changed is kept (for lists, the changed elements and the
+    appended items; for dicts and sets, the changed and added keys), so that each
+    reply can be dropped as soon as it has been added, rather than all of them being
+    held until the end of the region.
+    """
+    def __init__(self, original):
+        self.original = original
+        self.merged = original          # The merge of the copies, restricted to the original's elements
+        if isinstance(original, list):
+            self.added = []             # Items appended to the list, in order
+        elif isinstance(original, dict):
+            self.added = {}             # Keys added to the dict
+        elif isinstance(original, set):
+            self.added = set()          # Members added to the set
+        else:
+            self.added = None
+
+    def add(self, version) -> None:
+        """
+        Adds the next gang's copy.
+        """
+        original = self.original
+        if isinstance(original, list) and isinstance(version, list) and len(version) >= len(original):
+            self.added.extend(version[len(original):])
+            version = version[:len(original)]
+        elif isinstance(original, dict) and isinstance(version, dict):
+            self.added.update((key, val) for key, val in version.items() if key not in original)
+            version = {key: val for key, val in version.items() if key in original}
+        elif isinstance(original, set) and isinstance(version, set):
+            self.added |= version - original
+            return
+        self.merged = _merge(original, [self.merged, version])
+
+    def merge_in_place(self) -> None:
+        """
+        Merges everything added so far into the original.
+        """
+        merged = self.merged
+        if self.added and isinstance(self.original, list):
+            merged = list(merged) + self.added
+        elif self.added and isinstance(self.original, dict):
+            merged = dict(merged)
+            merged.update(self.added)
+        elif self.added and isinstance(self.original, set):
+            merged = set(merged) | self.added
+        _merge_in_place(self.original, [merged])
+
+def _merge_in_place(original, versions: list) -> None:
+    """
+    Merges the gangs' copies of `original` into `original` itself.
+    """
+    merged = _merge(original, versions)
+    if merged is original:
+        return
+
+    if isinstance(original, (list, bytearray)):
+        original[:] = merged
+    elif isinstance(original, (dict, set)):
+        original.clear()
+        original.update(merged)
+    elif _is_ndarray(original):
+        original[...] = merged
+    elif hasattr(original, "__dict__"):
+        original.__dict__.update(merged.__dict__)
+
+def _run_region(kernel, data, items, num_gangs, wait, modes, region=None, names=None, streams=(), sequential=False):
+    """
+    Runs a compute region to completion on the gangs, then copies the
+    results back into the original variables.
+    """
+    _wait_for(wait, region)
+    pool = get_pool()
+    num_gangs = pool.ngangs if num_gangs is None else num_gangs
+    if profiling.enabled:
+        profiling.dispatch("compute_construct_start", region, num_gangs=num_gangs)
+    modes = ("copy",) * len(data) if modes is None else modes
+    kernelbytes = dill.dumps(kernel, recurse=True)
+
+    started = tracing.clock() if tracing.enabled else None
+    options = {}
+    if started is not None:
+        options["trace"] = True
+    if gangprofile.enabled:
+        options["profile"] = True
+
+    # Memory-mapped arrays go to the gangs by reference to their files
+    mapped = {}
+    for i, value in enumerate(data):
+        if sharedarrays.is_mapped(value):
+            mapped[i] = sharedarrays.MappedArrayRef.from_memmap(value, modes[i])
+
+    # Sized iterables are split into chunks up front; anything else (generators, iterators...)
+    # is pulled a batch at a time, as the gangs are ready for more. A sequential loop is one chunk.
+    if items is None:
+        chunks = ((None, None, None) for _ in range(num_gangs))
+        pipelined = False
+    elif sequential:
+        items = items if isinstance(items, collections.abc.Sequence) or _is_ndarray(items) else list(items)
+        chunks = iter([(0, len(items), items)])
+        pipelined = False
+    elif isinstance(items, collections.abc.Sequence) or _is_ndarray(items):
+        pipelined = PIPELINE_DEPTH > 1 and len(items) >= PIPELINE_THRESHOLD
+        nchunks = num_gangs * PIPELINE_CHUNKS if pipelined else num_gangs
+        nchunks = max(nchunks, _count_windows(len(items), [data[i] for i in mapped]))
+        bounds = _split_bounds(len(items), min(nchunks, max(len(items), 1)))
+        chunks = ((lo, hi, items[lo:hi]) for lo, hi in bounds)
+    else:
+        chunks = _batches(iter(items), BATCH_SIZE)
+        pipelined = False
+
+    # Arrays go to the gangs in shared device buffers; everything else goes in the messages.
+    # When pipelining, the arrays whose first dimension is the trip count, and which the kernel only indexes
+    # by the index of its iteration, are streamed a chunk at a time.
+    # Arrays that a data region keeps resident are already on the device, and stay there.
+    # An array that is passed for several variables gets one buffer, which all of them refer to.
+    shared = {}
+    streamed = []
+    with _present_lock:
+        resident = {i: _present[id(value)] for i, value in enumerate(data) if id(value) in _present and _present[id(value)].original is value}
+    aliases = collections.OrderedDict()     # id -> the indices of the data that hold that array
+    for i, value in enumerate(data):
+        if i not in resident and sharedarrays.is_shareable(value):
+            aliases.setdefault(id(value), []).append(i)
+    for indices in aliases.values():
+        value = data[indices[0]]
+        buf = _allocate(value, _alias_mode([modes[i] for i in indices]), region, _name(names, indices[0]))
+        for i in indices:
+            shared[i] = buf
+        if pipelined and len(value) == len(items) and all(_name(names, i) in streams for i in indices):
+            streamed.append(buf)
+    buffers = _unique(shared.values())
+    messaged = [i for i in range(len(data)) if i not in shared and i not in mapped and i not in resident]
+    returns = [i for i in messaged if _is_composite(data[i]) and modes[i] in sharedarrays.COPIES_OUT]
+    sentdata = tuple(shared[i].ref if i in shared else mapped[i] if i in mapped else resident[i].ref if i in resident else value for i, value in enumerate(data))
+
+    mergers = [_Merger(data[i]) for i in returns]
+    try:
+        for buf in buffers:
+            if buf not in streamed and buf.copies_in:
+                _upload(buf, region)
+
+        # Keep at most `depth` chunks per gang staged or in flight, copying each chunk's
+        # results out as soon as it is done, oldest first (so, in iteration order)
+        inflight = collections.deque()
+        limit = num_gangs * PIPELINE_DEPTH
+        sent = 0
+        for k, (lo, hi, chunk) in enumerate(chunks):
+            while len(inflight) >= limit:
+                _retire_chunk(inflight.popleft(), streamed, mergers, kernel, region)
+            for buf in streamed:
+                if buf.copies_in:
+                    _upload(buf, region, lo, hi)
+            message = messages.dumps((kernelbytes, k % num_gangs, num_gangs, chunk, sentdata, returns, options or None))
+            if profiling.enabled:
+                profiling.dispatch("enqueue_launch_start", region, num_gangs=num_gangs, gang=k % num_gangs, nbytes=messages.size(message))
+            inflight.append((k % num_gangs, lo, hi, pool.submit(message)))
+            sent += 1
+            if profiling.enabled:
+                profiling.dispatch("enqueue_launch_end", region, num_gangs=num_gangs, gang=k % num_gangs, nbytes=messages.size(message))
+        while inflight:
+            _retire_chunk(inflight.popleft(), streamed, mergers, kernel, region)
+
+        for buf in buffers:
+            if buf not in streamed and buf.copies_out:
+                _download(buf, region)
+    finally:
+        for buf in buffers:
+            _free(buf, region)
+
+    merging = tracing.clock() if started is not None else None
+    for merger in mergers:
+        merger.merge_in_place()
+    if merging is not None:
+        if mergers:
+            tracing.add("merge", merging, region)
+        tracing.add("region", started, region, num_gangs=num_gangs, source=_source(kernel))
+    if transfers.enabled:
+        _count_messages(data, messaged, returns, sent, region, names)
+        transfers.copied_in(region, [(_name(names, i), data[i]) for i in range(len(data))
+                                     if (i in shared and shared[i].copies_in) or (i in messaged and _is_composite(data[i]))])
+    if profiling.enabled:
+        profiling.dispatch("compute_construct_end", region, num_gangs=num_gangs)
+
+def _run_serial(kernel, data, wait, modes, region=None):
+    """
+    Runs a serial region to completion on the calling thread. See `launch_serial`.
+    """
+    _wait_for(wait, region)
+    started = tracing.clock() if tracing.enabled else None
+    if profiling.enabled:
+        profiling.dispatch("compute_construct_start", region, num_gangs=1)
+    modes = ("copy",) * len(data) if modes is None else modes
+    with _present_lock:
+        resident = {i: _present[id(value)] for i, value in enumerate(data) if id(value) in _present and _present[id(value)].original is value}
+
+    args = []
+    handles = []
+    for i, value in enumerate(data):
+        if i in resident:
+            args.append(resident[i].array)
+        elif not _is_composite(value) or modes[i] in sharedarrays.COPIES_OUT:
+            args.append(value)
+        elif sharedarrays.is_mapped(value):
+            handle, array = sharedarrays.MappedArrayRef.from_memmap(value, modes[i]).attach()
+            handles.append(handle)
+            args.append(array)
+        elif _is_ndarray(value):
+            args.append(value.copy())
+        else:
+            args.append(copy.deepcopy(value))
+    try:
+        kernel(*args)
+    finally:
+        for handle in handles:
+            handle.close()
+    if started is not None:
+        tracing.add("serial", started, region, source=_source(kernel))
+    if profiling.enabled:
+        profiling.dispatch("compute_construct_end", region, num_gangs=1)
+
+def _source(kernel) -> str:
+    """
+    Returns where in the user's source code `kernel` came from ("file:line", the line of
+    its region's pragma; see sourcemap.py), for the timeline.
+    """
+    code = getattr(kernel, "__code__", None)
+    if code is None:
+        return None
+    return "{}:{}".format(code.co_filename, code.co_firstlineno)
+
+def _wait_for(wait, region=None) -> None:
+    """
+    Waits on the async-arguments of a wait clause: None if there was no wait clause,
+    otherwise a tuple of async-arguments (an empty tuple means all of the queues).
+    """
+    if wait is not None:
+        started = tracing.clock() if tracing.enabled else None
+        if profiling.enabled:
+            profiling.dispatch("wait_start", region)
+        if wait:
+            for queueid in wait:
+                queues.wait(queueid)
+        else:
+            queues.wait_all()
+        if profiling.enabled:
+            profiling.dispatch("wait_end", region)
+        if started is not None:
+            tracing.add("wait", started, region)
+
+def _allocate(value, mode: str, region, variable=None) -> sharedarrays.SharedArray:
+    """
+    Allocates the device buffer for the array `value` (of the variable named `variable`),
+    in a region whose key is `region`.
+    """
+    buf = sharedarrays.SharedArray(value, mode, variable)
+    if profiling.enabled:
+        profiling.dispatch("create", region, nbytes=buf.array.nbytes)
+    return buf
+
+def _alias_mode(modes: [str]) -> str:
+    """
+    Returns the transfer mode of a buffer for an array that was passed for several variables,
+    with the given `modes`: it is copied in if any of them copies in, and out if any copies out.
+    """
+    if len(set(modes)) == 1:
+        return modes[0]
+    copies_in = any(mode in sharedarrays.COPIES_IN for mode in modes)
+    copies_out = any(mode in sharedarrays.COPIES_OUT for mode in modes)
+    if copies_in and copies_out:
+        return "copy"
+    return "copyin" if copies_in else "copyout" if copies_out else modes[0]
+
+def _unique(items) -> list:
+    """
+    Returns `items` without the repeats (by identity), in order.
+    """
+    seen = set()
+    return [item for item in items if not (id(item) in seen or seen.add(id(item)))]
+
+def _free(buf, region) -> None:
+    """
+    Frees the device buffer `buf`, in a region whose key is `region`.
+    """
+    if profiling.enabled:
+        profiling.dispatch("delete", region, nbytes=buf.array.nbytes)
+    buf.release()
+
+def _upload(buf, region, lo=None, hi=None) -> None:
+    """
+    Copies the array of `buf` (or its slice [lo:hi]) into the buffer.
+    """
+    if not profiling.enabled and not tracing.enabled and not transfers.enabled:
+        buf.copy_in(lo, hi)
+        return
+    started = tracing.clock()
+    if profiling.enabled:
+        profiling.dispatch("enqueue_upload_start", region, nbytes=buf.array[lo:hi].nbytes)
+    nbytes = buf.copy_in(lo, hi)
+    if transfers.enabled:
+        transfers.record(region, buf.variable, "up", nbytes, tracing.clock() - started)
+    if profiling.enabled:
+        profiling.dispatch("enqueue_upload_end", region, nbytes=nbytes)
+    if tracing.enabled:
+        tracing.add("upload", started, region, bytes=nbytes)
+
+def _download(buf, region, lo=None, hi=None) -> None:
+    """
+    Copies the buffer `buf` (or its slice [lo:hi]) back into its array.
+    """
+    if not profiling.enabled and not tracing.enabled and not transfers.enabled:
+        buf.copy_out(lo, hi)
+        return
+    started = tracing.clock()
+    if profiling.enabled:
+        profiling.dispatch("enqueue_download_start", region, nbytes=buf.array[lo:hi].nbytes)
+    nbytes = buf.copy_out(lo, hi)
+    if transfers.enabled:
+        transfers.record(region, buf.variable, "down", nbytes, tracing.clock() - started)
+    if profiling.enabled:
+        profiling.dispatch("enqueue_download_end", region, nbytes=nbytes)
+    if tracing.enabled:
+        tracing.add("download", started, region, bytes=nbytes)
+
+def _count_messages(data, messaged: [int], returns: [int], sent: int, region, names) -> None:
+    """
+    Counts the transfers of the variables that went to the gangs in the `sent` task messages
+    of a region (the indices `messaged` of `data`), and came back in their replies (`returns`).
+    """
+    for i in messaged:
+        nbytes, elapsed = transfers.measure(data[i])
+        transfers.record(region, _name(names, i), "up", nbytes * sent, elapsed * sent, count=sent)
+        if i in returns:
+            transfers.record(region, _name(names, i), "down", nbytes * sent, elapsed * sent, count=sent)
+
+def _name(names, i: int) -> str:
+    """
+    Returns the name of the `i`th of a region's variables, given their `names` (or None).
+    """
+    if names is not None and i < len(names):
+        return names[i]
+    return "data[{}]".format(i)
+
+def _retire_chunk(chunk, streamed, mergers, kernel, region=None) -> None:
+    """
+    Waits for a chunk of a region to finish, copies its slice of the streamed
+    arrays back out, and hands the gang's copies of the other variables to the mergers.
+    """
+    gang, lo, hi, future = chunk
+    started = tracing.clock() if tracing.enabled else None
+    versions, report = future.result()
+    if started is not None:
+        tracing.add("gang wait", started, region, gang=gang)
+    if report is not None and "spans" in report:
+        tracing.add_gang_spans(report["pid"], report["spans"], region, gang=gang, chunk=[lo, hi], source=_source(kernel))
+    if report is not None and "profile" in report:
+        gangprofile.add(report["profile"], kernel, region)
+    for buf in streamed:
+        if buf.copies_out:
+            _download(buf, region, lo, hi)
+    merging = tracing.clock() if started is not None else None
+    for merger, version in zip(mergers, versions):
+        merger.add(version)
+    if merging is not None and mergers:
+        tracing.add("merge", merging, region, gang=gang)
+
+def _batches(iterator, size: int):
+    """
+    Pulls `size` items at a time from `iterator`, yielding the (start, stop) of each
+    batch in the iteration space along with the batch.
+    """
+    lo = 0
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield lo, lo + len(batch), batch
+        lo += len(batch)
+
+def _count_windows(length: int, arrays: list) -> int:
+    """
+    Returns the number of windows to split a loop of `length` iterations into so
+    that no window touches more than STREAM_WINDOW_BYTES of the given memory-mapped
+    arrays (counting only those whose first dimension is the trip count).
+    """
+    streamed = [a for a in arrays if a.ndim > 0 and len(a) == length]
+    rowbytes = sum(a.nbytes // max(len(a), 1) for a in streamed)
+    if rowbytes == 0:
+        return 1
+    rows = max(STREAM_WINDOW_BYTES // rowbytes, 1)
+    return -(-length // rows)
+
+def _split_bounds(length: int, n: int) -> [(int, int)]:
+    """
+    Splits range(length) into `n` contiguous chunks of (nearly) equal size and
+    returns the (start, stop) of each.
+    """
+    per_chunk, leftover = divmod(length, n)
+    bounds = []
+    start = 0
+    for k in range(n):
+        stop = start + per_chunk + (1 if k < leftover else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+def _split(iterable, n: int) -> list:
+    """
+    Splits `iterable` into `n` contiguous chunks of (nearly) equal size.
+    Sized, sliceable iterables (lists, tuples, ranges, arrays) are sliced;
+    anything else is consumed into a list first.
+    """
+    if not (isinstance(iterable, collections.abc.Sequence) or _is_ndarray(iterable)):
+        iterable = list(iterable)
+
+    return [iterable[start:stop] for start, stop in _split_bounds(len(iterable), n)]
+
+def collapse(*iterables):
+    """
+    Returns the linearized iteration space of the collapsed loops over `iterables`:
+    an iterator over the tuples of loop variables, in the order the loops would visit them.
+    The tuples are generated as the gangs need them, so the iteration space is never
+    held in memory all at once.
+    """
+    return itertools.product(*iterables)
@@ -6,16 +6,41 @@ from the front end and actually parallelizing the given code.
 A back end MUST provide a `compile` function that takes an IR and returns
 valid Python source code as a str. The source will be imported as a Python
 module and run in place of the @acc-decorated function.
+
+A back end MAY also set the IR's `line_map` to the line of the decorated function
+that each line of the source came from (see CompilerTarget.line_map), so that
+tracebacks and profiles of the generated code point at the user's source code.
 """
+import acc.frontend.kernels.kernels as kernels
 import acc.frontend.loop.loop as loop
 import acc.frontend.parallel.parallel as parallel
+import acc.frontend.serial.serial as serial
+import acc.frontend.util.util as util
+import acc.frontend.wait.wait as wait
 import acc.backend.common as common
+import ast
+import asttokens
 import os
-import random
-import string
 # Just needed for type hints
 import acc.ir.intrep as intrep
 
+# The aliases under which the generated module imports the host runtime
+GANGS_ALIAS = "_acc_gangs"
+QUEUES_ALIAS = "_acc_queues"
+FALLBACK_ALIAS = "_acc_fallback"
+
+# The name that the iterable of a parallel loop is evaluated into, before the loop is run
+ITEMS_NAME = "_acc_items"
+
+# The name of the data region that the code generated for a kernels region runs in
+DATA_REGION_NAME = "_acc_data"
+
+# The names of the parameters that every kernel function takes before the region's variables
+KERNEL_PARAMS = ["_acc_gang", "_acc_num_gangs", "_acc_items"]
+
+# The data clauses that set a variable's transfer mode, in the order they are looked up
+DATA_CLAUSES = ["copy", "copyin", "copyout", "create", "no_create", "present"]
+
 def compile(intermediate_rep: intrep.IntermediateRepresentation) -> str:
     """
     Compiles the given intermediate representation into a source code string
@@ -25,6 +50,7 @@ def compile(intermediate_rep: intrep.IntermediateRepresentation) -> str:
     for node in intermediate_rep.breadth_first_traversal():
         # Updates modified_src in place
         _apply_node(modified_src, node, intermediate_rep)
+    intermediate_rep.line_map = modified_src.line_map()
     return modified_src.build()
 
 def _apply_node(modified_src: common.CompilerTarget, node: intrep.IrNode, intermediate_rep: intrep.IntermediateRepresentation):
@@ -34,8 +60,14 @@ def _apply_node(modified_src: common.CompilerTarget, node: intrep.IrNode, interm
 
     if   type(node) == parallel.ParallelNode:
         _apply_parallel_node(*args)
+    elif type(node) == kernels.KernelsNode:
+        _apply_kernels_node(*args)
+    elif type(node) == serial.SerialNode:
+        _apply_serial_node(*args)
     elif type(node) == loop.LoopNode:
         _apply_loop_node(*args)
+    elif type(node) == wait.WaitNode:
+        _apply_wait_node(*args)
     else:
         # TODO
         raise NotImplementedError("Please implement this type of node in the back end.")
@@ -53,6 +85,10 @@ def _apply_parallel_node(modified_src: common.CompilerTarget, node: intrep.IrNod
     3. If there is no `async` clause, there is an implicit barrier across gangs
        at the end of the parallel region, so that the local thread may not continue
        executing until all gangs have finished the region.
+    4. If the if clause's condition is false or the self clause's condition is true
+       when the region is reached, the region runs on the local thread instead, as
+       if there were no pragma. A parallel loop also runs on the local thread when
+       its trip count is below its threshold (see fallback.py).
 
     TODO: Figure out:
     If there is no default(none) clause on the construct, the compiler will implicitly determine data
@@ -71,37 +107,482 @@ def _apply_parallel_node(modified_src: common.CompilerTarget, node: intrep.IrNod
     """
     # Modify the source to launch n gangs (gangs = parallel processes in host back end)
 
-    ## Import the appropriate multiprocessing stuff into the new module if not already there
-    modified_src.add_import("multiprocessing")
+    ## Import the gang runtime into the new module if not already there
+    modified_src.add_import("acc.backend.gangs", alias=GANGS_ALIAS)
 
     ## Move the node's source code into a kernel function
-    signature = _create_signature(intermediate_rep, ["ls, sqrs"])  # TODO: Determine necessary parameters
-    kernelsrc = signature + os.linesep + node.src
-    modified_src.add_kernel(kernelsrc)
+    ## (everything after the pragma, up to and including the closing brace if there is one)
+    lines = intermediate_rep.src.splitlines()
+    braced = intermediate_rep.index.braced_region(node.lineno)
+    first = node.lineno + 1
+    if braced is not None:
+        region_first, last = braced[0], braced[1] + 1
+    else:
+        region_first, last = intermediate_rep.index.region(node.lineno)
+
+    hybrid = _get_hybrid_loop_node(node)
+    if hybrid is not None and hybrid.fused:
+        # The loops that were fused into this one are replaced along with it
+        last = hybrid.fused[-1].span.last
+    if hybrid is not None:
+        body, targets, items = _build_parallel_loop_kernel_body(node, hybrid)
+    else:
+        body = _build_parallel_kernel_body(node, region_first, intermediate_rep)
+        targets = []
+        items = "None"
+
+    # Only the variables used inside the kernel need to go to the gangs
+    # (the iterable of a parallel loop is evaluated on the local thread)
+    datavars = common.get_region_variables(intermediate_rep, body, first, last, exclude=KERNEL_PARAMS + targets)
+    kernelname = _create_kernel_name(intermediate_rep, node)
+    signature = _create_signature(kernelname, KERNEL_PARAMS + datavars)
+    kernelsrc = signature + os.linesep + body
+    modified_src.add_kernel(kernelsrc, first, last, node.lineno)
 
     ## Place process creation, data movement, process destruction in the old location
-    pass
+    indent = common.get_indentation(lines[node.lineno])
+    sequential = hybrid is not None and not _is_partitioned(hybrid)
+    num_gangs = 1 if sequential else node.num_gangs
+    launch = "{gangs}.launch({kernel}, ({data}), items={items}, num_gangs={num_gangs}, async_={async_}, wait={wait}, modes={modes}, region={region!r}, names={names!r}, streams={streams!r}, sequential={sequential})".format(
+        gangs=GANGS_ALIAS,
+        kernel=kernelname,
+        data="".join(v + ", " for v in datavars).rstrip(" "),
+        items=ITEMS_NAME if hybrid is not None else items,
+        num_gangs=num_gangs,
+        async_=_async_argument(modified_src, node.async_),
+        wait=_wait_argument(node.wait),
+        modes=_data_modes(node, datavars),
+        region=_region_key(node, intermediate_rep),
+        names=tuple(datavars),
+        streams=_streamed_variables(body, items, targets, datavars) if hybrid is not None else (),
+        sequential=sequential)
+
+    if hybrid is None:
+        fallback = "\n".join(lines[first:last + 1])
+        modified_src.replace_lines(first, last, _guard(node, indent + launch, fallback, indent))
+        return
+
+    # A parallel loop may also run on the local thread because its trip count is too small
+    # (see fallback.py). Either way, its iterable is only evaluated once.
+    modified_src.add_import("acc.backend.fallback", alias=FALLBACK_ALIAS)
+    condition = _condition(node)
+    inline = _indent(util.left_strip_src(body), len(indent) + 8)
+    src  = "{}{} = {}".format(indent, ITEMS_NAME, items) + os.linesep
+    src += "{}with {}.timed({!r}, {}, num_gangs={}, condition={}, record={}) as _acc_run:".format(
+        indent, FALLBACK_ALIAS, _region_key(node, intermediate_rep), ITEMS_NAME, num_gangs,
+        "True" if condition is None else condition, node.async_ is None) + os.linesep
+    src += "{}    if _acc_run.offload:".format(indent) + os.linesep
+    src += "{}        {}".format(indent, launch) + os.linesep
+    src += "{}    else:".format(indent) + os.linesep
+    src += inline
+    modified_src.replace_lines(first, last, src)
+
+def _apply_kernels_node(modified_src: common.CompilerTarget, node: intrep.IrNode, intermediate_rep: intrep.IntermediateRepresentation):
+    """
+    Kernels
+    -------
+
+    1. The region is split into a sequence of kernels, one for each loop nest at the
+       top level of the region whose outermost loop is partitioned among the gangs
+       (an independent loop, or an auto loop that the auto-parallelization pass
+       decided to run on the gangs). Each kernel is launched just like a
+       `parallel loop`, one after the other, in order.
+    2. Everything else in the region (the code between the loop nests, and the loop
+       nests that are to run sequentially) runs on the local thread, in place.
+    3. The kernels run inside one data region, so the arrays that they share stay
+       on the device between one kernel and the next, rather than being copied in
+       and out around each of them. Before a piece of local code, the arrays that
+       it uses are updated from the device, and after it, the ones that it writes
+       are updated on the device.
+
+    A `kernels loop` is a single kernel, and is launched just like a `parallel loop`.
+    A kernels region with no loop nest to launch is left to run on the local thread.
+
+    The host runs the kernels of an async kernels region synchronously: the wait
+    clause is waited on before the region starts, but the local thread does not go
+    on until the region is done.
+    """
+    if _get_hybrid_loop_node(node) is not None:
+        _apply_parallel_node(modified_src, node, intermediate_rep)
+        return
+
+    lines = intermediate_rep.src.splitlines()
+    braced = intermediate_rep.index.braced_region(node.lineno)
+    first = node.lineno + 1
+    if braced is not None:
+        region_first, region_last, last = braced[0], braced[1], braced[1] + 1
+    else:
+        region_first, region_last = intermediate_rep.index.region(node.lineno)
+        last = region_last
+
+    loop_nodes = {child.span.first: child for child in node.children if type(child) == loop.LoopNode and child.span is not None}
+    fused = set(nested.span.first for child in loop_nodes.values() for nested in child.fused)
+    statements = [stmt for stmt in intermediate_rep.index.statements(region_first, region_last) if stmt[0] not in fused]
+    if not any(stmt_first in loop_nodes and _is_partitioned(loop_nodes[stmt_first]) for stmt_first, _, _ in statements):
+        return
+
+    modified_src.add_import("acc.backend.gangs", alias=GANGS_ALIAS)
+    regionsrc = intermediate_rep.index.text(region_first, region_last)
+    datavars = common.get_region_variables(intermediate_rep, regionsrc, region_first, region_last)
+    graph = intermediate_rep.dependency_graph
+
+    indent = common.get_indentation(lines[node.lineno])
+    inner = indent + " " * 4
+    # Consecutive statements that are not kernels run on the local thread as one piece
+    pieces = []
+    for stmt_first, stmt_last, _ in statements:
+        loop_node = loop_nodes.get(stmt_first)
+        if loop_node is not None and _is_partitioned(loop_node):
+            pieces.append((loop_node, stmt_first, stmt_last))
+        elif pieces and pieces[-1][0] is None:
+            pieces[-1] = (None, pieces[-1][1], stmt_last)
+        else:
+            pieces.append((None, stmt_first, stmt_last))
+
+    code = []
+    for loop_node, piece_first, piece_last in pieces:
+        if loop_node is not None:
+            code.append(inner + _build_kernel_launch(modified_src, node, loop_node, intermediate_rep))
+            continue
+
+        # Local code: make sure it sees (and the kernels after it see) the latest values
+        reads, writes = graph.reads_and_writes(piece_first, piece_last)
+        used = [var for var in datavars if var in reads or var in writes]
+        written = [var for var in datavars if var in writes]
+        if used:
+            code.append("{}{}.update_self({})".format(inner, DATA_REGION_NAME, ", ".join(used)))
+        code.append(_indent("\n".join(lines[piece_first:piece_last + 1])))
+        if written:
+            code.append("{}{}.update_device({})".format(inner, DATA_REGION_NAME, ", ".join(written)))
+
+    region = "{indent}with {gangs}.data_region(({data}), modes={modes}, wait={wait}, region={region!r}, names={names!r}) as {name}:".format(
+        indent=indent,
+        gangs=GANGS_ALIAS,
+        data="".join(v + ", " for v in datavars).rstrip(" "),
+        modes=_data_modes(node, datavars),
+        wait=_wait_argument(node.wait),
+        region=_region_key(node, intermediate_rep),
+        names=tuple(datavars),
+        name=DATA_REGION_NAME)
+    fallback = "\n".join(lines[first:last + 1])
+    modified_src.replace_lines(first, last, _guard(node, os.linesep.join([region] + code), fallback, indent))
+
+def _apply_serial_node(modified_src: common.CompilerTarget, node: intrep.IrNode, intermediate_rep: intrep.IntermediateRepresentation):
+    """
+    Serial
+    ------
+
+    1. A serial region runs as if it were a parallel region with num_gangs(1)
+       num_workers(1) vector_length(1), so every loop in it runs sequentially.
+    2. With a single gang, there is nothing to gain from another process, so the
+       region is moved into a kernel function that the gang runtime calls directly
+       on the local thread (see gangs.launch_serial), with the same data clause
+       semantics as a parallel region, but no processes, serializing or copying
+       for the variables that are copied back anyway.
+    3. If there is no `async` clause, the local thread does not go on until the
+       region is done, as for a parallel region.
+    """
+    modified_src.add_import("acc.backend.gangs", alias=GANGS_ALIAS)
+
+    lines = intermediate_rep.src.splitlines()
+    braced = intermediate_rep.index.braced_region(node.lineno)
+    first = node.lineno + 1
+    if braced is not None:
+        region_first, last = braced[0], braced[1] + 1
+    else:
+        region_first, last = intermediate_rep.index.region(node.lineno)
+
+    body = _indent(util.left_strip_src(node.src))
+    datavars = common.get_region_variables(intermediate_rep, body, first, last)
+    kernelname = _create_kernel_name(intermediate_rep, node)
+    modified_src.add_kernel(_create_signature(kernelname, datavars) + os.linesep + body, first, last, node.lineno)
+
+    indent = common.get_indentation(lines[node.lineno])
+    launch = "{indent}{gangs}.launch_serial({kernel}, ({data}), async_={async_}, wait={wait}, modes={modes}, region={region!r})".format(
+        indent=indent,
+        gangs=GANGS_ALIAS,
+        kernel=kernelname,
+        data="".join(v + ", " for v in datavars).rstrip(" "),
+        async_=_async_argument(modified_src, node.async_),
+        wait=_wait_argument(node.wait),
+        modes=_data_modes(node, datavars),
+        region=_region_key(node, intermediate_rep))
+    fallback = "\n".join(lines[first:last + 1])
+    modified_src.replace_lines(first, last, _guard(node, launch, fallback, indent))
+
+def _build_kernel_launch(modified_src: common.CompilerTarget, node: intrep.IrNode, loop_node: intrep.IrNode, intermediate_rep: intrep.IntermediateRepresentation) -> str:
+    """
+    Adds the kernel for the loop nest of `loop_node`, in the kernels region of `node`,
+    to the module, and returns the (unindented) source code that launches it.
+    """
+    body, targets, items = _build_parallel_loop_kernel_body(loop_node, loop_node)
+    last = loop_node.fused[-1].span.last if loop_node.fused else loop_node.span.last
+    datavars = common.get_region_variables(intermediate_rep, body, loop_node.span.first, last, exclude=KERNEL_PARAMS + targets)
+    kernelname = _create_kernel_name(intermediate_rep, loop_node)
+    modified_src.add_kernel(_create_signature(kernelname, KERNEL_PARAMS + datavars) + os.linesep + body, loop_node.span.first, last, loop_node.lineno)
+    return "{gangs}.launch({kernel}, ({data}), items={items}, num_gangs={num_gangs}, modes={modes}, region={region!r}, names={names!r}, streams={streams!r})".format(
+        gangs=GANGS_ALIAS,
+        kernel=kernelname,
+        data="".join(v + ", " for v in datavars).rstrip(" "),
+        items=items,
+        num_gangs=node.num_gangs,
+        modes=_data_modes(node, datavars),
+        region=_region_key(loop_node, intermediate_rep),
+        names=tuple(datavars),
+        streams=_streamed_variables(body, items, targets, datavars))
 
 def _apply_loop_node(modified_src: common.CompilerTarget, node: intrep.IrNode, intermediate_rep: intrep.IntermediateRepresentation):
     """
+    Loop constructs inside a compute region are taken care of by that region's node.
+    Orphaned loop constructs (those not inside a compute region) run on the local
+    thread, so there is nothing to do for them.
     """
     pass
 
-def _create_signature(intermediate_rep: intrep.IntermediateRepresentation, params: [str]) -> str:
+def _apply_wait_node(modified_src: common.CompilerTarget, node: intrep.IrNode, intermediate_rep: intrep.IntermediateRepresentation):
+    """
+    Wait
+    ----
+
+    The wait directive is turned into a call to the activity queue runtime, right
+    after the pragma.
+    """
+    modified_src.add_import("acc.backend.queues", alias=QUEUES_ALIAS)
+
+    pragma = intermediate_rep.src.splitlines()[node.lineno]
+    indent = common.get_indentation(pragma)
+    waitids = "({})".format("".join(e + ", " for e in node.wait.exprs).rstrip(" "))
+    if node.async_ is None and node.wait.exprs:
+        call = "for _acc_queueid in {}: {}.wait(_acc_queueid)".format(waitids, QUEUES_ALIAS)
+    elif node.async_ is None:
+        call = "{}.wait_all()".format(QUEUES_ALIAS)
+    elif node.wait.exprs:
+        call = "{}.wait_async({}, {})".format(QUEUES_ALIAS, waitids, _async_argument(modified_src, node.async_))
+    else:
+        call = "{}.wait_all_async({})".format(QUEUES_ALIAS, _async_argument(modified_src, node.async_))
+    modified_src.replace_lines(node.lineno, node.lineno, pragma + os.linesep + indent + call)
+
+def _condition(node: intrep.IrNode) -> str:
+    """
+    Returns the source code for the condition under which the region of `node` runs on the
+    device, according to its if and self clauses, or None if it has neither. When both
+    appear and the if clause's condition is false, the self clause has no effect: the
+    region runs on the local thread either way.
+    """
+    if_, self_ = getattr(node, "if_", None), getattr(node, "self_", None)
+    if if_ is not None and self_ is not None:
+        return "({}) and not ({})".format(if_, self_)
+    elif if_ is not None:
+        return "({})".format(if_)
+    elif self_ is not None:
+        return "not ({})".format(self_)
+    return None
+
+def _guard(node: intrep.IrNode, src: str, fallback: str, indent: str) -> str:
     """
-    Creates a statistically unique signature of the form `def name_mangled_kernel(args):`
-    and returns it.
+    Returns `src` (the code that runs the region of `node` on the device, indented by `indent`),
+    guarded by the region's if and self clauses, with the region's original source, `fallback`,
+    to run on the local thread when they say so. Returns `src` unchanged if there are no such clauses.
+    """
+    condition = _condition(node)
+    if condition is None:
+        return src
+    guarded  = "{}if {}:".format(indent, condition) + os.linesep
+    guarded += _indent(src) + os.linesep
+    guarded += "{}else:".format(indent) + os.linesep
+    guarded += _indent(fallback)
+    return guarded
+
+def _region_key(node: intrep.IrNode, intermediate_rep: intrep.IntermediateRepresentation) -> str:
+    """
+    Returns the key that identifies the region of `node` at runtime: the decorated
+    function's name and the line number of the region's pragma (or, for a loop nest
+    in a kernels region with no loop construct of its own, of its for loop).
+    """
+    return "{}:{}".format(intermediate_rep.meta_data.funcs_name, node.lineno)
+
+def _async_argument(modified_src: common.CompilerTarget, async_) -> str:
+    """
+    Returns the source code for the async-argument of an async clause.
+    """
+    if async_ is None:
+        return "None"
+    elif async_.expr is None:
+        modified_src.add_import("acc.backend.queues", alias=QUEUES_ALIAS)
+        return "{}.ASYNC_NOVAL".format(QUEUES_ALIAS)
+    else:
+        return async_.expr
+
+def _wait_argument(wait) -> str:
+    """
+    Returns the source code for the argument list of a wait clause.
+    """
+    if wait is None:
+        return "None"
+    return "({})".format("".join(e + ", " for e in wait.exprs).rstrip(" "))
+
+def _data_modes(node: intrep.IrNode, datavars: [str]) -> str:
+    """
+    Returns the source code for the tuple of transfer modes of `datavars`: the name of
+    the data clause each variable appeared in, or "copy" for the variables that were
+    not in a data clause.
+    """
+    modes = []
+    for var in datavars:
+        mode = "copy"
+        for clausename in DATA_CLAUSES:
+            dataclause = getattr(node, clausename, None)
+            if dataclause is not None and var in dataclause.vars:
+                mode = clausename
+                break
+        modes.append(repr(mode))
+    return "({})".format("".join(m + ", " for m in modes).rstrip(" "))
+
+def _build_parallel_kernel_body(node: intrep.IrNode, region_first: int, intermediate_rep: intrep.IntermediateRepresentation) -> str:
+    """
+    Returns the body of the kernel function for a `parallel` region.
+
+    Each gang runs the whole region (gang-redundant mode), except that the loops
+    with a loop construct are partitioned among the gangs.
+    """
+    src = util.left_strip_src(node.src)
+    atok = asttokens.ASTTokens(src, parse=True)
+    loop_linenos = [child.lineno + 1 - region_first + 1 for child in node.children if type(child) == loop.LoopNode and _is_partitioned(child)]
 
-    By 'statistically unique', I mean that the name of the function will be generated randomly,
-    but over such a large space of possible values, that there is a virtual guarantee of
-    uniqueness. I am too lazy right now to do this better.
+    replacements = []
+    for astnode in ast.walk(atok.tree):
+        if isinstance(astnode, ast.For) and astnode.lineno in loop_linenos:
+            start, end = atok.get_text_range(astnode.iter)
+            partitioned = "{}.partition({}, _acc_gang, _acc_num_gangs)".format(GANGS_ALIAS, src[start:end])
+            replacements.append((start, end, partitioned))
+
+    for start, end, text in sorted(replacements, reverse=True):
+        src = src[:start] + text + src[end:]
+
+    # The gang runtime is imported inside the kernel: if the kernel referred to the module's
+    # global, dill would serialize the whole runtime module along with the kernel
+    if replacements:
+        src = "import acc.backend.gangs as {}".format(GANGS_ALIAS) + os.linesep + src
+    return _indent(src)
+
+def _build_parallel_loop_kernel_body(node: intrep.IrNode, loop_node: intrep.IrNode) -> (str, [str], str):
     """
-    # Create name
-    letters = string.ascii_letters
-    unique = "".join(random.choices(letters, k=15))
+    Returns the body of the kernel function for a `parallel loop` region, the names
+    of the loop variables, and the source code for the iterable to partition
+    among the gangs.
+
+    The gangs are given their iterations through the kernel's `_acc_items` parameter.
+    If the loop has a collapse clause, the iterations are the tuples of the loop
+    variables of all the collapsed loops. If other loops were fused into the loop
+    (see acc.ir.passes.fusion), their bodies follow its body in each iteration.
+    """
+    src = util.left_strip_src(node.src)
+    atok = asttokens.ASTTokens(src, parse=True)
+    n = len(loop_node.collapse.loops) if loop_node.collapse is not None else 1
+
+    forloops = []
+    stmt = atok.tree.body[0]
+    for _ in range(n):
+        if not isinstance(stmt, ast.For):
+            raise SyntaxError("A parallel loop construct must be followed by {} tightly nested for loop(s).".format(n))
+        forloops.append(stmt)
+        stmt = stmt.body[0]
 
-    # Put together parameter list
-    args = ",".join(params)
+    targets = [atok.get_text(f.target) for f in forloops]
+    iterables = [atok.get_text(f.iter) for f in forloops]
+    targetnames = [name.id for f in forloops for name in ast.walk(f.target) if isinstance(name, ast.Name)]
+    if n == 1:
+        items = iterables[0]
+    else:
+        items = "{}.collapse({})".format(GANGS_ALIAS, ", ".join(iterables))
+        targets = ["({})".format(", ".join(targets))]
+
+    innermost = forloops[-1].body
+    srclines = src.splitlines()
+    loopbody = "\n".join(srclines[innermost[0].first_token.start[0] - 1:innermost[-1].last_token.end[0]])
+    loopbody = _indent(util.left_strip_src(loopbody))
+    for fused in loop_node.fused:
+        fusedsrc = util.left_strip_src(fused.src)
+        fusedtok = asttokens.ASTTokens(fusedsrc, parse=True)
+        fusedbody = fusedtok.tree.body[0].body
+        fusedlines = fusedsrc.splitlines()[fusedbody[0].first_token.start[0] - 1:fusedbody[-1].last_token.end[0]]
+        loopbody += os.linesep + _indent(util.left_strip_src("\n".join(fusedlines)))
+
+    body = "for {} in _acc_items:".format(targets[0]) + os.linesep + loopbody
+    return _indent(body), targetnames, items
+
+def _streamed_variables(body: str, items: str, targets: [str], datavars: [str]) -> tuple:
+    """
+    Returns the names of the variables in `datavars` that the kernel `body` of a parallel
+    loop over `items` only ever indexes by its loop variable, in their first dimension.
+    Only those may be streamed into a pipelined loop a chunk at a time (see gangs.launch),
+    since each chunk of the loop then reads and writes nothing but its own slice of them.
+
+    That is only so if the loop is over `range(n)` (so that its items are the indices)
+    and its loop variable is a plain name that the body never assigns to.
+    """
+    iterable = ast.parse(items.strip(), mode="eval").body
+    if len(targets) != 1 or not (isinstance(iterable, ast.Call) and type(iterable.func) == ast.Name
+                                 and iterable.func.id == "range" and len(iterable.args) == 1 and not iterable.keywords):
+        return ()
+    target = targets[0]
+    tree = ast.parse(util.left_strip_src(body))
+    if type(tree.body[0].target) != ast.Name:
+        return ()
+
+    indexed = set()
+    for node in ast.walk(tree):
+        if type(node) == ast.Subscript and type(node.value) == ast.Name:
+            index = node.slice.value if isinstance(node.slice, getattr(ast, "Index", ())) else node.slice
+            if type(index) == ast.Tuple and index.elts:
+                index = index.elts[0]
+            if type(index) == ast.Name and index.id == target:
+                indexed.add(node.value)
+    names = [node for node in ast.walk(tree) if type(node) == ast.Name]
+    if len([node for node in names if node.id == target and type(node.ctx) != ast.Load]) > 1:
+        return ()
+    return tuple(v for v in datavars if all(node in indexed for node in names if node.id == v))
+
+def _is_partitioned(loop_node: intrep.IrNode) -> bool:
+    """
+    Returns True if the iterations of the loop of `loop_node` are partitioned among the gangs.
+    The host has no workers or vector lanes to speak of, so a loop that is to be run in
+    worker or vector mode runs entirely within its gang, just like a sequential loop.
+    """
+    if loop_node.seq:
+        return False
+    return loop_node.schedule is None or loop_node.schedule == "gang"
+
+def _get_hybrid_loop_node(node: intrep.IrNode):
+    """
+    Returns the LoopNode of a combined construct (e.g., `parallel loop`), or None
+    if `node` is not a combined construct.
+    """
+    for child in node.children:
+        if type(child) == loop.LoopNode and child.lineno == node.lineno:
+            return child
+    return None
+
+def _indent(src: str, spaces=4) -> str:
+    """
+    Indents every non-blank line in `src` by `spaces`.
+    """
+    return "\n".join(" " * spaces + line if line.strip() else line for line in src.splitlines())
+
+def _create_kernel_name(intermediate_rep: intrep.IntermediateRepresentation, node: intrep.IrNode) -> str:
+    """
+    Creates the name of the kernel for `node` and returns it: the decorated function's name and the
+    line of the node's pragma (e.g., `_acc_f_12_kernel`), which is unique within the generated module
+    (it only holds the kernels of one function, and there is one node per line), and the same every time
+    the function is compiled, so profiles and tracebacks can be compared from run to run.
+    """
+    return "_acc_{}_{}_kernel".format(intermediate_rep.meta_data.funcs_name, node.lineno)
+
+def _create_signature(name: str, params: [str]) -> str:
+    """
+    Creates a signature of the form `def name(params):` and returns it.
+    """
+    args = ", ".join(params)
     args = "({})".format(args)
 
-    return "def {}_kernel_function{}:".format(unique, args)
+    return "def {}{}:".format(name, args)
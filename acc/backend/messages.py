@@ -0,0 +1,100 @@
+"""
+Serialization of the messages sent between the host and the gangs.
+
+Messages are pickled with protocol 5 (Python 3.8+), with large buffers (NumPy
+arrays, bytearrays, and anything else that supports PickleBuffer) taken out
+of band: rather than being copied into the pickle, each buffer is written to
+the pipe as a separate frame, straight from the memory it already lives in,
+and read on the other side straight into a buffer of its own. A message
+looks like this on the pipe:
+
+    1. A header: the number of frames, the size of each frame, and whether the
+       pickle was made by dill.
+    2. The pickle itself.
+    3. Each out-of-band buffer, in order.
+
+Plain pickle cannot serialize closures, lambdas, or functions that are not
+importable by name; only when pickling fails is the message pickled with dill
+instead (in band, since dill does not hand out PickleBuffers).
+
+On Pythons before 3.8 everything is pickled in band, with dill.
+"""
+import dill
+import pickle
+import struct
+
+# Protocol 5 is what allows buffers to be pickled out of band
+OUT_OF_BAND = pickle.HIGHEST_PROTOCOL >= 5
+
+# Header: number of frames, whether the pickle was made by dill, then the size of each frame
+_HEADER = "!I?"
+_FRAME_SIZE = "Q"
+
+def dumps(obj) -> (bool, list):
+    """
+    Serializes `obj` and returns whether dill had to be used, and the list of frames:
+    the pickle, followed by the out-of-band buffers (memoryviews of the memory
+    those buffers already occupy, so nothing is copied).
+    """
+    if OUT_OF_BAND:
+        buffers = []
+        try:
+            body = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+            return False, [body] + [b.raw() for b in buffers]
+        except (pickle.PicklingError, AttributeError, TypeError):
+            pass
+    return True, [dill.dumps(obj)]
+
+def loads(usesdill: bool, frames: list):
+    """
+    Deserializes a message from the frames returned by `dumps`.
+    """
+    if usesdill:
+        return dill.loads(frames[0])
+    return pickle.loads(frames[0], buffers=frames[1:])
+
+def size(message: (bool, list)) -> int:
+    """
+    Returns the number of bytes in the frames of a message returned by `dumps`.
+    """
+    return sum(memoryview(frame).nbytes for frame in message[1])
+
+def send(conn, obj) -> None:
+    """
+    Serializes `obj` and sends it over the multiprocessing Connection `conn`.
+    """
+    send_frames(conn, *dumps(obj))
+
+def send_frames(conn, usesdill: bool, frames: list) -> None:
+    """
+    Sends an already serialized message (as returned by `dumps`) over `conn`.
+    """
+    sizes = [memoryview(frame).nbytes for frame in frames]
+    conn.send_bytes(struct.pack(_HEADER + _FRAME_SIZE * len(sizes), len(sizes), usesdill, *sizes))
+    for frame in frames:
+        conn.send_bytes(frame)
+
+def recv(conn):
+    """
+    Receives a message sent with `send` or `send_frames` over `conn` and deserializes it.
+    """
+    return loads(*recv_frames(conn))
+
+def recv_frames(conn) -> (bool, list):
+    """
+    Receives a message sent with `send` or `send_frames` over `conn`, without deserializing it.
+    Out-of-band buffers are received directly into (writable) bytearrays, which the
+    deserialized objects will then use as their memory.
+    """
+    header = conn.recv_bytes()
+    nframes, usesdill = struct.unpack_from(_HEADER, header)
+    sizes = struct.unpack_from("!" + _FRAME_SIZE * nframes, header, struct.calcsize(_HEADER))
+    frames = [conn.recv_bytes()]
+    for size in sizes[1:]:
+        frame = bytearray(size)
+        if size:
+            conn.recv_bytes_into(frame)
+        else:
+            conn.recv_bytes()
+        frames.append(frame)
+    return usesdill, frames
@@ -0,0 +1,183 @@
+"""
+The OpenACC profiling interface.
+
+A tool (a profiler, a tracer, a test...) registers a Python callback for each event
+that it wants to hear about, and the runtime calls it, with an EventInfo that
+describes the event, each time that event happens:
+
+```python
+import acc.api as openacc
+
+def on_launch(info):
+    print(info.func_name, info.line_no, info.gang, info.num_gangs)
+
+openacc.prof_register("enqueue_launch_start", on_launch)
+```
+
+The events are the ones in the OpenACC specification (without their `acc_ev_`
+prefix), as far as the host back end has anything that corresponds to them:
+
+- device_init_start/end:        starting the gangs, the first time a region needs them.
+- device_shutdown_start/end:    stopping the gangs.
+- compute_construct_start/end:  around a compute region that runs on the device.
+- enter_data_start/end:         around copying in the arrays of a data region.
+- exit_data_start/end:          around copying out and freeing the arrays of a data region.
+- update_start/end:             around an update of a data region's arrays (self or device).
+- enqueue_launch_start/end:     around sending one chunk of a region's iterations to a gang.
+- enqueue_upload_start/end:     around copying an array into its device buffer.
+- enqueue_download_start/end:   around copying a device buffer back into its array.
+- create, delete:               after allocating, and before freeing, a device buffer.
+- wait_start/end:               around waiting on the activity queues of a wait clause.
+
+Regions that run on the local thread (see fallback.py) do not use the device, so they
+have no events.
+
+The runtime checks the module's `enabled` flag before it so much as builds an event's
+info, so when no callback is registered, an event costs one attribute lookup.
+
+Tools can also be loaded from the ACC_PROFLIB environment variable, a list of modules
+(by name, or by the path of their .py file) separated by os.pathsep. Each one must have
+an `acc_register_library(register, unregister)` function, which is called with this
+module's `register` and `unregister` when the runtime starts up.
+"""
+import importlib
+import importlib.util
+import os
+import threading
+
+# The modules (or .py files) of the tools to load when the runtime starts up
+DEFAULT_PROFLIB = os.environ.get("ACC_PROFLIB", "")
+
+# The events that callbacks can be registered for
+EVENTS = (
+    "device_init_start", "device_init_end",
+    "device_shutdown_start", "device_shutdown_end",
+    "compute_construct_start", "compute_construct_end",
+    "enter_data_start", "enter_data_end",
+    "exit_data_start", "exit_data_end",
+    "update_start", "update_end",
+    "enqueue_launch_start", "enqueue_launch_end",
+    "enqueue_upload_start", "enqueue_upload_end",
+    "enqueue_download_start", "enqueue_download_end",
+    "create", "delete",
+    "wait_start", "wait_end",
+)
+
+class EventInfo:
+    """
+    What a callback is told about an event.
+
+    Items
+    -----
+
+    - event_type  : The event (one of EVENTS).
+    - device_type : The type of the device ("host").
+    - func_name   : The name of the decorated function that the region is in, or None if
+                    the event does not belong to a region.
+    - line_no     : The line number of the region's pragma in the decorated function (the
+                    region's IrNode.lineno), or None.
+    - num_gangs   : The number of gangs the region runs on, for the compute construct and
+                    launch events; None otherwise.
+    - gang        : The gang that a chunk is sent to, for the launch events; None otherwise.
+    - bytes       : The number of bytes moved or allocated, for the upload, download, create
+                    and delete events (and, for the launch events, the size of the message
+                    sent to the gang); None otherwise.
+    """
+    __slots__ = ("event_type", "device_type", "func_name", "line_no", "num_gangs", "gang", "bytes")
+
+    def __init__(self, event_type: str, region=None, num_gangs=None, gang=None, nbytes=None):
+        self.event_type = event_type
+        self.device_type = "host"
+        self.func_name, self.line_no = _parse_region(region)
+        self.num_gangs = num_gangs
+        self.gang = gang
+        self.bytes = nbytes
+
+    def __repr__(self):
+        return "EventInfo({})".format(", ".join("{}={!r}".format(name, getattr(self, name)) for name in self.__slots__))
+
+# True while any callback is registered
+enabled = False
+
+# The callbacks registered for each event. The lists are replaced, never changed in place,
+# so that dispatch can go through them without taking the lock.
+_callbacks = {}
+_callbacks_lock = threading.Lock()
+
+# True once ACC_PROFLIB has been loaded
+_loaded = False
+
+def register(event: str, callback) -> None:
+    """
+    Registers `callback` to be called as `callback(info)`, with an EventInfo, each time
+    `event` happens. A callback that is registered more than once is called once for each time.
+    """
+    global enabled
+    if event not in EVENTS:
+        raise ValueError("Unknown profiling event: {}".format(event))
+    with _callbacks_lock:
+        _callbacks[event] = _callbacks.get(event, []) + [callback]
+        enabled = True
+
+def unregister(event: str, callback) -> None:
+    """
+    Removes one registration of `callback` for `event`, if there is one.
+    """
+    global enabled
+    if event not in EVENTS:
+        raise ValueError("Unknown profiling event: {}".format(event))
+    with _callbacks_lock:
+        callbacks = list(_callbacks.get(event, []))
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if callbacks:
+            _callbacks[event] = callbacks
+        else:
+            _callbacks.pop(event, None)
+        enabled = bool(_callbacks)
+
+def dispatch(event: str, region=None, num_gangs=None, gang=None, nbytes=None) -> None:
+    """
+    Calls the callbacks registered for `event`. `region` is the key of the region that the
+    event belongs to ("funcname:lineno"), if any. Callers check `enabled` first.
+    """
+    callbacks = _callbacks.get(event)
+    if not callbacks:
+        return
+    info = EventInfo(event, region, num_gangs, gang, nbytes)
+    for callback in callbacks:
+        callback(info)
+
+def load_libraries(proflib=None) -> None:
+    """
+    Loads the tools in `proflib` (ACC_PROFLIB if None) and lets them register their callbacks.
+    Does nothing after the first time it is called without `proflib`.
+    """
+    global _loaded
+    if proflib is None:
+        if _loaded:
+            return
+        _loaded = True
+        proflib = DEFAULT_PROFLIB
+
+    for name in proflib.split(os.pathsep):
+        name = name.strip()
+        if not name:
+            continue
+        if name.endswith(".py"):
+            spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(name))[0], name)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        else:
+            module = importlib.import_module(name)
+        try:
+            entry = getattr(module, "acc_register_library")
+        except AttributeError:
+            raise ImportError("Profiling library {} does not have an 'acc_register_library' function.".format(name))
+        entry(register, unregister)
+
+def _parse_region(region):
+    if region is None:
+        return None, None
+    funcname, _, lineno = region.rpartition(":")
+    return funcname, int(lineno)
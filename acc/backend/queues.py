@@ -0,0 +1,238 @@
+"""
+Asynchronous activity queues for the host back end.
+
+OpenACC regions and directives with an `async` clause are enqueued on an
+activity queue instead of blocking the local thread. Operations on the same
+queue run in order, one after the other; operations on different queues may
+run concurrently. The gangs themselves are shared by all the queues (see
+gangs.py), so a queue only costs one host thread, no matter how many regions
+are enqueued on it.
+
+Everything that gets enqueued hands back an AsyncHandle, which can be waited
+on like a `concurrent.futures.Future` or awaited from a coroutine, so that an
+asyncio event loop never has to block on a compute region.
+"""
+import asyncio
+import concurrent.futures
+import threading
+
+# The async-argument that means "use the default queue" (acc_async_noval)
+ASYNC_NOVAL = -1
+
+# The async-argument that means "do not run asynchronously" (acc_async_sync)
+ASYNC_SYNC = -2
+
+class AsyncHandle:
+    """
+    A handle to an operation that was enqueued on an activity queue.
+
+    The handle can be used from synchronous code:
+
+    ```python
+    handle = square_async(ls)
+    sqrs = handle.result()
+    ```
+
+    or awaited from a coroutine:
+
+    ```python
+    sqrs = await square_async(ls)
+    ```
+    """
+    def __init__(self, future: concurrent.futures.Future, queueid: int):
+        self.future = future
+        self.queueid = queueid
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def __repr__(self):
+        state = "done" if self.future.done() else "pending"
+        return "AsyncHandle(queue={}, {})".format(self.queueid, state)
+
+    def done(self) -> bool:
+        """
+        Returns True if the operation has completed (successfully or not).
+        """
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Blocks until the operation has completed and returns its result.
+        Re-raises whatever the operation raised.
+        """
+        return self.future.result(timeout=timeout)
+
+class ActivityQueue:
+    """
+    A single asynchronous activity queue. Operations are run in the order
+    they were enqueued by a single host thread dedicated to this queue.
+    """
+    def __init__(self, queueid: int):
+        self.queueid = queueid
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._last = None           # The future of the most recently enqueued operation
+        self._thread_ident = None   # The ident of the thread that runs this queue
+
+    def enqueue(self, func, *args, **kwargs) -> AsyncHandle:
+        """
+        Enqueues `func(*args, **kwargs)` on this queue and returns a handle to it.
+        """
+        with self._lock:
+            future = self._executor.submit(self._run, func, *args, **kwargs)
+            self._last = future
+        return AsyncHandle(future, self.queueid)
+
+    def is_current_thread(self) -> bool:
+        """
+        Returns True if the caller is running as an operation on this queue.
+        """
+        return threading.get_ident() == self._thread_ident
+
+    def last(self) -> concurrent.futures.Future:
+        """
+        Returns the future of the most recently enqueued operation, or None.
+        """
+        with self._lock:
+            return self._last
+
+    def test(self) -> bool:
+        """
+        Returns True if every operation enqueued so far has completed.
+        """
+        last = self.last()
+        return last is None or last.done()
+
+    def wait(self) -> None:
+        """
+        Blocks until every operation enqueued so far has completed.
+        """
+        last = self.last()
+        if last is not None and not self.is_current_thread():
+            last.result()
+
+    def _run(self, func, *args, **kwargs):
+        self._thread_ident = threading.get_ident()
+        return func(*args, **kwargs)
+
+# All the queues that have been used so far, by async-argument
+_queues = {}
+_queues_lock = threading.Lock()
+
+def get_queue(queueid: int) -> ActivityQueue:
+    """
+    Returns the activity queue for the given async-argument, creating it
+    if it does not already exist.
+    """
+    with _queues_lock:
+        if queueid not in _queues:
+            _queues[queueid] = ActivityQueue(queueid)
+        return _queues[queueid]
+
+def enqueue(queueid: int, func, *args, **kwargs) -> AsyncHandle:
+    """
+    Enqueues `func(*args, **kwargs)` on the activity queue `queueid` and returns
+    a handle to it.
+
+    If the caller is itself an operation on that queue, `func` is run immediately
+    instead, since anything enqueued behind the caller could not start until the
+    caller had finished.
+    """
+    queue = get_queue(resolve(queueid))
+    if queue.is_current_thread():
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return AsyncHandle(future, queue.queueid)
+    return queue.enqueue(func, *args, **kwargs)
+
+def resolve(queueid: int) -> int:
+    """
+    Returns the queue that `queueid` stands for: ASYNC_NOVAL stands for the
+    default queue (acc-default-async-var).
+    """
+    if queueid == ASYNC_NOVAL:
+        import acc.api as api
+        return api.get_default_async()
+    return queueid
+
+def test(queueid: int) -> bool:
+    """
+    Returns True if all operations enqueued on `queueid` have completed.
+    A queue that has never been used counts as completed.
+    """
+    with _queues_lock:
+        queue = _queues.get(resolve(queueid))
+    return queue is None or queue.test()
+
+def test_all() -> bool:
+    """
+    Returns True if all operations on all queues have completed.
+    """
+    return all(queue.test() for queue in _all_queues())
+
+def wait(queueid: int) -> None:
+    """
+    Blocks until all operations enqueued on `queueid` have completed.
+    """
+    with _queues_lock:
+        queue = _queues.get(resolve(queueid))
+    if queue is not None:
+        queue.wait()
+
+def wait_all() -> None:
+    """
+    Blocks until all operations on all queues have completed.
+    """
+    for queue in _all_queues():
+        queue.wait()
+
+def wait_async(waitids: [int], queueid: int) -> AsyncHandle:
+    """
+    Enqueues an operation on `queueid` that waits for the operations currently
+    enqueued on each of `waitids`, so that nothing enqueued on `queueid` later
+    starts before they are done. The local thread does not block.
+    """
+    queueid = resolve(queueid)
+    futures = [get_queue(resolve(w)).last() for w in waitids if resolve(w) != queueid]
+    futures = [f for f in futures if f is not None]
+    return enqueue(queueid, _wait_for_futures, futures)
+
+def wait_all_async(queueid: int) -> AsyncHandle:
+    """
+    Enqueues an operation on `queueid` that waits for all the other queues.
+    """
+    waitids = [queue.queueid for queue in _all_queues()]
+    return wait_async(waitids, queueid)
+
+async def wait_coroutine(queueid: int) -> None:
+    """
+    Coroutine version of `wait`: suspends the calling coroutine, rather than
+    blocking the event loop, until all operations enqueued on `queueid` have
+    completed.
+    """
+    with _queues_lock:
+        queue = _queues.get(resolve(queueid))
+    last = queue.last() if queue is not None else None
+    if last is not None:
+        await asyncio.wrap_future(last)
+
+async def wait_all_coroutine() -> None:
+    """
+    Coroutine version of `wait_all`.
+    """
+    lasts = [queue.last() for queue in _all_queues()]
+    lasts = [asyncio.wrap_future(last) for last in lasts if last is not None]
+    if lasts:
+        await asyncio.gather(*lasts)
+
+def _all_queues() -> [ActivityQueue]:
+    with _queues_lock:
+        return list(_queues.values())
+
+def _wait_for_futures(futures):
+    for future in futures:
+        future.result()
@@ -0,0 +1,174 @@
+"""
+Shared-memory device buffers for the host back end.
+
+Arrays (NumPy ndarrays) used by a compute region are given to the gangs in
+shared memory instead of being pickled into every gang's message. The host
+allocates one buffer per array for the region, copies the array in (for
+copy and copyin), and copies it back out at the end (for copy and copyout);
+the gangs map the buffer and read and write it in place. Since the buffer
+is shared, writes from one gang are visible to the others, which is how
+device memory behaves in OpenACC.
+
+The buffers can also be copied in and out a slice at a time, which is what
+lets a pipelined region (see gangs.py) overlap the transfers of one chunk
+of iterations with the computation of another.
+
+Memory-mapped arrays (numpy.memmap) are not copied at all, since they may be
+larger than memory: the gangs are given only the file's path, dtype, offset
+and shape, and each gang maps the file itself. The mapping is lazy, so a gang
+only reads (and keeps resident) the pages its own iterations touch. A gang
+maps copy and copyout arrays read-write, so its writes go straight to the
+file, and everything else copy-on-write, so its writes are discarded.
+
+Both NumPy and multiprocessing.shared_memory (Python 3.8+) are optional; if
+either is missing, `is_shareable` is always False and arrays are sent to the
+gangs the same way as any other data.
+"""
+import mmap
+try:
+    from multiprocessing import shared_memory
+    from multiprocessing import resource_tracker
+except ImportError:
+    shared_memory = None
+
+# The transfer modes (data clauses) that copy an array into the device buffer
+COPIES_IN = ("copy", "copyin", "present", "no_create")
+
+# The transfer modes (data clauses) that copy an array back out of the device buffer
+COPIES_OUT = ("copy", "copyout", "present", "no_create")
+
+class SharedArrayRef:
+    """
+    What a gang receives instead of an array: enough information to map the
+    array's device buffer.
+    """
+    def __init__(self, name: str, shape: tuple, dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def attach(self):
+        """
+        Maps the buffer in the calling (gang) process. Returns the SharedMemory
+        object (which must be kept alive while the array is in use, and closed
+        afterwards) and an ndarray view of it.
+        """
+        import numpy
+        shm = shared_memory.SharedMemory(name=self.name)
+        # The host owns the buffer; don't let this process's resource tracker unlink it too
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm, numpy.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+class MappedArrayRef:
+    """
+    What a gang receives instead of a memory-mapped array: the location of the
+    array in its file.
+    """
+    def __init__(self, filename: str, dtype: str, offset: int, shape: tuple, order: str, mapmode: str):
+        self.filename = filename
+        self.dtype = dtype
+        self.offset = offset
+        self.shape = shape
+        self.order = order
+        self.mapmode = mapmode
+
+    @classmethod
+    def from_memmap(cls, original, mode: str):
+        """
+        Returns the reference to the memmap `original`, which appeared in the data clause `mode`.
+        Writes from the gangs only reach the file if the clause copies out and the file is writable.
+        """
+        writable = mode in COPIES_OUT and original.mode in ("r+", "w+")
+        order = "F" if original.flags.f_contiguous and not original.flags.c_contiguous else "C"
+        return cls(original.filename, original.dtype.str, original.offset, original.shape, order, "r+" if writable else "c")
+
+    def attach(self):
+        """
+        Maps the array in the calling (gang) process. Returns a handle (which must be
+        closed once the gang is done with the array, to flush its writes) and the array.
+        """
+        import numpy
+        array = numpy.memmap(self.filename, dtype=self.dtype, mode=self.mapmode, offset=self.offset, shape=self.shape, order=self.order)
+        return _MappedArrayHandle(array), array
+
+class _MappedArrayHandle:
+    def __init__(self, array):
+        self._array = array
+
+    def close(self):
+        if self._array.mode == "r+":
+            self._array.flush()
+        self._array = None
+
+class SharedArray:
+    """
+    A device buffer for one array, owned by the host for the duration of a region.
+    """
+    def __init__(self, original, mode: str, variable=None):
+        """
+        Allocates the buffer for `original` (an ndarray). `mode` is the data clause the
+        array appeared in, or "copy" if it was not in one, and `variable` is the name of
+        the variable it is the value of, if known (which its transfers are counted under).
+        """
+        import numpy
+        self.original = original
+        self.mode = mode
+        self.variable = variable
+        nbytes = max(original.nbytes, 1)
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.array = numpy.ndarray(original.shape, dtype=original.dtype, buffer=self._shm.buf)
+        self.ref = SharedArrayRef(self._shm.name, original.shape, original.dtype.str)
+
+    @property
+    def copies_in(self) -> bool:
+        return self.mode in COPIES_IN
+
+    @property
+    def copies_out(self) -> bool:
+        return self.mode in COPIES_OUT
+
+    def copy_in(self, lo=None, hi=None) -> int:
+        """
+        Copies the original array (or the slice [lo:hi] of its first dimension)
+        into the buffer. Returns the number of bytes copied.
+        """
+        self.array[lo:hi] = self.original[lo:hi]
+        return self.array[lo:hi].nbytes
+
+    def copy_out(self, lo=None, hi=None) -> int:
+        """
+        Copies the buffer (or the slice [lo:hi] of its first dimension) back into
+        the original array. Returns the number of bytes copied.
+        """
+        self.original[lo:hi] = self.array[lo:hi]
+        return self.array[lo:hi].nbytes
+
+    def release(self):
+        """
+        Frees the buffer.
+        """
+        del self.array
+        self._shm.close()
+        self._shm.unlink()
+
+def is_shareable(value) -> bool:
+    """
+    Returns True if `value` can be given to the gangs in a shared buffer.
+    """
+    if shared_memory is None:
+        return False
+    if not (type(value).__module__ == "numpy" and type(value).__name__ == "ndarray"):
+        return False
+    return not value.dtype.hasobject and value.ndim > 0
+
+def is_mapped(value) -> bool:
+    """
+    Returns True if `value` is a whole memory-mapped array (not a view of one),
+    which can be given to the gangs by reference to its file.
+    """
+    if type(value).__module__ != "numpy" or type(value).__name__ != "memmap":
+        return False
+    return value.filename is not None and isinstance(value.base, mmap.mmap)
@@ -0,0 +1,83 @@
+"""
+Maps line numbers in the modules that the acc decorator generates back to the
+source code they came from.
+
+The module that is loaded in place of a decorated function's module is a copy of
+that module, with the decorated function's source swapped for what the back end
+made of it (the imports, the kernels, and the rewritten function). Everything before
+the swapped-in block is where it was; everything after it has moved by the difference
+in length; and everything in it came from the decorated function, line by line as the
+back end's line map says (see CompilerTarget.line_map).
+
+Rather than keep the maps around and look them up whenever something refers to a
+generated module, the api compiles each generated module with `compile_module`, which
+gives every line of the code the line of the original module that it came from, and
+gives the code the original module's file name. Tracebacks (including the ones the
+gangs send back), profiles, the timeline and coverage tools then all point at the
+user's source code, with no help from us.
+"""
+import ast
+
+class SourceMap:
+    """
+    Where the lines of one generated module came from.
+
+    Items
+    -----
+
+    - original  : The file name of the decorated function's module.
+    - first     : The (1-based) line number in both files where the swapped-in block starts.
+    - length    : The number of lines in the swapped-in block.
+    - replaced  : The number of lines of the original module that the block replaced.
+    - lineno    : The (1-based) line number of the decorated function's `def` in `original`.
+    - lines     : For each line of the block, the (function-based) line of the decorated function
+                  that it came from, or None; or None if the back end did not say.
+    """
+    __slots__ = ("original", "first", "length", "replaced", "lineno", "lines")
+
+    def __init__(self, original: str, first: int, length: int, replaced: int, lineno: int, lines=None):
+        self.original = original
+        self.first = first
+        self.length = length
+        self.replaced = replaced
+        self.lineno = lineno
+        # (a block that ends in blank lines has fewer lines than it was built from)
+        self.lines = lines[:length] if lines is not None and len(lines) >= length else None
+
+    def original_line(self, line: int) -> int:
+        """
+        Returns the line of `original` that line `line` of the generated module came from.
+        A line of the swapped-in block that the back end did not map maps to the decorated
+        function's `def`.
+        """
+        if line < self.first:
+            return line
+        elif line < self.first + self.length:
+            if self.lines is not None and self.lines[line - self.first] is not None:
+                return self.region_line(self.lines[line - self.first])
+            return self.lineno
+        return line - self.length + self.replaced
+
+    def region_line(self, lineno: int) -> int:
+        """
+        Returns the line of `original` that line `lineno` of the decorated function
+        (a function-based line number, as in IrNode.lineno) is on.
+        """
+        return self.lineno + lineno
+
+    def compile_module(self, src: str):
+        """
+        Compiles `src` (the source code of the generated module) into a code object whose
+        lines are those of `original` that they came from, and whose file name is `original`.
+        """
+        tree = ast.parse(src)
+        for node in ast.walk(tree):
+            if not hasattr(node, "lineno"):
+                continue
+            node.lineno = self.original_line(node.lineno)
+            if getattr(node, "end_lineno", None) is not None:
+                # A node that spans several lines can end up on fewer (or, mapped out of order, reversed) ones
+                node.end_lineno = max(self.original_line(node.end_lineno), node.lineno)
+                if node.end_lineno == node.lineno and getattr(node, "end_col_offset", None) is not None and node.end_col_offset < node.col_offset:
+                    node.end_col_offset = node.col_offset
+        return compile(tree, self.original, "exec")
@@ -0,0 +1,146 @@
+"""
+Timeline tracing of the gang runtime, written as a Chrome trace.
+
+When tracing is on, the gang runtime records a span (a name, a start and an end)
+for each thing it does:
+
+- On the host, on the thread that runs the region: the whole region ("region"),
+  waiting on a wait clause ("wait"), copying an array into its device buffer
+  ("upload") or back out ("download"), waiting for a gang to finish a chunk
+  ("gang wait"), and merging the gangs' copies of a variable back into the
+  original ("merge"). Serial regions are a single "serial" span.
+- In each gang process: deserializing a chunk's task and mapping its buffers
+  ("unpack"), and running the kernel on the chunk ("compute"). The gang sends
+  these back along with its results, and they are merged into the host's.
+
+All of the timestamps are taken from the same monotonic clock, which every process
+on the machine shares, so the spans of the host and of the gangs line up.
+
+`write` saves the spans in the Chrome trace event format, which chrome://tracing and
+Perfetto (ui.perfetto.dev) show as a timeline, with one row for each host thread and
+each gang process. Tracing is started when the program starts if ACC_TRACE is set to
+a file name, and the trace is written to that file when the program exits. Otherwise,
+call `start`, run the regions, and then `write`.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+# The file to write the trace to when the program exits; tracing is on from the start if this is set
+DEFAULT_TRACE_FILE = os.environ.get("ACC_TRACE", "")
+
+if hasattr(time, "monotonic_ns"):
+    clock = time.monotonic_ns
+else:
+    # Python 3.6 and earlier
+    clock = lambda: int(time.monotonic() * 1e9)
+
+# True while tracing is on
+enabled = False
+
+# The spans recorded so far: (name, start, end, pid, tid, args), with the times in nanoseconds
+_spans = []
+_spans_lock = threading.Lock()
+
+def start() -> None:
+    """
+    Turns tracing on.
+    """
+    global enabled
+    enabled = True
+
+def stop() -> None:
+    """
+    Turns tracing off. The spans recorded so far are kept until `reset`.
+    """
+    global enabled
+    enabled = False
+
+def reset() -> None:
+    """
+    Forgets the spans recorded so far.
+    """
+    with _spans_lock:
+        del _spans[:]
+
+def add(name: str, start: int, region=None, **args) -> None:
+    """
+    Records a span on the calling thread of the host, from `start` (a time from `clock`) until now.
+
+    @param name:    The name of the span.
+
+    @param start:   When the span started.
+
+    @param region:  The key of the region that the span belongs to ("funcname:lineno"), or None.
+
+    @param args:    Anything else to show with the span.
+    """
+    end = clock()
+    if region is not None:
+        args["region"] = region
+    with _spans_lock:
+        _spans.append((name, start, end, os.getpid(), threading.get_ident(), args))
+
+def add_gang_spans(pid: int, spans: [(str, int, int)], region=None, **args) -> None:
+    """
+    Records the `spans` ((name, start, end) tuples) that the gang process `pid` sent back.
+    """
+    if region is not None:
+        args["region"] = region
+    with _spans_lock:
+        for name, start, end in spans:
+            _spans.append((name, start, end, pid, 0, args))
+
+def spans() -> list:
+    """
+    Returns the spans recorded so far, as (name, start, end, pid, tid, args) tuples, in
+    nanoseconds, in the order they were recorded.
+    """
+    with _spans_lock:
+        return list(_spans)
+
+def events() -> [dict]:
+    """
+    Returns the spans recorded so far as Chrome trace events, with their times in microseconds
+    since the first span started, along with the events that name the rows.
+    """
+    recorded = spans()
+    if not recorded:
+        return []
+    origin = min(start for _, start, _, _, _, _ in recorded)
+    host = os.getpid()
+
+    traceevents = []
+    for pid in sorted({pid for _, _, _, pid, _, _ in recorded}):
+        label = "host" if pid == host else "gang process {}".format(pid)
+        traceevents.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": label}})
+        traceevents.append({"name": "process_sort_index", "ph": "M", "pid": pid, "tid": 0, "args": {"sort_index": 0 if pid == host else 1}})
+    for name, start, end, pid, tid, args in recorded:
+        traceevents.append({
+            "name": name,
+            "cat": "host" if pid == host else "gang",
+            "ph": "X",
+            "ts": (start - origin) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": args,
+        })
+    return traceevents
+
+def write(f) -> None:
+    """
+    Writes the spans recorded so far to `f` (a file name or a file object) as a Chrome trace.
+    """
+    trace = {"traceEvents": events(), "displayTimeUnit": "ns"}
+    if isinstance(f, str):
+        with open(f, 'w') as fobj:
+            json.dump(trace, fobj)
+    else:
+        json.dump(trace, f)
+
+if DEFAULT_TRACE_FILE:
+    start()
+    atexit.register(write, DEFAULT_TRACE_FILE)
@@ -0,0 +1,199 @@
+"""
+Accounting of the data that the gang runtime moves between the host and the device.
+
+Moving data to the gangs and back is often what a region costs the most, and it
+happens out of sight, so the gang runtime counts it: for each region (by its key,
+"funcname:lineno") and for each variable of the region, how many times it was
+copied to the device ("up") and back ("down"), how many bytes that came to, and how
+long it took. The counts cover the compute regions, the data regions that keep
+arrays resident, and their update directives:
+
+- An array that is given to the gangs in a device buffer (see sharedarrays.py) is
+  counted exactly: the bytes copied into the buffer and back out, and the time the
+  copies took. A pipelined region copies each chunk's slice separately, so each
+  slice counts as a transfer.
+- Anything else travels in the task message of every chunk (and, if it is copied
+  back, in every reply). Its bytes are the size of its pickle, and its time is how
+  long pickling it took, once for each message. These are measured once per region.
+
+Arrays that a data region keeps resident, and memory-mapped arrays, are not copied
+by a compute region, so they do not count; nor do serial regions, which run on the
+local thread.
+
+When a variable is copied to the device by DEFAULT_WARN_REGIONS compute regions in a
+row (the same object, on the same thread, with no region in between that did not copy it), a
+RedundantTransferWarning says so, since a data region around those regions would
+copy it in once. Counting is on unless ACC_TRANSFER_STATS is 0, and the counts are
+dumped as JSON to ACC_TRANSFER_STATS_FILE, if it is set, when the program exits.
+"""
+import atexit
+import json
+import os
+import pickle
+import threading
+import time
+import warnings
+import weakref
+
+# Count the transfers
+DEFAULT_ENABLED = os.environ.get("ACC_TRANSFER_STATS", "1") == "1"
+
+# The file to dump the counts into when the program exits, if any
+DEFAULT_DUMP_FILE = os.environ.get("ACC_TRANSFER_STATS_FILE", "")
+
+# How many compute regions in a row may copy the same variable in before it is warned about. 0 turns the warnings off.
+DEFAULT_WARN_REGIONS = int(os.environ.get("ACC_TRANSFER_WARN_REGIONS", 3))
+
+if hasattr(time, "perf_counter_ns"):
+    clock = time.perf_counter_ns
+else:
+    # Python 3.6 and earlier
+    clock = lambda: int(time.perf_counter() * 1e9)
+
+class RedundantTransferWarning(UserWarning):
+    """
+    A variable was copied to the device by several compute regions in a row.
+    """
+    pass
+
+class Counter:
+    """
+    The transfers of one variable, or of one region.
+
+    Items
+    -----
+
+    - uploads    : How many times data was copied to the device.
+    - downloads  : How many times data was copied back from the device.
+    - bytes_up   : The bytes copied to the device.
+    - bytes_down : The bytes copied back.
+    - time_ns    : The nanoseconds that the copies took, both ways.
+    """
+    __slots__ = ("uploads", "downloads", "bytes_up", "bytes_down", "time_ns")
+
+    def __init__(self):
+        self.uploads = 0
+        self.downloads = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.time_ns = 0
+
+    def add(self, direction: str, nbytes: int, elapsed: int, count=1) -> None:
+        """
+        Counts `count` transfers in `direction` ("up" or "down"), of `nbytes` bytes in all,
+        which took `elapsed` nanoseconds in all.
+        """
+        if direction == "up":
+            self.uploads += count
+            self.bytes_up += nbytes
+        else:
+            self.downloads += count
+            self.bytes_down += nbytes
+        self.time_ns += elapsed
+
+    def to_dict(self) -> dict:
+        return {"uploads": self.uploads, "downloads": self.downloads, "bytes_up": self.bytes_up,
+                "bytes_down": self.bytes_down, "time_ns": self.time_ns}
+
+# True while the transfers are counted
+enabled = DEFAULT_ENABLED
+
+# The counts by region key, and by region key and then variable name
+_regions = {}
+_variables = {}
+_lock = threading.Lock()
+
+# For each thread, the variables that the last compute region copied in: name -> (a reference to the value, the regions in a row that copied it in)
+_recent = threading.local()
+
+def record(region, variable, direction: str, nbytes: int, elapsed: int, count=1) -> None:
+    """
+    Counts a transfer of the variable named `variable` (or None) in the region whose key is
+    `region` (or None). See Counter.add.
+    """
+    region = "?" if region is None else region
+    variable = "?" if variable is None else variable
+    with _lock:
+        if region not in _regions:
+            _regions[region] = Counter()
+            _variables[region] = {}
+        if variable not in _variables[region]:
+            _variables[region][variable] = Counter()
+        _regions[region].add(direction, nbytes, elapsed, count)
+        _variables[region][variable].add(direction, nbytes, elapsed, count)
+
+def measure(value) -> (int, int):
+    """
+    Returns the size, in bytes, of `value` when it is sent in a message, and the nanoseconds
+    it took to find out (which is how long it takes to serialize it).
+    """
+    started = clock()
+    try:
+        nbytes = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        # Sent with dill (see messages.py); there is no telling how big it is without sending it
+        nbytes = 0
+    return nbytes, clock() - started
+
+def copied_in(region, variables: [(str, object)]) -> None:
+    """
+    Notes that the compute region whose key is `region` has copied the `variables`
+    ((name, value) pairs) to the device, and warns about the ones that the compute
+    regions before it on this thread have copied in too. See the module docstring.
+    """
+    previous = getattr(_recent, "streaks", {})
+    streaks = {}
+    for name, value in variables:
+        # The streak goes on only if it is the very same object, which is still alive
+        reference, regions = previous.get(name, (None, []))
+        regions = (regions if reference is not None and reference() is value else []) + [region]
+        streaks[name] = (_reference(value), regions)
+        if DEFAULT_WARN_REGIONS > 0 and len(regions) == DEFAULT_WARN_REGIONS:
+            warnings.warn("{} was copied to the device by {} compute regions in a row ({}); a data region around them "
+                          "would copy it in once".format(name, len(regions), ", ".join(str(r) for r in regions)),
+                          RedundantTransferWarning, stacklevel=2)
+    _recent.streaks = streaks
+
+def _reference(value):
+    """
+    Returns a function that returns `value`, or None once it has been garbage collected.
+    """
+    try:
+        return weakref.ref(value)
+    except TypeError:
+        # Lists, dicts and the like cannot be weakly referenced, so they are kept alive until the next region
+        return lambda: value
+
+def get() -> dict:
+    """
+    Returns the counts so far, as {"regions": {region: counts}, "variables": {region: {variable: counts}}},
+    where the counts are dictionaries (see Counter.to_dict).
+    """
+    with _lock:
+        return {
+            "regions": {region: counter.to_dict() for region, counter in _regions.items()},
+            "variables": {region: {variable: counter.to_dict() for variable, counter in variables.items()}
+                          for region, variables in _variables.items()},
+        }
+
+def dump(f) -> None:
+    """
+    Writes the counts so far as JSON to `f`, a file name or a file object.
+    """
+    if isinstance(f, str):
+        with open(f, 'w') as fobj:
+            json.dump(get(), fobj, indent=2, sort_keys=True)
+    else:
+        json.dump(get(), f, indent=2, sort_keys=True)
+
+def reset() -> None:
+    """
+    Forgets the counts so far (and, on the calling thread, which variables the last region copied in).
+    """
+    with _lock:
+        _regions.clear()
+        _variables.clear()
+    _recent.streaks = {}
+
+if DEFAULT_DUMP_FILE:
+    atexit.register(dump, DEFAULT_DUMP_FILE)
@@ -0,0 +1,213 @@
+"""
+A performance regression gate for the benchmark suites in benchmarks/.
+
+    python -m acc.bench run new.json [--suites kernels frontend] [--runs 3] [--repeat 3]
+    python -m acc.bench compare old.json new.json [--threshold 0.05] [--confidence 0.95]
+
+`run` runs each suite --runs times, each time in a new Python process (so that
+the results cover the noise from one process to the next, and not just from one
+call to the next), and writes their results into one file. `compare` compares two
+such files (or the files that a suite writes with --json), and exits with status 1
+if anything got slower, so that it can block a release.
+
+A result is a benchmark (everything in the suite's result but the measurements:
+the kernel, size and number of gangs, say) and its times, in seconds, from every
+run. For each benchmark in both files, the comparison is of the median times, and
+the change is the ratio of the new median to the old one. Its confidence interval
+is bootstrapped: both sets of times are resampled, with replacement, RESAMPLES
+times, and the interval holds the middle --confidence of the ratios of the
+resampled medians. Each benchmark then gets a verdict:
+
+- slower: the whole interval is above 1 + threshold; the gate fails.
+- faster: the whole interval is below 1 / (1 + threshold).
+- noisy:  the interval reaches past a threshold, but not all the way, because the
+          times vary too much from run to run to tell, or there are fewer than
+          --min-samples times on either side, which is too few to trust the
+          interval; run it more times.
+- same:   the whole interval is within the threshold.
+- short:  both medians are below --min-time, which is too short to time reliably.
+
+The benchmarks that are only in one of the files are listed, but do not fail the gate.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# The slowdown, as a fraction of the old time, beyond which a benchmark fails the gate
+DEFAULT_THRESHOLD = float(os.environ.get("ACC_BENCH_THRESHOLD", 0.05))
+
+# The confidence level of the intervals
+DEFAULT_CONFIDENCE = float(os.environ.get("ACC_BENCH_CONFIDENCE", 0.95))
+
+# The fewest times on each side that a benchmark can be called slower or faster with
+DEFAULT_MIN_SAMPLES = int(os.environ.get("ACC_BENCH_MIN_SAMPLES", 3))
+
+# Medians below this many seconds are too short to compare
+DEFAULT_MIN_TIME = float(os.environ.get("ACC_BENCH_MIN_TIME", 0.001))
+
+# The number of bootstrap resamples for each confidence interval
+RESAMPLES = 2000
+
+# The directory of the benchmark suites, and the suites that write their results as JSON
+BENCHMARKS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+SUITES = ("kernels", "frontend")
+
+# The verdicts, from worst to best
+VERDICTS = ("slower", "noisy", "faster", "same", "short")
+
+# The fields of a result that are measurements, rather than what was measured
+MEASUREMENTS = ("times", "best", "throughput", "serial", "speedup", "jit_overhead")
+
+class Comparison:
+    """
+    The comparison of one benchmark's times in two runs.
+
+    Items
+    -----
+
+    - name    : The benchmark, as "field=value field=value ...".
+    - old     : The median of the old times, in seconds.
+    - new     : The median of the new times, in seconds.
+    - ratio   : new / old.
+    - low     : The low end of the confidence interval of the ratio.
+    - high    : The high end of the confidence interval of the ratio.
+    - verdict : "slower", "faster", "noisy", "same", or "short" (see the module docstring).
+    """
+    __slots__ = ("name", "old", "new", "ratio", "low", "high", "verdict")
+
+    def __init__(self, name, old, new, ratio, low, high, verdict):
+        self.name = name
+        self.old = old
+        self.new = new
+        self.ratio = ratio
+        self.low = low
+        self.high = high
+        self.verdict = verdict
+
+def load(path: str) -> {str: [float]}:
+    """
+    Returns the times of each benchmark in the results file at `path`, by the benchmark's name.
+    """
+    with open(path) as f:
+        results = json.load(f)["results"]
+    times = {}
+    for result in results:
+        times.setdefault(benchmark_name(result), []).extend(result["times"])
+    return times
+
+def benchmark_name(result: dict) -> str:
+    """
+    Returns the name of the benchmark that `result` is a result of: its fields other than the measurements.
+    """
+    return " ".join("{}={}".format(key, result[key]) for key in sorted(result) if key not in MEASUREMENTS)
+
+def confidence_interval(old: [float], new: [float], confidence=DEFAULT_CONFIDENCE, seed=0) -> (float, float):
+    """
+    Returns the bootstrapped `confidence` interval of the ratio of the median of `new` to the median of `old`.
+    """
+    rng = random.Random(seed)
+    resample = lambda times: [rng.choice(times) for _ in times]
+    ratios = sorted(statistics.median(resample(new)) / statistics.median(resample(old)) for _ in range(RESAMPLES))
+    tail = (1 - confidence) / 2
+    return ratios[int(tail * (RESAMPLES - 1))], ratios[int(round((1 - tail) * (RESAMPLES - 1)))]
+
+def compare_times(name: str, old: [float], new: [float], threshold=DEFAULT_THRESHOLD, confidence=DEFAULT_CONFIDENCE,
+                  min_time=DEFAULT_MIN_TIME, min_samples=DEFAULT_MIN_SAMPLES) -> Comparison:
+    """
+    Compares the `old` and `new` times of the benchmark `name`. See the module docstring.
+    """
+    oldmedian = statistics.median(old)
+    newmedian = statistics.median(new)
+    ratio = newmedian / oldmedian if oldmedian > 0 else float("inf")
+    low, high = confidence_interval(old, new, confidence) if oldmedian > 0 else (ratio, ratio)
+    if oldmedian < min_time and newmedian < min_time:
+        verdict = "short"
+    elif low > 1 + threshold:
+        verdict = "slower"
+    elif high < 1 / (1 + threshold):
+        verdict = "faster"
+    elif high > 1 + threshold or low < 1 / (1 + threshold):
+        verdict = "noisy"
+    else:
+        verdict = "same"
+    if verdict in ("slower", "faster") and min(len(old), len(new)) < min_samples:
+        verdict = "noisy"
+    return Comparison(name, oldmedian, newmedian, ratio, low, high, verdict)
+
+def compare(old: {str: [float]}, new: {str: [float]}, threshold=DEFAULT_THRESHOLD, confidence=DEFAULT_CONFIDENCE,
+            min_time=DEFAULT_MIN_TIME, min_samples=DEFAULT_MIN_SAMPLES) -> [Comparison]:
+    """
+    Compares each benchmark that is in both `old` and `new` (as returned by `load`).
+    """
+    return [compare_times(name, old[name], new[name], threshold, confidence, min_time, min_samples) for name in old if name in new]
+
+def run(output: str, suites=SUITES, runs=3, repeat=3) -> None:
+    """
+    Runs each of the benchmark `suites` `runs` times, each in a new process with `repeat` timed
+    calls per benchmark, and writes all their results to the file `output`.
+    """
+    results = []
+    for suite in suites:
+        for _ in range(runs):
+            fd, path = tempfile.mkstemp(suffix=".json")
+            os.close(fd)
+            try:
+                cmd = [sys.executable, os.path.join(BENCHMARKS_DIR, suite + ".py"), "--repeat", str(repeat), "--json", path]
+                subprocess.run(cmd, check=True)
+                with open(path) as f:
+                    written = json.load(f)
+            finally:
+                os.remove(path)
+            machine = written["machine"]
+            results += written["results"]
+    with open(output, 'w') as f:
+        json.dump({"machine": machine, "results": results}, f, indent=2)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m acc.bench", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    runner = commands.add_parser("run", help="Run the benchmark suites and write their results to a file")
+    runner.add_argument("output", help="The file to write the results to")
+    runner.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES), help="The suites to run")
+    runner.add_argument("--runs", type=int, default=3, help="Number of processes to run each suite in")
+    runner.add_argument("--repeat", type=int, default=3, help="Number of timed calls per benchmark in each process")
+    comparer = commands.add_parser("compare", help="Compare two results files, and fail if anything got slower")
+    comparer.add_argument("old", help="The results to compare against")
+    comparer.add_argument("new", help="The results to compare")
+    comparer.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="The slowdown (as a fraction) that fails the gate")
+    comparer.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE, help="The confidence level of the intervals")
+    comparer.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES, help="The fewest times per benchmark to call it slower or faster with")
+    comparer.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="Median seconds below which a benchmark is not compared")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args.output, args.suites, args.runs, args.repeat)
+        return 0
+    if args.command != "compare":
+        parser.print_help()
+        return 2
+
+    old, new = load(args.old), load(args.new)
+    comparisons = compare(old, new, args.threshold, args.confidence, args.min_time, args.min_samples)
+    width = max([len(c.name) for c in comparisons] + [9])
+    print("{:<{w}} {:>12} {:>12} {:>8} {:>17} {:>7}".format("benchmark", "old (s)", "new (s)", "change", "interval", "verdict", w=width))
+    for c in comparisons:
+        print("{:<{w}} {:>12.6f} {:>12.6f} {:>+7.1%} {:>17} {:>7}".format(
+            c.name, c.old, c.new, c.ratio - 1, "[{:+.1%}, {:+.1%}]".format(c.low - 1, c.high - 1), c.verdict, w=width))
+    for name in sorted(set(old) - set(new)):
+        print("{:<{w}} only in {}".format(name, args.old, w=width))
+    for name in sorted(set(new) - set(old)):
+        print("{:<{w}} only in {}".format(name, args.new, w=width))
+
+    counts = [(verdict, len([c for c in comparisons if c.verdict == verdict])) for verdict in VERDICTS]
+    print()
+    print(", ".join("{} {}".format(n, verdict) for verdict, n in counts))
+    return 1 if any(c.verdict == "slower" for c in comparisons) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
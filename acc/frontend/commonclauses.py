@@ -3,6 +3,43 @@ This module contains all the clauses common to several constructs.
 """
 import acc.frontend.util.errors as errors
 
+class AsyncClause:
+    """
+    All the information needed by the back-end for an async clause.
+
+    Items
+    -----
+
+    - expr : The source text of the async-argument, or None if the clause had no argument,
+             in which case the default asynchronous activity queue is used.
+    """
+    __slots__ = ("expr",)
+
+    def __init__(self, expr: str):
+        self.expr = expr
+
+    def __str__(self):
+        return "{}".format(self.expr)
+
+class WaitClause:
+    """
+    All the information needed by the back-end for a wait clause (or the argument of a
+    wait directive).
+
+    Items
+    -----
+
+    - exprs : The source text of each async-argument to wait on. Empty if the clause had
+              no argument, in which case all the activity queues are waited on.
+    """
+    __slots__ = ("exprs",)
+
+    def __init__(self, exprs: [str]):
+        self.exprs = list(exprs)
+
+    def __str__(self):
+        return "{}".format(self.exprs)
+
 def apply_clause(index, clause_list, intermediate_rep, node, dbg):
     """
     Consumes however much of the clause list as necessary to apply the clause
@@ -11,7 +48,7 @@ def apply_clause(index, clause_list, intermediate_rep, node, dbg):
     @param index:               The index into the clause_list of the clause we are
                                 interested in.
 
-    @param clause_list:         The list of the clauses that this clause is indexed in.
+    @param clause_list:         The list of the clauses (grammar.Clauses) that this clause is indexed in.
 
     @param intermediate_rep:    The intermediate representation, filled with information
                                 about the source code in general, but not yet this node.
@@ -22,45 +59,139 @@ def apply_clause(index, clause_list, intermediate_rep, node, dbg):
                                 clauses after this one is done, index will be -1.
 
     """
-    args = (index, clause_list, intermediate_rep, node, dbg)
     clause = clause_list[index]
-    if   clause.startswith("async"):
-        return _async(*args)
-    elif clause.startswith("wait"):
-        return _wait(*args)
-    elif clause.startswith("num_gangs"):
-        return _num_gangs(*args)
-    elif clause.startswith("num_workers"):
-        return _num_workers(*args)
-    elif clause.startswith("vector_length"):
-        return _vector_length(*args)
-    elif clause.startswith("private"):
-        return _private(*args)
-    elif clause.startswith("firstprivate"):
-        return _firstprivate(*args)
-    elif clause.startswith("reduction"):
-        return _reduction(*args)
-    elif clause.startswith("default"):
-        return _default(*args)
-    elif clause.startswith("if"):
-        return _if(*args)
-    elif clause.startswith("self"):
-        return _self(*args)
+    if clause.name not in _CLAUSES:
+        errmsg = "Clause either not allowed for this directive, or else it may be spelled incorrectly. Clause given: {}.".format(clause.text)
+        raise errors.InvalidClauseError(dbg.build_message(errmsg))
+    return _CLAUSES[clause.name](index, clause_list, intermediate_rep, node, dbg)
+
+class DataClause:
+    """
+    All the information needed by the back-end for a data clause (copy, copyin, copyout,
+    create, no_create, present, deviceptr, or attach), or for a private or firstprivate clause.
+
+    Items
+    -----
+
+    - vars      : The names of the variables in the var-list, in order.
+    - subarrays : Maps a variable's name to the source text of its subarray specification
+                  (e.g. "[0:n]"), for the variables that were given as subarrays.
+    - readonly  : True if the readonly modifier was given (copyin only).
+    """
+    __slots__ = ("vars", "subarrays", "readonly")
+
+    def __init__(self, vars: [str], subarrays=None, readonly=False):
+        self.vars = list(vars)
+        self.subarrays = dict(subarrays) if subarrays else {}
+        self.readonly = readonly
+
+    def __str__(self):
+        return "{}".format([v + self.subarrays.get(v, "") for v in self.vars])
+
+    def extend(self, other):
+        """
+        Adds the variables from another clause of the same kind to this one.
+        """
+        self.vars.extend(v for v in other.vars if v not in self.vars)
+        self.subarrays.update(other.subarrays)
+        self.readonly = self.readonly and other.readonly
+
+def apply_data_clause(clausename: str, index, clause_list, node, dbg):
+    """
+    Records the data clause found at index in the clause_list in `node`
+    under the attribute of the same name, merging it with any earlier clause of the same kind.
+
+    @return:                    The new index.
+    """
+    clause = clause_list[index]
+    subarrays = {var.name: var.subarray for var in clause.vars if var.bounds is not None}
+    dataclause = DataClause([var.name for var in clause.vars], subarrays, clause.modifier == "readonly")
+    if getattr(node, clausename) is None:
+        setattr(node, clausename, dataclause)
+    else:
+        getattr(node, clausename).extend(dataclause)
+    return _next_index(index, clause_list)
+
+class ReductionClause:
+    """
+    All the information needed by the back-end for a reduction clause.
+
+    Items
+    -----
+
+    - vars      : The names of the reduction vars, in order.
+    - operators : Maps each reduction var's name to its reduction operator (e.g. "+" or "max").
+    - subarrays : Maps a variable's name to the source text of its subarray specification
+                  (e.g. "[0:n]"), for the variables that were given as subarrays.
+    """
+    __slots__ = ("vars", "operators", "subarrays")
+
+    def __init__(self, operator: str, vars: [str], subarrays=None):
+        self.vars = list(vars)
+        self.operators = {v: operator for v in self.vars}
+        self.subarrays = dict(subarrays) if subarrays else {}
+
+    def __str__(self):
+        return "{}".format(["{}:{}{}".format(self.operators[v], v, self.subarrays.get(v, "")) for v in self.vars])
+
+    def extend(self, other):
+        """
+        Adds the variables from another reduction clause to this one.
+        """
+        self.vars.extend(v for v in other.vars if v not in self.vars)
+        self.operators.update(other.operators)
+        self.subarrays.update(other.subarrays)
+
+def apply_reduction_clause(index, clause_list, node, dbg):
+    """
+    Records the reduction clause found at index in the clause_list in `node`,
+    merging it with any earlier reduction clause.
+
+    @return:                    The new index.
+    """
+    clause = clause_list[index]
+    _check_allowed("reduction", clause, node, dbg)
+    for var in clause.vars:
+        operator = node.reduction.operators.get(var.name) if node.reduction is not None else None
+        if operator not in (None, clause.modifier):
+            errmsg = "Variable {} is in reduction clauses with different operators, {} and {}.".format(var.name, operator, clause.modifier)
+            raise errors.InvalidClauseError(dbg.build_message(errmsg))
+    subarrays = {var.name: var.subarray for var in clause.vars if var.bounds is not None}
+    reduction = ReductionClause(clause.modifier, [var.name for var in clause.vars], subarrays)
+    if node.reduction is None:
+        node.reduction = reduction
     else:
-        errmsg = "Clause either not allowed for this directive, or else it may be spelled incorrectly. Clause given: {}.".format(clause)
+        node.reduction.extend(reduction)
+    return _next_index(index, clause_list)
+
+def _check_allowed(clausename: str, clause, node, dbg):
+    """
+    Raises an InvalidClauseError if `node`'s construct does not take the clause `clausename`.
+    """
+    if not hasattr(node, clausename):
+        errmsg = "Clause not allowed on this construct: {}.".format(clause.text)
         raise errors.InvalidClauseError(dbg.build_message(errmsg))
 
+def _next_index(index, clause_list):
+    """
+    Returns the index of the clause after `index`, or -1 if there isn't one.
+    """
+    return index + 1 if index + 1 < len(clause_list) else -1
+
 def _async(index, clause_list, intermediate_rep, node, dbg):
     """
     The async clause is optional; see Section 2.16 Asynchronous Behavior for more information
     """
-    return -1
+    exprs = clause_list[index].exprs
+    node.async_ = AsyncClause(exprs[0] if exprs else None)
+    return _next_index(index, clause_list)
 
 def _wait(index, clause_list, intermediate_rep, node, dbg):
     """
     The wait clause is optional; see Section 2.16 Asynchronous Behavior for more information.
     """
-    return -1
+    node.wait = WaitClause(clause_list[index].exprs)
+    return _next_index(index, clause_list)
 
 def _num_gangs(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -72,7 +203,8 @@ def _num_gangs(index, clause_list, intermediate_rep, node, dbg):
     construct. The implementation may use a lower value than specified based on limitations imposed by
     the target architecture.
     """
-    return -1
+    node.num_gangs = clause_list[index].exprs[0]
+    return _next_index(index, clause_list)
 
 def _num_workers(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -85,7 +217,8 @@ def _num_workers(index, clause_list, intermediate_rep, node, dbg):
     implementation may use a different value than specified based on limitations imposed by the target
     architecture.
     """
-    return -1
+    node.num_workers = clause_list[index].exprs[0]
+    return _next_index(index, clause_list)
 
 def _vector_length(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -98,7 +231,8 @@ def _vector_length(index, clause_list, intermediate_rep, node, dbg):
     clause, as well as loops automatically vectorized by the compiler. The implementation may use a
     different value than specified based on limitations imposed by the target architecture.
     """
-    return -1
+    node.vector_length = clause_list[index].exprs[0]
+    return _next_index(index, clause_list)
 
 def _private(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -106,7 +240,8 @@ def _private(index, clause_list, intermediate_rep, node, dbg):
 
     It declares that a copy of each item on the list will be created for each gang.
     """
-    return -1
+    _check_allowed("private", clause_list[index], node, dbg)
+    return apply_data_clause("private", index, clause_list, node, dbg)
 
 def _firstprivate(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -116,7 +251,8 @@ def _firstprivate(index, clause_list, intermediate_rep, node, dbg):
     and that the copy will be initialized with the value of that item on the local thread when a
     parallel or serial construct is encountered.
     """
-    return -1
+    _check_allowed("firstprivate", clause_list[index], node, dbg)
+    return apply_data_clause("firstprivate", index, clause_list, node, dbg)
 
 def _reduction(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -164,7 +300,7 @@ def _reduction(index, clause_list, intermediate_rep, node, dbg):
     • If the reduction var is a composite variable, each member of the composite variable must be
       a supported datatype for the reduction operation.
     """
-    return -1
+    return apply_reduction_clause(index, clause_list, node, dbg)
 
 def _default(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -177,7 +313,8 @@ def _default(index, clause_list, intermediate_rep, node, dbg):
     variables used in the compute construct that have implicitly determined data attributes to be treated
     as if they appeared in a present clause.
     """
-    return -1
+    node.default = clause_list[index].exprs[0]
+    return _next_index(index, clause_list)
 
 def _if(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -187,7 +324,8 @@ def _if(index, clause_list, intermediate_rep, node, dbg):
     region will execute on the current device. When the condition in the if clause evaluates to False,
     the local thread will execute the region.
     """
-    return -1
+    node.if_ = clause_list[index].exprs[0]
+    return _next_index(index, clause_list)
 
 def _self(index, clause_list, intermediate_rep, node, dbg):
     """
@@ -202,4 +340,20 @@ def _self(index, clause_list, intermediate_rep, node, dbg):
     on the local device. When the condition in the self clause evaluates to False,
     the region will execute on the current device.
     """
-    return -1
+    exprs = clause_list[index].exprs
+    node.self_ = exprs[0] if exprs else "True"
+    return _next_index(index, clause_list)
+
+_CLAUSES = {
+    "async": _async,
+    "wait": _wait,
+    "num_gangs": _num_gangs,
+    "num_workers": _num_workers,
+    "vector_length": _vector_length,
+    "private": _private,
+    "firstprivate": _firstprivate,
+    "reduction": _reduction,
+    "default": _default,
+    "if": _if,
+    "self": _self,
+}
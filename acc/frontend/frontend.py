@@ -4,28 +4,37 @@ This is the front end's API.
 This module exposes all of the functions that should be used from the
 frontend by the acc module.
 """
+import acc.frontend.kernels.kernels as kernels
 import acc.frontend.loop.loop as loop
 import acc.frontend.parallel.parallel as parallel
-import acc.frontend.util.util as util
-import asttokens
-import re
+import acc.frontend.serial.serial as serial
+import acc.frontend.util.errors as errors
+import acc.frontend.util.grammar as grammar
+import acc.frontend.wait.wait as wait
 
-def parse_pragmas(src, *args, **kwargs):
+def parse_pragmas(intermediate_rep, *args, **kwargs):
     """
     Generator that yields pragmas one at a time from the function
-    given in `src`.
+    that `intermediate_rep` is for, along with their line numbers.
+
+    The function's source is only tokenized and parsed once, when the
+    IntermediateRepresentation is created (see acc.ir.srcindex).
     """
-    regexp = re.compile(r"^((\s)*#(\s)*(pragma)(\s)*(acc))")
-    for lineno, line in enumerate(src.splitlines()):
-        if regexp.match(line):
-            yield line, lineno
+    yield from intermediate_rep.pragmas()
 
-def accumulate_pragma(intermediate_rep, pragma, lineno, *args, **kwargs):
+def accumulate_pragma(intermediate_rep, pragma, lineno, dbg, *args, **kwargs):
     """
     Modifies `intermediate_rep` according to `pragma`.
+
+    The pragma is parsed by the (cached) grammar, and only the clauses that apply to
+    the current device type are applied.
     """
-    directive, clause_list = util.parse_pragma_to_directive_and_clauses(pragma)
-    _accumulate_pragma_helper(directive, clause_list, intermediate_rep, lineno, *args, **kwargs)
+    try:
+        parsed = grammar.parse_pragma(pragma)
+    except errors.InvalidClauseError as e:
+        raise errors.InvalidClauseError(dbg.build_message(str(e))) from None
+    clause_list = parsed.select(intermediate_rep.internal_control_vars.current_device_type)
+    _accumulate_pragma_helper(parsed.directive, clause_list, intermediate_rep, lineno, dbg, *args, **kwargs)
 
 def _accumulate_pragma_helper(directive, clause_list, intermediate_rep, lineno, dbg, *args, **kwargs):
     """
@@ -36,9 +45,9 @@ def _accumulate_pragma_helper(directive, clause_list, intermediate_rep, lineno,
     if directive  == "parallel":
         parallel.parallel(clause_list, intermediate_rep, lineno, dbg, *args, **kwargs)
     elif directive == "kernels":
-        pass
+        kernels.kernels(clause_list, intermediate_rep, lineno, dbg, *args, **kwargs)
     elif directive == "serial":
-        pass
+        serial.serial(clause_list, intermediate_rep, lineno, dbg, *args, **kwargs)
     elif directive == "data":
         pass
     elif directive == "enter":  # enter data
@@ -64,7 +73,7 @@ def _accumulate_pragma_helper(directive, clause_list, intermediate_rep, lineno,
     elif directive == "update":
         pass
     elif directive == "wait":
-        pass
+        wait.wait(clause_list, intermediate_rep, lineno, dbg, *args, **kwargs)
     elif directive == "routine":
         pass
     else:
@@ -68,13 +68,22 @@ data clauses are described in Section 2.7 Data Clauses. The device_type clause i
 Section 2.4 Device-Specific Clauses.
 """
 from acc.ir.intrep import IrNode
+import acc.frontend.commonclauses as commonclauses
+import acc.frontend.loop.loop as loop
+import acc.frontend.util.grammar as grammar
+import acc.ir.srcindex as srcindex
+import ast
 
 class KernelsNode(IrNode):
     """
     Node for the IntermediateRepresentation tree that is used for kernels constructs.
     """
-    def __init__(self, lineno: int):
-        super().__init__(lineno)
+    __slots__ = ("async_", "wait", "num_gangs", "num_workers", "vector_length", "device_type",
+                 "if_", "self_", "copy", "copyin", "copyout", "create", "no_create", "present",
+                 "deviceptr", "attach", "default")
+
+    def __init__(self, lineno: int, span: srcindex.Span = None):
+        super().__init__(lineno, span)
         self.async_ = None
         self.wait = None
         self.num_gangs = None
@@ -92,3 +101,138 @@ class KernelsNode(IrNode):
         self.deviceptr = None
         self.attach = None
         self.default = None
+
+    def __str__(self):
+        s  = "Kernels:\n"
+        s += "  async {}\n".format(self.async_)
+        s += "  wait {}\n".format(self.wait)
+        s += "  num_gangs {}\n".format(self.num_gangs)
+        s += "  num_workers {}\n".format(self.num_workers)
+        s += "  vector_length {}\n".format(self.vector_length)
+        s += "  device_type {}\n".format(self.device_type)
+        s += "  if {}\n".format(self.if_)
+        s += "  self {}\n".format(self.self_)
+        s += "  copy {}\n".format(self.copy)
+        s += "  copyin {}\n".format(self.copyin)
+        s += "  copyout {}\n".format(self.copyout)
+        s += "  create {}\n".format(self.create)
+        s += "  no_create {}\n".format(self.no_create)
+        s += "  present {}\n".format(self.present)
+        s += "  attach {}\n".format(self.attach)
+        s += "  default {}\n".format(self.default)
+
+        return s
+
+def kernels(clauses, intermediate_rep, lineno, dbg, *args, **kwargs):
+    """
+    Adds a KernelsNode for the kernels construct at `lineno` to the IR. See the module
+    docstring for the construct itself.
+
+    Each loop nest at the top level of the region becomes its own kernel. The loop nests that
+    have a loop construct get their LoopNode when that construct's pragma is accumulated; the
+    ones that do not are given a LoopNode with no clauses here, which (like every loop in a
+    kernels region without an independent or seq clause) is treated as if it had the auto
+    clause, so the auto-parallelization pass decides how to run it. Its line number is the
+    line of the `for`, since it has no pragma.
+    """
+    kernels_node = KernelsNode(lineno, intermediate_rep.get_source_span(lineno))
+    index = 0 if clauses else -1
+    while index != -1:
+        index = _apply_clause(index, clauses, intermediate_rep, kernels_node, dbg)
+    if not any(type(child) == loop.LoopNode for child in kernels_node.children):
+        for loop_node in _implicit_loop_nodes(kernels_node, intermediate_rep):
+            kernels_node.add_child(loop_node)
+    intermediate_rep.add_child(kernels_node)
+
+def _implicit_loop_nodes(kernels_node: KernelsNode, intermediate_rep) -> [loop.LoopNode]:
+    """
+    Returns a LoopNode for each for loop at the top level of the kernels region that
+    no loop construct governs.
+    """
+    if kernels_node.span is None:
+        return []
+    index = intermediate_rep.index
+    governed = set()
+    for lineno in index.pragmas:
+        if kernels_node.span.first <= lineno <= kernels_node.span.last and index.directives[lineno] == "loop":
+            region = index.region(lineno)
+            if region is not None:
+                governed.add(region[1])
+
+    loop_nodes = []
+    for first, last, stmt in index.statements(kernels_node.span.first, kernels_node.span.last):
+        if isinstance(stmt, ast.For) and last not in governed:
+            loop_nodes.append(loop.LoopNode(first, srcindex.Span(index, first, last, stmt)))
+    return loop_nodes
+
+def _apply_clause(index, clause_list, intermediate_rep, kernels_node, dbg):
+    """
+    Consumes however much of the clause list as necessary to apply the clause
+    found at index in the clause_list.
+
+    @param index:               The index into the clause_list of the clause we are
+                                interested in.
+
+    @param clause_list:         The list of the clauses (grammar.Clauses) that this clause is indexed in.
+
+    @param intermediate_rep:    The intermediate representation, filled with information
+                                about the source code in general, but not yet this node.
+
+    @param kernels_node:        The node who's information we are filling in with the clauses.
+
+    @return:                    The new index. If there are no more
+                                clauses after this one is done, index will be -1.
+    """
+    apply = _CLAUSES.get(clause_list[index].name, commonclauses.apply_clause)
+    return apply(index, clause_list, intermediate_rep, kernels_node, dbg)
+
+def _loop(index: int, clause_list: [grammar.Clause], intermediate_rep, kernels_node: KernelsNode, dbg):
+    """
+    A kernels construct can be combined with a loop construct by
+    the following:
+
+    `#pragma acc kernels loop etc`
+
+    As with `parallel loop`, the kernels region is then the single loop after the pragma,
+    and the loop node and the kernels node share the same span.
+    """
+    loop_node = loop.LoopNode(kernels_node.lineno, kernels_node.span)
+
+    # The rest of the clauses may belong to either the loop or the kernels construct
+    index = index + 1 if index + 1 < len(clause_list) else -1
+    while index != -1:
+        if loop.is_loop_clause(clause_list[index]):
+            index = loop.apply_clause(index, clause_list, intermediate_rep, loop_node, dbg, hybrid='kernels')
+        else:
+            index = _apply_clause(index, clause_list, intermediate_rep, kernels_node, dbg)
+    kernels_node.add_child(loop_node)
+    return index
+
+def _device_type(index, clause_list, intermediate_rep, kernels_node, dbg):
+    """
+    The device_type clause names the device types that the clauses after it apply to.
+    The clauses for other device types have already been left out of the clause list
+    (see grammar.Pragma.select), so all that is left to do is to record it.
+    """
+    kernels_node.device_type = clause_list[index].exprs
+    return index + 1 if index + 1 < len(clause_list) else -1
+
+def _data_clause(clausename: str):
+    """
+    Returns the handler for the data clause `clausename` (see commonclauses.apply_data_clause).
+    """
+    def apply(index, clause_list, intermediate_rep, kernels_node, dbg):
+        return commonclauses.apply_data_clause(clausename, index, clause_list, kernels_node, dbg)
+    return apply
+
+_CLAUSES = {
+    "loop": _loop,
+    "device_type": _device_type,
+    "dtype": _device_type,
+    "copy": _data_clause("copy"),
+    "copyin": _data_clause("copyin"),
+    "copyout": _data_clause("copyout"),
+    "create": _data_clause("create"),
+    "no_create": _data_clause("no_create"),
+    "present": _data_clause("present"),
+}
@@ -4,22 +4,33 @@ This module contains the 'collapse' clause's AST visitor for the 'loop' construc
 import ast
 import acc.frontend.util.errors as errors
 import acc.frontend.util.util as util
+import acc.ir.srcindex as srcindex
 
 class Loop:
     """
     Collection of data for loops, including source code and variables of interest.
+    Both are worked out from the loop's span of the source when they are asked for.
     """
-    def __init__(self, src: str, variables: []):
-        self.src = src
-        self.variables = list(variables)
+    __slots__ = ("span",)
+
+    def __init__(self, span: srcindex.Span):
+        self.span = span
+
+    @property
+    def src(self) -> str:
+        return util.left_strip_src(self.span.text)
+
+    @property
+    def variables(self) -> [str]:
+        return list(set(util.get_variables_from_source(self.src)))
 
 class CollapseVisitor(ast.NodeVisitor):
     """
-    This class gets all the loops in a batch of source code.
+    This class gets all the loops in an already parsed statement.
     """
-    def __init__(self, atok):
+    def __init__(self, index: srcindex.SourceIndex):
         self.loops = []
-        self.atok = atok
+        self.index = index
 
     def generic_visit(self, node):
         type_name = type(node).__name__
@@ -28,10 +39,9 @@ class CollapseVisitor(ast.NodeVisitor):
             # TODO: We currently do not support parallelization of comprehensions
             pass
         elif type_name == "For":
-            for_src = self.atok.get_text(node)
-            ls_for_src = util.left_strip_src(for_src)
-            loop_vars = list(set(util.get_variables_from_source(ls_for_src)))
-            self.loops.append(Loop(ls_for_src, loop_vars))
+            # Before Python 3.8, the index marked the nodes with asttokens instead
+            last = node.end_lineno if getattr(node, "end_lineno", None) is not None else node.last_token.end[0]
+            self.loops.append(Loop(srcindex.Span(self.index, node.lineno - 1, last - 1, node)))
 
         ast.NodeVisitor.generic_visit(self, node)
 
@@ -57,15 +67,18 @@ class CollapseClause:
     It is implementation-defined whether a gang, worker or vector clause on the construct is
     applied to each loop, or to the linearized iteration space.
     """
+    __slots__ = ("loops",)
+
     def __init__(self, v: CollapseVisitor, n: int, dbg: errors.Debug):
         """
         Args
         ----
-        v : The CollapseVisitor that has walked the src tree.
+        v : The CollapseVisitor that has walked the loop's statement.
         n : The number of loops to collapse.
         """
-        # First check if there are the required number of loops
-        if len(v.loops) != n:
+        # First check if there are the required number of loops (the visitor also finds
+        # any loops nested deeper than the collapsed ones)
+        if len(v.loops) < n:
             plural = "loop" if n == 1 else "loops"
             raise SyntaxError(dbg.build_message("Clause specifies {} {}, but {} found.").format(n, plural, len(v.loops)))
 
@@ -0,0 +1,22 @@
+"""
+Gang clause
+"""
+
+class GangClause:
+    """
+    Items
+    -----
+
+    - num    : The source text of the number of gangs to use for the loop, or None.
+    - static : The source text of the static chunk size ("*" to let the implementation choose), or None.
+    - dim    : The source text of the dim argument, or None.
+    """
+    __slots__ = ("num", "static", "dim")
+
+    def __init__(self, num: str, static: str, dim: str):
+        self.num = num
+        self.static = static
+        self.dim = dim
+
+    def __str__(self):
+        return "num: {}, static: {}, dim: {}".format(self.num, self.static, self.dim)
@@ -5,7 +5,9 @@ Vector clause
 class VectorClause:
     """
     """
-    def __init__(self, length: int):
+    __slots__ = ("length",)
+
+    def __init__(self, length: str):
         self.length = length
 
     def __str__(self):
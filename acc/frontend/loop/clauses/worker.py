@@ -3,7 +3,9 @@ Worker clause
 """
 
 class WorkerClause:
-    def __init__(self, num_workers: int):
+    __slots__ = ("num_workers",)
+
+    def __init__(self, num_workers: str):
         """
         """
         if num_workers is None:
@@ -4,34 +4,42 @@ Module for the loop directive.
 Provides one API function: loop
 """
 import acc.ir.intrep as intrep
+import acc.ir.srcindex as srcindex
 import acc.frontend.util.errors as errors
+import acc.frontend.commonclauses as commonclauses
 import acc.frontend.loop.clauses.collapse as collapse
+import acc.frontend.loop.clauses.gang as gang
 import acc.frontend.loop.clauses.worker as worker
 import acc.frontend.loop.clauses.vector as vector
 import acc.frontend.kernels.kernels as kernels
 import acc.frontend.parallel.parallel as parallel
-import acc.frontend.util.util as util
+import acc.frontend.util.grammar as grammar
 import ast
-import asttokens
-import re
 
 class LoopNode(intrep.IrNode):
     """
     Node for the IntermediateRepresentation tree that is used for loop constructs.
     """
-    def __init__(self, lineno: int, src: str):
-        super().__init__(lineno, src)
+    __slots__ = ("collapse", "gang", "worker", "vector", "seq", "auto", "tile", "device_type",
+                 "independent", "private", "reduction", "nofuse", "schedule", "decision", "fused")
+
+    def __init__(self, lineno: int, span: srcindex.Span):
+        super().__init__(lineno, span)
         self.collapse = None        # clauses.collapse.CollapseClause
-        self.gang = None
+        self.gang = None            # clauses.gang.GangClause
         self.worker = None          # clauses.worker.WorkerClause
         self.vector = None          # clauses.vector.VectorClause
         self.seq = None
         self.auto = None
-        self.tile = None
+        self.tile = None            # The source text of each size-expr
         self.device_type = None
         self.independent = None
-        self.private = None
-        self.reduction = None
+        self.private = None         # commonclauses.DataClause
+        self.reduction = None       # commonclauses.ReductionClause
+        self.nofuse = None
+        self.schedule = None        # "seq", "gang", "worker" or "vector", once decided for an auto loop
+        self.decision = None        # Why the schedule was chosen; see acc.ir.passes.autopar.Decision
+        self.fused = []             # The LoopNodes of the loops that were fused into this one, in order; see acc.ir.passes.fusion
 
     def __str__(self):
         s  = "Loop:\n"
@@ -46,6 +54,9 @@ class LoopNode(intrep.IrNode):
         s += "  independent {}\n".format(self.independent)
         s += "  private {}\n".format(self.private)
         s += "  reduction {}\n".format(self.reduction)
+        s += "  nofuse {}\n".format(self.nofuse)
+        s += "  schedule {}\n".format(self.schedule)
+        s += "  fused {}\n".format([node.lineno for node in self.fused])
         return s
 
 def loop(clauses: [str], intermediate_rep: intrep.IntermediateRepresentation, lineno: int, dbg, *args, **kwargs):
@@ -80,6 +91,7 @@ def loop(clauses: [str], intermediate_rep: intrep.IntermediateRepresentation, li
     - independent
     - private( var-list )
     - reduction( operator:var-list )
+    - nofuse (not in the standard; see acc.ir.passes.fusion)
 
     where gang-arg is one of:
 
@@ -108,13 +120,20 @@ def loop(clauses: [str], intermediate_rep: intrep.IntermediateRepresentation, li
     - A loop associated with a loop construct that does not have a seq clause must be written
       such that the loop iteration count is computable when entering the loop construct.
     """
-    src = intermediate_rep.get_source_region(lineno)
-    loop_node = LoopNode(lineno, src)
-    index = 0
+    loop_node = LoopNode(lineno, intermediate_rep.get_source_span(lineno))
+    index = 0 if clauses else -1
     while index != -1:
         index = apply_clause(index, clauses, intermediate_rep, loop_node, dbg)
     intermediate_rep.add_child(loop_node)
 
+def is_loop_clause(clause: grammar.Clause) -> bool:
+    """
+    Returns True if `clause` is one of the loop construct's clauses. Used by the
+    combined constructs (e.g., `parallel loop`) to decide which construct a clause
+    belongs to.
+    """
+    return clause.name in _CLAUSES
+
 def apply_clause(index, clause_list, intermediate_rep, loop_node, dbg, hybrid=None):
     """
     Consumes however much of the clause list as necessary to apply the clause
@@ -123,7 +142,7 @@ def apply_clause(index, clause_list, intermediate_rep, loop_node, dbg, hybrid=No
     @param index:               The index into the clause_list of the clause we are
                                 interested in.
 
-    @param clause_list:         The list of the clauses that this clause is indexed in.
+    @param clause_list:         The list of the clauses (grammar.Clauses) that this clause is indexed in.
 
     @param intermediate_rep:    The intermediate representation, filled with information
                                 about the source code in general, but not yet this node.
@@ -136,33 +155,11 @@ def apply_clause(index, clause_list, intermediate_rep, loop_node, dbg, hybrid=No
     @return:                    The new index. If there are no more
                                 clauses after this one is done, index will be -1.
     """
-    args = (index, clause_list, intermediate_rep, loop_node, dbg, hybrid)
     clause = clause_list[index]
-    if   clause.startswith("collapse"):
-        return _collapse(*args)
-    elif clause.startswith("gang"):
-        return _gang(*args)
-    elif clause.startswith("worker"):
-        return _worker(*args)
-    elif clause.startswith("vector"):
-        return _vector(*args)
-    elif clause.startswith("seq"):
-        return _seq(*args)
-    elif clause.startswith("auto"):
-        return _auto(*args)
-    elif clause.startswith("tile"):
-        return _tile(*args)
-    elif clause.startswith("device_type"):
-        return _device_type(*args)
-    elif clause.startswith("independent"):
-        return _independent(*args)
-    elif clause.startswith("private"):
-        return _private(*args)
-    elif clause.startswith("reduction"):
-        return _reduction(*args)
-    else:
-        errmsg = "Clause either not allowed for this directive, or else it may be spelled incorrectly. Clause given: {}.".format(clause)
+    if clause.name not in _CLAUSES:
+        errmsg = "Clause either not allowed for this directive, or else it may be spelled incorrectly. Clause given: {}.".format(clause.text)
         raise errors.InvalidClauseError(dbg.build_message(errmsg))
+    return _CLAUSES[clause.name](index, clause_list, intermediate_rep, loop_node, dbg, hybrid)
 
 def _collapse(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
@@ -177,23 +174,14 @@ def _collapse(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     It is implementation-defined whether a gang, worker or vector clause on the construct is
     applied to each loop, or to the linearized iteration space.
     """
-    # Regex:
-    # "collapse" followed by any whitespace, followed by (, followed by at least one digit, then
-    # optional whitespace, then )
-    regexp = re.compile(r"collapse(\s)*\((\s)*(\d)+(\s)*\)")
-    if regexp.match(clause_list[index]):
-        n_plus_rest = clause_list[index].split("(")[-1]
-        n = int(n_plus_rest.split(")")[0].strip())
-    else:
-        raise SyntaxError(dbg.build_message("Collapse requires a constant integer argument."))
-
-    # Collect the necessary information from the source region
-    possible_source = "\n".join(intermediate_rep.src.splitlines()[loop_node.lineno + 1:])
-    possible_source = util.left_strip_src(possible_source)
-    atok = asttokens.ASTTokens(possible_source, parse=True)
-    v = collapse.CollapseVisitor(atok)
-    tree = atok.tree
-    v.visit(tree)
+    # The grammar has already checked that the argument is a constant positive integer
+    n = int(clause_list[index].exprs[0])
+
+    # Collect the necessary information from the loop's statement, which the front end has already parsed
+    if loop_node.span is None or loop_node.span.node is None:
+        raise SyntaxError(dbg.build_message("Collapse requires a loop after the pragma."))
+    v = collapse.CollapseVisitor(loop_node.span.index)
+    v.visit(loop_node.span.node)
 
     # Annotate the loop node with the collapse clause's information
     loop_node.collapse = collapse.CollapseClause(v, n, dbg)
@@ -230,7 +218,10 @@ def _gang(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     same kernels region with the same number of iterations, the same number of gangs to use, and with
     static clauses with the same argument, will assign the iterations to gangs in the same manner.
     """
-    return -1
+    # Gang clause: "gang [( gang-arg-list )]"; the grammar gives every gang-arg its keyword
+    keywords = dict(clause_list[index].keywords)
+    loop_node.gang = gang.GangClause(keywords.get("num"), keywords.get("static"), keywords.get("dim"))
+    return index + 1 if index + 1 < len(clause_list) else -1
 
 def _worker(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
@@ -253,8 +244,9 @@ def _worker(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     All workers will complete execution of their assigned iterations before any worker proceeds beyond
     the end of the loop.
     """
-    # Parse worker clause: "worker [(int-expr)]"
-    num_workers = util.parse_clause_with_parens("worker", clause_list[index], dbg)
+    # Worker clause: "worker [( [num:]int-expr )]"
+    exprs = clause_list[index].exprs
+    num_workers = exprs[0] if exprs else None
 
     # If the loop_node is part of a parallel (or nothing), no argument is allowed.
     ancestors = [n for n in intermediate_rep.get_ancestors(loop_node)]
@@ -299,8 +291,9 @@ def _vector(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     All vector lanes will complete execution of their assigned iterations before any vector lane proceeds
     beyond the end of the loop.
     """
-    # Parse worker clause: "vector [(int-expr)]"
-    veclength = util.parse_clause_with_parens("vector", clause_list[index], dbg)
+    # Vector clause: "vector [( [length:]int-expr )]"
+    exprs = clause_list[index].exprs
+    veclength = exprs[0] if exprs else None
 
     # If the loop_node is part of a kernels construct the argument is allowed
     # only when the kernels construct does not already contain a vector_length clause
@@ -322,7 +315,9 @@ def _seq(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     The seq clause specifies that the associated loop or loops are to be executed sequentially by the
     accelerator. This clause will override any automatic parallelization or vectorization.
     """
-    return -1
+    _check_exclusive(clause_list[index], loop_node, dbg)
+    loop_node.seq = True
+    return index + 1 if index + 1 < len(clause_list) else -1
 
 def _auto(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
@@ -332,8 +327,22 @@ def _auto(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     parallelism it can apply by the presence of loop constructs with gang, worker. or vector
     clauses for outer or inner loops. When the parent compute construct is a kernels construct, a
     loop construct with no independent or seq clause is treated as if it has the auto clause.
+
+    The analysis and the selection are done by the auto-parallelization pass (acc.ir.passes.autopar),
+    once the whole function has been parsed.
+    """
+    _check_exclusive(clause_list[index], loop_node, dbg)
+    loop_node.auto = True
+    return index + 1 if index + 1 < len(clause_list) else -1
+
+def _nofuse(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
+    """
+    The nofuse clause is not part of the OpenACC standard. It keeps the loop from being
+    fused with the loops next to it by the loop fusion pass (acc.ir.passes.fusion),
+    so that it is always launched on its own.
     """
-    return -1
+    loop_node.nofuse = True
+    return index + 1 if index + 1 < len(clause_list) else -1
 
 def _tile(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
@@ -354,14 +363,18 @@ def _tile(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     loops. If the worker clause appears on the loop construct, the worker clause is applied to the
     element loops if no vector clause appears, and to the tile loops otherwise.
     """
-    return -1
+    loop_node.tile = list(clause_list[index].exprs)
+    return index + 1 if index + 1 < len(clause_list) else -1
 
 def _device_type(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
     The 'device_type' clause is described in Section 2.4 Device-Specific
-    Clauses.
+    Clauses. The clauses for other device types have already been left out of
+    the clause list (see grammar.Pragma.select), so all that is left to do is
+    to record it.
     """
-    return -1
+    loop_node.device_type = clause_list[index].exprs
+    return index + 1 if index + 1 < len(clause_list) else -1
 
 def _independent(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
@@ -376,7 +389,9 @@ def _independent(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     writes to a variable or array element that any other iteration also writes or reads, except for
     vars in a reduction clause or accesses in atomic regions.
     """
-    return -1
+    _check_exclusive(clause_list[index], loop_node, dbg)
+    loop_node.independent = True
+    return index + 1 if index + 1 < len(clause_list) else -1
 
 def _private(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
@@ -387,7 +402,7 @@ def _private(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     associated with all the vector lanes of each worker. Otherwise, a copy of the item is created for and
     shared across the set of threads associated with all the vector lanes of all the workers of each gang.
     """
-    return -1
+    return commonclauses.apply_data_clause("private", index, clause_list, loop_node, dbg)
 
 def _reduction(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     """
@@ -425,4 +440,30 @@ def _reduction(index, clause_list, intermediate_rep, loop_node, dbg, hybrid):
     • See Section 2.17 Fortran Optional Arguments for discussion of Fortran optional arguments in
     reduction clauses.
     """
-    return -1
+    return commonclauses.apply_reduction_clause(index, clause_list, loop_node, dbg)
+
+def _check_exclusive(clause, loop_node, dbg):
+    """
+    Only one of the seq, independent, and auto clauses may appear on a loop construct
+    (for any one device type).
+    """
+    given = [name for name in ("seq", "independent", "auto") if getattr(loop_node, name)]
+    if given:
+        err_msg = dbg.build_message("Only one of the seq, independent, and auto clauses may appear on a loop construct, but found {} and {}.".format(given[0], clause.name))
+        raise errors.InvalidClauseError(err_msg)
+
+_CLAUSES = {
+    "collapse": _collapse,
+    "gang": _gang,
+    "worker": _worker,
+    "vector": _vector,
+    "seq": _seq,
+    "auto": _auto,
+    "tile": _tile,
+    "device_type": _device_type,
+    "dtype": _device_type,
+    "independent": _independent,
+    "private": _private,
+    "reduction": _reduction,
+    "nofuse": _nofuse,
+}
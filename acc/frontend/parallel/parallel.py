@@ -1,5 +1,7 @@
 import acc.frontend.commonclauses as commonclauses
+import acc.frontend.util.grammar as grammar
 import acc.ir.intrep as intrep
+import acc.ir.srcindex as srcindex
 import acc.frontend.loop.loop as loop
 import ast
 import asttokens
@@ -8,10 +10,14 @@ class ParallelNode(intrep.IrNode):
     """
     Node for the IntermediateRepresentation tree that is used for parallel constructs.
 
-    The src string should be the source code that this node applies to.
+    The span should be the region of source code that this node applies to.
     """
-    def __init__(self, lineno: int, src: str):
-        super().__init__(lineno, src)
+    __slots__ = ("async_", "wait", "num_gangs", "num_workers", "vector_length", "device_type",
+                 "if_", "self_", "reduction", "copy", "copyin", "copyout", "create", "no_create",
+                 "present", "deviceptr", "attach", "private", "firstprivate", "default")
+
+    def __init__(self, lineno: int, span: srcindex.Span):
+        super().__init__(lineno, span)
         self.async_ = None
         self.wait = None
         self.num_gangs = None
@@ -141,9 +147,8 @@ def parallel(clauses, intermediate_rep, lineno, dbg, *args, **kwargs):
 
     The device_type clause is described in Section 2.4 Device-Specific Clauses.
     """
-    src = intermediate_rep.get_source_region(lineno)
-    parallel_node = ParallelNode(lineno, src)
-    index = 0
+    parallel_node = ParallelNode(lineno, intermediate_rep.get_source_span(lineno))
+    index = 0 if clauses else -1
     while index != -1:
         index = _apply_clause(index, clauses, intermediate_rep, parallel_node, dbg)
     intermediate_rep.add_child(parallel_node)
@@ -156,7 +161,7 @@ def _apply_clause(index, clause_list, intermediate_rep, parallel_node, dbg):
     @param index:               The index into the clause_list of the clause we are
                                 interested in.
 
-    @param clause_list:         The list of the clauses that this clause is indexed in.
+    @param clause_list:         The list of the clauses (grammar.Clauses) that this clause is indexed in.
 
     @param intermediate_rep:    The intermediate representation, filled with information
                                 about the source code in general, but not yet this node.
@@ -167,32 +172,10 @@ def _apply_clause(index, clause_list, intermediate_rep, parallel_node, dbg):
                                 clauses after this one is done, index will be -1.
 
     """
-    args = (index, clause_list, intermediate_rep, parallel_node, dbg)
-    clause = clause_list[index]
-    if   clause.startswith("loop"):
-        return _loop(*args)
-    elif clause.startswith("device_type"):
-        return _device_type(*args)
-    elif clause.startswith("copy"):
-        return _copy(*args)
-    elif clause.startswith("copyin"):
-        return _copyin(*args)
-    elif clause.startswith("copyout"):
-        return _copyout(*args)
-    elif clause.startswith("create"):
-        return _create(*args)
-    elif clause.startswith("no_create"):
-        return _no_create(*args)
-    elif clause.startswith("present"):
-        return _present(*args)
-    elif clause.startswith("deviceptr"):
-        return _deviceptr(*args)
-    elif clause.startswith("attach"):
-        return _attach(*args)
-    else:
-        return commonclauses.apply_clause(*args)
-
-def _loop(index: int, clause_list: [str], intermediate_rep: intrep.IntermediateRepresentation, parallel_node: ParallelNode, dbg):
+    apply = _CLAUSES.get(clause_list[index].name, commonclauses.apply_clause)
+    return apply(index, clause_list, intermediate_rep, parallel_node, dbg)
+
+def _loop(index: int, clause_list: [grammar.Clause], intermediate_rep: intrep.IntermediateRepresentation, parallel_node: ParallelNode, dbg):
     """
     A parallel construct can be combined with a loop construct by
     the following:
@@ -205,56 +188,72 @@ def _loop(index: int, clause_list: [str], intermediate_rep: intrep.IntermediateR
     as if we were parsing a loop node.
 
     Once we return from this function, the parallel node will get
-    added to the IR tree, along with its child.
+    added to the IR tree, along with its child. Both nodes govern the same loop,
+    so they share the same span.
     """
-    src = intermediate_rep.get_source_region(parallel_node.lineno)
-    loop_node = loop.LoopNode(parallel_node.lineno, src)
+    loop_node = loop.LoopNode(parallel_node.lineno, parallel_node.span)
 
+    # The rest of the clauses may belong to either the loop or the parallel construct
     index = index + 1 if index + 1 < len(clause_list) else -1
-    if index == -1:
-        parallel_node.add_child(loop_node)
-        return index
-    else:
-        while index != -1:
+    while index != -1:
+        if loop.is_loop_clause(clause_list[index]):
             index = loop.apply_clause(index, clause_list, intermediate_rep, loop_node, dbg, hybrid='parallel')
-        parallel_node.add_child(loop_node)
-        assert index == -1
-        return index
+        else:
+            index = _apply_clause(index, clause_list, intermediate_rep, parallel_node, dbg)
+    parallel_node.add_child(loop_node)
+    return index
 
 def _device_type(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
+    The device_type clause names the device types that the clauses after it apply to.
+    The clauses for other device types have already been left out of the clause list
+    (see grammar.Pragma.select), so all that is left to do is to record it.
     """
-    return -1
+    parallel_node.device_type = clause_list[index].exprs
+    return index + 1 if index + 1 < len(clause_list) else -1
 
 def _copy(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
+    The copy clause specifies that the vars need to be copied to the device memory upon
+    entry to the region and back to local memory upon exit.
     """
-    return -1
+    return commonclauses.apply_data_clause("copy", index, clause_list, parallel_node, dbg)
 
 def _copyin(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
+    The copyin clause specifies that the vars need to be copied to the device memory upon
+    entry to the region, but not back. With the readonly modifier, the vars are never
+    written to in the region.
     """
-    return -1
+    return commonclauses.apply_data_clause("copyin", index, clause_list, parallel_node, dbg)
 
 def _copyout(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
+    The copyout clause specifies that the vars need to be allocated (but not initialized)
+    in device memory upon entry to the region and copied back to local memory upon exit.
     """
-    return -1
+    return commonclauses.apply_data_clause("copyout", index, clause_list, parallel_node, dbg)
 
 def _create(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
+    The create clause specifies that the vars need to be allocated (but not initialized)
+    in device memory for the region, and are not copied in either direction.
     """
-    return -1
+    return commonclauses.apply_data_clause("create", index, clause_list, parallel_node, dbg)
 
 def _no_create(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
+    The no_create clause specifies that the vars are used from device memory if they are
+    already present there, and from local memory otherwise.
     """
-    return -1
+    return commonclauses.apply_data_clause("no_create", index, clause_list, parallel_node, dbg)
 
 def _present(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
+    The present clause specifies that the vars are already present in device memory,
+    because of an enclosing data region or an enter data directive.
     """
-    return -1
+    return commonclauses.apply_data_clause("present", index, clause_list, parallel_node, dbg)
 
 def _deviceptr(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
@@ -265,3 +264,17 @@ def _attach(index, clause_list, intermediate_rep, parallel_node, dbg):
     """
     """
     return -1
+
+_CLAUSES = {
+    "loop": _loop,
+    "device_type": _device_type,
+    "dtype": _device_type,
+    "copy": _copy,
+    "copyin": _copyin,
+    "copyout": _copyout,
+    "create": _create,
+    "no_create": _no_create,
+    "present": _present,
+    "deviceptr": _deviceptr,
+    "attach": _attach,
+}
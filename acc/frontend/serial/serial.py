@@ -68,3 +68,150 @@ data clauses are described in Section 2.7 Data Clauses. The private and firstpri
 clauses are described in Sections 2.5.11 and Sections 2.5.12. The device_type clause is
 described in Section 2.4 Device-Specific Clauses
 """
+import acc.frontend.commonclauses as commonclauses
+import acc.frontend.loop.loop as loop
+import acc.frontend.util.errors as errors
+import acc.frontend.util.grammar as grammar
+import acc.ir.intrep as intrep
+import acc.ir.srcindex as srcindex
+
+class SerialNode(intrep.IrNode):
+    """
+    Node for the IntermediateRepresentation tree that is used for serial constructs.
+
+    The span should be the region of source code that this node applies to.
+    """
+    __slots__ = ("async_", "wait", "device_type", "if_", "self_", "reduction", "copy", "copyin",
+                 "copyout", "create", "no_create", "present", "deviceptr", "private",
+                 "firstprivate", "attach", "default")
+
+    def __init__(self, lineno: int, span: srcindex.Span):
+        super().__init__(lineno, span)
+        self.async_ = None
+        self.wait = None
+        self.device_type = None
+        self.if_ = None
+        self.self_ = None
+        self.reduction = None
+        self.copy = None
+        self.copyin = None
+        self.copyout = None
+        self.create = None
+        self.no_create = None
+        self.present = None
+        self.deviceptr = None
+        self.private = None
+        self.firstprivate = None
+        self.attach = None
+        self.default = None
+
+    def __str__(self):
+        s  = "Serial:\n"
+        s += "  async {}\n".format(self.async_)
+        s += "  wait {}\n".format(self.wait)
+        s += "  device_type {}\n".format(self.device_type)
+        s += "  if {}\n".format(self.if_)
+        s += "  self {}\n".format(self.self_)
+        s += "  reduction {}\n".format(self.reduction)
+        s += "  copy {}\n".format(self.copy)
+        s += "  copyin {}\n".format(self.copyin)
+        s += "  copyout {}\n".format(self.copyout)
+        s += "  create {}\n".format(self.create)
+        s += "  no_create {}\n".format(self.no_create)
+        s += "  present {}\n".format(self.present)
+        s += "  private {}\n".format(self.private)
+        s += "  firstprivate {}\n".format(self.firstprivate)
+        s += "  attach {}\n".format(self.attach)
+        s += "  default {}\n".format(self.default)
+
+        return s
+
+def serial(clauses, intermediate_rep, lineno, dbg, *args, **kwargs):
+    """
+    Adds a SerialNode for the serial construct at `lineno` to the IR. See the module
+    docstring for the construct itself.
+
+    Since a serial region runs on a single gang of a single worker with a vector length
+    of one, every loop in it runs sequentially.
+    """
+    serial_node = SerialNode(lineno, intermediate_rep.get_source_span(lineno))
+    index = 0 if clauses else -1
+    while index != -1:
+        index = _apply_clause(index, clauses, intermediate_rep, serial_node, dbg)
+    intermediate_rep.add_child(serial_node)
+
+def _apply_clause(index, clause_list, intermediate_rep, serial_node, dbg):
+    """
+    Consumes however much of the clause list as necessary to apply the clause
+    found at index in the clause_list.
+
+    @param index:               The index into the clause_list of the clause we are
+                                interested in.
+
+    @param clause_list:         The list of the clauses (grammar.Clauses) that this clause is indexed in.
+
+    @param intermediate_rep:    The intermediate representation, filled with information
+                                about the source code in general, but not yet this node.
+
+    @param serial_node:         The node who's information we are filling in with the clauses.
+
+    @return:                    The new index. If there are no more
+                                clauses after this one is done, index will be -1.
+    """
+    clause = clause_list[index]
+    if clause.name in ("num_gangs", "num_workers", "vector_length"):
+        errmsg = "Clause not allowed on the serial construct, which always runs on one gang of one worker: {}.".format(clause.text)
+        raise errors.InvalidClauseError(dbg.build_message(errmsg))
+    apply = _CLAUSES.get(clause.name, commonclauses.apply_clause)
+    return apply(index, clause_list, intermediate_rep, serial_node, dbg)
+
+def _loop(index: int, clause_list: [grammar.Clause], intermediate_rep, serial_node: SerialNode, dbg):
+    """
+    A serial construct can be combined with a loop construct by
+    the following:
+
+    `#pragma acc serial loop etc`
+
+    As with `parallel loop`, the serial region is then the single loop after the pragma,
+    and the loop node and the serial node share the same span.
+    """
+    loop_node = loop.LoopNode(serial_node.lineno, serial_node.span)
+
+    # The rest of the clauses may belong to either the loop or the serial construct
+    index = index + 1 if index + 1 < len(clause_list) else -1
+    while index != -1:
+        if loop.is_loop_clause(clause_list[index]):
+            index = loop.apply_clause(index, clause_list, intermediate_rep, loop_node, dbg, hybrid='serial')
+        else:
+            index = _apply_clause(index, clause_list, intermediate_rep, serial_node, dbg)
+    serial_node.add_child(loop_node)
+    return index
+
+def _device_type(index, clause_list, intermediate_rep, serial_node, dbg):
+    """
+    The device_type clause names the device types that the clauses after it apply to.
+    The clauses for other device types have already been left out of the clause list
+    (see grammar.Pragma.select), so all that is left to do is to record it.
+    """
+    serial_node.device_type = clause_list[index].exprs
+    return index + 1 if index + 1 < len(clause_list) else -1
+
+def _data_clause(clausename: str):
+    """
+    Returns the handler for the data clause `clausename` (see commonclauses.apply_data_clause).
+    """
+    def apply(index, clause_list, intermediate_rep, serial_node, dbg):
+        return commonclauses.apply_data_clause(clausename, index, clause_list, serial_node, dbg)
+    return apply
+
+_CLAUSES = {
+    "loop": _loop,
+    "device_type": _device_type,
+    "dtype": _device_type,
+    "copy": _data_clause("copy"),
+    "copyin": _data_clause("copyin"),
+    "copyout": _data_clause("copyout"),
+    "create": _data_clause("create"),
+    "no_create": _data_clause("no_create"),
+    "present": _data_clause("present"),
+}
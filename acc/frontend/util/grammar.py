@@ -0,0 +1,491 @@
+"""
+This module contains the grammar of OpenACC pragmas.
+
+A pragma is parsed into a `Pragma`: its directive and a tuple of typed `Clause`s.
+Each clause's argument is parsed according to the kind of argument that the
+clause takes in the spec:
+
+- var-lists, whose vars may be subarrays (`a[lower:length]`) and which may
+  start with a modifier (`copyin(readonly: a, b)`),
+- int-exprs and conditions, which are checked to be Python expressions, but
+  are kept as source text, since they may refer to variables that only exist
+  when the decorated function runs,
+- and the handful of clauses with an argument of their own shape (reduction,
+  wait, gang, tile, default, collapse, device_type).
+
+Clauses that follow a device_type clause only apply to the device types that it
+names (see `Pragma.select`).
+
+The regular expressions are compiled once, when this module is imported, and the
+pragmas are parsed once per distinct pragma text: `parse_pragma` caches its
+results, so that identical pragmas (in one function, or across functions) are only
+parsed the first time they are seen. The parsed objects are shared between the
+callers, so they must not be modified.
+"""
+import acc.frontend.util.errors as errors
+import ast
+import functools
+import re
+
+# How many distinct pragmas to keep the parse of
+DEFAULT_CACHE_SIZE = 1024
+
+# The kinds of clause argument
+NO_ARGUMENT = "no argument"
+OPTIONAL_EXPR = "optional expression"
+INT_EXPR = "int-expr"
+OPTIONAL_INT_EXPR = "optional int-expr"
+CONDITION = "condition"
+OPTIONAL_CONDITION = "optional condition"
+CONSTANT = "constant positive integer"
+VAR_LIST = "var-list"
+REDUCTION = "operator:var-list"
+WAIT = "wait-argument"
+GANG = "gang-arg-list"
+SIZE_LIST = "size-expr-list"
+DEVICE_TYPES = "device-type-list"
+DEFAULT = "none or present"
+NAME = "name"
+
+# Every clause in the spec, and the kind of argument it takes
+CLAUSES = {
+    "async": OPTIONAL_EXPR,
+    "wait": WAIT,
+    "num_gangs": INT_EXPR,
+    "num_workers": INT_EXPR,
+    "vector_length": INT_EXPR,
+    "device_type": DEVICE_TYPES,
+    "dtype": DEVICE_TYPES,
+    "if": CONDITION,
+    "self": OPTIONAL_CONDITION,
+    "if_present": NO_ARGUMENT,
+    "finalize": NO_ARGUMENT,
+    "default": DEFAULT,
+    "reduction": REDUCTION,
+    "copy": VAR_LIST,
+    "copyin": VAR_LIST,
+    "copyout": VAR_LIST,
+    "create": VAR_LIST,
+    "no_create": VAR_LIST,
+    "present": VAR_LIST,
+    "deviceptr": VAR_LIST,
+    "attach": VAR_LIST,
+    "detach": VAR_LIST,
+    "delete": VAR_LIST,
+    "private": VAR_LIST,
+    "firstprivate": VAR_LIST,
+    "host": VAR_LIST,
+    "device": VAR_LIST,
+    "use_device": VAR_LIST,
+    "device_resident": VAR_LIST,
+    "link": VAR_LIST,
+    "device_num": INT_EXPR,
+    "default_async": INT_EXPR,
+    "loop": NO_ARGUMENT,        # parallel loop, kernels loop, serial loop
+    "data": NO_ARGUMENT,        # enter data, exit data
+    "collapse": CONSTANT,
+    "gang": GANG,
+    "worker": OPTIONAL_INT_EXPR,
+    "vector": OPTIONAL_INT_EXPR,
+    "seq": NO_ARGUMENT,
+    "auto": NO_ARGUMENT,
+    "independent": NO_ARGUMENT,
+    "tile": SIZE_LIST,
+    "bind": NAME,
+    "nohost": NO_ARGUMENT,
+    "nofuse": NO_ARGUMENT,      # Not in the spec: keeps a loop out of loop fusion
+    "read": NO_ARGUMENT,        # atomic read, write, update, capture
+    "write": NO_ARGUMENT,
+    "update": NO_ARGUMENT,
+    "capture": NO_ARGUMENT,
+}
+
+# Clauses whose argument is different on some directives
+DIRECTIVE_CLAUSES = {
+    "update": {"self": VAR_LIST},
+}
+
+# The kind of argument that the directives which take one (e.g. "wait(1)") take
+DIRECTIVE_ARGUMENTS = {
+    "wait": WAIT,
+    "cache": VAR_LIST,
+    "routine": NAME,
+}
+
+# The modifiers that each clause allows at the start of its argument (e.g. "readonly:")
+MODIFIERS = {
+    "copyin": ("readonly",),
+    "copyout": ("zero",),
+    "create": ("zero",),
+    "cache": ("readonly",),
+    "collapse": ("force",),
+    "worker": ("num",),
+    "vector": ("length",),
+}
+
+# The clauses that may follow a device_type clause
+DEVICE_SPECIFIC_CLAUSES = ("async", "wait", "num_gangs", "num_workers", "vector_length",
+                           "collapse", "gang", "worker", "vector", "seq", "auto", "tile",
+                           "device_type", "dtype", "bind", "independent")
+
+# The reduction operators
+REDUCTION_OPERATORS = ("+", "*", "max", "min", "&", "|", "^", "&&", "||")
+
+_PREFIX = re.compile(r"^\s*#\s*pragma\s*acc\b")
+_NAME = re.compile(r"[\s,]*([A-Za-z_]\w*)\s*")
+_MODIFIER = re.compile(r"\s*([A-Za-z_]\w*)\s*:(?!:)")
+_REDUCTION = re.compile(r"\s*(&&|\|\||max|min|\+|\*|&|\||\^)\s*:(.*)$", re.DOTALL)
+_VAR = re.compile(r"\s*([A-Za-z_]\w*)\s*(?:\[(.*)\])?\s*$", re.DOTALL)
+_CONSTANT = re.compile(r"\s*(\d+)\s*$")
+_OPEN = "([{"
+_CLOSE = ")]}"
+
+class Var:
+    """
+    A var in a var-list.
+
+    Items
+    -----
+
+    - name   : The variable's name.
+    - bounds : None if the var is the whole variable. Otherwise, the var is a subarray, and this is
+               a tuple of (lower, length) pairs, one per dimension, of the source text of the
+               subarray's bounds; either may be None, meaning from the start and to the end.
+               An array element, `a[i]`, is the subarray `a[i:1]`.
+    """
+    __slots__ = ("name", "bounds")
+
+    def __init__(self, name: str, bounds=None):
+        self.name = name
+        self.bounds = bounds
+
+    def __repr__(self):
+        return self.name + (self.subarray or "")
+
+    @property
+    def subarray(self) -> str:
+        """
+        The source text of the subarray specification, e.g. "[0:n]", or None.
+        """
+        if self.bounds is None:
+            return None
+        dims = ["{}:{}".format(lower or "", length or "") for lower, length in self.bounds]
+        return "[{}]".format(", ".join(dims))
+
+class Clause:
+    """
+    A parsed clause.
+
+    Items
+    -----
+
+    - name         : The clause's name.
+    - text         : The clause's source text.
+    - modifier     : The modifier at the start of the argument (e.g. "readonly", "queues", or the
+                     reduction operator), or None.
+    - exprs        : The source text of each expression in the argument, in order. For device_type,
+                     the device types; for default, "none" or "present"; for collapse, the number.
+    - keywords     : (keyword, expression) pairs for the arguments given by keyword (gang's "num:",
+                     "static:" and "dim:", and wait's "devnum:").
+    - vars         : The vars of a var-list, as Vars.
+    - device_types : The device types that the clause applies to, if it follows a device_type
+                     clause, or None if it applies to all of them.
+    """
+    __slots__ = ("name", "text", "modifier", "exprs", "keywords", "vars", "device_types")
+
+    def __init__(self, name: str, text: str, modifier=None, exprs=(), keywords=(), vars=(), device_types=None):
+        self.name = name
+        self.text = text
+        self.modifier = modifier
+        self.exprs = tuple(exprs)
+        self.keywords = tuple(keywords)
+        self.vars = tuple(vars)
+        self.device_types = device_types
+
+    def __repr__(self):
+        return self.text
+
+class Pragma:
+    """
+    A parsed pragma.
+
+    Items
+    -----
+
+    - directive : The directive's name (the first word after "acc").
+    - clauses   : The clauses, in order, as Clauses. If the directive takes an argument (e.g. "wait(1)"),
+                  the argument is given as the first clause, which has the directive's name.
+    - text      : The pragma's source text.
+    """
+    __slots__ = ("directive", "clauses", "text")
+
+    def __init__(self, directive: str, clauses, text: str):
+        self.directive = directive
+        self.clauses = tuple(clauses)
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+    def select(self, device_type: str) -> [Clause]:
+        """
+        Returns the clauses that apply when running on `device_type`: the clauses that do not
+        follow a device_type clause, and those that follow one that names `device_type`, or
+        that is `device_type(*)` when no other device_type clause names `device_type`.
+        """
+        named = set()
+        for clause in self.clauses:
+            if clause.device_types is not None:
+                named.update(clause.device_types)
+
+        selected = []
+        for clause in self.clauses:
+            types = clause.device_types
+            if types is None or device_type in types or ("*" in types and device_type not in named):
+                selected.append(clause)
+        return selected
+
+def parse_directive(pragma: str) -> str:
+    """
+    Returns the directive of `pragma` without parsing its clauses, or None if it has none.
+    """
+    match = _NAME.match(pragma, _PREFIX.match(pragma).end())
+    return match.group(1) if match else None
+
+@functools.lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def parse_pragma(pragma: str) -> Pragma:
+    """
+    Parses `pragma` (a line of the form `# pragma acc directive clause list`) into a Pragma.
+    Raises an errors.InvalidClauseError (without any line information) if the pragma is not
+    valid. The result is cached: see the module docstring.
+    """
+    prefix = _PREFIX.match(pragma)
+    assert prefix, "Given pragma ({}) does not make sense for parsing into directives and clauses.".format(pragma)
+
+    scanned = list(_scan(pragma, prefix.end()))
+    if not scanned:
+        raise errors.InvalidClauseError("The pragma has no directive: {}".format(pragma))
+    directive, arg, _text = scanned[0]
+
+    clauses = []
+    if arg is not None:
+        if directive not in DIRECTIVE_ARGUMENTS:
+            raise errors.InvalidClauseError("The {} directive does not take an argument.".format(directive))
+        clauses.append(_parse_argument(directive, DIRECTIVE_ARGUMENTS[directive], arg, _text))
+
+    device_types = None
+    for name, arg, text in scanned[1:]:
+        kind = DIRECTIVE_CLAUSES.get(directive, {}).get(name, CLAUSES.get(name))
+        if kind is None:
+            raise errors.InvalidClauseError("Unrecognized clause: {}. It may be spelled incorrectly.".format(text))
+        if device_types is not None and name not in DEVICE_SPECIFIC_CLAUSES:
+            raise errors.InvalidClauseError("The {} clause may not follow a device_type clause.".format(name))
+
+        clause = _parse_argument(name, kind, arg, text)
+        if kind == DEVICE_TYPES:
+            device_types = clause.exprs
+        else:
+            clause.device_types = device_types
+        clauses.append(clause)
+    return Pragma(directive, clauses, pragma)
+
+def split_list(text: str) -> [str]:
+    """
+    Splits a comma-separated list of expressions, ignoring the commas inside
+    brackets, and returns the stripped, non-empty items.
+    """
+    return [item for item in _split_top_level(text, ",") if item]
+
+def _scan(pragma: str, pos: int):
+    """
+    Yields the (name, argument source text or None, source text) of each word of `pragma`
+    after `pos`: the directive, then the clauses. Clauses may be separated by whitespace
+    or commas.
+    """
+    while True:
+        match = _NAME.match(pragma, pos)
+        if not match:
+            rest = pragma[pos:].strip(" \t,")
+            if rest:
+                raise errors.InvalidClauseError("Could not parse the clauses: {}".format(rest))
+            return
+        start = match.start(1)
+        pos = match.end()
+        arg = None
+        if pos < len(pragma) and pragma[pos] == "(":
+            close = _matching_close(pragma, pos)
+            arg = pragma[pos + 1:close].strip()
+            pos = close + 1
+        yield match.group(1), arg, pragma[start:pos].strip()
+
+def _matching_close(text: str, pos: int) -> int:
+    """
+    Returns the index of the bracket that closes the one at `pos`, skipping over
+    any brackets nested in it and any string literals.
+    """
+    depth = 0
+    quote = None
+    for i in range(pos, len(text)):
+        c = text[i]
+        if quote is not None:
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c in _OPEN:
+            depth += 1
+        elif c in _CLOSE:
+            depth -= 1
+            if depth == 0:
+                return i
+    raise errors.InvalidClauseError("Unbalanced parentheses: {}".format(text[pos:]))
+
+def _split_top_level(text: str, separator: str) -> [str]:
+    """
+    Splits `text` on `separator`, except where it is inside brackets or a string literal,
+    and returns the stripped items.
+    """
+    items = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, c in enumerate(text):
+        if quote is not None:
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c in _OPEN:
+            depth += 1
+        elif c in _CLOSE:
+            depth -= 1
+        elif c == separator and depth == 0:
+            items.append(text[start:i].strip())
+            start = i + 1
+    items.append(text[start:].strip())
+    return items
+
+def _parse_argument(name: str, kind: str, arg: str, text: str) -> Clause:
+    """
+    Parses the argument `arg` (None if the clause has no parentheses) of the clause `name`,
+    which takes an argument of the given kind.
+    """
+    if kind == NO_ARGUMENT and arg is not None:
+        raise errors.InvalidClauseError("The {} clause does not take an argument.".format(name))
+    if kind in (INT_EXPR, CONDITION, CONSTANT, VAR_LIST, REDUCTION, SIZE_LIST, DEVICE_TYPES, DEFAULT, NAME) and not arg:
+        raise errors.InvalidClauseError("The {} clause requires a {} argument.".format(name, kind))
+    if not arg:
+        return Clause(name, text)
+
+    modifier = None
+    match = _MODIFIER.match(arg)
+    if match and match.group(1) in MODIFIERS.get(name, ()):
+        modifier = match.group(1)
+        arg = arg[match.end():]
+
+    if kind == VAR_LIST:
+        return Clause(name, text, modifier, vars=_parse_var_list(name, arg))
+    elif kind == REDUCTION:
+        match = _REDUCTION.match(arg)
+        if not match:
+            raise errors.InvalidClauseError("The reduction clause requires an operator, one of {}, and a var-list: {}".format(
+                " ".join(REDUCTION_OPERATORS), text))
+        return Clause(name, text, match.group(1), vars=_parse_var_list(name, match.group(2)))
+    elif kind == WAIT:
+        return _parse_wait(name, arg, text)
+    elif kind == GANG:
+        return _parse_gang(arg, text)
+    elif kind == CONSTANT:
+        match = _CONSTANT.match(arg)
+        if not match or int(match.group(1)) < 1:
+            raise errors.InvalidClauseError("The {} clause requires a constant positive integer argument.".format(name))
+        return Clause(name, text, modifier, exprs=(match.group(1),))
+    elif kind == DEVICE_TYPES:
+        types = split_list(arg)
+        for t in types:
+            if t != "*" and not t.isidentifier():
+                raise errors.InvalidClauseError("Invalid device type in {} clause: {}".format(name, t))
+        return Clause(name, text, exprs=types)
+    elif kind == DEFAULT:
+        if arg not in ("none", "present"):
+            raise errors.InvalidClauseError("The default clause must be default(none) or default(present).")
+        return Clause(name, text, exprs=(arg,))
+    elif kind == SIZE_LIST:
+        return Clause(name, text, exprs=[e if e == "*" else _expr(name, e) for e in split_list(arg)])
+    else:
+        # OPTIONAL_EXPR, INT_EXPR, OPTIONAL_INT_EXPR, CONDITION, OPTIONAL_CONDITION, NAME
+        return Clause(name, text, modifier, exprs=(_expr(name, arg),))
+
+def _parse_var_list(name: str, arg: str) -> [Var]:
+    """
+    Parses a var-list, each of whose vars is a variable or a subarray.
+    """
+    variables = []
+    for item in split_list(arg):
+        match = _VAR.match(item)
+        if not match:
+            raise errors.InvalidClauseError("Invalid variable in {} clause: {}".format(name, item))
+        bounds = None
+        if match.group(2) is not None:
+            bounds = tuple(_parse_bounds(name, dim) for dim in _split_top_level(match.group(2), ","))
+        variables.append(Var(match.group(1), bounds))
+    if not variables:
+        raise errors.InvalidClauseError("The {} clause requires a var-list.".format(name))
+    return variables
+
+def _parse_bounds(name: str, dim: str) -> (str, str):
+    """
+    Parses one dimension of a subarray, "lower:length", into its (lower, length).
+    """
+    parts = _split_top_level(dim, ":")
+    if len(parts) == 1:
+        return (_expr(name, parts[0]), "1")
+    elif len(parts) == 2:
+        return tuple(_expr(name, part) if part else None for part in parts)
+    raise errors.InvalidClauseError("Invalid subarray in {} clause: [{}]. Subarrays are given as [lower:length].".format(name, dim))
+
+def _parse_wait(name: str, arg: str, text: str) -> Clause:
+    """
+    Parses a wait-argument: "[devnum:int-expr:][queues:]async-argument-list".
+    """
+    keywords = []
+    modifier = None
+    parts = _split_top_level(arg, ":")
+    if parts[0] == "devnum":
+        if len(parts) < 3:
+            raise errors.InvalidClauseError("Invalid devnum in {}: {}".format(name, text))
+        keywords.append(("devnum", _expr(name, parts[1])))
+        parts = parts[2:]
+    if parts[0] == "queues":
+        modifier = "queues"
+        parts = parts[1:]
+    if len(parts) != 1:
+        raise errors.InvalidClauseError("Could not parse the argument of {}: {}".format(name, text))
+    return Clause(name, text, modifier, exprs=[_expr(name, e) for e in split_list(parts[0])], keywords=keywords)
+
+def _parse_gang(arg: str, text: str) -> Clause:
+    """
+    Parses a gang-arg-list, whose gang-args are "[num:]int-expr", "static:size-expr" or "dim:int-expr".
+    """
+    keywords = []
+    for item in split_list(arg):
+        match = _MODIFIER.match(item)
+        if match and match.group(1) in ("num", "static", "dim"):
+            keyword, value = match.group(1), item[match.end():].strip()
+        else:
+            keyword, value = "num", item
+        if any(k == keyword for k, _v in keywords):
+            raise errors.InvalidClauseError("The gang clause may have at most one {} argument: {}".format(keyword, text))
+        keywords.append((keyword, value if value == "*" and keyword == "static" else _expr("gang", value)))
+    return Clause("gang", text, keywords=keywords)
+
+def _expr(name: str, text: str) -> str:
+    """
+    Checks that `text` is a Python expression, and returns it stripped.
+    """
+    text = text.strip()
+    try:
+        ast.parse(text, mode="eval")
+    except SyntaxError:
+        raise errors.InvalidClauseError("The argument to the {} clause must be a valid Python expression: {}".format(name, text)) from None
+    return text
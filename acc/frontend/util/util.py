@@ -8,7 +8,6 @@ import asttokens
 import importlib.util
 import inspect
 import os
-import re
 import sys
 import tempfile
 import types
@@ -24,10 +23,12 @@ def compile_kernel_module(src):
     tmp.close()
     return tmp.name
 
-def load_kernel_module(fpath):
+def load_kernel_module(fpath, code=None):
     """
     Loads the given Python file into the running program as a module
-    and returns it.
+    and returns it. If `code` (a code object compiled from the file's
+    source) is given, the module runs that instead of the file's source,
+    on Python 3.5 and above.
     """
     fname = os.path.basename(fpath)
 
@@ -40,7 +41,10 @@ def load_kernel_module(fpath):
     elif minor > 4:
         spec = importlib.util.spec_from_file_location(fname, fpath)
         mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
+        if code is None:
+            spec.loader.exec_module(mod)
+        else:
+            exec(code, mod.__dict__)
     else:
         raise errors.VersionNotSupportedError("Python Version 3.{} is not supported. Only 3.4 and above is supported.".format(minor))
 
@@ -151,49 +155,26 @@ def left_strip_src(src):
     as_list = src.splitlines()
     spaces = [_num_spaces(line) for line in as_list if line.strip()]
     justification = min(spaces)
-    spaces = [x - justification for x in spaces]
-    as_list = [line.lstrip() for line in as_list]
-    as_list = [" " * space + line for line, space in zip(as_list, spaces)]
+    as_list = [line[justification:] if line.strip() else "" for line in as_list]
     return "\n".join(as_list)
 
-def parse_clause_with_parens(clausename, clause, dbg):
+def is_literal(node) -> bool:
     """
-    Parses a clause of the form "clausename(foo)"
-    and returns foo after eval()ing it.
-    Returns None if not matched.
+    Returns True if the AST node is a literal: an ast.Constant from Python 3.8 on,
+    or one of the ast.Num, ast.Str, ast.Bytes and ast.NameConstant nodes before it.
     """
-    regex = re.compile(r"{}(\s)*\(.*\)".format(clausename))
-    match = regex.match(clause)
-    if match:
-        # Get whatever is in the parentheses as the expr
-        expr = match.group(0).strip().lstrip(clausename).strip()  # (expr)
-        expr_no_parens = expr[1:-1]  # expr
-        try:
-            ret = eval(expr_no_parens)
-        except SyntaxError:
-            dbg.build_message("Argument to the {} clause must be valid python syntax.".format(clausename))
-            raise
-        except NameError:
-            dbg.build_message("Argument to the {} clause must contain only variables currently in scope.".format(clausename))
-            raise
-    else:
-        ret = None
+    return type(node).__name__ in ("Constant", "Num", "Str", "Bytes", "NameConstant")
 
-    return ret
-
-def parse_pragma_to_directive_and_clauses(pragma: str) -> (str, [str]):
+def literal_value(node):
     """
-    Parses `pragma` (a line of the form `# pragma acc directive clause list`)
-    into "directive" and ["clause", "list"].
+    Returns the value of the literal `node` (see is_literal).
     """
-    regexp = re.compile(r"^((\s)*#(\s)*(pragma)(\s)*(acc))")
-    assert regexp.match(pragma), "Given pragma ({}) does not make sense for parsing into directives and clauses.".format(pragma)
-
-    directive_and_clauses = pragma.partition("acc")[-1].split(' ')
-    directive_and_clauses = [word for word in directive_and_clauses if word != '']
-    directive = directive_and_clauses[0]
-    clause_list = directive_and_clauses[1:]
-    return directive, clause_list
+    type_name = type(node).__name__
+    if type_name == "Num":
+        return node.n
+    elif type_name in ("Str", "Bytes"):
+        return node.s
+    return node.value
 
 def _num_spaces(line):
     """
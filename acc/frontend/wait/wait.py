@@ -40,3 +40,47 @@ A wait directive is functionally equivalent to a call to one of the acc_wait, ac
 acc_wait_all or acc_wait_all_async runtime API routines, as described in Sections 3.2.11,
 3.2.12, 3.2.13 and 3.2.14.
 """
+import acc.frontend.commonclauses as commonclauses
+import acc.frontend.util.errors as errors
+import acc.frontend.util.grammar as grammar
+import acc.ir.intrep as intrep
+
+class WaitNode(intrep.IrNode):
+    """
+    Node for the IntermediateRepresentation tree that is used for wait directives.
+
+    The wait directive does not encompass any source code.
+    """
+    __slots__ = ("wait", "async_")
+
+    def __init__(self, lineno: int):
+        super().__init__(lineno)
+        self.wait = commonclauses.WaitClause([])    # The queues to wait on (empty means all of them)
+        self.async_ = None                          # commonclauses.AsyncClause
+
+    def __str__(self):
+        s  = "Wait:\n"
+        s += "  wait {}\n".format(self.wait)
+        s += "  async {}\n".format(self.async_)
+        return s
+
+def wait(clauses: [grammar.Clause], intermediate_rep: intrep.IntermediateRepresentation, lineno: int, dbg, *args, **kwargs):
+    """
+    Adds a WaitNode for the wait directive at `lineno` to the intermediate representation.
+    The directive's argument, if any, is the first item in `clauses`, a clause named "wait".
+    """
+    wait_node = WaitNode(lineno)
+    index = 0
+    if clauses and clauses[0].name == "wait":
+        wait_node.wait = commonclauses.WaitClause(clauses[0].exprs)
+        index = 1 if len(clauses) > 1 else -1
+    elif not clauses:
+        index = -1
+
+    while index != -1:
+        if clauses[index].name == "async":
+            index = commonclauses.apply_clause(index, clauses, intermediate_rep, wait_node, dbg)
+        else:
+            errmsg = "Only the async clause is allowed on the wait directive. Clause given: {}.".format(clauses[index].text)
+            raise errors.InvalidClauseError(dbg.build_message(errmsg))
+    intermediate_rep.add_child(wait_node)
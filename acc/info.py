@@ -0,0 +1,375 @@
+"""
+Compiler feedback: what the @acc decorator made of each decorated function, in the
+manner of the -Minfo=accel option of the PGI/NVHPC compilers.
+
+When ACC_INFO is 1 (or after `start`), every time a decorated function is compiled,
+a report like this is written to stderr, or appended to ACC_INFO_FILE if it is set:
+
+```
+scale (/path/to/module.py):
+    12, Generating parallel loop on 4 gangs
+        Generating implicit copy(a)
+        Generating implicit firstprivate(factor)
+        Estimated data movement: 8008 bytes in, 8000 bytes out
+    12, Loop parallelized across gangs (implied independent in a parallel region)
+        Schedule static: 4 chunks of about 250 iterations
+        Runs inline on the local thread while the trip count is below 256
+```
+
+For each compute construct, it says how it is run and on how many gangs; which data
+clauses it has, and what data attributes the variables that it uses without a data
+clause implicitly get (see `parallel.parallel`: an array or composite variable is
+copied, or is present under default(present); a scalar is firstprivate; and under
+default(none) there are no implicit data attributes); and an estimate of the bytes
+that those clauses move to the gangs and back, from the values that the function was
+called with. For each loop construct, it says whether the loop was parallelized and
+how (gang, worker or vector; the schedule and chunk size of a gang loop), or why it
+was left sequential (see acc.ir.passes.autopar), and which loops were fused into it
+(see acc.ir.passes.fusion) or which of its clauses were not applied.
+
+The decorated function is compiled on every call, so a report is only written when
+it differs from the last one for that function. This report supersedes the one
+that ACC_AUTO_REPORT prints, which only covers the auto-parallelization decisions.
+"""
+import acc.backend.fallback as fallback
+import acc.backend.gangs as gangs
+import acc.frontend.kernels.kernels as kernels
+import acc.frontend.loop.loop as loop
+import acc.frontend.parallel.parallel as parallel
+import acc.frontend.serial.serial as serial
+import acc.frontend.util.util as util
+import acc.ir.passes.constfold as constfold
+import acc.ir.passes.costmodel as costmodel
+import ast
+import math
+import numbers
+import os
+import re
+import sys
+import threading
+
+# Report on every decorated function as it is compiled
+DEFAULT_ENABLED = os.environ.get("ACC_INFO", "0") == "1"
+
+# The file to append the reports to, instead of stderr
+DEFAULT_INFO_FILE = os.environ.get("ACC_INFO_FILE", "")
+
+# The data clauses of a compute construct, in the order they are reported
+DATA_CLAUSES = ("copy", "copyin", "copyout", "create", "no_create", "present", "deviceptr", "attach")
+
+# The data attributes whose variables are sent to the gangs, and sent back, when the region runs
+MOVES_IN = ("copy", "copyin", "firstprivate")
+MOVES_OUT = ("copy", "copyout")
+
+# The functions whose results are scalars, for telling which local variables are scalars
+SCALAR_CALLS = ("abs", "bool", "complex", "divmod", "float", "int", "len", "max", "min", "pow", "round", "sum")
+
+# A line number quoted in a loop dependence's reasons
+_LINE = re.compile(r"\bline (\d+)")
+
+# True while reporting is on
+enabled = DEFAULT_ENABLED
+
+# The last report written for each function, by its qualified name
+_last = {}
+_last_lock = threading.Lock()
+
+def start() -> None:
+    """
+    Turns reporting on.
+    """
+    global enabled
+    enabled = True
+
+def stop() -> None:
+    """
+    Turns reporting off.
+    """
+    global enabled
+    enabled = False
+
+def emit(intermediate_rep, name: str, filename=None, lineno=0) -> bool:
+    """
+    Writes the report on `intermediate_rep` (see `report`) to ACC_INFO_FILE, or to stderr,
+    unless it is the same as the last one written for the function `name` (its qualified name).
+    Returns True if it was written.
+    """
+    lines = report(intermediate_rep, filename, lineno)
+    with _last_lock:
+        if _last.get(name) == lines:
+            return False
+        _last[name] = lines
+        text = "\n".join(lines) + "\n"
+        if DEFAULT_INFO_FILE:
+            with open(DEFAULT_INFO_FILE, 'a') as f:
+                f.write(text)
+        else:
+            sys.stderr.write(text)
+    return True
+
+def report(intermediate_rep, filename=None, lineno=0) -> [str]:
+    """
+    Returns the report on the decorated function of `intermediate_rep`, once it has been
+    through the IR passes, as a list of lines. See the module docstring.
+
+    @param filename:    The file that the function is in, for the heading.
+
+    @param lineno:      The line of that file that the function's `def` is on, which the
+                        (function-based) line numbers of the IR are reported relative to.
+    """
+    name = intermediate_rep.meta_data.funcs_name
+    lines = ["{} ({}):".format(name, filename) if filename else "{}:".format(name)]
+    for node in sorted(intermediate_rep.root.children, key=lambda node: node.lineno):
+        if type(node) in (parallel.ParallelNode, kernels.KernelsNode, serial.SerialNode):
+            lines += _format(lineno + node.lineno, _region_messages(node, intermediate_rep))
+            for loop_node in sorted(_loops(node), key=lambda loop_node: loop_node.lineno):
+                lines += _format(lineno + loop_node.lineno, _loop_messages(loop_node, node, intermediate_rep, lineno))
+        elif type(node) == loop.LoopNode:
+            lines += _format(lineno + node.lineno, ["Loop not parallelized: it is not in a compute construct, so it runs on the local thread"])
+    if len(lines) == 1:
+        lines.append("        No compute constructs")
+    return lines
+
+def _format(lineno: int, messages: [str]) -> [str]:
+    """
+    Returns the `messages` about line `lineno`, with the line number in front of the first one.
+    """
+    return ["{:>6}, {}".format(lineno, messages[0])] + ["        " + message for message in messages[1:]]
+
+def _region_messages(node, intermediate_rep) -> [str]:
+    """
+    Returns the messages about the compute construct of `node`: how it runs, and its data.
+    """
+    hybrid = _hybrid(node)
+    if type(node) == serial.SerialNode:
+        messages = ["Generating serial region: runs on the local thread"]
+    elif type(node) == kernels.KernelsNode:
+        messages = ["Generating kernels region: each loop nest is launched on {}, in a data region that keeps the arrays on the gangs".format(_gangs_text(node))]
+    elif hybrid is not None and hybrid.schedule not in (None, "gang"):
+        messages = ["Generating parallel loop on 1 gang"]
+    else:
+        messages = ["Generating parallel {} on {}".format("loop" if hybrid is not None else "region", _gangs_text(node))]
+
+    if getattr(node, "if_", None) is not None or getattr(node, "self_", None) is not None:
+        messages.append("Runs on the local thread instead, depending on its if and self clauses")
+    if getattr(node, "async_", None) is not None:
+        messages.append("Generating asynchronous launch")
+
+    attributes, missing = _data_attributes(node, intermediate_rep)
+    for attribute in DATA_CLAUSES + ("firstprivate",):
+        for implicit in (False, True):
+            names = [var for var, (attr, imp) in attributes.items() if attr == attribute and imp == implicit]
+            if names:
+                messages.append("Generating {}{}({})".format("implicit " if implicit else "", attribute, ", ".join(names)))
+    if missing:
+        messages.append("No data clause for {} under default(none)".format(", ".join(missing)))
+
+    moved_in, moved_out, unknown = _data_movement(attributes, intermediate_rep.meta_data.arguments or {})
+    estimate = "Estimated data movement: {} bytes in, {} bytes out".format(moved_in, moved_out)
+    if unknown:
+        estimate += ", plus {} of unknown size".format(", ".join(unknown))
+    messages.append(estimate)
+    return messages
+
+def _loop_messages(node, region, intermediate_rep, lineno: int) -> [str]:
+    """
+    Returns the messages about the loop construct of `node`, in the compute construct of `region`.
+    """
+    decision = node.decision
+    schedule = node.schedule if node.schedule is not None else (decision.schedule if decision is not None else ("seq" if node.seq else "gang"))
+    why = "; ".join(_file_lines(reason, lineno) for reason in decision.reasons) if decision is not None and decision.reasons else None
+    if type(region) == serial.SerialNode:
+        messages = ["Loop not parallelized: {}".format(why or "in a serial region")]
+    elif schedule == "seq":
+        messages = ["Loop not parallelized: {}".format(why or "seq clause")]
+    elif schedule in ("worker", "vector"):
+        messages = ["Loop scheduled for {} parallelism{}".format(schedule, " ({})".format(why) if why else ""),
+                    "Runs whole within each gang, since a gang has one worker with one vector lane on the host"]
+    else:
+        messages = ["Loop parallelized across gangs{}".format(" ({})".format(why) if why else "")]
+        messages += _schedule_messages(node, region, intermediate_rep)
+
+    if node.fused:
+        messages.append("Fused with the loop{} at line{} {} into one kernel".format(
+            "s" if len(node.fused) > 1 else "", "s" if len(node.fused) > 1 else "",
+            ", ".join(str(lineno + fused.lineno) for fused in node.fused)))
+    if node.collapse is not None:
+        messages.append("Collapse clause not applied: the loops are scheduled as the outermost one")
+    if node.tile is not None:
+        messages.append("Tile clause not applied: tiling is not implemented")
+    return messages
+
+def _file_lines(reason: str, lineno: int) -> str:
+    """
+    Returns the `reason` (see acc.ir.dependence.LoopDependence), with the (function-based)
+    line numbers that it quotes made relative to the file, like the rest of the report.
+    """
+    return _LINE.sub(lambda match: "line {}".format(lineno + int(match.group(1))), reason)
+
+def _schedule_messages(node, region, intermediate_rep) -> [str]:
+    """
+    Returns the messages about how the iterations of the gang loop of `node` are split up.
+    """
+    if _hybrid(region) is not node and type(region) != kernels.KernelsNode:
+        # A loop inside a parallel region is partitioned by each gang as it gets to it
+        return ["Schedule static: one contiguous chunk per gang"]
+    forloop = node.span.node if node.span is not None else None
+    if not isinstance(forloop, ast.For):
+        return []
+    cost = node.decision.cost if node.decision is not None and node.decision.cost is not None else costmodel.estimate(forloop, intermediate_rep.meta_data.arguments)
+    num_gangs = _num_gangs(region)
+
+    messages = []
+    if not cost.known_trip_count and gangs.PIPELINE_DEPTH <= 1:
+        messages.append("Schedule static: one chunk per gang")
+    elif not cost.known_trip_count:
+        messages.append("Schedule static: one chunk per gang, or {} per gang pipelined {} deep once the trip count is {} or more".format(
+            gangs.PIPELINE_CHUNKS, gangs.PIPELINE_DEPTH, gangs.PIPELINE_THRESHOLD))
+    else:
+        pipelined = gangs.PIPELINE_DEPTH > 1 and cost.trip_count >= gangs.PIPELINE_THRESHOLD
+        nchunks = min(num_gangs * gangs.PIPELINE_CHUNKS if pipelined else num_gangs, max(cost.trip_count, 1))
+        messages.append("Schedule static: {} chunk{} of about {} iterations{}".format(
+            nchunks, "s" if nchunks != 1 else "", math.ceil(cost.trip_count / nchunks),
+            ", pipelined {} deep".format(gangs.PIPELINE_DEPTH) if pipelined else ""))
+    if type(region) == parallel.ParallelNode and fallback.DEFAULT_INLINE_THRESHOLD > 0:
+        messages.append("Runs inline on the local thread while the trip count is below {}".format(fallback.DEFAULT_INLINE_THRESHOLD))
+    return messages
+
+def _data_attributes(node, intermediate_rep) -> (dict, [str]):
+    """
+    Returns the data attribute of each variable that the compute construct of `node` uses
+    from outside of it, in order of first use, as a dict of name -> (attribute, implicit),
+    along with the names of the variables that have none because of default(none).
+    """
+    first, last = node.span.first, node.span.last
+    hybrid = _hybrid(node)
+    if hybrid is not None and hybrid.fused:
+        # The loops that were fused into this one are part of its kernel
+        last = hybrid.fused[-1].span.last
+    src = util.left_strip_src(intermediate_rep.index.text(first, last))
+    tree = ast.parse(src)
+    targets = {name.id for stmt in ast.walk(tree) if isinstance(stmt, (ast.For, ast.comprehension))
+               for name in ast.walk(stmt.target) if isinstance(name, ast.Name)}
+    reads, writes = intermediate_rep.dependency_graph.reads_and_writes(first, last)
+    used = reads | writes
+    names = []
+    for name in ast.walk(tree):
+        if isinstance(name, ast.Name) and name.id in used and name.id not in targets and name.id not in names:
+            names.append(name.id)
+
+    explicit = {}
+    for clausename in DATA_CLAUSES:
+        dataclause = getattr(node, clausename, None)
+        if dataclause is not None:
+            for var in dataclause.vars:
+                explicit.setdefault(var, clausename)
+
+    arguments = intermediate_rep.meta_data.arguments or {}
+    default = getattr(node, "default", None)
+    attributes = {var: (attribute, False) for var, attribute in explicit.items()}
+    missing = []
+    for name in names:
+        if name in attributes:
+            continue
+        if default == "none":
+            missing.append(name)
+        elif _is_scalar(arguments[name]) if name in arguments else _is_scalar_local(name, intermediate_rep):
+            attributes[name] = ("firstprivate", True)
+        elif default == "present":
+            attributes[name] = ("present", True)
+        else:
+            attributes[name] = ("copy", True)
+    return attributes, missing
+
+def _data_movement(attributes: dict, arguments: dict) -> (int, int, [str]):
+    """
+    Returns the estimated bytes that the data `attributes` (see `_data_attributes`) move to
+    the gangs and back, and the names of the variables whose sizes are not known.
+    """
+    moved_in = moved_out = 0
+    unknown = []
+    for var, (attribute, _) in attributes.items():
+        if attribute not in MOVES_IN and attribute not in MOVES_OUT:
+            continue
+        if var in arguments:
+            size = costmodel.value_size(arguments[var])
+        elif attribute == "firstprivate":
+            # A local scalar (see _is_scalar_local)
+            size = costmodel.DEFAULT_ITEM_SIZE
+        else:
+            unknown.append(var)
+            continue
+        if attribute in MOVES_IN:
+            moved_in += size
+        if attribute in MOVES_OUT:
+            moved_out += size
+    return moved_in, moved_out, unknown
+
+def _is_scalar(value) -> bool:
+    """
+    Returns True if `value` is a scalar, rather than an array or composite variable.
+    """
+    return value is None or isinstance(value, (numbers.Number, str, bytes))
+
+def _is_scalar_local(name: str, intermediate_rep) -> bool:
+    """
+    Returns True if every assignment to the local variable `name` assigns it a scalar.
+    """
+    definitions = [d for d in intermediate_rep.dependency_graph.defuse.definitions if d.name == name]
+    return bool(definitions) and all(isinstance(d.node, (ast.Assign, ast.AugAssign)) and _is_scalar_expr(d.node.value) for d in definitions)
+
+def _is_scalar_expr(expr) -> bool:
+    """
+    Returns True if the expression `expr` is sure to evaluate to a scalar.
+    """
+    if util.is_literal(expr):
+        return _is_scalar(util.literal_value(expr))
+    if isinstance(expr, ast.UnaryOp):
+        return _is_scalar_expr(expr.operand)
+    if isinstance(expr, ast.BinOp):
+        return _is_scalar_expr(expr.left) and _is_scalar_expr(expr.right)
+    if isinstance(expr, ast.Call) and isinstance(expr.func, ast.Name):
+        return expr.func.id in SCALAR_CALLS
+    return False
+
+def _loops(node) -> list:
+    """
+    Returns the LoopNodes in the region of `node`.
+    """
+    found = []
+    for child in node.children:
+        if type(child) == loop.LoopNode:
+            found.append(child)
+        found += _loops(child)
+    return found
+
+def _hybrid(node):
+    """
+    Returns the LoopNode of a combined construct (e.g., `parallel loop`), or None.
+    """
+    for child in node.children:
+        if type(child) == loop.LoopNode and child.lineno == node.lineno:
+            return child
+    return None
+
+def _num_gangs(node) -> int:
+    """
+    Returns the number of gangs that the compute construct of `node` launches, or the
+    number of gang processes if that is not known.
+    """
+    expr = getattr(node, "num_gangs", None)
+    if isinstance(expr, str) and constfold.is_constant(expr):
+        value = ast.literal_eval(expr)
+        if type(value) is int and value > 0:
+            return value
+    return gangs.DEFAULT_NUM_GANGS
+
+def _gangs_text(node) -> str:
+    """
+    Returns how many gangs the compute construct of `node` launches, for the report.
+    """
+    expr = getattr(node, "num_gangs", None)
+    if expr is not None and not (isinstance(expr, str) and constfold.is_constant(expr)):
+        return "num_gangs({}) gangs".format(expr)
+    count = _num_gangs(node)
+    return "{} gang{}".format(count, "s" if count != 1 else "")
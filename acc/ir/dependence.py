@@ -0,0 +1,740 @@
+"""
+This module contains the dependence analysis of the decorated function.
+
+It works out three things, from the function's AST:
+
+- Def-use chains: for every use of a variable, the definitions (assignments,
+  parameters, loop targets, imports, ...) that may reach it. This is a
+  reaching-definitions analysis over the function's structured control flow:
+  the branches of an if both reach the code after it, and a loop's body may run
+  any number of times, so the definitions at the end of the body reach its start.
+
+- Loop dependences: whether the iterations of a for loop may depend on one
+  another. Each pair of accesses to the same array, at least one of which is a
+  write, is tested on its subscripts. When the subscripts are affine in the loop
+  variables (e.g. `a[2 * i + 1]`, `b[i, j - 1]`), the GCD test (is there an integer
+  solution at all?) and the Banerjee test (is there a real solution within the
+  loops' bounds, with the two accesses in different iterations of the loop?) are
+  used. When they are not, the loop is conservatively taken to be dependent.
+  Scalars that are carried from one iteration to the next (e.g. `s += a[i]`), or
+  that are used after the loop, and calls that may modify the function's variables
+  (e.g. `out.append(x)`), also make the loop dependent.
+
+- The region graph: a DAG of the IR's top-level regions, with an edge from a region
+  to each later region that reads what it writes, or writes what it reads or writes.
+  Regions with no path between them may run in either order.
+
+All line numbers are function-based (line 0 is the `def` line), as everywhere else in the IR.
+"""
+import acc.frontend.util.util as util
+import ast
+
+# Functions whose calls do not modify their arguments
+PURE_FUNCTIONS = ("abs", "all", "any", "bool", "complex", "divmod", "enumerate", "float", "int",
+                  "isinstance", "len", "max", "min", "pow", "range", "reversed", "round", "sorted",
+                  "str", "sum", "tuple", "zip")
+
+class Definition:
+    """
+    A definition of a variable: where the variable is given a value.
+    """
+    __slots__ = ("name", "lineno", "node")
+
+    def __init__(self, name: str, lineno: int, node):
+        self.name = name
+        self.lineno = lineno
+        self.node = node
+
+    def __repr__(self):
+        return "{}@{}".format(self.name, self.lineno)
+
+class Use:
+    """
+    A use of a variable, and the definitions that may reach it.
+    """
+    __slots__ = ("name", "lineno", "node", "reaching")
+
+    def __init__(self, name: str, lineno: int, node):
+        self.name = name
+        self.lineno = lineno
+        self.node = node
+        self.reaching = set()
+
+    def __repr__(self):
+        return "{}@{} <- {}".format(self.name, self.lineno, sorted(self.reaching, key=lambda d: d.lineno))
+
+class DefUseChains:
+    """
+    The def-use chains of a function, or of one iteration of a loop's body. See the module docstring.
+
+    Items
+    -----
+
+    - definitions : Every Definition, in the order they were found.
+    - uses        : Every Use, in the order they were found.
+    - chains      : Maps each Definition to the Uses it reaches.
+    - entry       : For a loop body, maps each of the names in `free` to the Definition that
+                    stands for its value at the start of the iteration.
+    """
+    def __init__(self, node, free=()):
+        """
+        @param node:    The function's (or the for loop's) AST node.
+
+        @param free:    For a loop, the names whose values at the start of an iteration are
+                        of interest. A use that one of these reaches reads a value that was
+                        set before the iteration began (i.e., it is upward exposed).
+        """
+        self.definitions = []
+        self.uses = []
+        self.chains = {}
+        self.entry = {}
+        self._definitions_by_node = {}
+        self._uses_by_node = {}
+
+        reaching = {}
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            args = node.args
+            for arg in args.args + args.kwonlyargs + getattr(args, "posonlyargs", []) + [a for a in (args.vararg, args.kwarg) if a]:
+                reaching[arg.arg] = {self._define(arg.arg, 0, arg)}
+        else:
+            for name in free:
+                self.entry[name] = self._define(name, node.lineno - 1, node)
+                reaching[name] = {self.entry[name]}
+            reaching = self._targets(node.target, reaching, node)
+        self._block(node.body, reaching)
+
+        for definition in self.definitions:
+            self.chains[definition] = []
+        for use in self.uses:
+            for definition in use.reaching:
+                self.chains[definition].append(use)
+
+    def _define(self, name: str, lineno: int, node) -> Definition:
+        # A loop's body is analysed more than once, but each statement only defines each name once
+        key = (id(node), name)
+        if key not in self._definitions_by_node:
+            self._definitions_by_node[key] = Definition(name, lineno, node)
+            self.definitions.append(self._definitions_by_node[key])
+        return self._definitions_by_node[key]
+
+    def _block(self, body: list, reaching: dict) -> dict:
+        """
+        Runs the analysis over a list of statements, given the definitions that reach
+        the first one, and returns the definitions that reach the end of the list.
+        """
+        for stmt in body:
+            reaching = self._statement(stmt, reaching)
+        return reaching
+
+    def _statement(self, stmt, reaching: dict) -> dict:
+        if isinstance(stmt, ast.If):
+            self._expression(stmt.test, reaching)
+            return _merge(self._block(stmt.body, dict(reaching)), self._block(stmt.orelse, dict(reaching)))
+        elif isinstance(stmt, (ast.For, ast.AsyncFor, ast.While)):
+            if isinstance(stmt, ast.While):
+                self._expression(stmt.test, reaching)
+            else:
+                self._expression(stmt.iter, reaching)
+            # The body runs zero or more times: iterate until the definitions reaching its start stop growing
+            entry = dict(reaching)
+            while True:
+                start = dict(entry)
+                if not isinstance(stmt, ast.While):
+                    start = self._targets(stmt.target, start, stmt)
+                end = self._block(stmt.body, start)
+                grown = _merge(entry, end)
+                if grown == entry:
+                    break
+                entry = grown
+            return self._block(stmt.orelse, entry)
+        elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+            for item in stmt.items:
+                self._expression(item.context_expr, reaching)
+                if item.optional_vars is not None:
+                    reaching = self._targets(item.optional_vars, reaching, stmt)
+            return self._block(stmt.body, reaching)
+        elif isinstance(stmt, ast.Try) or type(stmt).__name__ == "TryStar":
+            after_body = self._block(stmt.body, dict(reaching))
+            merged = _merge(reaching, after_body)
+            ends = [after_body]
+            for handler in stmt.handlers:
+                start = dict(merged)
+                if handler.name:
+                    start[handler.name] = {self._define(handler.name, handler.lineno - 1, handler)}
+                ends.append(self._block(handler.body, start))
+            ends.append(self._block(stmt.orelse, dict(after_body)))
+            result = {}
+            for end in ends:
+                result = _merge(result, end)
+            return self._block(stmt.finalbody, result)
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            for decorator in stmt.decorator_list:
+                self._expression(decorator, reaching)
+            reaching = dict(reaching)
+            reaching[stmt.name] = {self._define(stmt.name, stmt.lineno - 1, stmt)}
+            return reaching
+        elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            reaching = dict(reaching)
+            for alias in stmt.names:
+                name = alias.asname if alias.asname else alias.name.split(".")[0]
+                reaching[name] = {self._define(name, stmt.lineno - 1, stmt)}
+            return reaching
+        elif isinstance(stmt, ast.Assign):
+            self._expression(stmt.value, reaching)
+            for target in stmt.targets:
+                reaching = self._targets(target, reaching, stmt)
+            return reaching
+        elif isinstance(stmt, ast.AugAssign):
+            self._expression(stmt.value, reaching)
+            self._expression(stmt.target, reaching, load_stores=True)
+            return self._targets(stmt.target, reaching, stmt)
+        elif isinstance(stmt, ast.AnnAssign):
+            if stmt.value is None:
+                return reaching
+            self._expression(stmt.value, reaching)
+            return self._targets(stmt.target, reaching, stmt)
+        elif isinstance(stmt, ast.Delete):
+            for target in stmt.targets:
+                self._expression(target, reaching, load_stores=True)
+            return reaching
+        else:
+            # Expressions, return, raise, assert, pass, global, ...
+            for child in ast.iter_child_nodes(stmt):
+                self._expression(child, reaching)
+            return reaching
+
+    def _targets(self, target, reaching: dict, stmt) -> dict:
+        """
+        Records the definitions made by assigning to `target`, and the uses in it
+        (e.g. the `a` and `i` of `a[i] = x`), and returns the new reaching definitions.
+        """
+        reaching = dict(reaching)
+        for node in ast.walk(target):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                reaching[node.id] = {self._define(node.id, node.lineno - 1, stmt)}
+            elif isinstance(node, (ast.Subscript, ast.Attribute)):
+                self._expression(node.value, reaching)
+                if isinstance(node, ast.Subscript):
+                    self._expression(node.slice, reaching)
+        return reaching
+
+    def _expression(self, expr, reaching: dict, load_stores=False):
+        """
+        Records the uses in the expression `expr`. Names bound by comprehensions and
+        lambdas inside it are not uses of the function's variables.
+        """
+        if expr is None:
+            return
+        inner = set()
+        for node in ast.walk(expr):
+            if isinstance(node, ast.comprehension):
+                inner.update(n.id for n in ast.walk(node.target) if isinstance(n, ast.Name))
+            elif isinstance(node, ast.Lambda):
+                inner.update(a.arg for a in node.args.args)
+        for node in ast.walk(expr):
+            if isinstance(node, ast.Name) and node.id not in inner and (isinstance(node.ctx, ast.Load) or load_stores):
+                if id(node) not in self._uses_by_node:
+                    use = Use(node.id, node.lineno - 1, node)
+                    self._uses_by_node[id(node)] = use
+                    self.uses.append(use)
+                self._uses_by_node[id(node)].reaching.update(reaching.get(node.id, ()))
+
+class Affine:
+    """
+    An affine subscript: the sum of `coefficients[var] * var` over the loop variables,
+    plus the sum of `symbols[name] * name` over other (loop-invariant) names, plus `constant`.
+    """
+    __slots__ = ("coefficients", "symbols", "constant")
+
+    def __init__(self, coefficients=None, symbols=None, constant=0):
+        self.coefficients = coefficients or {}
+        self.symbols = symbols or {}
+        self.constant = constant
+
+    def scaled(self, factor: int):
+        return Affine({k: v * factor for k, v in self.coefficients.items()}, {k: v * factor for k, v in self.symbols.items()}, self.constant * factor)
+
+    def plus(self, other, sign=1):
+        coefficients = dict(self.coefficients)
+        for k, v in other.coefficients.items():
+            coefficients[k] = coefficients.get(k, 0) + sign * v
+        symbols = dict(self.symbols)
+        for k, v in other.symbols.items():
+            symbols[k] = symbols.get(k, 0) + sign * v
+        return Affine(coefficients, symbols, self.constant + sign * other.constant)
+
+    def is_constant(self) -> bool:
+        return not any(self.coefficients.values()) and not any(self.symbols.values())
+
+class Access:
+    """
+    An access to an element of an array inside a loop: `name[subscripts]`.
+    `subscripts` has one Affine (or None, if it is not affine) per dimension.
+    """
+    __slots__ = ("name", "subscripts", "write", "lineno", "text")
+
+    def __init__(self, name: str, subscripts: list, write: bool, lineno: int, text: str):
+        self.name = name
+        self.subscripts = subscripts
+        self.write = write
+        self.lineno = lineno
+        self.text = text
+
+class LoopDependence:
+    """
+    The result of testing a for loop for loop-carried dependences.
+
+    Items
+    -----
+
+    - lineno      : The line number of the `for`.
+    - variable    : The loop variable, or None if the target is not a plain name.
+    - bounds      : The (first, last) values of the loop variable, if they are constants, else None.
+    - independent : True if the iterations of the loop are known not to depend on one another.
+    - reasons     : Why the loop is not independent, one string per dependence found.
+    """
+    __slots__ = ("lineno", "variable", "bounds", "independent", "reasons")
+
+    def __init__(self, lineno: int, variable: str, bounds, reasons: [str]):
+        self.lineno = lineno
+        self.variable = variable
+        self.bounds = bounds
+        self.reasons = list(reasons)
+        self.independent = not self.reasons
+
+    def __repr__(self):
+        if self.independent:
+            return "loop at line {}: independent".format(self.lineno)
+        return "loop at line {}: {}".format(self.lineno, "; ".join(self.reasons))
+
+class DependencyGraph:
+    """
+    The dependence analysis of a decorated function: its def-use chains, the dependences
+    of its loops, and the DAG of its IR's top-level regions. See the module docstring.
+
+    Items
+    -----
+
+    - defuse  : The function's DefUseChains.
+    - regions : The IR's top-level region nodes (those with source code), in source order.
+    - edges   : Maps each region's line number to a dict of the line number of each later
+                region that depends on it -> the variables that it depends on it through.
+    """
+    def __init__(self, intermediate_rep, funcdef=None):
+        if funcdef is None:
+            funcdef = ast.parse(util.left_strip_src(intermediate_rep.src)).body[0]
+        self._funcdef = funcdef
+        self._bound = _bound_names(funcdef)
+        self._loops = {}        # Line number of a for loop -> its AST node
+        self._lines = {}        # Line number -> the AST nodes that start on it
+        for node in ast.walk(funcdef):
+            if isinstance(node, ast.For):
+                self._loops.setdefault(node.lineno - 1, node)
+            if hasattr(node, "lineno") and node is not funcdef:
+                self._lines.setdefault(node.lineno - 1, []).append(node)
+        self._dependences = {}
+
+        self.defuse = DefUseChains(funcdef)
+        self.regions = sorted((node for node in intermediate_rep.root.children if node.span is not None), key=lambda node: node.lineno)
+        self.edges = {}
+        self._build_region_graph()
+
+    def loop_dependence(self, lineno: int) -> LoopDependence:
+        """
+        Returns the LoopDependence of the for loop whose `for` is at line `lineno`,
+        or None if there is no for loop there.
+        """
+        if lineno not in self._loops:
+            return None
+        if lineno not in self._dependences:
+            self._dependences[lineno] = self._test_loop(self._loops[lineno])
+        return self._dependences[lineno]
+
+    def fused_dependence(self, linenos: [int]) -> LoopDependence:
+        """
+        Returns the LoopDependence of the for loops whose `for`s are at `linenos`, as if
+        they were fused into one loop: the first loop, with the bodies of the others added
+        to its body, in order. The loops must have the same target. Returns None if there is
+        no for loop at one of the line numbers.
+        """
+        loops = [self._loops.get(lineno) for lineno in linenos]
+        if None in loops:
+            return None
+        first = loops[0]
+        fused = ast.For(target=first.target, iter=first.iter, body=[stmt for loop in loops for stmt in loop.body], orelse=[])
+        ast.copy_location(fused, first)
+        fused.end_lineno = getattr(loops[-1], "end_lineno", None)
+        return self._test_loop(fused)
+
+    def successors(self, node) -> [int]:
+        """
+        Returns the line numbers of the regions that depend directly on the region `node`.
+        """
+        return sorted(self.edges.get(node.lineno, {}))
+
+    def independent(self, first, second) -> bool:
+        """
+        Returns True if there is no path between the regions `first` and `second` in the
+        region graph, so that they may run in either order (or at the same time).
+        """
+        return not self._reaches(first.lineno, second.lineno) and not self._reaches(second.lineno, first.lineno)
+
+    def reads_and_writes(self, first: int, last: int) -> (set, set):
+        """
+        Returns the names of the function's variables that lines `first` through `last` read
+        and write, as seen from outside those lines. A variable is read if a definition from
+        outside the lines reaches a use inside them, and written if a definition inside them
+        reaches a use outside them, if one of its elements or attributes is assigned to, or if
+        one of its methods is called (which may modify it). So a loop variable, or any other
+        name that only lives inside the lines, is neither.
+        """
+        inside = lambda lineno: first <= lineno <= last
+        reads, writes = set(), set()
+        for use in self.defuse.uses:
+            if inside(use.lineno) and any(not inside(d.lineno) for d in use.reaching):
+                reads.add(use.name)
+        for definition in self.defuse.definitions:
+            if inside(definition.lineno) and any(not inside(u.lineno) for u in self.defuse.chains[definition]):
+                writes.add(definition.name)
+        for lineno in range(first, last + 1):
+            for node in self._lines.get(lineno, ()):
+                if isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                    base = _base_name(node)
+                    if base is not None:
+                        writes.add(base)
+                elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                    base = _base_name(node.func.value)
+                    if base is not None and base in self._bound:
+                        writes.add(base)
+        return reads, writes
+
+    def _build_region_graph(self):
+        """
+        Adds an edge between every pair of regions that access the same variable, where at
+        least one of the accesses is a write, from the earlier region to the later one.
+        """
+        accesses = [self.reads_and_writes(node.span.first, node.span.last) for node in self.regions]
+        for i, node in enumerate(self.regions):
+            self.edges[node.lineno] = {}
+            reads, writes = accesses[i]
+            for j in range(i + 1, len(self.regions)):
+                later_reads, later_writes = accesses[j]
+                shared = (writes & (later_reads | later_writes)) | (reads & later_writes)
+                if shared:
+                    self.edges[node.lineno][self.regions[j].lineno] = shared
+
+    def _reaches(self, start: int, end: int) -> bool:
+        pending = [start]
+        seen = set()
+        while pending:
+            lineno = pending.pop()
+            if lineno == end:
+                return True
+            if lineno in seen:
+                continue
+            seen.add(lineno)
+            pending.extend(self.edges.get(lineno, {}))
+        return False
+
+    def _test_loop(self, loop) -> LoopDependence:
+        """
+        Tests the for loop `loop` for loop-carried dependences.
+        """
+        lineno = loop.lineno - 1
+        variable = loop.target.id if isinstance(loop.target, ast.Name) else None
+        bounds = {}     # Loop variable -> (first, last) or None
+        if variable is None:
+            return LoopDependence(lineno, None, None, ["the loop target is not a single variable"])
+        bounds[variable] = _range_bounds(loop.iter)
+        for node in ast.walk(loop):
+            if isinstance(node, ast.For) and node is not loop and isinstance(node.target, ast.Name):
+                bounds[node.target.id] = _range_bounds(node.iter)
+
+        reasons = []
+        written = set()
+        for node in ast.walk(loop):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                written.add(node.id)
+        loopvars = set(bounds)
+        invariant = lambda name: name not in written
+
+        # Scalars carried between iterations: read in an iteration before that iteration assigns them
+        body = DefUseChains(loop, free=sorted(written - loopvars))
+        for name, definition in body.entry.items():
+            if body.chains[definition]:
+                reasons.append("{} is carried from one iteration to the next (line {})".format(name, body.chains[definition][0].lineno))
+
+        # Scalars needed after the loop
+        first, last = lineno, lineno + _height(loop)
+        for definition in self.defuse.definitions:
+            if not first < definition.lineno <= last or definition.name in loopvars:
+                continue
+            for use in self.defuse.chains[definition]:
+                if use.lineno > last or use.lineno < first:
+                    reasons.append("{} is assigned in the loop and used after it (line {})".format(definition.name, use.lineno))
+                    break
+
+        # Statements that leave the loop, or hand control back to the caller, in the middle of an iteration
+        for node in _exits(loop):
+            if isinstance(node, ast.Break):
+                reasons.append("the break at line {} may end the loop early".format(node.lineno - 1))
+            elif isinstance(node, ast.Return):
+                reasons.append("the return at line {} may end the loop early".format(node.lineno - 1))
+            else:
+                reasons.append("the yield at line {} hands each iteration back to the caller in turn".format(node.lineno - 1))
+
+        # Calls that may modify the function's variables
+        for node in ast.walk(loop):
+            if not isinstance(node, ast.Call):
+                continue
+            if isinstance(node.func, ast.Attribute):
+                base = _base_name(node.func.value)
+                if base is not None and base in self._bound:
+                    reasons.append("the call at line {} may modify {}".format(node.lineno - 1, base))
+            elif not (isinstance(node.func, ast.Name) and node.func.id in PURE_FUNCTIONS):
+                for arg in node.args:
+                    if isinstance(arg, ast.Name) and arg.id in self._bound and arg.id not in loopvars:
+                        reasons.append("the call at line {} may modify {}".format(node.lineno - 1, arg.id))
+
+        # Array accesses
+        accesses = _accesses(loop, loopvars, invariant)
+        for i, one in enumerate(accesses):
+            for other in accesses[i:]:
+                if one.name != other.name or not (one.write or other.write):
+                    continue
+                if _may_depend(one, other, variable, bounds):
+                    reasons.append("{} (line {}) and {} (line {}) may access the same element in different iterations".format(
+                        one.text, one.lineno, other.text, other.lineno))
+        return LoopDependence(lineno, variable, bounds[variable], _unique(reasons))
+
+def _merge(one: dict, other: dict) -> dict:
+    merged = {name: set(defs) for name, defs in one.items()}
+    for name, defs in other.items():
+        merged.setdefault(name, set()).update(defs)
+    return merged
+
+def _bound_names(funcdef) -> set:
+    """
+    Returns the parameters and the names that the function assigns to.
+    """
+    args = funcdef.args
+    names = {a.arg for a in args.args + args.kwonlyargs + getattr(args, "posonlyargs", [])}
+    names.update(a.arg for a in (args.vararg, args.kwarg) if a)
+    names.update(n.id for n in ast.walk(funcdef) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store))
+    return names
+
+def _base_name(node):
+    """
+    Returns the name at the root of a chain of subscripts and attributes (the `a` of `a.b[i].c`), or None.
+    """
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+def _height(node) -> int:
+    """
+    Returns how many lines after its first line the statement `node` ends on.
+    """
+    last = max((n.lineno for n in ast.walk(node) if hasattr(n, "lineno")), default=node.lineno)
+    last = max(last, getattr(node, "end_lineno", None) or last)
+    return last - node.lineno
+
+def _unique(items: list) -> list:
+    seen = set()
+    return [i for i in items if not (i in seen or seen.add(i))]
+
+def _exits(loop) -> list:
+    """
+    Returns the break, return, yield and yield from nodes in the body of the for loop `loop`,
+    in source order, leaving out those in nested functions and classes, and the breaks that
+    only end a nested loop.
+    """
+    exits = []
+    pending = [(child, False) for child in loop.body]     # (node, inside a nested loop's body)
+    while pending:
+        node, nested = pending.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        if isinstance(node, ast.Break) and not nested or isinstance(node, (ast.Return, ast.Yield, ast.YieldFrom)):
+            exits.append(node)
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            # A break in a nested loop's else clause ends this loop, not the nested one
+            pending.extend((child, nested) for child in ast.iter_child_nodes(node) if child not in node.body)
+            pending.extend((child, True) for child in node.body)
+        else:
+            pending.extend((child, nested) for child in ast.iter_child_nodes(node))
+    return sorted(exits, key=lambda node: node.lineno)
+
+def _range_bounds(iterable):
+    """
+    Returns the (first, last) values of a `range(...)` with constant arguments and a step
+    of one, or None.
+    """
+    if not (isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name) and iterable.func.id == "range"):
+        return None
+    values = []
+    for arg in iterable.args:
+        affine = _affine(arg, set(), lambda name: False)
+        if affine is None or not affine.is_constant():
+            return None
+        values.append(affine.constant)
+    if len(values) == 1:
+        values = [0, values[0]]
+    if len(values) == 3 and values[2] != 1:
+        return None
+    if len(values) < 2 or values[1] <= values[0]:
+        return None
+    return values[0], values[1] - 1
+
+def _affine(node, loopvars: set, invariant) -> Affine:
+    """
+    Returns the Affine form of the expression `node`, or None if it is not affine in `loopvars`.
+    """
+    if util.is_literal(node) and type(util.literal_value(node)) is int:
+        return Affine(constant=util.literal_value(node))
+    elif isinstance(node, ast.Name):
+        if node.id in loopvars:
+            return Affine({node.id: 1})
+        elif invariant(node.id):
+            return Affine(symbols={node.id: 1})
+        return None
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _affine(node.operand, loopvars, invariant)
+        if operand is None:
+            return None
+        return operand.scaled(-1) if isinstance(node.op, ast.USub) else operand
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+        left = _affine(node.left, loopvars, invariant)
+        right = _affine(node.right, loopvars, invariant)
+        if left is None or right is None:
+            return None
+        return left.plus(right, 1 if isinstance(node.op, ast.Add) else -1)
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        left = _affine(node.left, loopvars, invariant)
+        right = _affine(node.right, loopvars, invariant)
+        if left is None or right is None:
+            return None
+        if left.is_constant() and not left.symbols:
+            return right.scaled(left.constant)
+        if right.is_constant() and not right.symbols:
+            return left.scaled(right.constant)
+    return None
+
+def _accesses(loop, loopvars: set, invariant) -> [Access]:
+    """
+    Returns every access to an element of an array (a subscript of a name) in the loop.
+    """
+    accesses = []
+    inner_subscripts = set()
+    for node in ast.walk(loop):
+        if not isinstance(node, ast.Subscript) or id(node) in inner_subscripts:
+            continue
+        # Only the outermost subscript of a chain like a[i][j] is an access
+        chain = []
+        inner = node
+        while isinstance(inner, ast.Subscript):
+            chain.append(inner.slice)
+            inner = inner.value
+        if not isinstance(inner, ast.Name):
+            continue
+        inner_subscripts.update(id(sub) for sub in ast.walk(node.value) if isinstance(sub, ast.Subscript))
+        dims = []
+        for index in reversed(chain):
+            if isinstance(index, ast.Index):    # Before Python 3.9
+                index = index.value
+            if isinstance(index, ast.Tuple):
+                dims.extend(_affine(e, loopvars, invariant) for e in index.elts)
+            elif isinstance(index, ast.Slice):
+                dims.append(None)
+            else:
+                dims.append(_affine(index, loopvars, invariant))
+        write = isinstance(node.ctx, (ast.Store, ast.Del))
+        accesses.append(Access(inner.id, dims, write, node.lineno - 1, _text(node)))
+    # Augmented assignments both read and write their target
+    for node in ast.walk(loop):
+        if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Subscript):
+            for access in accesses:
+                if access.write and access.lineno == node.lineno - 1 and access.name == _base_name(node.target):
+                    accesses.append(Access(access.name, access.subscripts, False, access.lineno, access.text))
+                    break
+    return accesses
+
+def _text(node) -> str:
+    try:
+        return ast.unparse(node)
+    except AttributeError:      # Before Python 3.9
+        return _base_name(node) + "[...]"
+
+def _may_depend(one: Access, other: Access, variable: str, bounds: dict) -> bool:
+    """
+    Returns True unless the subscripts of the two accesses show that they never touch the
+    same element in two different iterations of the loop over `variable`.
+    """
+    if len(one.subscripts) != len(other.subscripts):
+        return True
+    for a, b in zip(one.subscripts, other.subscripts):
+        if a is None or b is None:
+            continue
+        if not _dimension_may_depend(a, b, variable, bounds):
+            # The accesses never meet in this dimension, so they never meet at all
+            return False
+    return True
+
+def _dimension_may_depend(a: Affine, b: Affine, variable: str, bounds: dict) -> bool:
+    """
+    Tests whether a(i, ...) == b(i', ...) has a solution with i != i', where i is `variable`
+    and the other loop variables are free, with the GCD and Banerjee tests.
+    """
+    # Symbolic terms must cancel out, or nothing can be said
+    symbols = set(a.symbols) | set(b.symbols)
+    if any(a.symbols.get(s, 0) != b.symbols.get(s, 0) for s in symbols):
+        return True
+    difference = b.constant - a.constant
+    loopvars = set(a.coefficients) | set(b.coefficients)
+
+    # GCD test: sum(a_k x_k) - sum(b_k y_k) = difference needs gcd(all coefficients) to divide it
+    g = 0
+    for v in loopvars:
+        g = _gcd(_gcd(g, a.coefficients.get(v, 0)), b.coefficients.get(v, 0))
+    if g == 0:
+        # Both subscripts are the same constant in every iteration
+        return difference == 0
+    if difference % g != 0:
+        return False
+
+    # Banerjee test: is difference within the bounds of sum(a_k x_k - b_k y_k), with x != y for the loop variable?
+    low, high = 0, 0
+    for v in loopvars - {variable}:
+        if bounds.get(v) is None:
+            return True
+        lo, hi = bounds[v]
+        ca, cb = a.coefficients.get(v, 0), b.coefficients.get(v, 0)
+        values = [ca * x - cb * y for x, y in ((lo, lo), (lo, hi), (hi, lo), (hi, hi))]
+        low += min(values)
+        high += max(values)
+
+    ca, cb = a.coefficients.get(variable, 0), b.coefficients.get(variable, 0)
+    if ca == 0 and cb == 0:
+        # The loop variable does not appear, so every iteration accesses the same elements
+        return low <= difference <= high
+    if bounds.get(variable) is None:
+        if ca != cb:
+            return True
+        # c * (i - i') with i != i' is at least |c| away from zero
+        c = abs(ca)
+        return not (difference - high > -c and difference - low < c)
+    lo, hi = bounds[variable]
+    if lo == hi:
+        return False    # A single iteration carries no dependence
+    # i < i' and i > i' are two triangles, whose vertices are where ca * i - cb * i' is extreme
+    for vertices in (((lo, lo + 1), (lo, hi), (hi - 1, hi)), ((lo + 1, lo), (hi, lo), (hi, hi - 1))):
+        values = [ca * x - cb * y for x, y in vertices]
+        if low + min(values) <= difference <= high + max(values):
+            return True
+    return False
+
+def _gcd(a: int, b: int) -> int:
+    a, b = abs(a), abs(b)
+    while b:
+        a, b = b, a % b
+    return a
@@ -6,19 +6,22 @@ frontend. The frontend, meanwhile, should include this file and be agnostic
 about which particular backend it is using (the backend is passed into the
 frontend as an argument).
 """
-import acc.frontend.util.util as util
+import acc.frontend.util.grammar as grammar
 import acc.frontend.util.errors as errors
+import acc.ir.dependence as dependence
 import acc.ir.metavars as metavars
 import acc.ir.icv as icv
+import acc.ir.srcindex as srcindex
 import os
-import re
 
 class IrNode:
     """
     IntermediateRepresentation tree node. Base class for all types
     of Nodes.
     """
-    def __init__(self, lineno: int, src: str, children=None):
+    __slots__ = ("children", "lineno", "span")
+
+    def __init__(self, lineno: int, span: srcindex.Span = None, children=None):
         """
         An IrNode is a node in the IntermediateRepresentation tree.
         Each IrNode type contains all the specifics of their clauses,
@@ -26,7 +29,9 @@ class IrNode:
 
         - lineno: The line number (function-based - i.e., starting at 0 at the
                   function declaration) of the pragma that was found.
-        - src:    The source code that the node encompasses, if it encompasses any.
+        - span:   The region of the function's source code that the node encompasses,
+                  if it encompasses any. The span refers into the source and AST that
+                  the IntermediateRepresentation owns; see `src` for its text.
         """
         if children is None:
             self.children = []
@@ -34,7 +39,14 @@ class IrNode:
             self.children = children
 
         self.lineno = lineno
-        self.src = src
+        self.span = span
+
+    @property
+    def src(self) -> str:
+        """
+        The source code that the node encompasses, or None if it does not encompass any.
+        """
+        return None if self.span is None else self.span.text
 
     def add_child(self, child):
         """
@@ -46,10 +58,12 @@ class AccNode(IrNode):
     """
     The root of an IntermediateRepresentation tree.
     The line number of this node should be zero, and the
-    src should be the function's source.
+    span should be the whole function.
     """
-    def __init__(self, lineno: int, src: str):
-        super().__init__(lineno, src)
+    __slots__ = ()
+
+    def __init__(self, lineno: int, span: srcindex.Span):
+        super().__init__(lineno, span)
 
     def __str__(self):
         return "AccNode (Root)"
@@ -73,9 +87,11 @@ class IntermediateRepresentation:
         self.meta_data = meta_data                          # All the meta data
         self.internal_control_vars = icvs                   # All the ICVs for the back-end
         self.src = meta_data.src                            # Shortcut to the source code
-        self.root = AccNode(0, self.src)                    # The root of the tree
+        self.index = srcindex.SourceIndex(self.src)         # Where the pragmas are and what they govern
+        self.root = AccNode(0, self._get_function_span())   # The root of the tree
         self._lineno_lookup = {}                            # A hash table for line number -> IrNode
-        self.dependency_graph = self._construct_dgraph()    # A DAG for dependency relationships
+        self._dependency_graph = None                       # Built the first time it is needed; see dependency_graph
+        self.line_map = None                                # Set by the back end: for each line it returns, the line it came from
 
     def __repr__(self):
         s = ""
@@ -86,21 +102,50 @@ class IntermediateRepresentation:
     def __str__(self):
         return repr(self)
 
+    @property
+    def dependency_graph(self) -> dependence.DependencyGraph:
+        """
+        The dependence analysis of the decorated function: its def-use chains, the
+        dependences of its loops, and a DAG of the top-level regions by the variables
+        they read and write. It is built from the tree, so it is only built once the
+        front end has finished, the first time it is asked for.
+        """
+        if self._dependency_graph is None:
+            self._dependency_graph = self._construct_dgraph()
+        return self._dependency_graph
+
     def add_child(self, child):
         """
         Adds a child node to the tree. Determines where to add the node
-        by seeing what the node's line number is and then going back
-        up in the source code until it finds either the pragma construct
-        that encompasses this new node or else it reaches the top of the
-        function, in which case this node is added as a child of root.
+        by seeing what the node's line number is and then looking up
+        the pragma construct that encompasses this new node, if there is one.
+        If there isn't, this node is added as a child of root.
         """
         # Add the child to the hash table. There shouldn't already be a node for this line number.
         assert child.lineno not in self._lineno_lookup, "Line number {} already in hash. Hash: {}".format(child.lineno, self._lineno_lookup)
         self._lineno_lookup[child.lineno] = child
+        self._dependency_graph = None
 
         parent = self._get_parent(child)
         parent.add_child(child)
 
+    def remove_node(self, node: IrNode):
+        """
+        Removes `node`, and all the nodes under it, from the tree.
+        """
+        for parent in [self.root] + list(self.breadth_first_traversal()):
+            if any(child is node for child in parent.children):
+                parent.children = [child for child in parent.children if child is not node]
+                break
+
+        self._dependency_graph = None
+        removed = [node]
+        while removed:
+            n = removed.pop()
+            if self._lineno_lookup.get(n.lineno) is n:
+                del self._lineno_lookup[n.lineno]
+            removed.extend(n.children)
+
     def breadth_first_traversal(self):
         """
         Yields the nodes in the IR one at a time, in breadth first order.
@@ -138,6 +183,15 @@ class IntermediateRepresentation:
     def get_source_region(self, lineno: int) -> str:
         """
         Given a line number containing a pragma, return the source string that the
+        directive in that pragma encapsulates, or None if it does not encapsulate any.
+        See `get_source_span`.
+        """
+        span = self.get_source_span(lineno)
+        return None if span is None else span.text
+
+    def get_source_span(self, lineno: int) -> srcindex.Span:
+        """
+        Given a line number containing a pragma, return the span of the source that the
         directive in that pragma encapsulates. For example,
 
         ```python
@@ -174,41 +228,47 @@ class IntermediateRepresentation:
         ```
 
         If the pragma is one that does not encapsulate source code, None is returned.
+        The text of the span is not built until it is asked for.
         """
-        pragma = self._get_src_line_by_lineno(lineno)
-        directive, clause_list = util.parse_pragma_to_directive_and_clauses(pragma)
+        pragma = grammar.parse_pragma(self.get_pragma(lineno))
+        directive = pragma.directive
+        hybrid = bool(pragma.clauses) and pragma.clauses[0].name == "loop"
 
         # Check for loop hybrid
-        if directive == "parallel" and clause_list[0] == "loop":
+        if directive == "parallel" and hybrid:
             directive = "parallel loop"
-        elif directive == "kernels" and clause_list[0] == "loop":
+        elif directive == "kernels" and hybrid:
             directive = "kernels loop"
+        elif directive == "serial" and hybrid:
+            directive = "serial loop"
 
         # Now determine region based on directive
         if directive   == "parallel":
-            return self._get_region_from_scope_or_braces(lineno)
+            return self._get_span_from_scope_or_braces(lineno)
         elif directive == "kernels":
-            return self._get_region_from_scope_or_braces(lineno)
+            return self._get_span_from_scope_or_braces(lineno)
         elif directive == "parallel loop":
-            return self._get_region_from_scope(lineno)
+            return self._get_span_from_scope(lineno)
         elif directive == "kernels loop":
-            return self._get_region_from_scope(lineno)
+            return self._get_span_from_scope(lineno)
         elif directive == "serial":
-            return self._get_region_from_scope_or_braces(lineno)
+            return self._get_span_from_scope_or_braces(lineno)
+        elif directive == "serial loop":
+            return self._get_span_from_scope(lineno)
         elif directive == "data":
-            return self._get_region_from_scope_or_braces(lineno)
+            return self._get_span_from_scope_or_braces(lineno)
         elif directive == "enter":  # enter data
             return None
         elif directive == "exit":   # exit data
             return None
         elif directive == "host_data":
-            return self._get_region_from_scope_or_braces(lineno)
+            return self._get_span_from_scope_or_braces(lineno)
         elif directive == "loop":
-            return self._get_region_from_scope(lineno)
+            return self._get_span_from_scope(lineno)
         elif directive == "cache":
             return None
         elif directive == "atomic":
-            return self._get_src_line_by_lineno(lineno + 1)
+            return srcindex.Span(self.index, lineno + 1, lineno + 1, self.index.statement(lineno))
         elif directive == "declare":
             return None
         elif directive == "init":
@@ -222,46 +282,45 @@ class IntermediateRepresentation:
         elif directive == "wait":
             return None
         elif directive == "routine":
-            return self._get_region_from_scope(lineno)
+            return self._get_span_from_scope(lineno)
         else:
             raise ValueError("Unrecognized construct or directive:", directive)
 
-    def _construct_dgraph(self):
+    def get_pragma(self, lineno: int) -> str:
+        """
+        Returns the text of the pragma at the given line number, with any continuation
+        lines joined onto it.
+        """
+        return self.index.pragmas[lineno]
+
+    def pragmas(self):
+        """
+        Yields the text and line number of each pragma in the function, in order.
+        """
+        for lineno in sorted(self.index.pragmas):
+            yield self.index.pragmas[lineno], lineno
+
+    def _construct_dgraph(self) -> dependence.DependencyGraph:
         """
         Constructs a directed acyclic graph (DAG) for showing
         dependencies between all the variables in the decorated function's
         source code.
         """
-        # TODO
-        return []
+        return dependence.DependencyGraph(self)
 
     def _get_parent(self, child: IrNode) -> IrNode:
         """
-        Finds the parent of the given child. The last resort parent is the
+        Finds the parent of the given child: the node of the innermost compute construct
+        whose region contains the child's pragma. The last resort parent is the
         root node, which is the parent to everyone.
         """
-        # Get the source code above child and reverse it for easy iteration
-        src_lines_above_child = self.src.splitlines()[0:child.lineno]
-        src_lines_above_child.reverse()
-        line_numbers = [i for i in range(0, child.lineno)]
-        line_numbers.reverse()
-
-        # TODO: Determine the best way to specify 'code blocks' in Python
-        #       In C/C++, you can use curly braces to show the scope of the construct,
-        #       but in Python, that's not really an option. Probably best to do
-        #       a special comment to close the construct region.
-        # Walk up from here, looking for pragmas
-        regexp = re.compile(r"^((\s)*#(\s)*(pragma)(\s)*(acc))")
-        for lineno, line in zip(line_numbers, src_lines_above_child):
-            if regexp.match(line):
-                # This line is a '#pragma acc' line. Check if it encompasses me.
-                if self._pragma_encompasses_child(child, lineno):
-                    parent = self._get_node_by_lineno(lineno)
-                    assert parent is not None, "Could not find node for pragma {} at line {}".format(line, lineno)
-                    return parent
-
-        # If we get here it is because we have scanned the whole function and not
-        # found any nodes that encompass the child.
+        lineno = self.index.parents.get(child.lineno)
+        while lineno is not None:
+            parent = self._get_node_by_lineno(lineno)
+            if parent is not None:
+                return parent
+            # The enclosing construct did not make a node (it is not implemented); keep looking outward
+            lineno = self.index.parents.get(lineno)
         return self.root
 
     def _get_node_by_lineno(self, lineno: int) -> IrNode:
@@ -274,7 +333,13 @@ class IntermediateRepresentation:
         else:
             return None
 
-    def _get_region_from_scope_or_braces(self, lineno: int) -> str:
+    def _get_function_span(self) -> srcindex.Span:
+        """
+        Returns the span of the whole function.
+        """
+        return srcindex.Span(self.index, 0, len(self.index.lines) - 1)
+
+    def _get_span_from_scope_or_braces(self, lineno: int) -> srcindex.Span:
         """
         If the line after lineno is a commented open-brace ('#{'),
         the region spanned by the open and close braces will be returned. This will
@@ -296,94 +361,25 @@ class IntermediateRepresentation:
         would be returned with the `print("hello world")` removed, since it is not
         part of the for loop's block.
         """
-        nextline = self._get_src_line_by_lineno(lineno + 1)
-        regex = re.compile(r"(\s)*#(\s)*{.*")
-        if regex.match(nextline):
-            return self._get_region_from_braces(lineno)
-        else:
-            return self._get_region_from_scope(lineno)
-
-    def _get_region_from_braces(self, lineno: int) -> str:
-        """
-        Gets the region of source code starting from lineno + 1 which is enclosed
-        by commented braces. Lineno + 1 must be an open brace.
-        """
-        regex_open = re.compile(r"(\s)*#(\s)*{.*")
-        regex_close = re.compile(r"(\s)*#(\s)*}.*")
-
-        # Sanity check the input
-        openbrace = self._get_src_line_by_lineno(lineno + 1)
-        assert regex_open.match(openbrace), "Line {} should be an open brace but is '{}'.".format(lineno + 1, openbrace)
-
-        # Now walk through the lines starting at lineno + 1, adding the lines
-        # that are not a brace to the region_lines, and stopping once we reach the ending brace
-        possible_lines = self.src.splitlines()[lineno + 1 : ]
-        region_lines = []
-
-        # Because it is possible that we have multiple regions of brace-enclosed source,
-        # we must keep track of any open-braces we see, and only return once we have seen
-        # the right close-brace
-        nopens = 0
-        for line in possible_lines:
-            if regex_open.match(line):
-                nopens += 1
-            elif regex_close.match(line):
-                nopens -= 1
-
-            if nopens == 0:
-                return os.linesep.join(region_lines)
-            else:
-                region_lines.append(line)
-
-        errorlines = [self._get_src_line_by_lineno(i) for i in (lineno - 1, lineno)]
-        errorlines = os.linesep.join(errorlines)
-        raise SyntaxError("Missing closing brace for open brace at line {} inside of function. Lines around error: {}".format(lineno, errorlines))
+        span = self.index.braced_region(lineno)
+        if span is None:
+            return self._get_span_from_scope(lineno)
+        return srcindex.Span(self.index, *span)
 
-    def _get_region_from_scope(self, lineno: int) -> str:
+    def _get_span_from_scope(self, lineno: int) -> srcindex.Span:
         """
         Gets the region of source code starting from lineno + 1 which is governed
-        by Python's whitespace code block rules.
-        """
-        possible_lines = self.src.splitlines()[lineno + 1 : ]
-        region_lines = []
-
-        # TODO: Handle explicit line continuation (\)
-        # Walk the source lines starting at lineno + 1, and once our leading whitespace
-        # gets back to where we started, we are done
-        currentws = -1
-        for number, line in enumerate(possible_lines, start=lineno + 1):
-            if number == lineno + 1:
-                # This is the starting amount of leading whitespace
-                startingws = len(line) - len(line.lstrip(' '))
-            else:
-                currentws = len(line) - len(line.lstrip(' '))
-
-            if currentws == startingws:
-                break
-            else:
-                region_lines.append(line)
-
-        return os.linesep.join(region_lines)
+        by Python's whitespace code block rules: the statement after the pragma,
+        including any lines it is continued onto and any blocks nested in it.
+        If there is no statement, the span is empty.
+        """
+        span = self.index.region(lineno)
+        if span is None:
+            return srcindex.Span(self.index, lineno + 1, lineno)
+        return srcindex.Span(self.index, span[0], span[1], self.index.statement(lineno))
 
     def _get_src_line_by_lineno(self, lineno: int) -> str:
         """
         Returns the source code at the given function-oriented line number.
         """
-        return self.src.splitlines()[lineno]
-
-    def _pragma_encompasses_child(self, child: IrNode, lineno: int) -> bool:
-        """
-        Returns True if the given child node should be contained in the pragma
-        found in the source code at lineno. Returns False otherwise.
-
-        According to my reading of the spec, only kernels, serial, and parallel
-        constructs can encompass other nodes.
-        """
-        # Get the directive from the pragma
-        pragma = self.src.splitlines()[lineno]
-        directive_and_clauses = pragma.partition("acc")[-1].split(' ')
-        directive_and_clauses = [word for word in directive_and_clauses if word != '']
-        directive = directive_and_clauses[0]
-
-        # Determine if we are contained in this pragma
-        return directive in ("parallel", "kernels", "serial")
+        return self.index.lines[lineno]
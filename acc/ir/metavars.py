@@ -13,7 +13,7 @@ class MetaVars:
     def __init__(self, *, src=None, stackframe=None, signature=None,
                     signature_vars=None, callers_mods=None, callers_funcs=None,
                     funcs_mods=None, funcs_funcs=None, funcs_name=None,
-                    funcs_module=None):
+                    funcs_module=None, arguments=None):
         """
         @param src:             The source code of the acc-decorated-function,
                                 including the `def whatever(args):` line, but NOT
@@ -44,6 +44,10 @@ class MetaVars:
         @param funcs_name:      The name of the acc-decorated function
 
         @param funcs_module:    The module in which the function is defined
+
+        @param arguments:       The values that the acc-decorated-function was
+                                called with this time, by parameter name (a dict),
+                                including the defaults of the ones that were not given
         """
         self.src = src
         self.stackframe = stackframe
@@ -54,6 +58,7 @@ class MetaVars:
         self.funcs_funcs = funcs_funcs
         self.funcs_name = funcs_name
         self.funcs_module = funcs_module
+        self.arguments = arguments
 
     def __str__(self):
         s = ""
@@ -67,6 +72,7 @@ class MetaVars:
         s += "funcs_funcs: " + os.linesep + str(self.funcs_funcs) + os.linesep
         s += "funcs_name: " + os.linesep + str(self.funcs_name) + os.linesep
         s += "funcs_module: " + os.linesep + str(self.funcs_module) + os.linesep
+        s += "arguments: " + os.linesep + str(self.arguments) + os.linesep
         s += ")"
 
         return s
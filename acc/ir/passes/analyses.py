@@ -0,0 +1,63 @@
+"""
+This module contains the analyses of the decorated function that the other
+passes share.
+"""
+import acc.frontend.util.util as util
+import acc.ir.dependence as dependence
+import acc.ir.passes.passmanager as passmanager
+import ast
+
+class FunctionAST(passmanager.Analysis):
+    """
+    The AST of the decorated function (the `def` statement), parsed once for every
+    pass that needs it. Its line numbers are 1-based: line 1 is the `def` line.
+    """
+    name = "function-ast"
+
+    def run(self, intermediate_rep, manager):
+        return ast.parse(util.left_strip_src(intermediate_rep.src)).body[0]
+
+class BoundNames(passmanager.Analysis):
+    """
+    The names that the decorated function binds: its parameters and every name that
+    it assigns to, deletes, defines or imports. Any other name that the function uses
+    is a global (or a builtin).
+    """
+    name = "bound-names"
+    requires = ("function-ast",)
+
+    def run(self, intermediate_rep, manager):
+        funcdef = manager.get_analysis("function-ast", intermediate_rep)
+        names = set()
+
+        args = funcdef.args
+        for arg in args.args + args.kwonlyargs + getattr(args, "posonlyargs", []):
+            names.add(arg.arg)
+        for arg in (args.vararg, args.kwarg):
+            if arg is not None:
+                names.add(arg.arg)
+
+        for node in ast.walk(funcdef):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                names.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node is not funcdef:
+                names.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    names.add(alias.asname if alias.asname else alias.name.split(".")[0])
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                names.add(node.name)
+        return names
+
+class Dependences(passmanager.Analysis):
+    """
+    The dependence analysis of the decorated function (see acc.ir.dependence): its
+    def-use chains, the dependences of its loops, and the DAG of the IR's top-level
+    regions. The IR keeps a copy too, but that one is not thrown away when a transform
+    changes the tree behind its back.
+    """
+    name = "dependences"
+    requires = ("function-ast",)
+
+    def run(self, intermediate_rep, manager):
+        return dependence.DependencyGraph(intermediate_rep, manager.get_analysis("function-ast", intermediate_rep))
@@ -0,0 +1,222 @@
+"""
+This module contains the auto-parallelization pass.
+
+A loop construct with the auto clause, or a loop construct in a kernels region
+with no independent or seq clause (which is treated as if it had the auto clause),
+leaves it to the implementation to decide how to run the loop. This pass decides,
+for each such loop, one of:
+
+- "seq":    run the loop sequentially. This is chosen when the dependence analysis
+            (acc.ir.dependence) cannot show that the iterations are independent, when
+            the enclosing and enclosed loops leave no level of parallelism for it, or
+            when the cost model (acc.ir.passes.costmodel) estimates that launching
+            gangs would take longer than running the loop on the local thread.
+- "gang":   partition the iterations among the gangs.
+- "worker": partition them among the workers of a gang (for a loop inside a gang loop).
+- "vector": run them in vector mode (for the innermost parallel loop).
+
+The outermost level of parallelism that is still free is chosen, since that is the
+one that has the most work per launch, except that an innermost loop inside a gang
+loop is run in vector mode. The decision is kept in the loop node's
+`schedule`, along with a Decision that says why, and `report` turns the decisions
+for every loop into a human-readable report, which is printed to stderr after the
+pass runs if the ACC_AUTO_REPORT environment variable is set to 1. (The report that
+ACC_INFO turns on, see acc.info, includes these decisions along with the rest of
+what was done to the function.)
+"""
+import acc.frontend.kernels.kernels as kernels
+import acc.frontend.loop.loop as loop
+import acc.frontend.serial.serial as serial
+import acc.ir.passes.constfold as constfold
+import acc.ir.passes.costmodel as costmodel
+import acc.ir.passes.passmanager as passmanager
+import ast
+import os
+import sys
+
+# Print the report of the decisions after every run of the pass
+DEFAULT_REPORT = os.environ.get("ACC_AUTO_REPORT", "0") == "1"
+
+# The levels of parallelism, outermost first
+LEVELS = ("gang", "worker", "vector")
+
+class Decision:
+    """
+    How a loop is to be run, and why.
+
+    Items
+    -----
+
+    - schedule  : "seq", "gang", "worker" or "vector".
+    - automatic : True if the schedule was chosen by this pass, False if it was given by the loop's clauses.
+    - reasons   : Why the schedule was chosen.
+    - cost      : The costmodel.LoopCost of the loop, if it was estimated.
+    - num_gangs : The number of gangs that the cost was estimated for.
+    """
+    __slots__ = ("schedule", "automatic", "reasons", "cost", "num_gangs")
+
+    def __init__(self, schedule: str, automatic: bool, reasons: [str], cost=None, num_gangs=None):
+        self.schedule = schedule
+        self.automatic = automatic
+        self.reasons = list(reasons)
+        self.cost = cost
+        self.num_gangs = num_gangs
+
+    def __str__(self):
+        s = "{} ({})".format(self.schedule, "auto" if self.automatic else "clause")
+        if self.reasons:
+            s += ": " + "; ".join(self.reasons)
+        if self.cost is not None:
+            s += "; trip count {}{}, {:g} operations per iteration, {} bytes to transfer".format(
+                self.cost.trip_count, "" if self.cost.known_trip_count else " (assumed)", self.cost.body_cost, self.cost.bytes)
+            if self.num_gangs is not None:
+                s += "; estimated {:.3g} ms sequential, {:.3g} ms on {} gangs".format(
+                    self.cost.sequential() * 1e3, self.cost.parallel(self.num_gangs) * 1e3, self.num_gangs)
+        return s
+
+class AutoParallelization(passmanager.Transform):
+    """
+    Decides how to run the loops that are left to the implementation. See the module docstring.
+    """
+    name = "auto-parallelization"
+    requires = ("dependences", "dead-regions")
+    preserves = ("function-ast", "bound-names", "dependences")
+
+    def run(self, intermediate_rep, manager):
+        graph = manager.get_analysis("dependences", intermediate_rep)
+        loops = [node for node in intermediate_rep.breadth_first_traversal() if type(node) == loop.LoopNode]
+        loops.sort(key=lambda node: node.lineno)
+
+        auto = [node for node in loops if _is_auto(node, intermediate_rep)]
+        changed = False
+        for node in loops:
+            if any(type(ancestor) == serial.SerialNode for ancestor in _ancestors(node, intermediate_rep)):
+                # A serial region has one gang of one worker with one vector lane
+                node.decision = Decision("seq", False, ["in a serial region"])
+            elif any(node is a for a in auto):
+                node.decision = _decide(node, loops, auto, intermediate_rep, graph)
+                node.schedule = node.decision.schedule
+                changed = True
+            else:
+                node.decision = Decision(_clause_schedule(node), False, [_clause_reason(node)])
+
+        if DEFAULT_REPORT:
+            for line in report(intermediate_rep):
+                print(line, file=sys.stderr)
+        return changed
+
+def report(intermediate_rep) -> [str]:
+    """
+    Returns one line for each loop construct in the IR that has been through the pass,
+    saying how it will be run and why, in source order.
+    """
+    name = intermediate_rep.meta_data.funcs_name
+    loops = sorted((node for node in intermediate_rep.breadth_first_traversal() if type(node) == loop.LoopNode and node.decision is not None),
+                   key=lambda node: node.lineno)
+    return ["{}:{}: loop {}".format(name, node.lineno, node.decision) for node in loops]
+
+def _is_auto(node, intermediate_rep) -> bool:
+    """
+    Returns True if how to run the loop of `node` is up to the implementation.
+    """
+    if node.auto:
+        return True
+    if node.seq or node.independent or node.gang is not None or node.worker is not None or node.vector is not None:
+        return False
+    return any(type(ancestor) == kernels.KernelsNode for ancestor in _ancestors(node, intermediate_rep))
+
+def _clause_schedule(node) -> str:
+    """
+    Returns the schedule that the clauses of a loop that is not auto ask for.
+    """
+    if node.seq:
+        return "seq"
+    for level in LEVELS:
+        if getattr(node, level) is not None:
+            return level
+    return "gang"
+
+def _clause_reason(node) -> str:
+    if node.seq:
+        return "seq clause"
+    for level in LEVELS:
+        if getattr(node, level) is not None:
+            return "{} clause".format(level)
+    return "independent clause" if node.independent else "implied independent in a parallel region"
+
+def _decide(node, loops, auto, intermediate_rep, graph) -> Decision:
+    """
+    Decides how to run the auto loop of `node`. `loops` is every loop node in the IR, in source
+    order, and `auto` is the ones that are auto.
+    """
+    forloop = node.span.node if node.span is not None else None
+    if not isinstance(forloop, ast.For):
+        return Decision("seq", True, ["there is no for loop after the pragma"])
+
+    dependence = graph.loop_dependence(forloop.lineno - 1)
+    if dependence is None or not dependence.independent:
+        return Decision("seq", True, dependence.reasons if dependence is not None else ["the loop could not be analysed"])
+
+    levels = _free_levels(node, loops, auto)
+    if not levels:
+        return Decision("seq", True, ["the enclosing and enclosed loops leave no level of parallelism free"])
+
+    cost = costmodel.estimate(forloop, intermediate_rep.meta_data.arguments)
+    if cost.trip_count < 2:
+        return Decision("seq", True, ["the loop runs at most once"], cost)
+    if levels[0] != "gang":
+        # Inside a gang loop: no gangs to launch, and no data to transfer. The innermost loop
+        # takes the innermost level, leaving the levels in between for the loops around it.
+        innermost = not any(node.span.first <= other.lineno <= node.span.last and node.lineno < other.lineno for other in loops)
+        return Decision(levels[-1] if innermost else levels[0], True, ["the iterations are independent"], cost)
+
+    num_gangs = _num_gangs(node, intermediate_rep)
+    if cost.parallel(num_gangs) >= cost.sequential():
+        return Decision("seq", True, ["launching gangs would cost more than it saves"], cost, num_gangs)
+    return Decision("gang", True, ["the iterations are independent"], cost, num_gangs)
+
+def _free_levels(node, loops, auto) -> [str]:
+    """
+    Returns the levels of parallelism that the loops enclosing and enclosed by `node`
+    have left for it: a loop can only use a level that is inside the levels of every
+    loop around it, and outside the levels of every loop in it.
+    """
+    outer, inner = -1, len(LEVELS)
+    for other in loops:
+        if other is node or other.span is None or node.span is None:
+            continue
+        schedule = other.schedule if any(other is a for a in auto) else _clause_schedule(other)
+        if schedule not in LEVELS:
+            # Sequential, or an auto loop that has not been decided yet
+            continue
+        level = LEVELS.index(schedule)
+        if other.span.first <= node.lineno <= other.span.last and other.lineno < node.lineno:
+            outer = max(outer, level)
+        elif node.span.first <= other.lineno <= node.span.last and node.lineno < other.lineno:
+            inner = min(inner, level)
+    return list(LEVELS[outer + 1:inner])
+
+def _num_gangs(node, intermediate_rep) -> int:
+    """
+    Returns the number of gangs that the compute construct around `node` launches.
+    """
+    for ancestor in _ancestors(node, intermediate_rep):
+        expr = getattr(ancestor, "num_gangs", None)
+        if isinstance(expr, str) and constfold.is_constant(expr):
+            value = ast.literal_eval(expr)
+            if type(value) is int and value > 0:
+                return value
+    return costmodel.DEFAULT_NUM_GANGS
+
+def _ancestors(node, intermediate_rep) -> list:
+    """
+    Returns the ancestors of `node` in the tree, innermost first. Unlike
+    IntermediateRepresentation.get_ancestors, this finds the compute construct of a
+    combined construct (e.g., `parallel loop`), whose pragma is the loop's own pragma.
+    """
+    for parent in [intermediate_rep.root] + list(intermediate_rep.breadth_first_traversal()):
+        if any(child is node for child in parent.children):
+            if parent is intermediate_rep.root:
+                return [parent]
+            return [parent] + intermediate_rep.get_ancestors(parent)
+    return intermediate_rep.get_ancestors(node)
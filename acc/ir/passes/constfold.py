@@ -0,0 +1,135 @@
+"""
+This module contains the constant folding pass.
+
+The arguments of clauses like num_gangs and if are kept as source text, since
+they may refer to variables that only exist when the decorated function runs.
+But often they are constants, or arithmetic on constants, or refer to constants
+defined at the top of the decorated function's module:
+
+```python
+NGANGS = 4
+
+@acc()
+def f(a):
+    # pragma acc parallel loop num_gangs(NGANGS * 2) if(DEBUG == False)
+    ...
+```
+
+This pass evaluates those arguments when it can, and replaces them with the
+literal they evaluate to (here, "8" and "True"), which the later passes (and the
+back end) can then act on. The decorated function is rewritten every time it is
+called, so a module global's value at the time of the call is the value it has
+for the whole call.
+"""
+import acc.frontend.util.util as util
+import acc.ir.passes.passmanager as passmanager
+import ast
+import operator
+
+# The clause arguments (node attributes) that are folded
+FOLDABLE_CLAUSES = ("num_gangs", "num_workers", "vector_length", "if_", "self_")
+
+# The types of module global that are substituted for their names
+CONSTANT_TYPES = (bool, int, float, type(None))
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+    ast.BitAnd: operator.and_, ast.BitOr: operator.or_, ast.BitXor: operator.xor,
+    ast.LShift: operator.lshift, ast.RShift: operator.rshift,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg, ast.Not: operator.not_, ast.Invert: operator.invert}
+_COMPARISONS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Is: operator.is_, ast.IsNot: operator.is_not,
+}
+
+class _NotConstant(Exception):
+    """
+    Raised while evaluating an expression that is not a constant.
+    """
+    pass
+
+class ConstantFolding(passmanager.Transform):
+    """
+    Folds the constant arguments of the clauses in FOLDABLE_CLAUSES. See the module docstring.
+    """
+    name = "constant-folding"
+    requires = ("bound-names",)
+    preserves = ("function-ast", "bound-names")
+
+    def run(self, intermediate_rep, manager):
+        constants = _module_constants(intermediate_rep, manager.get_analysis("bound-names", intermediate_rep))
+        changed = False
+        for node in intermediate_rep.breadth_first_traversal():
+            for attr in FOLDABLE_CLAUSES:
+                expr = getattr(node, attr, None)
+                if not isinstance(expr, str):
+                    continue
+                folded = fold(expr, constants)
+                if folded != expr:
+                    setattr(node, attr, folded)
+                    changed = True
+        return changed
+
+def fold(expr: str, constants=None) -> str:
+    """
+    Returns the source text of the literal that `expr` evaluates to, if it only
+    involves literals and the names in `constants` (a dict of name -> value), or
+    `expr` itself if it does not.
+    """
+    try:
+        value = _evaluate(ast.parse(expr, mode="eval").body, constants or {})
+    except (_NotConstant, SyntaxError, ArithmeticError, TypeError, ValueError):
+        return expr
+    return repr(value)
+
+def is_constant(expr: str) -> bool:
+    """
+    Returns True if `expr` is a literal (e.g. after folding).
+    """
+    try:
+        ast.literal_eval(expr)
+    except (SyntaxError, ValueError):
+        return False
+    return True
+
+def _module_constants(intermediate_rep, bound: set) -> dict:
+    """
+    Returns the module globals that the decorated function can see and does not
+    rebind, and whose values are constants.
+    """
+    module = intermediate_rep.meta_data.funcs_module
+    if module is None:
+        return {}
+    return {name: value for name, value in vars(module).items() if name not in bound and type(value) in CONSTANT_TYPES}
+
+def _evaluate(node, constants: dict):
+    """
+    Evaluates the expression `node`, raising _NotConstant if it is not a constant.
+    """
+    if util.is_literal(node) and type(util.literal_value(node)) in CONSTANT_TYPES:
+        return util.literal_value(node)
+    elif isinstance(node, ast.Name) and node.id in constants:
+        return constants[node.id]
+    elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        return _BINARY_OPERATORS[type(node.op)](_evaluate(node.left, constants), _evaluate(node.right, constants))
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand, constants))
+    elif isinstance(node, ast.BoolOp):
+        values = [_evaluate(v, constants) for v in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = (result and value) if isinstance(node.op, ast.And) else (result or value)
+        return result
+    elif isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+        left = _evaluate(node.left, constants)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, constants)
+            if not _COMPARISONS[type(op)](left, right):
+                return False
+            left = right
+        return True
+    elif isinstance(node, ast.IfExp):
+        return _evaluate(node.body if _evaluate(node.test, constants) else node.orelse, constants)
+    raise _NotConstant()
@@ -0,0 +1,228 @@
+"""
+This module contains the cost model that the auto-parallelization pass uses to
+decide whether a loop is worth running on the gangs.
+
+A loop's cost is estimated from its AST and, when they are known, from the values
+that the decorated function was called with (the function is rewritten every time
+it is called, so those are the values for this call):
+
+- The trip count: how many times the loop runs. `range(...)` with arguments that
+  are literals, integer arguments or `len(...)` of arguments, and loops directly
+  over (or enumerate/zip/reversed of) sized arguments, are counted exactly.
+  Otherwise the trip count is DEFAULT_TRIP_COUNT.
+- The body cost: how many operations (AST nodes) one iteration runs, with nested
+  loops counted as many times as they run.
+- The bytes to transfer: the size of the arguments that the loop uses, which have to
+  be sent to the gangs (and, for the ones it writes, sent back).
+
+Running the loop on n gangs costs the launch overhead of each gang, plus the time
+to transfer the data, plus 1/n of the time to run the loop on the local thread.
+The costs of each of those are in seconds, and can be tuned with the environment
+variables ACC_GANG_LAUNCH_COST, ACC_TRANSFER_COST and ACC_OPERATION_COST.
+"""
+import acc.frontend.util.util as util
+import ast
+import os
+
+# Seconds to launch a region on one gang (send it the kernel and wait for its reply)
+DEFAULT_GANG_LAUNCH_COST = float(os.environ.get("ACC_GANG_LAUNCH_COST", 2e-4))
+
+# Seconds to transfer one byte to or from a gang
+DEFAULT_TRANSFER_COST = float(os.environ.get("ACC_TRANSFER_COST", 1e-9))
+
+# Seconds to run one operation (AST node) of a loop's body on the local thread
+DEFAULT_OPERATION_COST = float(os.environ.get("ACC_OPERATION_COST", 5e-8))
+
+# The trip count assumed for a loop whose trip count cannot be worked out
+DEFAULT_TRIP_COUNT = int(os.environ.get("ACC_DEFAULT_TRIP_COUNT", 1000))
+
+# The number of gangs assumed when the compute construct does not say
+DEFAULT_NUM_GANGS = os.cpu_count() or 1
+
+# The size, in bytes, assumed for an item of a variable whose size is not known
+DEFAULT_ITEM_SIZE = 8
+
+# The operations that a call to a function is counted as, on top of its arguments
+CALL_OPERATIONS = 10
+
+class LoopCost:
+    """
+    The estimated cost of a loop.
+
+    Items
+    -----
+
+    - trip_count       : How many times the loop runs.
+    - known_trip_count : True if the trip count was worked out, False if it is DEFAULT_TRIP_COUNT.
+    - body_cost        : The operations in one iteration.
+    - bytes            : The bytes that would be transferred to and from the gangs.
+    """
+    __slots__ = ("trip_count", "known_trip_count", "body_cost", "bytes")
+
+    def __init__(self, trip_count: int, known_trip_count: bool, body_cost: float, nbytes: int):
+        self.trip_count = trip_count
+        self.known_trip_count = known_trip_count
+        self.body_cost = body_cost
+        self.bytes = nbytes
+
+    def __repr__(self):
+        return "LoopCost(trip_count={}, body_cost={}, bytes={})".format(self.trip_count, self.body_cost, self.bytes)
+
+    def sequential(self) -> float:
+        """
+        Returns the estimated seconds to run the loop on the local thread.
+        """
+        return self.trip_count * self.body_cost * DEFAULT_OPERATION_COST
+
+    def parallel(self, num_gangs: int) -> float:
+        """
+        Returns the estimated seconds to run the loop on `num_gangs` gangs.
+        """
+        num_gangs = max(1, min(num_gangs, self.trip_count))
+        return num_gangs * DEFAULT_GANG_LAUNCH_COST + self.bytes * DEFAULT_TRANSFER_COST + self.sequential() / num_gangs
+
+def estimate(loop: ast.For, arguments=None) -> LoopCost:
+    """
+    Returns the LoopCost of the for loop `loop`.
+
+    @param loop:        The loop's AST node.
+
+    @param arguments:   The values that the decorated function was called with, by
+                        parameter name, or None if they are not known.
+    """
+    arguments = arguments or {}
+    trips = trip_count(loop.iter, arguments)
+    known = trips is not None
+    trips = DEFAULT_TRIP_COUNT if trips is None else trips
+    return LoopCost(trips, known, _cost(loop.body, arguments), _transfer_bytes(loop, arguments, trips))
+
+def trip_count(iterable, arguments: dict):
+    """
+    Returns the number of items in the iterable of a for loop, or None if it cannot be worked out.
+    """
+    if isinstance(iterable, ast.Name):
+        return _length(arguments.get(iterable.id))
+    if not (isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name)):
+        return None
+    name, args = iterable.func.id, iterable.args
+    if name == "range" and 1 <= len(args) <= 3:
+        values = [_integer(arg, arguments) for arg in args]
+        if None in values or values[-1] == 0:
+            return None
+        return len(range(*values))
+    if name in ("enumerate", "reversed", "sorted", "list", "tuple") and len(args) >= 1:
+        return trip_count(args[0], arguments)
+    if name == "zip" and args:
+        counts = [trip_count(arg, arguments) for arg in args]
+        return None if None in counts else min(counts)
+    return None
+
+def _integer(node, arguments: dict):
+    """
+    Returns the value of the integer expression `node`, or None if it cannot be worked out.
+    """
+    if util.is_literal(node) and type(util.literal_value(node)) is int:
+        return util.literal_value(node)
+    elif isinstance(node, ast.Name):
+        value = arguments.get(node.id)
+        return value if type(value) is int else None
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _integer(node.operand, arguments)
+        return None if value is None else -value
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.FloorDiv)):
+        left, right = _integer(node.left, arguments), _integer(node.right, arguments)
+        if left is None or right is None or (isinstance(node.op, ast.FloorDiv) and right == 0):
+            return None
+        if isinstance(node.op, ast.Add):
+            return left + right
+        elif isinstance(node.op, ast.Sub):
+            return left - right
+        elif isinstance(node.op, ast.Mult):
+            return left * right
+        return left // right
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and len(node.args) == 1 and node.func.id == "len":
+        return trip_count(node.args[0], arguments)
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.args and node.func.id in ("min", "max"):
+        values = [_integer(arg, arguments) for arg in node.args]
+        return None if None in values else (min(values) if node.func.id == "min" else max(values))
+    return None
+
+def _length(value):
+    """
+    Returns len(value), or None if `value` has no length. Never iterates over `value`.
+    """
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+def _cost(statements: list, arguments: dict) -> float:
+    """
+    Returns the operations that running `statements` once takes.
+    """
+    total = 0.0
+    for stmt in statements:
+        if isinstance(stmt, ast.For):
+            trips = trip_count(stmt.iter, arguments)
+            trips = DEFAULT_TRIP_COUNT if trips is None else trips
+            total += _operations(stmt.iter) + trips * _cost(stmt.body, arguments) + _cost(stmt.orelse, arguments)
+        elif isinstance(stmt, ast.While):
+            total += DEFAULT_TRIP_COUNT * (_operations(stmt.test) + _cost(stmt.body, arguments))
+        elif isinstance(stmt, ast.If):
+            total += _operations(stmt.test) + max(_cost(stmt.body, arguments), _cost(stmt.orelse, arguments))
+        elif isinstance(stmt, (ast.With, ast.Try)):
+            total += _cost(stmt.body, arguments)
+        else:
+            total += _operations(stmt)
+    return total
+
+def _operations(node) -> int:
+    """
+    Returns the operations in a simple statement or expression.
+    """
+    count = 0
+    for n in ast.walk(node):
+        if isinstance(n, (ast.expr_context, ast.operator, ast.cmpop, ast.boolop, ast.unaryop)):
+            continue
+        count += CALL_OPERATIONS if isinstance(n, ast.Call) else 1
+    return count
+
+def _transfer_bytes(loop: ast.For, arguments: dict, trips: int) -> int:
+    """
+    Returns the bytes of the variables that `loop` uses that would be sent to the gangs,
+    counting the ones that it writes twice (they come back, too).
+    """
+    used, written = set(), set()
+    for node in ast.walk(loop):
+        if isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, ast.Store):
+            while isinstance(node, (ast.Subscript, ast.Attribute)):
+                node = node.value
+            if isinstance(node, ast.Name):
+                written.add(node.id)
+
+    total = 0
+    for name in used:
+        if name in arguments:
+            size = value_size(arguments[name])
+        elif name in written:
+            size = trips * DEFAULT_ITEM_SIZE
+        else:
+            continue
+        total += 2 * size if name in written else size
+    return total
+
+def value_size(value) -> int:
+    """
+    Returns the approximate size, in bytes, of `value` when it is sent to a gang.
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    length = _length(value)
+    if length is not None:
+        return length * DEFAULT_ITEM_SIZE
+    return DEFAULT_ITEM_SIZE
@@ -0,0 +1,55 @@
+"""
+This module contains the dead region elimination pass.
+
+A compute construct whose if clause is false, or whose self clause is true, runs
+on the local thread, exactly as if there were no pragma:
+
+```python
+# pragma acc parallel loop if(False)
+for i in range(n):
+    ...
+```
+
+Once constant folding has turned the condition into a literal, this pass removes
+such a node (and the nodes inside its region) from the IR, so the back end leaves
+the region's source alone instead of launching gangs for it. A condition that is
+known to be true (or a self clause that is known to be false) is dropped from the
+node, since it is the same as not having the clause at all.
+"""
+import acc.ir.passes.constfold as constfold
+import acc.ir.passes.passmanager as passmanager
+import ast
+
+class DeadRegionElimination(passmanager.Transform):
+    """
+    Removes the compute regions that are known to run on the local thread. See the module docstring.
+    """
+    name = "dead-regions"
+    requires = ("constant-folding",)
+    preserves = ("function-ast", "bound-names")
+
+    def run(self, intermediate_rep, manager):
+        dead = []
+        for node in intermediate_rep.breadth_first_traversal():
+            if_ = _constant_value(getattr(node, "if_", None))
+            self_ = _constant_value(getattr(node, "self_", None))
+            if if_ is False or self_ is True:
+                dead.append(node)
+                continue
+            if if_ is True:
+                node.if_ = None
+            if self_ is False:
+                node.self_ = None
+
+        for node in dead:
+            intermediate_rep.remove_node(node)
+        return bool(dead)
+
+def _constant_value(expr):
+    """
+    Returns the truth of the clause argument `expr` if it is a literal, or None if it is
+    not (or if there is no argument).
+    """
+    if not isinstance(expr, str) or not constfold.is_constant(expr):
+        return None
+    return bool(ast.literal_eval(expr))
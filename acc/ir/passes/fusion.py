@@ -0,0 +1,220 @@
+"""
+This module contains the loop fusion pass.
+
+Back-to-back parallel loops over the same iteration space each pay for a launch
+(and, on the host, for sending their data to the gangs and back):
+
+```python
+# pragma acc parallel loop
+for i in range(n):
+    b[i] = a[i] * 2
+# pragma acc parallel loop
+for i in range(n):
+    c[i] = b[i] + 1
+```
+
+This pass fuses such loops into one kernel, which runs the body of the second loop
+right after the body of the first, for each iteration. Two loops are fused when:
+
+- they are next to each other, with nothing but comments and blank lines between
+  them: two `parallel loop`s at the top level of the function, or two loop nests at
+  the top level of the same kernels region;
+- they have the same loop variable and loop over the same iterable, which the first
+  loop does not rebind or modify;
+- both are partitioned among the gangs (see acc.ir.passes.autopar), and neither has
+  a collapse, tile, private or reduction clause, or the nofuse clause;
+- for two `parallel loop`s, their compute constructs have the same num_gangs, async
+  and wait clauses, no if, self, private, firstprivate or reduction clauses, and give
+  every variable that they both use the same data clause;
+- and the dependence analysis can show that the iterations of the fused loop are
+  still independent, so that no iteration of the second loop needs what another
+  iteration of the first loop computes.
+
+The second loop's LoopNode is appended to the first's `fused` list, and its nodes
+are removed from the IR. The back end
+then builds one kernel for all of them. Any number of loops in a row may be fused
+this way. The `nofuse` clause on a loop keeps it on its own, and the whole pass can
+be turned off with ACC_DISABLE_PASSES=loop-fusion.
+"""
+import acc.frontend.kernels.kernels as kernels
+import acc.frontend.loop.loop as loop
+import acc.frontend.parallel.parallel as parallel
+import acc.ir.passes.passmanager as passmanager
+import ast
+
+# The data clauses that give a variable its transfer mode, in the order they are looked up
+DATA_CLAUSES = ("copy", "copyin", "copyout", "create", "no_create", "present")
+
+# The clauses of a loop construct that keep it from being fused
+LOOP_CLAUSES = ("collapse", "tile", "private", "reduction", "nofuse")
+
+# The clauses of a parallel construct that keep its loop from being fused
+PARALLEL_CLAUSES = ("if_", "self_", "private", "firstprivate", "reduction")
+
+class LoopFusion(passmanager.Transform):
+    """
+    Fuses adjacent compatible parallel loops. See the module docstring.
+    """
+    name = "loop-fusion"
+    requires = ("dependences", "auto-parallelization")
+    preserves = ("function-ast", "bound-names")
+
+    def run(self, intermediate_rep, manager):
+        graph = manager.get_analysis("dependences", intermediate_rep)
+        changed = False
+
+        # parallel loops at the top level of the function
+        regions = sorted((node for node in intermediate_rep.root.children if type(node) == parallel.ParallelNode),
+                         key=lambda node: node.lineno)
+        regions = [node for node in regions if _hybrid_loop_node(node) is not None]
+        compatible = lambda first, second: (_compatible_loops(_hybrid_loop_node(first), _hybrid_loop_node(second), intermediate_rep, graph)
+                                            and _compatible_regions(first, second))
+        for first, second in _runs(regions, compatible):
+            _merge_regions(first, second)
+            _hybrid_loop_node(first).fused.append(_hybrid_loop_node(second))
+            intermediate_rep.remove_node(second)
+            changed = True
+
+        # Loop nests at the top level of a kernels region
+        for node in list(intermediate_rep.breadth_first_traversal()):
+            if type(node) != kernels.KernelsNode:
+                continue
+            nests = sorted((child for child in node.children if type(child) == loop.LoopNode and child.lineno != node.lineno and child.span is not None),
+                           key=lambda child: child.span.first)
+            nests = [child for child in nests if any(child.span.first == first for first, _, _ in intermediate_rep.index.statements(node.span.first, node.span.last))]
+            compatible = lambda first, second: _compatible_loops(first, second, intermediate_rep, graph)
+            for first, second in _runs(nests, compatible):
+                first.fused.append(second)
+                intermediate_rep.remove_node(second)
+                changed = True
+        return changed
+
+def _runs(nodes: list, compatible):
+    """
+    Yields (first, second) for each node `second` in `nodes` (in source order) that may be
+    fused into the node `first` before it, according to `compatible(first, second)`, where
+    `first` is the node that the run of nodes before `second` has been fused into. The caller
+    must fuse each pair it is given before asking for the next one.
+    """
+    head = None
+    for node in nodes:
+        if head is not None and compatible(head, node):
+            yield head, node
+            continue
+        head = node
+
+def _compatible_loops(first, second, intermediate_rep, graph) -> bool:
+    """
+    Returns True if the loop of LoopNode `second` may be fused into that of LoopNode `first`
+    (and the loops already fused into it).
+    """
+    for node in (first, second):
+        if node.span is None or not isinstance(node.span.node, ast.For) or node.decision is None or node.decision.schedule != "gang":
+            return False
+        if node.seq or any(getattr(node, clause) is not None for clause in LOOP_CLAUSES):
+            return False
+
+    # Next to each other, in the same block
+    last = (first.fused[-1] if first.fused else first).span.last
+    lines = intermediate_rep.index.lines
+    if not all(not line.strip() or line.strip().startswith("#") for line in lines[last + 1:second.span.first]):
+        return False
+    if _indentation(lines[first.span.first]) != _indentation(lines[second.span.first]):
+        return False
+
+    # The same iteration space
+    one, other = first.span.node, second.span.node
+    if not isinstance(one.target, ast.Name) or ast.dump(one.target) != ast.dump(other.target) or ast.dump(one.iter) != ast.dump(other.iter):
+        return False
+    loops = [first] + first.fused
+    names = {n.id for n in ast.walk(one.iter) if isinstance(n, ast.Name)}
+    if any(_modifies(node.span.node, names) for node in loops):
+        return False
+
+    # Still independent once fused
+    linenos = [node.span.first for node in loops + [second]]
+    for lineno in linenos:
+        dependence = graph.loop_dependence(lineno)
+        if dependence is None or not dependence.independent:
+            return False
+    dependence = graph.fused_dependence(linenos)
+    return dependence is not None and dependence.independent
+
+def _compatible_regions(first, second) -> bool:
+    """
+    Returns True if the parallel loop of ParallelNode `second` may share a kernel with that of `first`.
+    """
+    for clause in ("num_gangs", "async_", "wait"):
+        one, other = getattr(first, clause), getattr(second, clause)
+        if (one is None) != (other is None) or str(one) != str(other):
+            return False
+    for node in (first, second):
+        if any(getattr(node, clause) is not None for clause in PARALLEL_CLAUSES):
+            return False
+
+    # Every variable that both use must be transferred the same way
+    used = [_used_names(_hybrid_loop_node(node)) | _clause_vars(node) for node in (first, second)]
+    for name in used[0] & used[1]:
+        if _data_mode(first, name) != _data_mode(second, name):
+            return False
+    return True
+
+def _merge_regions(first, second):
+    """
+    Moves the data clauses of ParallelNode `second` onto `first`.
+    """
+    for clausename in DATA_CLAUSES:
+        dataclause = getattr(second, clausename)
+        if dataclause is None:
+            continue
+        if getattr(first, clausename) is None:
+            setattr(first, clausename, dataclause)
+        else:
+            getattr(first, clausename).extend(dataclause)
+
+def _hybrid_loop_node(node):
+    """
+    Returns the LoopNode of the combined construct `node` (e.g., `parallel loop`), or None.
+    """
+    for child in node.children:
+        if type(child) == loop.LoopNode and child.lineno == node.lineno:
+            return child
+    return None
+
+def _modifies(forloop, names: set) -> bool:
+    """
+    Returns True if the for loop `forloop` may rebind or modify any of `names`.
+    """
+    for node in ast.walk(forloop):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)) and node.id in names:
+            return True
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            base = node.func.value
+            while isinstance(base, (ast.Subscript, ast.Attribute)):
+                base = base.value
+            if isinstance(base, ast.Name) and base.id in names:
+                return True
+    return False
+
+def _used_names(loop_node) -> set:
+    """
+    Returns the names that the loop of `loop_node`, and the loops fused into it, use.
+    """
+    return {n.id for node in [loop_node] + loop_node.fused for n in ast.walk(node.span.node) if isinstance(n, ast.Name)}
+
+def _clause_vars(node) -> set:
+    return {var for clausename in DATA_CLAUSES if getattr(node, clausename) is not None for var in getattr(node, clausename).vars}
+
+def _data_mode(node, name: str):
+    """
+    Returns the data clause that `name` appears in on `node` (with its subarray), or
+    ("copy", None) if it does not appear in one.
+    """
+    for clausename in DATA_CLAUSES:
+        dataclause = getattr(node, clausename)
+        if dataclause is not None and name in dataclause.vars:
+            return clausename, dataclause.subarrays.get(name)
+    return "copy", None
+
+def _indentation(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
@@ -0,0 +1,159 @@
+"""
+This module contains the pass manager, which sits between the front end and the
+back end.
+
+Once the front end has built the IntermediateRepresentation, the pass manager
+runs a pipeline of passes over it, so that the back end is given an optimised IR.
+There are two kinds of pass:
+
+- Analyses, which work something out about the IR (or the decorated function)
+  without changing it. The result of an analysis is cached by the pass manager,
+  so that every pass that needs it shares the same result.
+- Transforms, which change the IR. When a transform changes the IR, the cached
+  results of the analyses that it does not declare that it preserves are thrown
+  away, and worked out again if a later pass needs them.
+
+Every pass has a name, and declares the names of the passes that must run before
+it (its `requires`). The pass manager runs the passes in an order that respects
+those dependencies.
+
+Transforms can be turned off, to measure what they are worth, by naming them in
+the ACC_DISABLE_PASSES environment variable (a comma-separated list of pass names,
+or "all"), or by giving the names to the PassManager. The time that each pass takes
+is recorded in `PassManager.timings`.
+"""
+import os
+import time
+
+# The transforms that are turned off, from the environment
+DEFAULT_DISABLED_PASSES = [name.strip() for name in os.environ.get("ACC_DISABLE_PASSES", "").split(",") if name.strip()]
+
+class Pass:
+    """
+    Base class for all passes.
+
+    Subclasses set `name` and `requires`, and implement `run`.
+    """
+    name = None
+    requires = ()
+
+    def run(self, intermediate_rep, manager):
+        """
+        Runs the pass over `intermediate_rep`. `manager` is the PassManager that is
+        running the pass, which is where the results of analyses come from.
+        """
+        raise NotImplementedError("Passes must implement run.")
+
+class Analysis(Pass):
+    """
+    A pass that works something out without changing the IR. Its `run` returns the
+    result, which the pass manager caches.
+    """
+    pass
+
+class Transform(Pass):
+    """
+    A pass that changes the IR. Its `run` returns True if it changed anything.
+
+    `preserves` is the names of the analyses whose results are still valid after
+    the transform has changed the IR.
+    """
+    preserves = ()
+
+class PassManager:
+    """
+    Runs a pipeline of passes over an IntermediateRepresentation. See the module docstring.
+    """
+    def __init__(self, passes: [Pass], disabled=None):
+        """
+        @param passes:      The passes, as Pass instances. The order only matters between
+                            passes that do not depend on one another.
+
+        @param disabled:    The names of the transforms to leave out, or "all" among
+                            them to leave out every transform. Defaults to ACC_DISABLE_PASSES.
+        """
+        self.passes = {}                # Name -> Pass
+        self.disabled = set(DEFAULT_DISABLED_PASSES if disabled is None else disabled)
+        self.timings = {}               # Name -> seconds taken by the pass (all of its runs)
+        self._results = {}              # Analysis name -> cached result
+        for p in passes:
+            self.register(p)
+
+    def register(self, p: Pass):
+        """
+        Adds the pass `p` to the pipeline.
+        """
+        if p.name in self.passes:
+            raise ValueError("A pass named {} is already registered.".format(p.name))
+        self.passes[p.name] = p
+
+    def is_enabled(self, name: str) -> bool:
+        """
+        Returns True if the pass called `name` will run. Analyses always run when they are needed.
+        """
+        if isinstance(self.passes[name], Analysis):
+            return True
+        return "all" not in self.disabled and name not in self.disabled
+
+    def get_analysis(self, name: str, intermediate_rep):
+        """
+        Returns the result of the analysis called `name` on `intermediate_rep`, running it
+        (and any analyses that it requires) if it has not been run since the IR last changed.
+        """
+        if name not in self._results:
+            analysis = self.passes[name]
+            for required in analysis.requires:
+                self.get_analysis(required, intermediate_rep)
+            self._results[name] = self._timed(analysis, intermediate_rep)
+        return self._results[name]
+
+    def run(self, intermediate_rep):
+        """
+        Runs every enabled transform over `intermediate_rep`, in dependency order, and
+        returns it.
+        """
+        self._results = {}
+        for name in self._schedule():
+            p = self.passes[name]
+            if isinstance(p, Analysis):
+                continue
+            for required in p.requires:
+                if isinstance(self.passes[required], Analysis):
+                    self.get_analysis(required, intermediate_rep)
+            if self._timed(p, intermediate_rep):
+                self._results = {kept: result for kept, result in self._results.items() if kept in p.preserves}
+        return intermediate_rep
+
+    def _schedule(self) -> [str]:
+        """
+        Returns the names of the enabled passes, ordered so that every pass comes after
+        the passes it requires. A disabled transform that another pass requires is skipped,
+        but the passes after it still run.
+        """
+        order = []
+        visiting = set()
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError("The passes have a circular dependency through {}.".format(name))
+            if name not in self.passes:
+                raise ValueError("Unknown pass: {}.".format(name))
+            visiting.add(name)
+            for required in self.passes[name].requires:
+                visit(required)
+            visiting.remove(name)
+            order.append(name)
+
+        for name in self.passes:
+            visit(name)
+        return [name for name in order if self.is_enabled(name)]
+
+    def _timed(self, p: Pass, intermediate_rep):
+        """
+        Runs `p`, adding the time it takes to its timing, and returns what it returns.
+        """
+        start = time.perf_counter()
+        result = p.run(intermediate_rep, self)
+        self.timings[p.name] = self.timings.get(p.name, 0.0) + time.perf_counter() - start
+        return result
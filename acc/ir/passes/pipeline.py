@@ -0,0 +1,34 @@
+"""
+This module puts together the default pipeline of passes that the IR goes through
+between the front end and the back end.
+"""
+import acc.ir.passes.analyses as analyses
+import acc.ir.passes.autopar as autopar
+import acc.ir.passes.constfold as constfold
+import acc.ir.passes.deadregions as deadregions
+import acc.ir.passes.fusion as fusion
+import acc.ir.passes.passmanager as passmanager
+
+def default_passes() -> [passmanager.Pass]:
+    """
+    Returns new instances of the default passes.
+    """
+    return [
+        analyses.FunctionAST(),
+        analyses.BoundNames(),
+        analyses.Dependences(),
+        constfold.ConstantFolding(),
+        deadregions.DeadRegionElimination(),
+        autopar.AutoParallelization(),
+        fusion.LoopFusion(),
+    ]
+
+def optimize(intermediate_rep, disabled=None) -> passmanager.PassManager:
+    """
+    Runs the default pipeline over `intermediate_rep`, leaving out the transforms named in
+    `disabled` (by default, those in ACC_DISABLE_PASSES), and returns the pass manager,
+    which has the passes' timings.
+    """
+    manager = passmanager.PassManager(default_passes(), disabled=disabled)
+    manager.run(intermediate_rep)
+    return manager
@@ -0,0 +1,306 @@
+"""
+This module indexes the source code of a decorated function for the front end.
+
+The function's source is tokenized and parsed exactly once, and everything
+the front end needs to know about where the pragmas are and what they govern
+is worked out from that in a single linear pass:
+
+- The pragmas themselves. Only real comments count (a "# pragma acc" inside a
+  string is not a pragma), and a pragma may be continued onto the following
+  comment line by ending it with a backslash, as in C:
+
+  ```python
+  # pragma acc parallel loop \\
+  #     copyin(a) copyout(b)
+  ```
+
+- The region each pragma governs: either the statement right after it (the
+  whole statement, however many lines it spans, including any nested blocks
+  and explicit line continuations), or, for constructs that allow it, the
+  lines between a pair of commented braces (`#{` and `#}`).
+
+- The compute construct (parallel, kernels, serial) that lexically encloses
+  each pragma, if any.
+
+- The function's parameters, and the lines that bind each of its local variables,
+  so that the back end can tell which variables a region needs from outside it
+  without parsing the function again for every region.
+
+The index owns the function's source lines and its AST, and the rest of the
+front end refers to pieces of them with `Span`s rather than copying them out.
+
+All line numbers are function-based: line 0 is the `def` line.
+"""
+import acc.frontend.util.grammar as grammar
+import acc.frontend.util.util as util
+import ast
+import io
+import re
+import tokenize
+
+# A comment that starts a pragma
+_PRAGMA = re.compile(r"^#(\s)*(pragma)(\s)*(acc)")
+
+# Commented braces
+_OPEN_BRACE = re.compile(r"^#(\s)*{")
+_CLOSE_BRACE = re.compile(r"^#(\s)*}")
+
+# The constructs that may enclose other constructs
+COMPUTE_CONSTRUCTS = ("parallel", "kernels", "serial")
+
+class Span:
+    """
+    A region of the source: lines `first` through `last` (inclusive) of the index,
+    and the AST node of the statement that makes up the region, if the region is
+    a single statement. The text of the region is only built when it is asked for.
+    """
+    __slots__ = ("index", "first", "last", "node")
+
+    def __init__(self, index, first: int, last: int, node=None):
+        self.index = index
+        self.first = first
+        self.last = last
+        self.node = node
+
+    def __repr__(self):
+        return "Span({}, {})".format(self.first, self.last)
+
+    @property
+    def text(self) -> str:
+        """
+        The source code of the region.
+        """
+        return self.index.text(self.first, self.last)
+
+class SourceIndex:
+    """
+    The index of a decorated function's source code. See the module docstring.
+    """
+    def __init__(self, src: str):
+        self.lines = src.splitlines()
+        self.pragmas = {}               # Pragma line number -> the pragma's text (continuations joined)
+        self.directives = {}            # Pragma line number -> the pragma's directive
+        self.parents = {}               # Pragma line number -> line number of the enclosing compute construct, or None
+        self._braces = {}               # Open brace line number -> close brace line number
+        self._statements = {}           # First line number of a statement -> (its last line number, its AST node or None)
+        self._continued = set()         # Line numbers of pragma continuation lines
+        self.parameters = set()         # The names of the function's parameters
+        self.bindings = {}              # Local variable name -> the line numbers that bind it, in order
+
+        if any(line.strip() for line in self.lines):
+            stripped = util.left_strip_src(src)
+            self._index_comments(stripped)
+            self._index_statements(stripped)
+        self._index_parents()
+
+    def region(self, lineno: int):
+        """
+        Returns the (first, last) line numbers of the statement that the pragma at `lineno`
+        governs, or None if there is no statement after it.
+        """
+        first = lineno + 1
+        while first in self._continued:
+            first += 1
+        start = self._next_code_line(first)
+        if start is None or start not in self._statements:
+            return None
+        return first, self._statements[start][0]
+
+    def statement(self, lineno: int):
+        """
+        Returns the AST node of the statement that the pragma at `lineno` governs, or
+        None if there is no statement after it. The node's line numbers are 1-based.
+        """
+        if lineno not in self.pragmas:
+            return None
+        first = lineno + 1
+        while first in self._continued:
+            first += 1
+        start = self._next_code_line(first)
+        if start is None or start not in self._statements:
+            return None
+        return self._statements[start][1]
+
+    def braced_region(self, lineno: int):
+        """
+        Returns the (first, last) line numbers of the lines between the commented braces
+        that open on the line after the pragma at `lineno`, or None if that line is not
+        an open brace. Raises a SyntaxError if the brace is never closed.
+        """
+        first = lineno + 1
+        while first in self._continued:
+            first += 1
+        if first not in self._braces:
+            return None
+        close = self._braces[first]
+        if close is None:
+            raise SyntaxError("Missing closing brace for open brace at line {} inside of function. Lines around error: {}".format(
+                first, "\n".join(self.lines[max(lineno - 1, 0):first + 1])))
+        return first + 1, close - 1
+
+    def statements(self, first: int, last: int) -> list:
+        """
+        Returns the (first line, last line, AST node) of each statement at the top level of
+        lines `first` through `last`, in order. The nodes are parsed from those lines alone,
+        but their line numbers are 1-based in the function, like the rest of the index's.
+        """
+        src = util.left_strip_src(self.text(first, last))
+        if not src.strip():
+            return []
+        tree = ast.parse(src)
+        ends = _end_linenos(tree.body, tree, src)
+        ast.increment_lineno(tree, first)
+        return [(node.lineno - 1, ends[node] + first - 1, node) for node in tree.body]
+
+    def text(self, first: int, last: int) -> str:
+        """
+        Returns lines `first` through `last` (inclusive) of the source.
+        """
+        return "\n".join(self.lines[first:last + 1])
+
+    def _index_comments(self, src: str):
+        """
+        Finds the pragmas and the commented braces among the source's comments.
+        """
+        comments = []
+        readline = io.StringIO(src).readline
+        for tok in tokenize.generate_tokens(readline):
+            if tok.type == tokenize.COMMENT:
+                comments.append((tok.start[0] - 1, tok.string))
+
+        open_braces = []
+        continuing = None
+        for lineno, comment in comments:
+            if continuing is not None and lineno == continuing[1] + 1:
+                # This comment continues the pragma that started at continuing[0]
+                text = comment.lstrip("#").strip()
+                self.pragmas[continuing[0]] = self.pragmas[continuing[0]][:-1].rstrip() + " " + text
+                self._continued.add(lineno)
+                continuing = (continuing[0], lineno) if text.endswith("\\") else None
+                continue
+            continuing = None
+
+            if _PRAGMA.match(comment):
+                self.pragmas[lineno] = comment.strip()
+                if comment.rstrip().endswith("\\"):
+                    continuing = (lineno, lineno)
+            elif _OPEN_BRACE.match(comment):
+                open_braces.append(lineno)
+                self._braces[lineno] = None
+            elif _CLOSE_BRACE.match(comment) and open_braces:
+                self._braces[open_braces.pop()] = lineno
+
+        for lineno, pragma in self.pragmas.items():
+            if pragma.endswith("\\"):
+                self.pragmas[lineno] = pragma[:-1].rstrip()
+            self.directives[lineno] = grammar.parse_directive(self.pragmas[lineno])
+
+    def _index_statements(self, src: str):
+        """
+        Records the first and last line of every statement in the source, and keeps the
+        AST nodes of the statements that the pragmas govern. The rest of the tree is not
+        kept, so that it can be freed once the index is built.
+        """
+        tree = ast.parse(src)
+        if tree.body and isinstance(tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)):
+            self._index_bindings(tree.body[0])
+        statements = list(_walk_statements(tree.body))
+        ends = _end_linenos(statements, tree, src)
+        governed = set()
+        for lineno in self.pragmas:
+            first = lineno + 1
+            while first in self._continued:
+                first += 1
+            governed.add(self._next_code_line(first))
+        for node in statements:
+            first = node.lineno - 1
+            if first not in self._statements:
+                self._statements[first] = (ends[node] - 1, node if first in governed else None)
+
+    def _index_bindings(self, funcdef):
+        """
+        Records the parameters of the function `funcdef`, and the lines that bind each of its
+        local variables (by assignment, del, def, class, import, or an except clause).
+        """
+        args = funcdef.args
+        for arg in args.args + args.kwonlyargs + getattr(args, "posonlyargs", []):
+            self.parameters.add(arg.arg)
+        for arg in (args.vararg, args.kwarg):
+            if arg is not None:
+                self.parameters.add(arg.arg)
+
+        for node in ast.walk(funcdef):
+            if node is funcdef or not hasattr(node, "lineno"):
+                continue
+            names = ()
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                names = (node.id,)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names = (node.name,)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                names = [alias.asname if alias.asname else alias.name.split(".")[0] for alias in node.names]
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                names = (node.name,)
+            for name in names:
+                self.bindings.setdefault(name, []).append(node.lineno - 1)
+        for lines in self.bindings.values():
+            lines.sort()
+
+    def _index_parents(self):
+        """
+        Works out which compute construct (if any) encloses each pragma, in one pass
+        over the pragmas, from top to bottom.
+        """
+        enclosing = []      # Stack of (pragma line number, last line of its region)
+        for lineno in sorted(self.pragmas):
+            while enclosing and enclosing[-1][1] < lineno:
+                enclosing.pop()
+            self.parents[lineno] = enclosing[-1][0] if enclosing else None
+
+            if self.directives[lineno] in COMPUTE_CONSTRUCTS:
+                span = self.braced_region(lineno) or self.region(lineno)
+                if span is not None:
+                    enclosing.append((lineno, span[1]))
+
+    def _next_code_line(self, lineno: int):
+        """
+        Returns the first line at or after `lineno` that is neither blank nor a comment.
+        """
+        for number in range(lineno, len(self.lines)):
+            stripped = self.lines[number].strip()
+            if stripped and not stripped.startswith("#"):
+                return number
+        return None
+
+def _walk_statements(body: list):
+    """
+    Yields every statement in a list of statements, and all the statements nested in
+    them, outermost first. Expressions are not visited, since they cannot contain statements
+    (other than lambdas, which only contain expressions).
+    """
+    pending = list(reversed(body))
+    while pending:
+        node = pending.pop()
+        yield node
+        nested = []
+        for _name, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.stmt):
+                        nested.append(item)
+                    elif isinstance(getattr(item, "body", None), list):
+                        # Exception handlers and match cases
+                        nested.extend(item.body)
+        pending.extend(reversed(nested))
+
+def _end_linenos(statements: list, tree, src: str) -> dict:
+    """
+    Returns a dict of each of the given statements to its last (1-based) line number.
+    """
+    if all(getattr(node, "end_lineno", None) is not None for node in statements):
+        return {node: node.end_lineno for node in statements}
+
+    # Before Python 3.8, the AST does not know where statements end
+    import asttokens
+    asttokens.ASTTokens(src, tree=tree)
+    return {node: node.last_token.end[0] for node in statements}
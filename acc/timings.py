@@ -0,0 +1,176 @@
+"""
+Per-stage timings of the @acc decorator's pipeline.
+
+Every call to a decorated function goes through the same stages before (and
+including) running the rewritten function:
+
+- source:     fetching the decorated function's source code
+- signature:  inspecting its signature and binding the call's arguments to it
+- stack:      grabbing the caller's stack frame
+- modules:    scanning the function's module for the modules it uses
+- parse:      parsing the pragmas into the intermediate representation
+- optimize:   running the IR passes (see acc.ir.passes.pipeline)
+- compile:    generating the new source code with the back end
+- module:     splicing the new source code into the module's and writing it out
+- load:       importing the new module
+- execute:    running the rewritten function (or, for an async function, enqueueing it)
+
+Each stage is timed in nanoseconds, and the timings are kept for each decorated
+function and stage as a Histogram: a count, total, minimum and maximum, and the
+number of timings that fell into each power-of-two bucket of nanoseconds. Keeping
+them costs a clock read per stage and one lock per call, so they are on unless
+ACC_STAGE_TIMINGS is 0. If ACC_STAGE_TIMINGS_FILE is set, the timings are dumped to
+that file as JSON when the program exits.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+# Time the stages of every call
+DEFAULT_ENABLED = os.environ.get("ACC_STAGE_TIMINGS", "1") == "1"
+
+# The file to dump the timings into when the program exits, if any
+DEFAULT_DUMP_FILE = os.environ.get("ACC_STAGE_TIMINGS_FILE", "")
+
+# The stages, in the order they run in
+STAGES = ("source", "signature", "stack", "modules", "parse", "optimize", "compile", "module", "load", "execute")
+
+if hasattr(time, "perf_counter_ns"):
+    _clock = time.perf_counter_ns
+else:
+    # Python 3.6 and earlier
+    _clock = lambda: int(time.perf_counter() * 1e9)
+
+class Histogram:
+    """
+    The timings of one stage of one decorated function.
+
+    Items
+    -----
+
+    - count   : The number of timings.
+    - total   : Their sum, in nanoseconds.
+    - minimum : The shortest, in nanoseconds, or None if there are none.
+    - maximum : The longest, in nanoseconds, or None if there are none.
+    - buckets : The number of timings in each bucket, by the bucket's exponent: bucket k
+                holds the timings of at least 2**k and less than 2**(k + 1) nanoseconds
+                (bucket 0 also holds the timings of 0 nanoseconds).
+    """
+    __slots__ = ("count", "total", "minimum", "maximum", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.buckets = {}
+
+    def add(self, nanoseconds: int) -> None:
+        self.count += 1
+        self.total += nanoseconds
+        self.minimum = nanoseconds if self.minimum is None else min(self.minimum, nanoseconds)
+        self.maximum = nanoseconds if self.maximum is None else max(self.maximum, nanoseconds)
+        bucket = max(nanoseconds.bit_length() - 1, 0)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> int:
+        """
+        Returns an upper bound on the `p`th percentile (0 to 100) of the timings: the upper
+        edge of the bucket that it falls into, capped at the maximum.
+        """
+        if not self.count:
+            return 0
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** (bucket + 1), self.maximum)
+        return self.maximum
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ns": self.total,
+            "min_ns": self.minimum,
+            "max_ns": self.maximum,
+            "mean_ns": self.mean(),
+            "p50_ns": self.percentile(50),
+            "p99_ns": self.percentile(99),
+            "buckets": {str(2 ** bucket): n for bucket, n in sorted(self.buckets.items())},
+        }
+
+class Stopwatch:
+    """
+    Times the stages of one call. `lap(stage)` ends the stage that has been running since the
+    stopwatch was started (or since the last lap), and `stop()` adds the call's timings to
+    its function's histograms.
+    """
+    __slots__ = ("funcname", "_last", "_laps")
+
+    def __init__(self, funcname: str):
+        self.funcname = funcname
+        self._laps = []
+        self._last = _clock() if DEFAULT_ENABLED else None
+
+    def lap(self, stage: str) -> None:
+        if self._last is None:
+            return
+        now = _clock()
+        self._laps.append((stage, now - self._last))
+        self._last = now
+
+    def stop(self) -> None:
+        if self._last is None:
+            return
+        with _histograms_lock:
+            stages = _histograms.setdefault(self.funcname, {})
+            for stage, nanoseconds in self._laps:
+                if stage not in stages:
+                    stages[stage] = Histogram()
+                stages[stage].add(nanoseconds)
+        self._laps = []
+
+# The Histogram of each stage of each decorated function, by the function's name and then by stage
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def stopwatch(funcname: str) -> Stopwatch:
+    """
+    Returns a Stopwatch, already started, for a call to the decorated function `funcname`.
+    """
+    return Stopwatch(funcname)
+
+def get() -> dict:
+    """
+    Returns the timings so far: for each decorated function, for each of its stages (in
+    the order of STAGES), the dictionary of its Histogram (see Histogram.to_dict).
+    """
+    with _histograms_lock:
+        return {funcname: {stage: stages[stage].to_dict() for stage in STAGES if stage in stages}
+                for funcname, stages in _histograms.items()}
+
+def dump(f) -> None:
+    """
+    Writes the timings (as returned by `get`) as JSON to `f`, a file name or a file object.
+    """
+    if isinstance(f, str):
+        with open(f, 'w') as fobj:
+            json.dump(get(), fobj, indent=2)
+    else:
+        json.dump(get(), f, indent=2)
+
+def reset() -> None:
+    """
+    Forgets all the timings so far.
+    """
+    with _histograms_lock:
+        _histograms.clear()
+
+if DEFAULT_DUMP_FILE:
+    atexit.register(dump, DEFAULT_DUMP_FILE)
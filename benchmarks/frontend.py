@@ -0,0 +1,223 @@
+"""
+Benchmarks for the compile latency of the front end and the host back end: the
+time an @acc call spends turning the decorated function into new source code,
+before anything runs.
+
+Generates decorated functions with parallel loops, parallel regions containing
+nests of loop constructs, and wait directives, padded out with ordinary
+statements, and grows them along one dimension at a time (a sweep):
+
+- lines:   the length of the function, with a construct about every --pragma-every lines
+- pragmas: the number of constructs in a function of --base-lines lines
+- depth:   how deeply the loop constructs in each parallel region are nested
+- modules: how many modules the function's module imports and the function uses
+
+Each function is run through the same steps as the acc decorator, and the time
+spent in each of these is reported (the best of --repeat runs, in milliseconds):
+
+- parse_pragmas:     finding the pragmas (frontend.parse_pragmas)
+- accumulate_pragma: parsing each pragma into the IR (frontend.accumulate_pragma),
+                     including the two below
+- add_child:         adding each node to the IR tree (IntermediateRepresentation.add_child),
+                     including the one below
+- _get_parent:       finding the enclosing node of each node (IntermediateRepresentation._get_parent)
+- optimize:          the IR passes (acc.ir.passes.pipeline.optimize)
+- compile:           generating the new source code (the host back end's compile)
+
+along with, for each size after the first, the growth of the total time: the
+exponent k in time ~ size**k from the size before (the size of the lines and
+pragmas sweeps being the number of lines and pragmas that were generated). A total
+that is linear in the size shows k close to 1; k close to 2 means that something
+is quadratic, such as splitting the whole source into lines again for every pragma.
+
+With --json, the results are also written to a file, for tracking regressions:
+
+    {"machine": {...}, "results": [{"sweep": ..., "size": ..., "lines": ..., "pragmas": ...,
+                                    "stage": ..., "times": [seconds, ...], "best": ...}]}
+
+Usage:
+
+    python benchmarks/frontend.py [--sweeps lines pragmas depth modules] [--sizes 500 1000 2000 4000]
+                                  [--pragma-every 20] [--base-lines 1000] [--repeat R] [--json FILE]
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+import types
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "..")))
+import acc.backend.host as host
+import acc.frontend.frontend as frontend
+import acc.frontend.util.errors as errors
+import acc.ir.icv as icv
+import acc.ir.intrep as intrep
+import acc.ir.metavars as metavars
+import acc.ir.passes.pipeline as pipeline
+
+# The steps that are timed, in the order they run in
+STAGES = ("parse_pragmas", "accumulate_pragma", "add_child", "_get_parent", "optimize", "compile")
+
+# The sizes of each sweep other than lines (whose sizes are given by --sizes)
+SWEEPS = {
+    "pragmas": [25, 50, 100, 200],      # About how many constructs, each of them about --base-lines / size lines
+    "depth": [1, 2, 4, 8],
+    "modules": [1, 10, 100, 1000],
+}
+
+def generate_function(nlines: int, pragma_every: int, depth=1, nmodules=0) -> str:
+    """
+    Returns the source of a function about `nlines` long, with a construct about every `pragma_every` lines.
+    The loop constructs in its parallel regions are nested `depth` deep, and it uses the modules
+    m0 ... m`nmodules`-1 in turn.
+    """
+    lines = ["def big(a, b, c):"]
+    kind = 0
+    while len(lines) < nlines:
+        for i in range(max(pragma_every - 6, 1)):
+            if nmodules:
+                lines.append("    x{} = a[{}] + m{}.e".format(len(lines), i % 10, len(lines) % nmodules))
+            else:
+                lines.append("    x{} = a[{}] + b[{}] * 2".format(len(lines), i % 10, i % 7))
+        kind = (kind + 1) % 3
+        if kind == 0:
+            lines.append("    # pragma acc parallel loop copyin(a, b) copy(c) num_gangs(4)")
+            lines.append("    for i in range(len(a)):")
+            lines.append("        c[i] = a[i] + \\")
+            lines.append("            b[i]")
+        elif kind == 1:
+            lines.append("    # pragma acc parallel copy(c) async(1)")
+            lines.append("    for _ in range(1):")
+            indent = "        "
+            for level in range(depth):
+                lines.append("{}# pragma acc loop".format(indent))
+                lines.append("{}for i{} in range({}):".format(indent, level, "len(a)" if level == 0 else 2))
+                indent += "    "
+            lines.append("{}c[i0] += {}".format(indent, " + ".join("i{}".format(level) for level in range(depth))))
+        else:
+            lines.append("    # pragma acc wait(1)")
+    lines.append("    return c")
+    return "\n".join(lines)
+
+def generate_modules(nmodules: int) -> [(str, types.ModuleType)]:
+    """
+    Returns `nmodules` (alias, module) pairs, as the acc decorator finds them in the function's module.
+    """
+    return [("m{}".format(k), types.ModuleType("accbench{}".format(k))) for k in range(nmodules)]
+
+def build_ir(src: str, modules=()) -> intrep.IntermediateRepresentation:
+    """
+    Runs `src` through the front end, the same way the acc decorator does.
+    """
+    meta_data = metavars.MetaVars(src=src, funcs_name="big", funcs_mods=list(modules))
+    intermediate_rep = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+    dbg = errors.Debug(intermediate_rep)
+    pragmas = frontend.parse_pragmas(intermediate_rep)
+    while True:
+        with _timed("parse_pragmas"):
+            pragma, lineno = next(pragmas, (None, None))
+        if pragma is None:
+            break
+        dbg.lineno = lineno
+        frontend.accumulate_pragma(intermediate_rep, pragma, lineno, dbg)
+    return intermediate_rep
+
+def compile_function(src: str, modules=()) -> intrep.IntermediateRepresentation:
+    """
+    Runs `src` through the front end, the IR passes, and the host back end, the same way the acc decorator does.
+    """
+    intermediate_rep = build_ir(src, modules)
+    with _timed("optimize"):
+        pipeline.optimize(intermediate_rep)
+    with _timed("compile"):
+        host.compile(intermediate_rep)
+    return intermediate_rep
+
+# The seconds spent in each stage in the run so far
+_elapsed = {}
+
+@contextlib.contextmanager
+def _timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _elapsed[stage] = _elapsed.get(stage, 0.0) + time.perf_counter() - start
+
+def _timing(func, stage: str):
+    """
+    Returns `func`, timed as `stage`.
+    """
+    def timed(*args, **kwargs):
+        with _timed(stage):
+            return func(*args, **kwargs)
+    return timed
+
+def measure(src: str, modules, repeat: int) -> ({str: [float]}, int):
+    """
+    Compiles `src` `repeat` times, and returns the seconds that each stage took in each run,
+    and the number of pragmas in the function.
+    """
+    times = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        _elapsed.clear()
+        ir = compile_function(src, modules)
+        for stage in STAGES:
+            times[stage].append(_elapsed.get(stage, 0.0))
+    return times, len(ir.index.pragmas)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sweeps", nargs="+", choices=["lines"] + sorted(SWEEPS), default=["lines"] + list(SWEEPS), help="Dimensions to grow the functions along")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 4000], help="Function lengths, in lines, for the lines sweep")
+    parser.add_argument("--pragma-every", type=int, default=20, help="Lines per construct, for the sweeps other than pragmas")
+    parser.add_argument("--base-lines", type=int, default=1000, help="Function length, in lines, for the sweeps other than lines")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per size")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to FILE as JSON")
+    args = parser.parse_args()
+
+    # Time the IR's tree building from the inside
+    frontend.accumulate_pragma = _timing(frontend.accumulate_pragma, "accumulate_pragma")
+    intrep.IntermediateRepresentation.add_child = _timing(intrep.IntermediateRepresentation.add_child, "add_child")
+    intrep.IntermediateRepresentation._get_parent = _timing(intrep.IntermediateRepresentation._get_parent, "_get_parent")
+
+    results = []
+    for sweep in args.sweeps:
+        print()
+        print("{:>8} {:>8} {:>8}".format(sweep, "lines", "pragmas") + "".join(" {:>17}".format(stage) for stage in STAGES) + " {:>9} {:>7}".format("total", "growth"))
+        previous = None
+        for size in (args.sizes if sweep == "lines" else SWEEPS[sweep]):
+            if sweep == "lines":
+                src, modules = generate_function(size, args.pragma_every), ()
+            elif sweep == "pragmas":
+                src, modules = generate_function(args.base_lines, max(args.base_lines // size, 1)), ()
+            elif sweep == "depth":
+                src, modules = generate_function(args.base_lines, args.pragma_every, depth=size), ()
+            else:
+                src, modules = generate_function(args.base_lines, args.pragma_every, nmodules=size), generate_modules(size)
+            times, npragmas = measure(src, modules, args.repeat)
+            nlines = len(src.splitlines())
+            best = {stage: min(times[stage]) for stage in STAGES}
+            # The stages of the front end are nested in accumulate_pragma, so the total is the outermost ones
+            total = min(sum(run) for run in zip(times["parse_pragmas"], times["accumulate_pragma"], times["optimize"], times["compile"]))
+            x = nlines if sweep == "lines" else npragmas if sweep == "pragmas" else size
+            growth = "" if previous is None or x == previous[0] else "{:.2f}".format(math.log(total / previous[1]) / math.log(x / previous[0]))
+            previous = (x, total)
+            print("{:>8} {:>8} {:>8}".format(size, nlines, npragmas) + "".join(" {:>17.2f}".format(1e3 * best[stage]) for stage in STAGES)
+                  + " {:>9.2f} {:>7}".format(1e3 * total, growth))
+            for stage in STAGES:
+                results.append({"sweep": sweep, "size": size, "lines": nlines, "pragmas": npragmas, "stage": stage,
+                                "times": times[stage], "best": best[stage]})
+
+    if args.json:
+        machine = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+        with open(args.json, 'w') as f:
+            json.dump({"machine": machine, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Benchmark suite of classic OpenACC kernels on the host back end.
+
+Runs each of these kernels as an @acc function, at several problem sizes and
+numbers of gangs:
+
+- jacobi:    one sweep of a 5-point Jacobi stencil over an n x n grid
+- matmul:    dense n x n matrix multiplication
+- spmv:      sparse matrix-vector product, with the matrix in CSR format (8 nonzeros per row)
+- histogram: a histogram of n values into 64 bins
+- nbody:     the gravitational accelerations of n bodies on each other
+- dot:       n dot products of vectors of 1000 elements
+- map:       an elementwise function of n elements
+
+and reports, for each, the best time of a call, the throughput (in the kernel's
+unit of work per second), the speedup over running the same function as plain
+serial Python (the undecorated function, with its pragmas as comments), and the
+JIT overhead: the time that each call spends in the @acc decorator before the
+rewritten function runs (see acc.timings). Every result is checked against the
+serial run.
+
+The host back end does not implement the atomic and reduction clauses, so the
+histogram is privatized (each iteration counts a block of the values into its own
+row of bins, and the rows are summed after the region), and each dot product is
+reduced sequentially inside its own iteration.
+
+With --json, the results are also written to a file, for tracking regressions:
+
+    {"machine": {...}, "results": [{"kernel": ..., "size": ..., "n": ..., "gangs": ...,
+                                    "times": [seconds, ...], "best": ..., "throughput": ...,
+                                    "unit": ..., "serial": ..., "speedup": ..., "jit_overhead": ...}]}
+
+Usage:
+
+    python benchmarks/kernels.py [--kernels jacobi matmul ...] [--sizes small medium large]
+                                 [--gangs 1 2 4] [--repeat R] [--json FILE]
+
+Requires NumPy.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "..")))
+import acc.api as openacc
+import acc.backend.gangs as gangs
+import numpy
+
+####################################################################################
+###################### KERNELS #####################################################
+####################################################################################
+
+@openacc.acc()
+def jacobi(a, b, n, ngangs):
+    # pragma acc parallel loop num_gangs(ngangs) copyin(a) copy(b)
+    for i in range(1, n - 1):
+        for j in range(1, n - 1):
+            b[i, j] = 0.25 * (a[i - 1, j] + a[i + 1, j] + a[i, j - 1] + a[i, j + 1])
+    return b
+
+@openacc.acc()
+def matmul(a, b, c, n, ngangs):
+    # pragma acc parallel loop num_gangs(ngangs) copyin(a, b) copyout(c)
+    for i in range(n):
+        for j in range(n):
+            total = 0.0
+            for k in range(n):
+                total += a[i, k] * b[k, j]
+            c[i, j] = total
+    return c
+
+@openacc.acc()
+def spmv(indptr, indices, values, x, y, nrows, ngangs):
+    # pragma acc parallel loop num_gangs(ngangs) copyin(indptr, indices, values, x) copyout(y)
+    for row in range(nrows):
+        total = 0.0
+        for k in range(indptr[row], indptr[row + 1]):
+            total += values[k] * x[indices[k]]
+        y[row] = total
+    return y
+
+@openacc.acc()
+def histogram(data, blocks, nblocks, blocksize, nbins, ngangs):
+    # pragma acc parallel loop num_gangs(ngangs) copyin(data) copyout(blocks)
+    for block in range(nblocks):
+        for k in range(block * blocksize, min((block + 1) * blocksize, len(data))):
+            blocks[block, int(data[k] * nbins)] += 1
+    return blocks.sum(axis=0)
+
+@openacc.acc()
+def nbody(pos, mass, accel, n, ngangs):
+    # pragma acc parallel loop num_gangs(ngangs) copyin(pos, mass) copyout(accel)
+    for i in range(n):
+        ax = 0.0
+        ay = 0.0
+        az = 0.0
+        for j in range(n):
+            dx = pos[j, 0] - pos[i, 0]
+            dy = pos[j, 1] - pos[i, 1]
+            dz = pos[j, 2] - pos[i, 2]
+            r2 = dx * dx + dy * dy + dz * dz + 0.01
+            scale = mass[j] / (r2 * r2 ** 0.5)
+            ax += dx * scale
+            ay += dy * scale
+            az += dz * scale
+        accel[i, 0] = ax
+        accel[i, 1] = ay
+        accel[i, 2] = az
+    return accel
+
+@openacc.acc()
+def dot(x, y, out, n, length, ngangs):
+    # pragma acc parallel loop num_gangs(ngangs) copyin(x, y) copyout(out)
+    for i in range(n):
+        total = 0.0
+        for j in range(length):
+            total += x[i, j] * y[i, j]
+        out[i] = total
+    return out
+
+@openacc.acc()
+def map_(x, y, n, ngangs):
+    # pragma acc parallel loop num_gangs(ngangs) copyin(x) copyout(y)
+    for i in range(n):
+        y[i] = x[i] * x[i] * 0.5 + 1.0
+    return y
+
+####################################################################################
+###################### INPUTS ######################################################
+####################################################################################
+
+def jacobi_args(n: int) -> tuple:
+    rng = numpy.random.RandomState(n)
+    return rng.rand(n, n), numpy.zeros((n, n)), n
+
+def matmul_args(n: int) -> tuple:
+    rng = numpy.random.RandomState(n)
+    return rng.rand(n, n), rng.rand(n, n), numpy.zeros((n, n)), n
+
+def spmv_args(n: int) -> tuple:
+    rng = numpy.random.RandomState(n)
+    indptr = numpy.arange(0, 8 * n + 1, 8)
+    indices = rng.randint(0, n, size=8 * n)
+    return indptr, indices, rng.rand(8 * n), rng.rand(n), numpy.zeros(n), n
+
+def histogram_args(n: int) -> tuple:
+    rng = numpy.random.RandomState(n)
+    nblocks = 64
+    blocksize = -(-n // nblocks)
+    return rng.rand(n), numpy.zeros((nblocks, 64), dtype=numpy.int64), nblocks, blocksize, 64
+
+def nbody_args(n: int) -> tuple:
+    rng = numpy.random.RandomState(n)
+    return rng.rand(n, 3), rng.rand(n), numpy.zeros((n, 3)), n
+
+def dot_args(n: int) -> tuple:
+    rng = numpy.random.RandomState(n)
+    return rng.rand(n, 1000), rng.rand(n, 1000), numpy.zeros(n), n, 1000
+
+def map_args(n: int) -> tuple:
+    rng = numpy.random.RandomState(n)
+    return rng.rand(n), numpy.zeros(n), n
+
+class Benchmark:
+    """
+    One kernel of the suite.
+
+    Items
+    -----
+
+    - func  : The @acc function, which takes the arguments and then the number of gangs, and returns its result.
+    - args  : A function of the problem size that returns new arguments (the output arrays zeroed).
+    - sizes : The problem size of each size name.
+    - work  : A function of the problem size that returns the units of work that a call does.
+    - unit  : What a unit of work is.
+    """
+    __slots__ = ("func", "args", "sizes", "work", "unit")
+
+    def __init__(self, func, args, sizes, work, unit):
+        self.func = func
+        self.args = args
+        self.sizes = sizes
+        self.work = work
+        self.unit = unit
+
+BENCHMARKS = {
+    "jacobi": Benchmark(jacobi, jacobi_args, {"small": 64, "medium": 128, "large": 256}, lambda n: (n - 2) ** 2, "points"),
+    "matmul": Benchmark(matmul, matmul_args, {"small": 24, "medium": 48, "large": 96}, lambda n: 2 * n ** 3, "flops"),
+    "spmv": Benchmark(spmv, spmv_args, {"small": 4000, "medium": 20000, "large": 100000}, lambda n: 2 * 8 * n, "flops"),
+    "histogram": Benchmark(histogram, histogram_args, {"small": 50000, "medium": 250000, "large": 1000000}, lambda n: n, "values"),
+    "nbody": Benchmark(nbody, nbody_args, {"small": 100, "medium": 250, "large": 500}, lambda n: n * n, "interactions"),
+    "dot": Benchmark(dot, dot_args, {"small": 40, "medium": 200, "large": 1000}, lambda n: 2 * 1000 * n, "flops"),
+    "map": Benchmark(map_, map_args, {"small": 50000, "medium": 250000, "large": 1000000}, lambda n: n, "elements"),
+}
+
+####################################################################################
+###################### RUNNING #####################################################
+####################################################################################
+
+def time_serial(benchmark: Benchmark, n: int, repeat: int) -> (float, object):
+    """
+    Runs the benchmark's function as plain Python `repeat` times, and returns the best
+    time in seconds and the result.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        args = benchmark.args(n)
+        start = time.perf_counter()
+        result = benchmark.func.__wrapped__(*args, 1)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def time_acc(benchmark: Benchmark, n: int, ngangs: int, repeat: int, expected) -> ([float], float):
+    """
+    Runs the benchmark's @acc function `repeat` times with `ngangs` gangs, checks each
+    result against `expected`, and returns the times in seconds, and the mean seconds of
+    each call that were spent in the decorator before the rewritten function ran.
+    """
+    name = "{}.{}".format(benchmark.func.__module__, benchmark.func.__qualname__)
+    openacc.reset_stage_timings()
+    times = []
+    for _ in range(repeat):
+        args = benchmark.args(n)
+        start = time.perf_counter()
+        result = benchmark.func(*args, ngangs)
+        times.append(time.perf_counter() - start)
+        assert numpy.allclose(result, expected), "{} gave the wrong result".format(benchmark.func.__name__)
+    stages = openacc.get_stage_timings().get(name, {})
+    overhead = sum(histogram["mean_ns"] for stage, histogram in stages.items() if stage != "execute") / 1e9
+    return times, overhead
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kernels", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS), help="Kernels to run")
+    parser.add_argument("--sizes", nargs="+", choices=["small", "medium", "large"], default=["small", "medium"], help="Problem sizes to run")
+    parser.add_argument("--gangs", type=int, nargs="+", default=sorted({1, 2, gangs.DEFAULT_NUM_GANGS}), help="Numbers of gangs to run with")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per kernel, size, and number of gangs")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to FILE as JSON")
+    args = parser.parse_args()
+
+    openacc.set_device_type('host')
+    map_(*map_args(10), 1)      # Start the gangs outside of the timing
+
+    results = []
+    print("{:>10} {:>7} {:>8} {:>6} {:>10} {:>14} {:>13} {:>8} {:>9}".format(
+        "kernel", "size", "n", "gangs", "best (s)", "throughput", "unit/s", "speedup", "jit (ms)"))
+    for kernel in args.kernels:
+        benchmark = BENCHMARKS[kernel]
+        for size in args.sizes:
+            n = benchmark.sizes[size]
+            serial, expected = time_serial(benchmark, n, args.repeat)
+            for ngangs in args.gangs:
+                times, overhead = time_acc(benchmark, n, ngangs, args.repeat, expected)
+                best = min(times)
+                result = {
+                    "kernel": kernel, "size": size, "n": n, "gangs": ngangs, "times": times, "best": best,
+                    "throughput": benchmark.work(n) / best, "unit": benchmark.unit, "serial": serial,
+                    "speedup": serial / best, "jit_overhead": overhead,
+                }
+                results.append(result)
+                print("{:>10} {:>7} {:>8} {:>6} {:>10.4f} {:>14.4g} {:>13} {:>7.2f}x {:>9.2f}".format(
+                    kernel, size, n, ngangs, best, result["throughput"], benchmark.unit, result["speedup"], 1e3 * overhead))
+
+    if args.json:
+        machine = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                   "numpy": numpy.__version__}
+        with open(args.json, 'w') as f:
+            json.dump({"machine": machine, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
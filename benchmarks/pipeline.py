@@ -0,0 +1,82 @@
+"""
+Benchmark for the pipelined (double-buffered) transfer of arrays to and from the gangs.
+
+Runs a memory-bound `parallel loop` (SAXPY over large float64 arrays) with
+ACC_PIPELINE_DEPTH set to 1 (the default, no pipelining: every array is copied in before
+the gangs start and copied out after they have all finished) and to larger
+depths (the copies of one chunk overlap the computation of the others), and
+reports the best wall-clock time of each.
+
+Each depth is run in its own Python process, since the depth is read from the
+environment when the gang runtime is imported.
+
+Usage:
+
+    python benchmarks/pipeline.py [--n N] [--repeat R] [--depths 1 2 4]
+
+Requires NumPy.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "..")))
+import acc.api as openacc
+import numpy
+
+@openacc.acc()
+def saxpy(n, a, x, y):
+    # pragma acc parallel loop copyin(x) copy(y)
+    for i in range(n):
+        y[i] = a * x[i] + y[i]
+
+def run_one(n: int, repeat: int) -> float:
+    """
+    Runs the workload `repeat` times in this process and returns the best time in seconds.
+    """
+    openacc.set_device_type('host')
+    x = numpy.random.rand(n)
+    y = numpy.random.rand(n)
+    expected = 2.0 * x + y
+
+    saxpy(10, 2.0, x[:10].copy(), y[:10].copy())    # Start the gangs outside of the timing
+    best = float("inf")
+    for _ in range(repeat):
+        yy = y.copy()
+        start = time.perf_counter()
+        saxpy(n, 2.0, x, yy)
+        best = min(best, time.perf_counter() - start)
+    assert numpy.allclose(yy, expected)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=2000000, help="Number of array elements")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per depth")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 2, 4], help="Pipeline depths to compare")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_one(args.n, args.repeat)))
+        return
+
+    results = {}
+    for depth in args.depths:
+        env = dict(os.environ, ACC_PIPELINE_DEPTH=str(depth))
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", "--n", str(args.n), "--repeat", str(args.repeat)]
+        out = subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        results[depth] = json.loads(out.strip().splitlines()[-1])
+
+    baseline = results[args.depths[0]]
+    mb = 3 * args.n * 8 / 1e6     # x in, y in, y out
+    print("{:>6} {:>10} {:>10} {:>8}".format("depth", "best (s)", "MB/s", "speedup"))
+    for depth, seconds in results.items():
+        print("{:>6} {:>10.3f} {:>10.1f} {:>7.2f}x".format(depth, seconds, mb / seconds, baseline / seconds))
+
+if __name__ == "__main__":
+    main()
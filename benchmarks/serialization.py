@@ -0,0 +1,91 @@
+"""
+Benchmark for the serialization of gang messages.
+
+Sends a large NumPy payload (100 MB by default) from the host to a gang-like
+child process over a multiprocessing pipe, and back, with:
+
+- dill:     the whole message pickled in band with dill (how gang messages used to be sent)
+- protocol5: acc.backend.messages, which pickles with protocol 5 and sends the
+             array's buffer out of band, without copying it into the pickle
+
+and reports the best round-trip throughput of each.
+
+Usage:
+
+    python benchmarks/serialization.py [--mb MB] [--repeat R]
+
+Requires NumPy and Python 3.8+.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "..")))
+import acc.backend.messages as messages
+import dill
+import numpy
+
+def echo_dill(conn):
+    while True:
+        try:
+            message = conn.recv_bytes()
+        except EOFError:
+            return
+        conn.send_bytes(dill.dumps(dill.loads(message)))
+
+def echo_protocol5(conn):
+    while True:
+        try:
+            message = messages.recv(conn)
+        except EOFError:
+            return
+        messages.send(conn, message)
+
+def roundtrip_dill(conn, payload):
+    conn.send_bytes(dill.dumps(payload))
+    return dill.loads(conn.recv_bytes())
+
+def roundtrip_protocol5(conn, payload):
+    messages.send(conn, payload)
+    return messages.recv(conn)
+
+def measure(echo, roundtrip, payload, repeat: int) -> float:
+    """
+    Returns the best round-trip time in seconds of `payload` through a child process running `echo`.
+    """
+    host, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=echo, args=(child,), daemon=True)
+    process.start()
+    child.close()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = roundtrip(host, payload)
+        best = min(best, time.perf_counter() - start)
+    assert numpy.array_equal(result["data"], payload["data"])
+
+    process.terminate()
+    process.join()
+    host.close()
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=100, help="Payload size in megabytes")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed round trips per method")
+    args = parser.parse_args()
+
+    payload = {"data": numpy.random.rand(args.mb * 1000 * 1000 // 8), "gang": 0}
+    mb = 2 * payload["data"].nbytes / 1e6     # There and back
+
+    print("{:>10} {:>10} {:>10}".format("method", "best (s)", "MB/s"))
+    for name, echo, roundtrip in (("dill", echo_dill, roundtrip_dill), ("protocol5", echo_protocol5, roundtrip_protocol5)):
+        seconds = measure(echo, roundtrip, payload, args.repeat)
+        print("{:>10} {:>10.3f} {:>10.1f}".format(name, seconds, mb / seconds))
+
+if __name__ == "__main__":
+    main()
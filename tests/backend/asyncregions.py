@@ -0,0 +1,97 @@
+"""
+This module contains all the tests for asynchronous compute regions and the
+asyncio integration.
+"""
+import asyncio
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def square_async_region(ls, sqrs):
+    # pragma acc parallel loop async(1)
+    for x in ls:
+        sqrs.append(x * x)
+
+@openacc.acc()
+def square_then_wait(ls):
+    sqrs = []
+    # pragma acc parallel loop async(3)
+    for x in ls:
+        sqrs.append(x * x)
+    # pragma acc wait(3)
+    return sqrs
+
+@openacc.acc(async_=2)
+def square_async_function(ls):
+    sqrs = []
+    # pragma acc parallel loop
+    for x in ls:
+        sqrs.append(x * x)
+    return sqrs
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestAsyncRegions(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+        self.ls = list(range(11))
+        self.expected = [x * x for x in self.ls]
+
+    def test_async_region_wait(self):
+        """
+        Test that an async region's results are there after waiting on its queue.
+        """
+        sqrs = []
+        square_async_region(self.ls, sqrs)
+        openacc.wait(1)
+        self.assertEqual(sqrs, self.expected)
+        self.assertTrue(openacc.async_test(1))
+
+    def test_wait_directive(self):
+        """
+        Test that the wait directive waits for the region.
+        """
+        self.assertEqual(square_then_wait(self.ls), self.expected)
+
+    def test_async_function_handle(self):
+        """
+        Test that an async @acc function returns a handle with the function's result.
+        """
+        handle = square_async_function(self.ls)
+        self.assertEqual(handle.result(), self.expected)
+
+    def test_asyncio(self):
+        """
+        Test that async regions and functions can be awaited from coroutines.
+        """
+        async def main():
+            results = await asyncio.gather(square_async_function(self.ls), square_async_function(self.ls[:5]))
+            sqrs = []
+            square_async_region(self.ls, sqrs)
+            await openacc.wait_coroutine(1)
+            await openacc.wait_all_coroutine()
+            return results, sqrs
+
+        # asyncio.run is Python 3.7 and later
+        loop = asyncio.new_event_loop()
+        try:
+            results, sqrs = loop.run_until_complete(main())
+        finally:
+            loop.close()
+        self.assertEqual(results, [self.expected, self.expected[:5]])
+        self.assertEqual(sqrs, self.expected)
+        self.assertTrue(openacc.async_test_all())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+This module contains the tests for running regions on the local thread instead of
+on the gangs: the if and self clauses, and the trip count threshold.
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.fallback as fallback
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+# Scalars are firstprivate on the gangs, so `last` is only assigned when the loop runs locally
+
+@openacc.acc()
+def if_clause(ls, offload):
+    last = None
+    # pragma acc parallel loop if(offload)
+    for x in ls:
+        last = x
+    return last
+
+@openacc.acc()
+def self_clause(ls, local):
+    last = None
+    # pragma acc parallel loop self(local) num_gangs(2)
+    for x in ls:
+        last = x
+    return last
+
+@openacc.acc()
+def gang_if(ls, offload):
+    last = None
+    # pragma acc parallel loop gang if(offload)
+    for x in ls:
+        last = x
+    return last
+
+@openacc.acc()
+def num_workers_if(ls, offload):
+    last = None
+    # pragma acc parallel loop num_workers(2) if(offload)
+    for x in ls:
+        last = x
+    return last
+
+@openacc.acc()
+def no_clause(ls):
+    last = None
+    # pragma acc parallel loop
+    for x in ls:
+        last = x
+    return last
+
+@openacc.acc()
+def kernels_if(ls, offload):
+    last = None
+    # pragma acc kernels if(offload)
+    #{
+    # pragma acc loop independent
+    for i in range(len(ls)):
+        ls[i] = ls[i] + 1
+    last = ls[-1]
+    #}
+    return ls, last
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestFallback(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+        self.threshold = fallback.DEFAULT_INLINE_THRESHOLD
+        fallback.reset()
+
+    def tearDown(self):
+        fallback.DEFAULT_INLINE_THRESHOLD = self.threshold
+
+    def test_if_and_self(self):
+        """
+        Test that the if and self clauses choose where the region runs, at runtime.
+        """
+        fallback.DEFAULT_INLINE_THRESHOLD = 0
+        self.assertEqual(if_clause([1, 2, 3], False), 3)
+        self.assertIsNone(if_clause([1, 2, 3], True))
+        self.assertEqual(self_clause([1, 2, 3], True), 3)
+        self.assertIsNone(self_clause([1, 2, 3], False))
+        self.assertEqual(kernels_if([1, 2, 3], False), ([2, 3, 4], 4))
+        self.assertEqual(kernels_if([1, 2, 3], True), ([2, 3, 4], 4))
+
+    def test_clause_order(self):
+        """
+        Test that the if clause is honoured whichever clauses come before it.
+        """
+        fallback.DEFAULT_INLINE_THRESHOLD = 0
+        for func in (gang_if, num_workers_if):
+            self.assertEqual(func([1, 2, 3], False), 3, msg=func.__name__)
+            self.assertIsNone(func([1, 2, 3], True), msg=func.__name__)
+
+    def test_threshold(self):
+        """
+        Test that loops with a trip count below the threshold run on the local thread.
+        """
+        fallback.DEFAULT_INLINE_THRESHOLD = 100
+        self.assertEqual(no_clause(list(range(99))), 98)
+        self.assertIsNone(no_clause(list(range(100))))
+
+    def test_learning(self):
+        """
+        Test the threshold that is learned from a region's timings.
+        """
+        fallback.DEFAULT_INLINE_THRESHOLD = 100
+        fallback.record("f:1", 1000, 0.01, False, 4)
+        self.assertEqual(fallback.thresholds(4), {"f:1": 100})
+        fallback.record("f:1", 1000, 0.0125, True, 4)
+        # 1e-5 s per item on the local thread, and a launch takes 0.01 s on top of its share
+        self.assertAlmostEqual(fallback.thresholds(4)["f:1"], 0.01 / (1e-5 * 0.75))
+        self.assertEqual(fallback.thresholds(1)["f:1"], float("inf"))
+
+if __name__ == "__main__":
+    unittest.main()
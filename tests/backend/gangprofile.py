@@ -0,0 +1,94 @@
+"""
+This module contains the tests for profiling the kernels in the gang processes.
+"""
+import inspect
+import io
+import os
+import pstats
+import sys
+import tempfile
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.gangprofile as gangprofile
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+def cube(x):
+    return x * x * x
+
+@openacc.acc()
+def cubes(ls):
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(ls)):
+        ls[i] = cube(ls[i])
+    return ls
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+def entries(stats) -> dict:
+    """
+    Returns the entries of `stats` by function name, with their (file name, line number, number of calls).
+    """
+    return {name: (filename, line, nc) for (filename, line, name), (_, nc, _, _, _) in stats.stats.items()}
+
+class TestGangProfile(unittest.TestCase):
+    def setUp(self):
+        gangprofile.reset()
+        gangprofile.start()
+
+    def tearDown(self):
+        gangprofile.stop()
+        gangprofile.reset()
+
+    def test_merged(self):
+        """
+        Test that the gangs' profiles are merged, with the kernel and the functions it calls mapped back to this file.
+        """
+        self.assertEqual(cubes(list(range(1000))), [i ** 3 for i in range(1000)])
+        stats = gangprofile.stats()
+        found = entries(stats)
+
+        pragma = inspect.getsourcelines(cubes)[1] + 2
+        filename, line, ncalls = found["cubes:1 (acc region)"]
+        self.assertEqual(os.path.realpath(filename), os.path.realpath(__file__))
+        self.assertEqual(line, pragma)
+        self.assertEqual(ncalls, 2)
+
+        filename, line, ncalls = found["cube"]
+        self.assertEqual(os.path.realpath(filename), os.path.realpath(__file__))
+        self.assertEqual(line, cube.__code__.co_firstlineno)
+        self.assertEqual(ncalls, 1000)
+
+        # It is a proper pstats profile
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats()
+        self.assertIn("cubes:1 (acc region)", out.getvalue())
+
+    def test_dump(self):
+        """
+        Test that the merged profile can be written to a file and loaded by pstats.
+        """
+        cubes(list(range(1000)))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fpath = os.path.join(tmpdir, "acc.prof")
+            gangprofile.dump(fpath)
+            self.assertIn("cubes:1 (acc region)", entries(pstats.Stats(fpath)))
+
+    def test_disabled(self):
+        """
+        Test that nothing is profiled when profiling is off.
+        """
+        gangprofile.stop()
+        cubes(list(range(10)))
+        self.assertIsNone(gangprofile.stats())
+
+if __name__ == "__main__":
+    unittest.main()
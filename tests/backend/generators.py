@@ -0,0 +1,97 @@
+"""
+This module contains all the tests for parallel loops over iterables that
+have no length (generators and iterators).
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.gangs as gangs
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def square_all(items, sqrs):
+    # pragma acc parallel loop
+    for x in items:
+        sqrs.append(x * x)
+
+@openacc.acc()
+def count_words(lines, counts):
+    # pragma acc parallel loop
+    for line in lines:
+        for word in line.split():
+            counts[word] = counts.get(word, 0) + 1
+
+@openacc.acc()
+def outer_product(xs, ys, products):
+    # pragma acc parallel loop collapse(2)
+    for x in xs:
+        for y in ys:
+            products.append(x * y)
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestGenerators(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+
+    def test_generator_in_order(self):
+        """
+        Test that a generator spanning many batches gives its results in order.
+        """
+        n = 5 * gangs.BATCH_SIZE + 3
+        sqrs = [-1]
+        square_all((x for x in range(n)), sqrs)
+        self.assertEqual(sqrs, [-1] + [x * x for x in range(n)])
+
+    def test_pulls_in_batches(self):
+        """
+        Test that the generator is not drained before the gangs start: each batch after
+        the first is only pulled once the ones before it have been launched.
+        """
+        launches = []
+        pulled = []     # For each item, how many launches there had been when it was pulled
+        def numbers():
+            for x in range(4 * gangs.BATCH_SIZE):
+                pulled.append(len(launches))
+                yield x
+
+        sqrs = []
+        openacc.prof_register("enqueue_launch_start", launches.append)
+        try:
+            square_all(numbers(), sqrs)
+        finally:
+            openacc.prof_unregister("enqueue_launch_start", launches.append)
+        self.assertEqual(sqrs, [x * x for x in range(4 * gangs.BATCH_SIZE)])
+        self.assertEqual(len(launches), 4)
+        self.assertEqual([pulled[k * gangs.BATCH_SIZE] for k in range(4)], [0, 1, 2, 3])
+
+    def test_dict_merge(self):
+        """
+        Test that the keys that every batch adds or changes are merged in, with their values.
+        """
+        lines = iter(["a w0"] + ["w{0} w{0}".format(i) for i in range(1, 3 * gangs.BATCH_SIZE)])
+        counts = {"a": 0, "b": 5}
+        count_words(lines, counts)
+        expected = {"w{}".format(i): 2 for i in range(1, 3 * gangs.BATCH_SIZE)}
+        expected.update(a=1, b=5, w0=1)
+        self.assertEqual(counts, expected)
+
+    def test_collapse(self):
+        """
+        Test that a collapsed loop (whose iteration space is generated lazily) gives its results in order.
+        """
+        products = []
+        outer_product(range(30), range(40), products)
+        self.assertEqual(products, [x * y for x in range(30) for y in range(40)])
+
+if __name__ == "__main__":
+    unittest.main()
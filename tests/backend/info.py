@@ -0,0 +1,155 @@
+"""
+This module contains the tests for the compiler feedback report (ACC_INFO).
+"""
+import contextlib
+import inspect
+import io
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.info as info
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def scale(a, b, factor):
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(a)):
+        a[i] = a[i] * factor
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(a)):
+        b[i] = a[i] + 1
+    return a, b
+
+@openacc.acc()
+def prefix(a):
+    # pragma acc kernels copyin(a)
+    #{
+    total = 0
+    for i in range(len(a)):
+        total += a[i]
+    #}
+    return a
+
+@openacc.acc()
+def fill(a, out):
+    n = 3
+    # pragma acc parallel num_gangs(2) default(present)
+    #{
+    # pragma acc loop
+    for i in range(len(out)):
+        out[i] = a[i] * n
+    #}
+    return out
+
+@openacc.acc()
+def strict(a, k):
+    # pragma acc parallel loop num_gangs(2) default(none) copy(a)
+    for i in range(len(a)):
+        a[i] = a[i] + k
+    return a
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+def line_of(func, text: str) -> int:
+    """
+    Returns the line of this file that `text` is on in `func`.
+    """
+    lines, first = inspect.getsourcelines(func)
+    return first + [line.strip() for line in lines].index(text)
+
+def run(func, *args) -> str:
+    """
+    Calls `func` with reporting on, and returns what was reported.
+    """
+    out = io.StringIO()
+    with contextlib.redirect_stderr(out):
+        func(*args)
+    return out.getvalue()
+
+class TestInfo(unittest.TestCase):
+    def setUp(self):
+        info.start()
+
+    def tearDown(self):
+        info.stop()
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_parallel_loop(self):
+        """
+        Test the report on two parallel loops that are fused: the gangs, the implicit data, the bytes, and the schedule.
+        """
+        reported = run(scale, numpy.ones(1000), numpy.ones(1000), 2.0)
+        pragma = line_of(scale, "# pragma acc parallel loop num_gangs(2)")
+        self.assertIn("scale ({}):".format(__file__), reported)
+        self.assertIn("{:>6}, Generating parallel loop on 2 gangs".format(pragma), reported)
+        self.assertIn("Generating implicit copy(a, b)", reported)
+        self.assertIn("Generating implicit firstprivate(factor)", reported)
+        self.assertIn("Estimated data movement: 16008 bytes in, 16000 bytes out", reported)
+        self.assertIn("{:>6}, Loop parallelized across gangs (implied independent in a parallel region)".format(pragma), reported)
+        self.assertIn("Schedule static: 2 chunks of about 500 iterations", reported)
+        self.assertIn("Fused with the loop at line {} into one kernel".format(pragma + 3), reported)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_sequential(self):
+        """
+        Test that a loop that is left sequential is reported with the reason why.
+        """
+        reported = run(prefix, numpy.ones(1000))
+        self.assertIn("Generating copyin(a)", reported)
+        self.assertIn("{:>6}, Loop not parallelized: total is carried from one iteration to the next (line {})".format(
+            line_of(prefix, "for i in range(len(a)):"), line_of(prefix, "total += a[i]")), reported)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_default_present(self):
+        """
+        Test that under default(present), arrays are implicitly present and scalars implicitly firstprivate.
+        """
+        reported = run(fill, numpy.ones(1000), numpy.zeros(1000))
+        self.assertIn("Generating implicit present(out, a)", reported)
+        self.assertIn("Generating implicit firstprivate(n)", reported)
+        self.assertIn("Estimated data movement: 8 bytes in, 0 bytes out", reported)
+        self.assertIn("Schedule static: one contiguous chunk per gang", reported)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_default_none(self):
+        """
+        Test that under default(none), the variables without a data clause are reported.
+        """
+        reported = run(strict, numpy.ones(1000), 1.0)
+        self.assertIn("Generating copy(a)", reported)
+        self.assertIn("No data clause for k under default(none)", reported)
+        self.assertNotIn("implicit", reported)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_once(self):
+        """
+        Test that the same report is not written twice for the same function.
+        """
+        run(scale, numpy.ones(1000), numpy.ones(1000), 2.0)
+        self.assertEqual(run(scale, numpy.ones(1000), numpy.ones(1000), 2.0), "")
+        self.assertNotEqual(run(scale, numpy.ones(2000), numpy.ones(2000), 2.0), "")
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_stopped(self):
+        """
+        Test that nothing is reported when reporting is off.
+        """
+        info.stop()
+        self.assertEqual(run(prefix, numpy.ones(1000)), "")
+
+if __name__ == "__main__":
+    unittest.main()
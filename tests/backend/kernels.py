@@ -0,0 +1,149 @@
+"""
+This module contains the tests for kernels regions, which are split into a sequence
+of kernels, one for each loop nest, with the local code between them run in place.
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.frontend.frontend as frontend
+import acc.frontend.kernels.kernels as kernels
+import acc.frontend.loop.loop as loop
+import acc.frontend.util.errors as errors
+import acc.ir.icv as icv
+import acc.ir.intrep as intrep
+import acc.ir.metavars as metavars
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def scale_and_shift(a, b):
+    # pragma acc kernels num_gangs(2) copyout(b)
+    #{
+    # pragma acc loop independent
+    for i in range(len(a)):
+        a[i] = a[i] * 2
+    shift = a[0]
+    a[1] = -1
+    # pragma acc loop independent
+    for i in range(len(a)):
+        b[i] = a[i] + shift
+    #}
+    return a, b
+
+@openacc.acc()
+def prefix_then_double(ls):
+    # pragma acc kernels
+    #{
+    for i in range(1, len(ls)):
+        ls[i] = ls[i] + ls[i - 1]
+    # pragma acc loop independent
+    for i in range(len(ls)):
+        ls[i] = ls[i] * 2
+    #}
+    return ls
+
+@openacc.acc()
+def kernels_loop(ls):
+    out = [0] * len(ls)
+    # pragma acc kernels loop independent num_gangs(2)
+    for i in range(len(ls)):
+        out[i] = ls[i] + 1
+    return out
+
+KERNELS = '''def f(a, b):
+    # pragma acc kernels
+    #{
+    for i in range(len(a)):
+        a[i] = 0
+    # pragma acc loop seq
+    for i in range(len(b)):
+        b[i] = 1
+    b.sort()
+    #}
+    return a
+'''
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestKernels(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_resident_arrays(self):
+        """
+        Test that local code between the kernels sees what the kernels before it wrote,
+        and that the kernels after it see what it wrote.
+        """
+        a, b = scale_and_shift(numpy.arange(10.0), numpy.zeros(10))
+        expected = numpy.arange(10.0) * 2
+        expected[1] = -1
+        self.assertTrue(numpy.array_equal(a, expected))
+        self.assertTrue(numpy.array_equal(b, expected + expected[0]))
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_data_region_first(self):
+        """
+        Test that a kernels region can be the first thing to use the gangs: its data region
+        must start them before allocating its buffers, or the gangs share (and unregister
+        the buffers from) the host's resource tracker, which then fails when the host frees them.
+        """
+        code = "\n".join([
+            "import sys",
+            "sys.path.insert(0, {!r})".format(mydir),
+            "import numpy",
+            "import kernels",
+            "a, b = kernels.scale_and_shift(numpy.arange(2000.0), numpy.zeros(2000))",
+            "assert a[2] == 4.0 and b[2] == 4.0",
+        ])
+        result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
+
+    def test_dependent_loop_nest(self):
+        """
+        Test that a loop nest with a loop-carried dependence runs on the local thread,
+        and the loop nest after it runs as a kernel on its results.
+        """
+        self.assertEqual(prefix_then_double(list(range(6))), [0, 2, 6, 12, 20, 30])
+
+    def test_kernels_loop(self):
+        """
+        Test a kernels loop, which is a single kernel.
+        """
+        self.assertEqual(kernels_loop(list(range(9))), list(range(1, 10)))
+
+    def test_implicit_loops(self):
+        """
+        Test that the loop nests without a loop construct get a loop node of their own.
+        """
+        meta_data = metavars.MetaVars(src=KERNELS, funcs_name="f")
+        intermediate_rep = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+        dbg = errors.Debug(intermediate_rep)
+        for pragma, lineno in frontend.parse_pragmas(intermediate_rep):
+            dbg.lineno = lineno
+            frontend.accumulate_pragma(intermediate_rep, pragma, lineno, dbg)
+
+        kernels_node, = intermediate_rep.root.children
+        self.assertEqual(type(kernels_node), kernels.KernelsNode)
+        implicit, explicit = kernels_node.children
+        self.assertEqual((type(implicit), implicit.lineno, implicit.span.first, implicit.span.last), (loop.LoopNode, 3, 3, 4))
+        self.assertEqual((explicit.lineno, explicit.span.first), (5, 6))
+        self.assertTrue(explicit.seq)
+
+if __name__ == "__main__":
+    unittest.main()
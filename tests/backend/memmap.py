@@ -0,0 +1,83 @@
+"""
+This module contains all the tests for parallel loops over memory-mapped arrays.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.gangs as gangs
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def scale(n, a, x, y):
+    # pragma acc parallel loop copyin(x) copyout(y)
+    for i in range(n):
+        y[i] = a * x[i]
+
+@openacc.acc()
+def scribble(n, x):
+    # pragma acc parallel loop copyin(x)
+    for i in range(n):
+        x[i] = -1.0
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+@unittest.skipIf(numpy is None, "NumPy is not available")
+class TestMemmap(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.n = 10000
+        self.x = numpy.memmap(os.path.join(self.tmpdir.name, "x.dat"), dtype=numpy.float64, mode="w+", shape=(self.n,))
+        self.x[:] = numpy.arange(self.n)
+        self.x.flush()
+        self.y = numpy.memmap(os.path.join(self.tmpdir.name, "y.dat"), dtype=numpy.float64, mode="w+", shape=(self.n,))
+
+    def tearDown(self):
+        del self.x
+        del self.y
+        self.tmpdir.cleanup()
+
+    def test_copyout(self):
+        """
+        Test that the gangs' writes to a copyout memmap reach the file.
+        """
+        scale(self.n, 2.0, self.x, self.y)
+        numpy.testing.assert_array_equal(self.y, 2.0 * numpy.arange(self.n))
+
+    def test_copyin_not_written(self):
+        """
+        Test that the gangs' writes to a copyin memmap do not reach the file.
+        """
+        scribble(self.n, self.x)
+        numpy.testing.assert_array_equal(self.x, numpy.arange(self.n))
+
+    def test_streaming_windows(self):
+        """
+        Test that a loop split into many small windows gives the same results.
+        """
+        old = gangs.STREAM_WINDOW_BYTES
+        gangs.STREAM_WINDOW_BYTES = 4096
+        try:
+            self.assertGreater(gangs._count_windows(self.n, [self.x, self.y]), gangs.DEFAULT_NUM_GANGS)
+            scale(self.n, 3.0, self.x, self.y)
+        finally:
+            gangs.STREAM_WINDOW_BYTES = old
+        numpy.testing.assert_array_equal(self.y, 3.0 * numpy.arange(self.n))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+This module contains all the tests for the serialization of the messages
+between the host and the gangs.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.backend.messages as messages
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class TestMessages(unittest.TestCase):
+    def setUp(self):
+        self.host, self.gang = multiprocessing.Pipe()
+
+    def tearDown(self):
+        self.host.close()
+        self.gang.close()
+
+    def roundtrip(self, obj):
+        """
+        Sends `obj` from one end of the pipe on another thread (so that big messages
+        cannot fill the pipe and block) and returns what the other end receives.
+        """
+        sender = threading.Thread(target=messages.send, args=(self.host, obj))
+        sender.start()
+        received = messages.recv(self.gang)
+        sender.join()
+        return received
+
+    def test_plain_objects(self):
+        """
+        Test that ordinary objects make it across the pipe.
+        """
+        obj = (1, "two", [3.0, {"four": {5}}], bytearray(b"six"))
+        self.assertEqual(self.roundtrip(obj), obj)
+
+    def test_closure_falls_back_to_dill(self):
+        """
+        Test that closures and lambdas are pickled with dill.
+        """
+        y = 3
+        usesdill, _frames = messages.dumps(lambda x: x + y)
+        self.assertTrue(usesdill)
+        self.assertEqual(self.roundtrip(lambda x: x + y)(2), 5)
+
+    @unittest.skipIf(numpy is None or not messages.OUT_OF_BAND, "NumPy or pickle protocol 5 is not available")
+    def test_arrays_out_of_band(self):
+        """
+        Test that arrays are sent as separate frames, and come out writable.
+        """
+        a = numpy.arange(100000, dtype=numpy.float64)
+        usesdill, frames = messages.dumps({"a": a, "n": 1})
+        self.assertFalse(usesdill)
+        self.assertEqual(len(frames), 2)
+        self.assertLess(len(frames[0]), 1000)
+
+        received = self.roundtrip({"a": a, "n": 1})
+        numpy.testing.assert_array_equal(received["a"], a)
+        received["a"][0] = -1.0
+        self.assertEqual(a[0], 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
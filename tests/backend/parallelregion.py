@@ -0,0 +1,63 @@
+"""
+This module contains all the tests for parallel regions (the parallel construct
+on its own, with loop constructs inside of it).
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def braced_region(ls):
+    out = []
+    # pragma acc parallel \
+    #     copy(out)
+    #{
+    # pragma acc loop
+    for x in ls:
+        out.append(x + 1)
+    #}
+    out.append(-1)
+    return out
+
+@openacc.acc()
+def scoped_region(ls):
+    out = []
+    # pragma acc parallel
+    for _ in range(1):
+        # pragma acc loop
+        for x in ls:
+            out.append(x * \
+                       2)
+    return out
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestParallelRegion(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+        self.ls = list(range(11))
+
+    def test_braced_region(self):
+        """
+        Test a parallel region given by commented braces, with a continued pragma.
+        """
+        self.assertEqual(braced_region(self.ls), [x + 1 for x in self.ls] + [-1])
+
+    def test_scoped_region(self):
+        """
+        Test a parallel region given by a statement, with a continued line inside it.
+        """
+        self.assertEqual(scoped_region(self.ls), [x * 2 for x in self.ls])
+
+if __name__ == "__main__":
+    unittest.main()
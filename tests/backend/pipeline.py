@@ -0,0 +1,173 @@
+"""
+This module contains all the tests for the data clauses and the pipelined
+(double-buffered) transfer of arrays to and from the gangs.
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.gangs as gangs
+import acc.backend.sharedarrays as sharedarrays
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def saxpy(n, a, x, y):
+    # pragma acc parallel loop copyin(x) copy(y)
+    for i in range(n):
+        y[i] = a * x[i] + y[i]
+
+@openacc.acc()
+def fill(n, x, out):
+    # pragma acc parallel loop copyin(x) copyout(out)
+    for i in range(n):
+        out[i] = x[i] + 1
+
+@openacc.acc()
+def scratch(n, x, tmp):
+    # pragma acc parallel loop copyin(x) create(tmp)
+    for i in range(n):
+        tmp[i] = x[i] * 2
+
+@openacc.acc()
+def reverse(n, x, out):
+    # pragma acc parallel loop copyin(x) copyout(out)
+    for i in range(n):
+        out[i] = x[n - 1 - i]
+
+@openacc.acc()
+def double(n, inp, out):
+    # pragma acc parallel loop
+    for i in range(n):
+        out[i] = inp[i] * 2
+
+@openacc.acc()
+def running_count_seq(a, n):
+    # pragma acc parallel loop seq
+    for i in range(1, n):
+        a[i] = a[i - 1] + 1
+
+@openacc.acc()
+def running_count_auto(a, n):
+    # pragma acc parallel loop auto
+    for i in range(1, n):
+        a[i] = a[i - 1] + 1
+
+@openacc.acc()
+def square_list(ls, sqrs):
+    # pragma acc parallel loop copyout(sqrs)
+    for x in ls:
+        sqrs.append(x * x)
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+@unittest.skipIf(numpy is None or sharedarrays.shared_memory is None, "NumPy or multiprocessing.shared_memory is not available")
+class TestPipelinedArrays(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+        # Pipelining is off by default
+        self.depth = gangs.PIPELINE_DEPTH
+        gangs.PIPELINE_DEPTH = 2
+        self.n = 3 * gangs.PIPELINE_THRESHOLD + 7
+        self.x = numpy.arange(self.n, dtype=numpy.float64)
+
+    def tearDown(self):
+        gangs.PIPELINE_DEPTH = self.depth
+
+    def test_copy(self):
+        """
+        Test that a copy array gets the gangs' results, across every chunk.
+        """
+        y = numpy.ones(self.n)
+        saxpy(self.n, 2.0, self.x, y)
+        numpy.testing.assert_array_equal(y, 2.0 * self.x + 1)
+
+    def test_copyout(self):
+        """
+        Test that a copyout array gets the gangs' results.
+        """
+        out = numpy.zeros(self.n)
+        fill(self.n, self.x, out)
+        numpy.testing.assert_array_equal(out, self.x + 1)
+
+    def test_create(self):
+        """
+        Test that a create array is not copied back, and a copyin array is left alone.
+        """
+        tmp = numpy.full(self.n, -1.0)
+        original = self.x.copy()
+        scratch(self.n, self.x, tmp)
+        numpy.testing.assert_array_equal(tmp, numpy.full(self.n, -1.0))
+        numpy.testing.assert_array_equal(self.x, original)
+
+    def test_not_streamed(self):
+        """
+        Test that an array that is the length of the loop, but is not indexed by the loop
+        variable, is copied in whole rather than a chunk at a time.
+        """
+        out = numpy.zeros(self.n)
+        reverse(self.n, self.x, out)
+        numpy.testing.assert_array_equal(out, self.x[::-1])
+
+    def test_aliased(self):
+        """
+        Test that an array that is passed for two variables gets the gangs' results, pipelined or not.
+        """
+        for n in (10, self.n):
+            x = self.x[:n].copy()
+            double(n, x, x)
+            numpy.testing.assert_array_equal(x, 2 * self.x[:n])
+
+    def test_short_loop(self):
+        """
+        Test that a loop below the pipelining threshold still gives the right results.
+        """
+        n = 10
+        y = numpy.ones(n)
+        saxpy(n, 3.0, self.x[:n].copy(), y)
+        numpy.testing.assert_array_equal(y, 3.0 * self.x[:n] + 1)
+
+class TestDataClauses(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+        self.depth = gangs.PIPELINE_DEPTH
+        gangs.PIPELINE_DEPTH = 2
+
+    def tearDown(self):
+        gangs.PIPELINE_DEPTH = self.depth
+
+    def test_list_copyout_in_order(self):
+        """
+        Test that list appends from a pipelined loop come back in iteration order.
+        """
+        ls = list(range(2 * gangs.PIPELINE_THRESHOLD + 3))
+        sqrs = []
+        square_list(ls, sqrs)
+        self.assertEqual(sqrs, [x * x for x in ls])
+
+    def test_sequential_not_pipelined(self):
+        """
+        Test that a sequential loop above the pipelining threshold keeps its loop-carried
+        dependence on a list, which goes to the gang in the messages.
+        """
+        n = 4 * gangs.PIPELINE_THRESHOLD
+        for func in (running_count_seq, running_count_auto):
+            a = [0] * n
+            func(a, n)
+            wrong = [i for i, x in enumerate(a) if x != i]
+            self.assertEqual(len(wrong), 0, msg="{}: {} wrong, first at {}".format(func.__name__, len(wrong), wrong[:1]))
+
+if __name__ == "__main__":
+    unittest.main()
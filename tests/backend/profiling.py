@@ -0,0 +1,175 @@
+"""
+This module contains the tests for the profiling interface.
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.profiling as profiling
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def double(a):
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(a)):
+        a[i] = a[i] * 2
+    return a
+
+@openacc.acc()
+def total(a, out):
+    # pragma acc serial copyin(a)
+    #{
+    for x in a:
+        out[0] += x
+    #}
+    return out
+
+@openacc.acc()
+def kernels_region(a):
+    # pragma acc kernels
+    #{
+    # pragma acc loop independent
+    for i in range(len(a)):
+        a[i] = a[i] + 1
+    a[0] = 0
+    #}
+    return a
+
+LIBRARY = '''
+events = []
+
+def acc_register_library(register, unregister):
+    register("compute_construct_end", events.append)
+'''
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class Recorder:
+    """
+    Records every event while it is in use.
+    """
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, info):
+        with self._lock:
+            self.events.append(info)
+
+    def __enter__(self):
+        for event in profiling.EVENTS:
+            openacc.prof_register(event, self)
+        return self
+
+    def __exit__(self, *args):
+        for event in profiling.EVENTS:
+            openacc.prof_unregister(event, self)
+        return False
+
+    def types(self) -> [str]:
+        return [info.event_type for info in self.events]
+
+class TestProfiling(unittest.TestCase):
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_parallel_loop(self):
+        """
+        Test that a parallel loop reports its construct, launches and transfers, with the region's line.
+        """
+        a = numpy.arange(1000, dtype=numpy.float64)
+        double(a)   # the gangs are started before any callback is registered
+        with Recorder() as recorder:
+            double(a)
+        self.assertTrue(numpy.array_equal(a, numpy.arange(1000) * 4))
+
+        types = recorder.types()
+        self.assertEqual(types[0], "compute_construct_start")
+        self.assertEqual(types[-1], "compute_construct_end")
+        self.assertEqual(types.count("create"), 1)
+        self.assertEqual(types.count("delete"), 1)
+        self.assertGreaterEqual(types.count("enqueue_launch_start"), 2)
+        self.assertEqual(types.count("enqueue_launch_start"), types.count("enqueue_launch_end"))
+
+        for info in recorder.events:
+            self.assertEqual(info.func_name, "double")
+            self.assertEqual(info.line_no, 1)
+        uploads = [info for info in recorder.events if info.event_type == "enqueue_upload_end"]
+        downloads = [info for info in recorder.events if info.event_type == "enqueue_download_end"]
+        self.assertEqual(sum(info.bytes for info in uploads), a.nbytes)
+        self.assertEqual(sum(info.bytes for info in downloads), a.nbytes)
+        launches = [info for info in recorder.events if info.event_type == "enqueue_launch_start"]
+        self.assertEqual({info.num_gangs for info in launches}, {2})
+        self.assertEqual({info.gang for info in launches}, {0, 1})
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_serial_and_kernels(self):
+        """
+        Test that a serial region reports one gang, and that a kernels region reports its data region.
+        """
+        with Recorder() as recorder:
+            self.assertEqual(total([1, 2, 3], [0]), [6])
+        self.assertEqual(recorder.types(), ["compute_construct_start", "compute_construct_end"])
+        self.assertEqual(recorder.events[0].num_gangs, 1)
+        self.assertEqual(recorder.events[0].line_no, 1)
+
+        a = numpy.zeros(1000)
+        with Recorder() as recorder:
+            kernels_region(a)
+        self.assertEqual(a[0], 0)
+        self.assertEqual(a[1], 1)
+        types = recorder.types()
+        self.assertEqual(types[0], "enter_data_start")
+        self.assertEqual(types[-1], "exit_data_end")
+        self.assertIn("update_start", types)
+        self.assertIn("compute_construct_start", types)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_registration(self):
+        """
+        Test that unregistering the last callback turns the events off, and that unknown events are refused.
+        """
+        self.assertFalse(profiling.enabled)
+        calls = []
+        openacc.prof_register("compute_construct_start", calls.append)
+        self.assertTrue(profiling.enabled)
+        openacc.prof_unregister("compute_construct_start", calls.append)
+        self.assertFalse(profiling.enabled)
+        double(numpy.ones(1000))
+        self.assertEqual(calls, [])
+        with self.assertRaises(ValueError):
+            openacc.prof_register("no_such_event", calls.append)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_proflib(self):
+        """
+        Test that a tool in a .py file is loaded and registers its callbacks.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fpath = os.path.join(tmpdir, "tool.py")
+            with open(fpath, 'w') as f:
+                f.write(LIBRARY)
+            profiling.load_libraries(fpath)
+        try:
+            double(numpy.ones(1000))
+            callbacks = profiling._callbacks["compute_construct_end"]
+            self.assertEqual(len(callbacks), 1)
+            self.assertEqual(callbacks[0].__self__[0].func_name, "double")
+        finally:
+            profiling.unregister("compute_construct_end", profiling._callbacks["compute_construct_end"][0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+This module contains the tests for serial regions, which run on the local thread.
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.gangs as gangs
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def running_sum(ls):
+    total = 0
+    out = []
+    # pragma acc serial loop copy(out)
+    for x in ls:
+        total += x
+        out.append(total)
+    return out, total
+
+@openacc.acc()
+def scratch(a, b):
+    # pragma acc serial copyin(a) copyout(b)
+    #{
+    for i in range(len(a)):
+        a[i] = a[i] + 1
+        b[i] = a[i] * 2
+    #}
+    return a, b
+
+@openacc.acc()
+def serial_async(ls):
+    out = []
+    # pragma acc serial loop async(4)
+    for x in ls:
+        out.append(-x)
+    # pragma acc wait(4)
+    return out
+
+@openacc.acc()
+def serial_in_data_region(a):
+    # pragma acc kernels num_gangs(2)
+    #{
+    # pragma acc loop independent
+    for i in range(len(a)):
+        a[i] = a[i] * 2
+    #}
+    # pragma acc serial
+    #{
+    a[0] = -1
+    #}
+    return a
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestSerial(unittest.TestCase):
+    def setUp(self):
+        openacc.set_device_type('host')
+
+    def test_serial_loop(self):
+        """
+        Test that a serial loop runs in order, and that scalars are firstprivate.
+        """
+        self.assertEqual(running_sum([1, 2, 3, 4]), ([1, 3, 6, 10], 0))
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_data_clauses(self):
+        """
+        Test that the writes to a copyin array do not come back, and those to a copyout array do.
+        """
+        a, b = scratch(numpy.arange(5.0), numpy.zeros(5))
+        self.assertTrue(numpy.array_equal(a, numpy.arange(5.0)))
+        self.assertTrue(numpy.array_equal(b, (numpy.arange(5.0) + 1) * 2))
+
+    def test_async(self):
+        """
+        Test an async serial region.
+        """
+        self.assertEqual(serial_async([1, 2, 3]), [-1, -2, -3])
+
+    def test_no_gangs(self):
+        """
+        Test that serial regions never start the gang processes.
+        """
+        if gangs._pool is None:
+            running_sum(list(range(10)))
+            self.assertIsNone(gangs._pool)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_after_kernels(self):
+        """
+        Test a serial region after a kernels region that used the same array.
+        """
+        a = serial_in_data_region(numpy.arange(4.0))
+        self.assertTrue(numpy.array_equal(a, [-1.0, 2.0, 4.0, 6.0]))
+
+if __name__ == "__main__":
+    unittest.main()
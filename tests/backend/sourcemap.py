@@ -0,0 +1,100 @@
+"""
+This module contains the tests for mapping the generated code back to the source code it came from.
+"""
+import inspect
+import os
+import sys
+import traceback
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.gangs as gangs
+import acc.backend.sourcemap as sourcemap
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def invert(ls):
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(ls)):
+        ls[i] = 1 / ls[i]
+    return ls
+
+@openacc.acc()
+def head(ls):
+    # pragma acc serial
+    #{
+    x = ls[0]
+    ls[0] = 1 / x
+    #}
+    return ls
+
+@openacc.acc()
+def kernel_name(names):
+    # pragma acc serial
+    #{
+    names[0] = sys._getframe().f_code.co_name
+    #}
+    return names
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+def line_of(func, text: str) -> int:
+    """
+    Returns the line of this file that `text` is on in `func`.
+    """
+    lines, first = inspect.getsourcelines(func)
+    return first + [line.strip() for line in lines].index(text)
+
+class TestSourceMap(unittest.TestCase):
+    def test_kernel_name(self):
+        """
+        Test that a kernel is named after the decorated function and the line of its pragma, every time.
+        """
+        self.assertEqual(kernel_name([None]), ["_acc_kernel_name_1_kernel"])
+        self.assertEqual(kernel_name([None]), ["_acc_kernel_name_1_kernel"])
+
+    def test_serial_traceback(self):
+        """
+        Test that a traceback from a kernel points at the line of this file that raised.
+        """
+        try:
+            head([0])
+            self.fail("head([0]) did not raise")
+        except ZeroDivisionError as e:
+            filename, line, name, text = traceback.extract_tb(e.__traceback__)[-1]
+        self.assertEqual(os.path.realpath(filename), os.path.realpath(__file__))
+        self.assertEqual(line, line_of(head, "ls[0] = 1 / x"))
+        self.assertEqual(name, "_acc_head_1_kernel")
+        self.assertEqual(text, "ls[0] = 1 / x")
+
+    def test_gang_traceback(self):
+        """
+        Test that a traceback from a gang process points at the line of this file that raised.
+        """
+        with self.assertRaises(gangs.GangError) as context:
+            invert([1.0] * 999 + [0.0])
+        message = str(context.exception)
+        self.assertIn('File "{}", line {}, in _acc_invert_1_kernel'.format(__file__, line_of(invert, "ls[i] = 1 / ls[i]")), message)
+        self.assertIn("ls[i] = 1 / ls[i]", message)
+
+    def test_original_line(self):
+        """
+        Test that the lines before, in, and after the swapped-in block map to where they came from.
+        """
+        mapping = sourcemap.SourceMap("original.py", 10, 5, 3, 11, [None, 0, 2, None, 1])
+        self.assertEqual(mapping.original_line(9), 9)
+        self.assertEqual(mapping.original_line(10), 11)
+        self.assertEqual(mapping.original_line(12), 13)
+        self.assertEqual(mapping.original_line(13), 11)
+        self.assertEqual(mapping.original_line(14), 12)
+        self.assertEqual(mapping.original_line(15), 13)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+This module contains the tests for the per-stage timings of the @acc decorator's pipeline.
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.timings as timings
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def square(ls):
+    # pragma acc parallel loop
+    for i in range(len(ls)):
+        ls[i] = ls[i] ** 2
+    return ls
+
+@openacc.acc()
+def fails(ls):
+    # pragma acc serial
+    #{
+    raise ValueError("expected")
+    #}
+    return ls
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestStageTimings(unittest.TestCase):
+    def setUp(self):
+        openacc.reset_stage_timings()
+
+    def test_stages(self):
+        """
+        Test that every stage of every call is timed, under the decorated function's name.
+        """
+        for _ in range(3):
+            self.assertEqual(square([1, 2, 3]), [1, 4, 9])
+        stats = openacc.get_stage_timings()
+        self.assertEqual(list(stats), [__name__ + ".square"])
+        stages = stats[__name__ + ".square"]
+        self.assertEqual(tuple(stages), timings.STAGES)
+        for stage in stages.values():
+            self.assertEqual(stage["count"], 3)
+            self.assertEqual(sum(stage["buckets"].values()), 3)
+            self.assertLessEqual(stage["min_ns"], stage["mean_ns"])
+            self.assertLessEqual(stage["mean_ns"], stage["max_ns"])
+            self.assertLessEqual(stage["p50_ns"], stage["max_ns"])
+
+    def test_exception(self):
+        """
+        Test that a call that raises is still timed.
+        """
+        with self.assertRaises(ValueError):
+            fails([])
+        self.assertEqual(openacc.get_stage_timings()[__name__ + ".fails"]["execute"]["count"], 1)
+
+    def test_dump(self):
+        """
+        Test that the timings can be dumped as JSON, to a file object or a file name.
+        """
+        square([1])
+        f = io.StringIO()
+        openacc.dump_stage_timings(f)
+        self.assertEqual(json.loads(f.getvalue()), openacc.get_stage_timings())
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fpath = os.path.join(tmpdir, "timings.json")
+            openacc.dump_stage_timings(fpath)
+            with open(fpath) as fobj:
+                self.assertEqual(json.load(fobj)[__name__ + ".square"]["parse"]["count"], 1)
+
+    def test_histogram(self):
+        """
+        Test the power-of-two buckets and the percentiles.
+        """
+        histogram = timings.Histogram()
+        for nanoseconds in (0, 1, 3, 4, 1000, 1000):
+            histogram.add(nanoseconds)
+        self.assertEqual(histogram.buckets, {0: 2, 1: 1, 2: 1, 9: 2})
+        self.assertEqual(histogram.percentile(50), 4)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+if __name__ == "__main__":
+    unittest.main()
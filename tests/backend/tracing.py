@@ -0,0 +1,117 @@
+"""
+This module contains the tests for the Chrome trace timeline of the gang runtime.
+"""
+import inspect
+import io
+import json
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.tracing as tracing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def scale(a, ls):
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(a)):
+        a[i] = a[i] * 3
+        ls[i] = i
+    return a, ls
+
+@openacc.acc()
+def first(ls):
+    # pragma acc serial
+    #{
+    ls[0] = 1
+    #}
+    return ls
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        tracing.reset()
+        tracing.start()
+
+    def tearDown(self):
+        tracing.stop()
+        tracing.reset()
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_spans(self):
+        """
+        Test that the host and the gangs record their spans, and that the gangs' spans are inside the region's.
+        """
+        a = numpy.ones(1000)
+        ls = [0] * 1000
+        scale(a, ls)
+        self.assertEqual(a[-1], 3)
+        self.assertEqual(ls[-1], 999)
+
+        spans = tracing.spans()
+        names = [name for name, _, _, _, _, _ in spans]
+        for name in ("region", "upload", "download", "gang wait", "merge", "unpack", "compute"):
+            self.assertIn(name, names)
+        region = [span for span in spans if span[0] == "region"][0]
+        self.assertEqual(region[5], {"region": "scale:1", "num_gangs": 2, "source": "{}:{}".format(__file__, inspect.getsourcelines(scale)[1] + 2)})
+
+        computes = [span for span in spans if span[0] == "compute"]
+        self.assertEqual({span[5]["gang"] for span in computes}, {0, 1})
+        for _, start, end, pid, _, args in computes:
+            self.assertNotEqual(pid, os.getpid())
+            self.assertLessEqual(region[1], start)
+            self.assertLessEqual(end, region[2])
+            self.assertEqual(args["region"], "scale:1")
+        uploads = [span for span in spans if span[0] == "upload"]
+        self.assertEqual(sum(span[5]["bytes"] for span in uploads), a.nbytes)
+
+    def test_serial(self):
+        """
+        Test that a serial region is one span on the host.
+        """
+        self.assertEqual(first([0]), [1])
+        self.assertEqual([span[0] for span in tracing.spans()], ["serial"])
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_stopped(self):
+        """
+        Test that nothing is recorded when tracing is off.
+        """
+        tracing.stop()
+        scale(numpy.ones(1000), [0] * 1000)
+        self.assertEqual(tracing.spans(), [])
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_write(self):
+        """
+        Test that the trace is written in the Chrome trace event format.
+        """
+        scale(numpy.ones(1000), [0] * 1000)
+        f = io.StringIO()
+        tracing.write(f)
+        trace = json.loads(f.getvalue())
+        events = trace["traceEvents"]
+        complete = [event for event in events if event["ph"] == "X"]
+        self.assertEqual(len(complete), len(tracing.spans()))
+        self.assertEqual(min(event["ts"] for event in complete), 0)
+        self.assertTrue(all(event["dur"] >= 0 for event in complete))
+        names = [event["args"]["name"] for event in events if event["ph"] == "M" and event["name"] == "process_name"]
+        self.assertIn("host", names)
+        self.assertTrue(any(name.startswith("gang process") for name in names))
+
+if __name__ == "__main__":
+    unittest.main()
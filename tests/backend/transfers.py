@@ -0,0 +1,128 @@
+"""
+This module contains the tests for the accounting of the data moved to and from the device.
+"""
+import io
+import json
+import os
+import sys
+import unittest
+import warnings
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.backend.transfers as transfers
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+@openacc.acc()
+def add(a, b, ls):
+    # pragma acc parallel loop num_gangs(2) copyin(b)
+    for i in range(len(a)):
+        a[i] = a[i] + b[i]
+        ls[i] = i
+    return a, ls
+
+@openacc.acc()
+def twice(a):
+    # pragma acc kernels
+    #{
+    # pragma acc loop independent
+    for i in range(len(a)):
+        a[i] = a[i] * 2
+    # pragma acc loop independent
+    for i in range(len(a)):
+        a[i] = a[i] + 1
+    #}
+    return a
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestTransfers(unittest.TestCase):
+    def setUp(self):
+        openacc.reset_transfer_stats()
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_variables(self):
+        """
+        Test that each variable's transfers are counted under the region, in the directions its data clause says.
+        """
+        a, b = numpy.ones(1000), numpy.ones(1000)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", transfers.RedundantTransferWarning)
+            add(a, b, [0] * 1000)
+            add(a, b, [0] * 1000)
+        stats = openacc.get_transfer_stats()
+        variables = stats["variables"]["add:1"]
+        self.assertEqual(variables["a"], dict(variables["a"], uploads=2, downloads=2, bytes_up=2 * a.nbytes, bytes_down=2 * a.nbytes))
+        self.assertEqual(variables["b"], dict(variables["b"], uploads=2, downloads=0, bytes_up=2 * b.nbytes, bytes_down=0))
+        # The list goes in each gang's message, and comes back in each reply
+        self.assertEqual(variables["ls"]["uploads"], 4)
+        self.assertEqual(variables["ls"]["downloads"], 4)
+        self.assertGreater(variables["ls"]["bytes_up"], 0)
+
+        region = stats["regions"]["add:1"]
+        for key in ("uploads", "downloads", "bytes_up", "bytes_down", "time_ns"):
+            self.assertEqual(region[key], sum(counts[key] for counts in variables.values()))
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_data_region(self):
+        """
+        Test that the kernels of a kernels region copy their array in and out once, in their data region.
+        """
+        a = numpy.ones(1000)
+        twice(a)
+        self.assertEqual(a[0], 3)
+        stats = openacc.get_transfer_stats()
+        self.assertEqual(stats["variables"]["twice:1"]["a"], dict(stats["variables"]["twice:1"]["a"], uploads=1, downloads=1))
+        self.assertNotIn("twice:4", stats["regions"])
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_warning(self):
+        """
+        Test that copying the same array into several compute regions in a row is warned about, once.
+        """
+        a, b = numpy.ones(1000), numpy.ones(1000)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", transfers.RedundantTransferWarning)
+            for _ in range(transfers.DEFAULT_WARN_REGIONS + 2):
+                add(a, b, [0] * 1000)
+        messages = [str(w.message) for w in caught if w.category is transfers.RedundantTransferWarning]
+        self.assertEqual(len([m for m in messages if m.startswith("a was copied")]), 1)
+        self.assertEqual(len([m for m in messages if m.startswith("b was copied")]), 1)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_new_objects(self):
+        """
+        Test that a new object under the same name starts a new streak, even if it reuses the id of
+        the one before it.
+        """
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", transfers.RedundantTransferWarning)
+            for _ in range(transfers.DEFAULT_WARN_REGIONS + 2):
+                transfers.copied_in("f:1", [("a", numpy.ones(10)), ("ls", [0] * 10)])
+        self.assertEqual([w for w in caught if w.category is transfers.RedundantTransferWarning], [])
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_dump(self):
+        """
+        Test that the counts can be dumped as JSON and reset.
+        """
+        twice(numpy.ones(1000))
+        f = io.StringIO()
+        openacc.dump_transfer_stats(f)
+        self.assertEqual(json.loads(f.getvalue()), openacc.get_transfer_stats())
+        openacc.reset_transfer_stats()
+        self.assertEqual(openacc.get_transfer_stats(), {"regions": {}, "variables": {}})
+
+if __name__ == "__main__":
+    unittest.main()
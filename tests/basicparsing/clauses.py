@@ -0,0 +1,137 @@
+"""
+This module tests the clause grammar: parsing pragmas into typed clauses.
+"""
+import unittest
+import os
+import sys
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.frontend.frontend as frontend
+import acc.frontend.util.errors as errors
+import acc.frontend.util.grammar as grammar
+import acc.ir.icv as icv
+import acc.ir.intrep as intrep
+import acc.ir.metavars as metavars
+
+def build_ir(pragma: str) -> intrep.IntermediateRepresentation:
+    """
+    Runs a function with `pragma` over a loop through the front end.
+    """
+    src = "def f(a, y, t, s, flag):\n    {}\n    for i in range(len(a)):\n        a[i] = y[i]\n".format(pragma)
+    meta_data = metavars.MetaVars(src=src, funcs_name="f")
+    intermediate_rep = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+    dbg = errors.Debug(intermediate_rep)
+    for parsed, lineno in frontend.parse_pragmas(intermediate_rep):
+        dbg.lineno = lineno
+        frontend.accumulate_pragma(intermediate_rep, parsed, lineno, dbg)
+    return intermediate_rep
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestClauseGrammar(unittest.TestCase):
+    def test_var_list(self):
+        """
+        Test var-lists with subarrays, array elements and the readonly modifier.
+        """
+        pragma = grammar.parse_pragma("# pragma acc parallel copyin(readonly: a, b[0:n]) copy(c[i], d[:n, 2:])")
+        copyin, copy = pragma.clauses
+        self.assertEqual(copyin.modifier, "readonly")
+        self.assertEqual([v.name for v in copyin.vars], ["a", "b"])
+        self.assertIsNone(copyin.vars[0].bounds)
+        self.assertEqual(copyin.vars[1].bounds, (("0", "n"),))
+        self.assertEqual(copy.vars[0].subarray, "[i:1]")
+        self.assertEqual(copy.vars[1].bounds, ((None, "n"), ("2", None)))
+
+    def test_arguments(self):
+        """
+        Test the clauses whose arguments have shapes of their own.
+        """
+        pragma = grammar.parse_pragma("# pragma acc loop gang(num: 4, static: *), worker(num: w) collapse(2) reduction(&&: ok) tile(*, 8)")
+        gang, worker, collapse, reduction, tile = pragma.clauses
+        self.assertEqual(gang.keywords, (("num", "4"), ("static", "*")))
+        self.assertEqual(worker.exprs, ("w",))
+        self.assertEqual(collapse.exprs, ("2",))
+        self.assertEqual(reduction.modifier, "&&")
+        self.assertEqual(tile.exprs, ("*", "8"))
+
+        wait = grammar.parse_pragma("# pragma acc wait(devnum: 0: queues: q, q + 1) async(2)")
+        self.assertEqual(wait.directive, "wait")
+        self.assertEqual(wait.clauses[0].name, "wait")
+        self.assertEqual(wait.clauses[0].exprs, ("q", "q + 1"))
+        self.assertEqual(wait.clauses[0].keywords, (("devnum", "0"),))
+
+    def test_device_type(self):
+        """
+        Test that the clauses after a device_type clause only apply to its device types.
+        """
+        pragma = grammar.parse_pragma("# pragma acc parallel num_gangs(4) device_type(host) num_gangs(2) dtype(*) num_gangs(8)")
+        def num_gangs(device_type):
+            return [c.exprs[0] for c in pragma.select(device_type) if c.name == "num_gangs"]
+        self.assertEqual(num_gangs("host"), ["4", "2"])
+        self.assertEqual(num_gangs("nvidia"), ["4", "8"])
+
+        with self.assertRaises(errors.InvalidClauseError):
+            grammar.parse_pragma("# pragma acc parallel device_type(host) copy(a)")
+
+    def test_invalid(self):
+        """
+        Test that invalid clauses are errors.
+        """
+        for pragma in ("# pragma acc parallel copyin()",
+                       "# pragma acc parallel copyni(a)",
+                       "# pragma acc loop collapse(n)",
+                       "# pragma acc loop seq(1)",
+                       "# pragma acc parallel num_gangs(4 +)",
+                       "# pragma acc parallel copy(a",
+                       "# pragma acc parallel reduction(a)"):
+            with self.assertRaises(errors.InvalidClauseError, msg=pragma):
+                grammar.parse_pragma(pragma)
+
+    def test_cache(self):
+        """
+        Test that an identical pragma is only parsed once.
+        """
+        text = "# pragma acc parallel loop copy(cached)"
+        first = grammar.parse_pragma(text)
+        self.assertIs(grammar.parse_pragma(text), first)
+
+class TestClauseOrder(unittest.TestCase):
+    def test_clauses_after(self):
+        """
+        Test that every clause is recorded, whichever clauses come before it.
+        """
+        parallel = build_ir("# pragma acc parallel loop gang if(flag)").root.children[0]
+        self.assertEqual(parallel.if_, "flag")
+        self.assertIsNone(parallel.children[0].gang.num)
+
+        parallel = build_ir("# pragma acc parallel loop private(t) copyin(y)").root.children[0]
+        self.assertEqual(parallel.copyin.vars, ["y"])
+        self.assertEqual(parallel.children[0].private.vars, ["t"])
+
+        parallel = build_ir("# pragma acc parallel loop reduction(+:s) async(1)").root.children[0]
+        self.assertEqual(parallel.async_.expr, "1")
+        self.assertEqual(parallel.children[0].reduction.operators, {"s": "+"})
+
+        parallel = build_ir("# pragma acc parallel num_workers(2) vector_length(32) private(t) firstprivate(s) "
+                            "reduction(max: a[0:2]) if(flag) copy(y)").root.children[0]
+        self.assertEqual((parallel.num_workers, parallel.vector_length, parallel.if_), ("2", "32", "flag"))
+        self.assertEqual((parallel.private.vars, parallel.firstprivate.vars), (["t"], ["s"]))
+        self.assertEqual(parallel.reduction.subarrays, {"a": "[0:2]"})
+        self.assertEqual(parallel.copy.vars, ["y"])
+
+        loop = build_ir("# pragma acc parallel loop gang(static: *) tile(*, 8) nofuse").root.children[0].children[0]
+        self.assertEqual((loop.gang.static, loop.tile, loop.nofuse), ("*", ["*", "8"], True))
+
+    def test_not_allowed(self):
+        """
+        Test that the private and reduction clauses are errors on a kernels construct, which does not take them.
+        """
+        for pragma in ("# pragma acc kernels private(t)", "# pragma acc kernels reduction(+: s)"):
+            with self.assertRaises(errors.InvalidClauseError, msg=pragma):
+                build_ir(pragma)
+
+if __name__ == "__main__":
+    unittest.main()
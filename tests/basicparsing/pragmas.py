@@ -0,0 +1,103 @@
+"""
+This module tests finding the pragmas in a function, and the regions of source
+code that they govern.
+"""
+import ast
+import unittest
+import os
+import sys
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.ir.srcindex as srcindex
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+SRC = '''def func(a, b):
+    """
+    # pragma acc parallel (not a pragma: this is a docstring)
+    """
+    # pragma acc parallel \\
+    #     copyin(a) copy(b)
+    #{
+    x = [i for i in
+         range(10)]
+    # pragma acc loop
+    for i in range(len(a)):
+        b[i] = a[i] + \\
+            x[i]
+    #}
+    # pragma acc wait
+    # pragma acc parallel loop
+    for j in range(3):
+        # pragma acc loop
+        for k in range(3):
+            pass
+    return b
+'''
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class TestSourceIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = srcindex.SourceIndex(SRC)
+
+    def test_pragmas(self):
+        """
+        Test that only real pragma comments are found, with continuations joined.
+        """
+        self.assertEqual(sorted(self.index.pragmas), [4, 9, 14, 15, 17])
+        self.assertEqual(self.index.pragmas[4], "# pragma acc parallel copyin(a) copy(b)")
+        self.assertEqual(self.index.directives[15], "parallel")
+
+    def test_braced_region(self):
+        """
+        Test that a braced region is the lines between the braces, after the continuation.
+        """
+        self.assertEqual(self.index.braced_region(4), (7, 12))
+        self.assertIsNone(self.index.braced_region(15))
+
+    def test_statement_region(self):
+        """
+        Test that a statement's region covers its line continuations and nested blocks.
+        """
+        self.assertEqual(self.index.region(9), (10, 12))
+        self.assertEqual(self.index.region(15), (16, 19))
+        self.assertEqual(self.index.region(17), (18, 19))
+
+    def test_statement(self):
+        """
+        Test that the statement a pragma governs is the already parsed AST node, and that
+        a span over it only builds its text when asked.
+        """
+        node = self.index.statement(15)
+        self.assertIsInstance(node, ast.For)
+        self.assertEqual(node.lineno - 1, 16)
+        self.assertEqual(self.index.statement(9).lineno - 1, 10)
+        span = srcindex.Span(self.index, 16, 19, node)
+        self.assertEqual(span.text.splitlines()[0].strip(), "for j in range(3):")
+        self.assertFalse(hasattr(span, "__dict__"))
+
+    def test_parents(self):
+        """
+        Test that each pragma's enclosing compute construct is the innermost one that contains it.
+        """
+        self.assertIsNone(self.index.parents[4])
+        self.assertEqual(self.index.parents[9], 4)
+        self.assertIsNone(self.index.parents[14])
+        self.assertEqual(self.index.parents[17], 15)
+
+    def test_missing_brace(self):
+        """
+        Test that an unclosed brace is an error.
+        """
+        src = "def f():\n    # pragma acc parallel\n    #{\n    pass\n"
+        with self.assertRaises(SyntaxError):
+            srcindex.SourceIndex(src)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+This module contains the tests for comparing benchmark results (python -m acc.bench compare).
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.bench as bench
+
+def results_file(times_by_kernel: dict) -> str:
+    """
+    Writes a results file with a benchmark for each kernel in `times_by_kernel`, and returns its path.
+    """
+    results = [{"kernel": kernel, "n": 1000, "gangs": 2, "times": times, "best": min(times)} for kernel, times in times_by_kernel.items()]
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, 'w') as f:
+        json.dump({"machine": {}, "results": results}, f)
+    return path
+
+class TestCompare(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def run_compare(self, old: dict, new: dict) -> (int, str):
+        """
+        Runs `compare` on results files with the `old` and `new` times, and returns its exit status and output.
+        """
+        self.paths += [results_file(old), results_file(new)]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = bench.main(["compare"] + self.paths[-2:])
+        return status, out.getvalue()
+
+    def test_verdicts(self):
+        """
+        Test that clear slowdowns and speedups are told apart from unchanged and noisy times.
+        """
+        old = [1.00, 1.01, 0.99, 1.02, 0.98, 1.00, 1.01]
+        self.assertEqual(bench.compare_times("x", old, [t * 1.5 for t in old]).verdict, "slower")
+        self.assertEqual(bench.compare_times("x", old, [t * 0.5 for t in old]).verdict, "faster")
+        self.assertEqual(bench.compare_times("x", old, [t * 1.01 for t in old]).verdict, "same")
+        self.assertEqual(bench.compare_times("x", old, [0.6, 1.5, 0.9, 1.4, 1.1, 0.7, 1.3]).verdict, "noisy")
+        self.assertEqual(bench.compare_times("x", [1e-5] * 3, [2e-5] * 3).verdict, "short")
+        self.assertEqual(bench.compare_times("x", old[:2], [t * 1.5 for t in old[:2]]).verdict, "noisy")
+
+    def test_ratio(self):
+        """
+        Test that the change is the ratio of the medians, and that it is inside its interval.
+        """
+        comparison = bench.compare_times("x", [1.0, 2.0, 3.0, 4.0, 100.0], [2.0, 4.0, 6.0, 8.0, 0.1])
+        self.assertEqual((comparison.old, comparison.new, comparison.ratio), (3.0, 4.0, 4.0 / 3.0))
+        self.assertLessEqual(comparison.low, comparison.ratio)
+        self.assertGreaterEqual(comparison.high, comparison.ratio)
+
+    def test_gate(self):
+        """
+        Test that the exit status is 1 when a benchmark got slower, and 0 otherwise.
+        """
+        old = {"matmul": [0.10, 0.11, 0.10, 0.09, 0.10], "map": [0.20, 0.21, 0.19, 0.20, 0.20]}
+        status, out = self.run_compare(old, old)
+        self.assertEqual(status, 0)
+        self.assertIn("0 slower", out)
+        status, out = self.run_compare(old, dict(old, matmul=[0.20, 0.22, 0.20, 0.18, 0.20]))
+        self.assertEqual(status, 1)
+        self.assertIn("1 slower", out)
+        self.assertIn("gangs=2 kernel=matmul n=1000", out)
+
+    def test_only_in_one(self):
+        """
+        Test that the benchmarks that are only in one file are listed, and do not fail the gate.
+        """
+        status, out = self.run_compare({"map": [0.2] * 3}, {"map": [0.2] * 3, "dot": [0.5] * 3})
+        self.assertEqual(status, 0)
+        self.assertIn("gangs=2 kernel=dot n=1000 only in {}".format(self.paths[-1]), out)
+
+    def test_load_merges_runs(self):
+        """
+        Test that the times of the same benchmark from several runs are pooled.
+        """
+        self.paths.append(results_file({"map": [0.1, 0.2]}))
+        with open(self.paths[-1]) as f:
+            results = json.load(f)
+        results["results"].append(dict(results["results"][0], times=[0.3], best=0.3))
+        with open(self.paths[-1], 'w') as f:
+            json.dump(results, f)
+        self.assertEqual(bench.load(self.paths[-1]), {"gangs=2 kernel=map n=1000": [0.1, 0.2, 0.3]})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+This module contains the tests for the auto-parallelization pass and its cost model.
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.frontend.frontend as frontend
+import acc.frontend.util.errors as errors
+import acc.ir.icv as icv
+import acc.ir.intrep as intrep
+import acc.ir.metavars as metavars
+import acc.ir.passes.autopar as autopar
+import acc.ir.passes.costmodel as costmodel
+import acc.ir.passes.pipeline as pipeline
+import ast
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+SRC = '''def f(a, b, c, n):
+    # pragma acc parallel loop auto num_gangs(4)
+    for i in range(1, n):
+        a[i] = a[i - 1] + 1
+    # pragma acc parallel loop auto num_gangs(4)
+    for i in range(n):
+        b[i] = a[i] * 2
+    # pragma acc parallel loop num_gangs(4)
+    for i in range(n):
+        # pragma acc loop auto
+        for j in range(n):
+            c[i][j] = a[i] * a[j]
+    # pragma acc parallel loop seq
+    for i in range(n):
+        b[i] = 0
+    return b
+'''
+
+@openacc.acc()
+def prefix(ls):
+    # pragma acc parallel loop auto num_gangs(4)
+    for i in range(1, len(ls)):
+        ls[i] = ls[i - 1] + ls[i]
+    return ls
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+def build_ir(src: str, arguments=None) -> intrep.IntermediateRepresentation:
+    meta_data = metavars.MetaVars(src=src, funcs_name="f", arguments=arguments)
+    intermediate_rep = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+    dbg = errors.Debug(intermediate_rep)
+    for pragma, lineno in frontend.parse_pragmas(intermediate_rep):
+        dbg.lineno = lineno
+        frontend.accumulate_pragma(intermediate_rep, pragma, lineno, dbg)
+    return intermediate_rep
+
+def loops(intermediate_rep) -> dict:
+    """
+    Returns the loop nodes of the IR, by line number.
+    """
+    return {node.lineno: node for node in intermediate_rep.breadth_first_traversal() if hasattr(node, "schedule")}
+
+class TestAutoParallelization(unittest.TestCase):
+    def test_cost_model(self):
+        """
+        Test trip counts from the arguments, and that gangs only pay off for enough work.
+        """
+        forloop = ast.parse("for i in range(1, len(a) - 1):\n    b[i] = a[i] * 2").body[0]
+        cost = costmodel.estimate(forloop, {"a": [0] * 101, "b": [0] * 101})
+        self.assertEqual(cost.trip_count, 99)
+        self.assertTrue(cost.known_trip_count)
+        self.assertEqual(cost.bytes, 101 * 8 * 3)
+        self.assertEqual(costmodel.estimate(forloop).trip_count, costmodel.DEFAULT_TRIP_COUNT)
+        self.assertGreater(cost.parallel(4), cost.sequential())
+
+        big = costmodel.estimate(forloop, {"a": range(10 ** 7), "b": None})
+        self.assertLess(big.parallel(4), big.sequential())
+
+    def test_decisions(self):
+        """
+        Test that dependent loops run sequentially, independent ones run on the gangs if it is
+        worth it, and loops inside gang loops take the next level of parallelism.
+        """
+        ir = build_ir(SRC, {"a": None, "b": None, "c": None, "n": 10 ** 6})
+        pipeline.optimize(ir, disabled=["loop-fusion"])
+        nodes = loops(ir)
+        self.assertEqual(nodes[1].schedule, "seq")
+        self.assertIn("different iterations", nodes[1].decision.reasons[0])
+        self.assertEqual(nodes[4].schedule, "gang")
+        self.assertIsNone(nodes[7].schedule)
+        self.assertEqual(nodes[7].decision.schedule, "gang")
+        self.assertFalse(nodes[7].decision.automatic)
+        self.assertEqual(nodes[9].schedule, "vector")
+        self.assertTrue(nodes[12].seq)
+        self.assertEqual(len(autopar.report(ir)), 5)
+
+        small = build_ir(SRC, {"a": None, "b": None, "c": None, "n": 3})
+        pipeline.optimize(small, disabled=["loop-fusion"])
+        self.assertEqual(loops(small)[4].schedule, "seq")
+        self.assertIn("cost more", loops(small)[4].decision.reasons[0])
+
+    def test_exclusive(self):
+        """
+        Test that seq, independent and auto may not appear together.
+        """
+        with self.assertRaises(errors.InvalidClauseError):
+            build_ir("def f(a):\n    # pragma acc parallel loop seq auto\n    for i in a:\n        pass\n")
+
+    def test_dependent_loop(self):
+        """
+        Test that an auto loop with a loop-carried dependence gives the sequential result.
+        """
+        self.assertEqual(prefix(list(range(10))), [0, 1, 3, 6, 10, 15, 21, 28, 36, 45])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+This module contains the tests for the dependence analysis: def-use chains, loop
+dependence testing and the region graph.
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.frontend.frontend as frontend
+import acc.frontend.util.errors as errors
+import acc.ir.icv as icv
+import acc.ir.intrep as intrep
+import acc.ir.metavars as metavars
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+LOOPS = '''def f(a, b, c, n):
+    for i in range(n):
+        b[i] = a[i] * 2
+    for i in range(n):
+        a[i + 1] = a[i]
+    for i in range(n):
+        a[2 * i] = a[2 * i + 1]
+    for i in range(10):
+        a[i + 100] = a[i]
+    for i in range(10):
+        a[i] = a[i + n]
+    s = 0
+    for i in range(n):
+        s += a[i]
+    for i in range(n):
+        c.append(a[i])
+    for i in range(4):
+        t = 0
+        for j in range(8):
+            t += c[i][j]
+            c[i][j] = a[j]
+        b[i] = t
+    for i in range(4):
+        for j in range(8):
+            c[i, j] = c[i, j - 1]
+    for i in range(n):
+        last = a[i]
+    return s + last
+'''
+
+EXITS = '''def f(a, b, n):
+    for i in range(n):
+        if a[i] < 0:
+            break
+        b[i] = a[i]
+    for i in range(n):
+        if a[i] < 0:
+            return i
+        b[i] = a[i]
+    for i in range(n):
+        yield a[i]
+    for i in range(n):
+        for j in range(n):
+            if a[j] < 0:
+                break
+        b[i] = a[i]
+    for i in range(n):
+        def g(x):
+            return x * 2
+        b[i] = g(a[i])
+    for i in range(n):
+        for j in range(n):
+            b[i] = a[i]
+        else:
+            break
+'''
+
+REGIONS = '''def f(a, b, c, n):
+    # pragma acc parallel loop copy(b)
+    for i in range(n):
+        b[i] = a[i]
+    # pragma acc parallel loop copy(c)
+    for i in range(n):
+        c[i] = a[i] + 1
+    # pragma acc parallel loop copyin(b)
+    for i in range(n):
+        total = b[i]
+    return c
+'''
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+def build_ir(src: str) -> intrep.IntermediateRepresentation:
+    meta_data = metavars.MetaVars(src=src, funcs_name="f")
+    intermediate_rep = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+    dbg = errors.Debug(intermediate_rep)
+    for pragma, lineno in frontend.parse_pragmas(intermediate_rep):
+        dbg.lineno = lineno
+        frontend.accumulate_pragma(intermediate_rep, pragma, lineno, dbg)
+    return intermediate_rep
+
+class TestDependence(unittest.TestCase):
+    def test_defuse(self):
+        """
+        Test that every use is reached by the right definitions, including around loops.
+        """
+        graph = build_ir(LOOPS).dependency_graph
+        uses = {(use.name, use.lineno): use for use in graph.defuse.uses}
+        self.assertEqual([d.lineno for d in uses[("n", 1)].reaching], [0])
+        # s += a[i]: the s = 0 before the loop, and itself from the previous iteration
+        self.assertEqual(sorted(d.lineno for d in uses[("s", 13)].reaching), [11, 13])
+        # t += c[i][j]: t = 0, or itself from the inner loop's previous iteration
+        self.assertEqual(sorted(d.lineno for d in uses[("t", 19)].reaching), [17, 19])
+        self.assertEqual(sorted(d.lineno for d in uses[("t", 21)].reaching), [17, 19])
+
+    def test_loops(self):
+        """
+        Test the loop dependence tests, by the line numbers of the loops.
+        """
+        graph = build_ir(LOOPS).dependency_graph
+        independent = {lineno: graph.loop_dependence(lineno).independent for lineno in (1, 3, 5, 7, 9, 12, 14, 16, 18, 22, 23, 25)}
+        self.assertTrue(independent[1])         # b[i] = a[i] * 2
+        self.assertFalse(independent[3])        # a[i + 1] = a[i]
+        self.assertTrue(independent[5])         # GCD: even and odd elements never meet
+        self.assertTrue(independent[7])         # Banerjee: i + 100 is never below 10
+        self.assertFalse(independent[9])        # a[i + n]: nothing is known about n
+        self.assertFalse(independent[12])       # s += a[i]
+        self.assertFalse(independent[14])       # c.append
+        self.assertTrue(independent[16])        # t is private to each iteration
+        self.assertFalse(independent[18])       # but it is carried through the inner loop
+        self.assertTrue(independent[22])        # c[i, j - 1] stays in the same row
+        self.assertFalse(independent[23])       # but not in the same column
+        self.assertFalse(independent[25])       # last is used after the loop
+        self.assertIn("s is carried", graph.loop_dependence(12).reasons[0])
+        self.assertIsNone(graph.loop_dependence(2))
+        self.assertEqual(graph.loop_dependence(7).bounds, (0, 9))
+
+    def test_exits(self):
+        """
+        Test that a loop that may be left part way through, or that yields, is not independent,
+        but one whose break or return belongs to a nested loop or function is.
+        """
+        graph = build_ir(EXITS).dependency_graph
+        self.assertEqual(graph.loop_dependence(1).reasons, ["the break at line 3 may end the loop early"])
+        self.assertEqual(graph.loop_dependence(5).reasons, ["the return at line 7 may end the loop early"])
+        self.assertEqual(graph.loop_dependence(9).reasons, ["the yield at line 10 hands each iteration back to the caller in turn"])
+        self.assertTrue(graph.loop_dependence(11).independent)
+        self.assertTrue(graph.loop_dependence(16).independent)
+        self.assertFalse(graph.loop_dependence(20).independent)
+
+    def test_regions(self):
+        """
+        Test the region graph: the third region reads what the first writes, and the second
+        shares nothing with either.
+        """
+        ir = build_ir(REGIONS)
+        graph = ir.dependency_graph
+        first, second, third = ir.root.children
+        self.assertEqual(graph.edges[first.lineno], {third.lineno: {"b"}})
+        self.assertEqual(graph.successors(second), [])
+        self.assertTrue(graph.independent(first, second))
+        self.assertFalse(graph.independent(first, third))
+
+        ir.remove_node(second)
+        self.assertEqual([node.lineno for node in ir.dependency_graph.regions], [first.lineno, third.lineno])
+
+if __name__ == "__main__":
+    unittest.main()
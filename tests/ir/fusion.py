@@ -0,0 +1,138 @@
+"""
+This module contains the tests for the loop fusion pass.
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.frontend.frontend as frontend
+import acc.frontend.util.errors as errors
+import acc.ir.icv as icv
+import acc.ir.intrep as intrep
+import acc.ir.metavars as metavars
+import acc.ir.passes.pipeline as pipeline
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+SRC = '''def f(a, b, c, d, n):
+    # pragma acc parallel loop
+    for i in range(n):
+        b[i] = a[i] * 2
+    # pragma acc parallel loop
+    for i in range(n):
+        c[i] = b[i] + 1
+
+    # pragma acc parallel loop
+    for i in range(n):
+        d[i] = c[i]
+    # pragma acc parallel loop
+    for i in range(n):
+        a[i] = d[i + 1]
+    # pragma acc parallel loop nofuse
+    for i in range(n):
+        a[i] = 0
+    n = n - 1
+    # pragma acc parallel loop
+    for i in range(n):
+        a[i] = 1
+    # pragma acc parallel loop copyin(a)
+    for i in range(n):
+        b[i] = a[i]
+    return a
+'''
+
+KERNELS = '''def f(a, b, n):
+    # pragma acc kernels
+    #{
+    # pragma acc loop independent
+    for i in range(n):
+        a[i] = i
+    # pragma acc loop independent
+    for i in range(n):
+        b[i] = a[i] * a[i]
+    #}
+    return b
+'''
+
+@openacc.acc()
+def fused(a, b, c):
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(a)):
+        b[i] = a[i] * 2
+    # pragma acc parallel loop num_gangs(2)
+    for i in range(len(a)):
+        c[i] = b[i] + a[i]
+    return b, c
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+def build_ir(src: str) -> intrep.IntermediateRepresentation:
+    meta_data = metavars.MetaVars(src=src, funcs_name="f")
+    intermediate_rep = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+    dbg = errors.Debug(intermediate_rep)
+    for pragma, lineno in frontend.parse_pragmas(intermediate_rep):
+        dbg.lineno = lineno
+        frontend.accumulate_pragma(intermediate_rep, pragma, lineno, dbg)
+    pipeline.optimize(intermediate_rep, disabled=[])
+    return intermediate_rep
+
+class TestLoopFusion(unittest.TestCase):
+    def test_parallel_loops(self):
+        """
+        Test which of a run of parallel loops are fused.
+        """
+        ir = build_ir(SRC)
+        regions = {node.lineno: [fused.lineno for fused in node.children[0].fused] for node in ir.root.children}
+        self.assertEqual(regions, {
+            1: [4, 8],      # b then c then d, all element by element
+            11: [],         # d[i + 1] is written by the next iteration of the loop before it
+            14: [],         # nofuse
+            18: [],         # host code before it
+            21: [],         # copyin(a), but the loop before it copies a back
+        })
+
+    def test_kernels_loops(self):
+        """
+        Test that adjacent loop nests in a kernels region are fused.
+        """
+        ir = build_ir(KERNELS)
+        kernels_node, = ir.root.children
+        first, = kernels_node.children
+        self.assertEqual([fused.lineno for fused in first.fused], [6])
+
+    def test_disabled(self):
+        """
+        Test that the pass can be turned off.
+        """
+        meta_data = metavars.MetaVars(src=KERNELS, funcs_name="f")
+        ir = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+        dbg = errors.Debug(ir)
+        for pragma, lineno in frontend.parse_pragmas(ir):
+            frontend.accumulate_pragma(ir, pragma, lineno, dbg)
+        pipeline.optimize(ir, disabled=["loop-fusion"])
+        self.assertEqual(len(ir.root.children[0].children), 2)
+
+    @unittest.skipIf(numpy is None, "NumPy is not available")
+    def test_fused_kernel(self):
+        """
+        Test that a fused kernel gives the same result as the loops one after the other.
+        """
+        a = numpy.arange(10.0)
+        b, c = fused(a, numpy.zeros(10), numpy.zeros(10))
+        self.assertTrue(numpy.array_equal(b, a * 2))
+        self.assertTrue(numpy.array_equal(c, a * 3))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+This module contains the tests for the pass manager and the optimisation passes.
+"""
+import os
+import sys
+import unittest
+
+mydir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(mydir, "../..")))
+import acc.api as openacc
+import acc.frontend.frontend as frontend
+import acc.frontend.util.errors as errors
+import acc.ir.icv as icv
+import acc.ir.intrep as intrep
+import acc.ir.metavars as metavars
+import acc.ir.passes.constfold as constfold
+import acc.ir.passes.passmanager as passmanager
+import acc.ir.passes.pipeline as pipeline
+
+NGANGS = 2
+
+####################################################################################
+###################### SOURCE CODE TO TEST #########################################
+####################################################################################
+
+SRC = '''def f(a, b, NGANGS):
+    # pragma acc parallel loop num_gangs(NGANGS * 2) copy(b)
+    for i in range(len(a)):
+        b[i] = a[i]
+    # pragma acc parallel loop num_gangs(GANGS + 1) if(GANGS > 8) copy(b)
+    for i in range(len(a)):
+        b[i] += a[i]
+    # pragma acc parallel loop if(GANGS < 8) self(False) copy(b)
+    for i in range(len(a)):
+        b[i] += 1
+    return b
+'''
+
+@openacc.acc()
+def dead_region(ls):
+    out = [0 for _ in ls]
+    # pragma acc parallel loop if(NGANGS > 8) copy(out)
+    for i in range(len(ls)):
+        out[i] = ls[i] * 2
+    return out
+
+####################################################################################
+###################### ACTUAL TESTS ################################################
+####################################################################################
+
+class FakeModule:
+    GANGS = 4
+    NGANGS = 100
+
+def build_ir(src: str) -> intrep.IntermediateRepresentation:
+    meta_data = metavars.MetaVars(src=src, funcs_name="f", funcs_module=FakeModule)
+    intermediate_rep = intrep.IntermediateRepresentation(meta_data, icv.ICVs("host", 0, -1))
+    dbg = errors.Debug(intermediate_rep)
+    for pragma, lineno in frontend.parse_pragmas(intermediate_rep):
+        dbg.lineno = lineno
+        frontend.accumulate_pragma(intermediate_rep, pragma, lineno, dbg)
+    return intermediate_rep
+
+class Counting(passmanager.Analysis):
+    name = "counting"
+    def __init__(self):
+        self.runs = 0
+    def run(self, intermediate_rep, manager):
+        self.runs += 1
+        return self.runs
+
+class Changing(passmanager.Transform):
+    name = "changing"
+    requires = ("counting",)
+    def run(self, intermediate_rep, manager):
+        manager.get_analysis("counting", intermediate_rep)
+        return True
+
+class After(passmanager.Transform):
+    name = "after"
+    requires = ("changing", "counting")
+    def run(self, intermediate_rep, manager):
+        self.seen = manager.get_analysis("counting", intermediate_rep)
+        return False
+
+class TestPasses(unittest.TestCase):
+    def test_fold(self):
+        """
+        Test folding of literals and constant globals, and leaving everything else alone.
+        """
+        self.assertEqual(constfold.fold("2 * (3 + 1)"), "8")
+        self.assertEqual(constfold.fold("N > 3 and not DEBUG", {"N": 4, "DEBUG": False}), "True")
+        self.assertEqual(constfold.fold("len(a)"), "len(a)")
+        self.assertEqual(constfold.fold("1 / 0"), "1 / 0")
+
+    def test_pipeline(self):
+        """
+        Test that constant folding skips names the function binds, and that dead regions are removed
+        while known-true conditions are dropped.
+        """
+        ir = build_ir(SRC)
+        pipeline.optimize(ir, disabled=[])
+        nodes = [node for node in ir.root.children]
+        self.assertEqual([node.lineno for node in nodes], [1, 7])
+        self.assertEqual(nodes[0].num_gangs, "NGANGS * 2")
+        self.assertIsNone(nodes[1].if_)
+        self.assertIsNone(nodes[1].self_)
+
+    def test_disabled(self):
+        """
+        Test that disabled passes leave the IR alone.
+        """
+        ir = build_ir(SRC)
+        manager = pipeline.optimize(ir, disabled=["all"])
+        self.assertEqual(len(ir.root.children), 3)
+        self.assertEqual(ir.root.children[1].num_gangs, "GANGS + 1")
+        self.assertEqual(ir.root.children[1].if_, "GANGS > 8")
+        self.assertEqual(manager.timings, {})
+
+    def test_manager(self):
+        """
+        Test that passes run in dependency order and that analyses are rerun after a change.
+        """
+        counting = Counting()
+        after = After()
+        manager = passmanager.PassManager([after, Changing(), counting], disabled=[])
+        manager.run(build_ir(SRC))
+        self.assertEqual(after.seen, 2)
+        self.assertEqual(set(manager.timings), {"counting", "changing", "after"})
+
+    def test_dead_region(self):
+        """
+        Test that a region with if(False) runs on the local thread and gives the same results.
+        """
+        ls = list(range(7))
+        self.assertEqual(dead_region(ls), [x * 2 for x in ls])
+
+if __name__ == "__main__":
+    unittest.main()